@@ -1,6 +1,6 @@
 from typing import Optional
-from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from jose import JWTError, jwt
@@ -8,15 +8,32 @@ from app.database import get_async_db
 # from app.core.config import settings  # Not needed here
 from app.auth import decode_token
 from app.models import User
+from app.services.principal_cache import UserPrincipal, principal_cache
+from app.services.response_encoding import FieldSelection, InvalidFields, parse_fields
 
-security = HTTPBearer()
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+
+
+async def resolve_principal(user_id: str, db: AsyncSession) -> Optional[UserPrincipal]:
+    """Return the cached principal for ``user_id``, loading it on a miss."""
+    principal = await principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
+    if user is None:
+        return None
+
+    principal = UserPrincipal.from_user(user)
+    await principal_cache.set(principal)
+    return principal
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_async_db)
-) -> User:
-    token = credentials.credentials
+) -> UserPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Ungültige Authentifizierungsdaten",
@@ -33,30 +50,26 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    result = await db.execute(
-        select(User).where(User.id == user_id, User.is_active == True)
-    )
-    user = result.scalar_one_or_none()
-
-    if user is None:
+    principal = await resolve_principal(user_id, db)
+    if principal is None or not principal.is_active:
         raise credentials_exception
-    return user
+    return principal
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_user),
+) -> UserPrincipal:
     if not current_user.is_active:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_403_FORBIDDEN,
             detail="Inaktiver Benutzer"
         )
     return current_user
 
 
 async def get_current_superuser(
-    current_user: User = Depends(get_current_active_user),
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_active_user),
+) -> UserPrincipal:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -98,4 +111,16 @@ def check_document_access(
     if document.scope == "company":
         return True
 
-    return False
\ No newline at end of file
+    return False
+
+
+def get_field_selection(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated fields to return; '-name' drops a field, dots reach into nested objects",
+    )
+) -> Optional[FieldSelection]:
+    try:
+        return parse_fields(fields)
+    except InvalidFields as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
@@ -10,7 +10,15 @@ from app.database import get_async_db
 from app.models import User, Document, ChatSession, Department
 from app.api.deps import get_current_superuser
 from app.services.llm_service import LLMService
-from app.auth import get_password_hash
+from app.services.embedding_registry import (
+    ModelAlreadyRegistered,
+    ModelNotFound,
+    ShadowIncomplete,
+    activate_model,
+    build_progress,
+    register_model,
+)
+from app.auth import get_password_hash_async
 
 router = APIRouter(prefix="/api/v1/admin", tags=["Administration"])
 
@@ -40,6 +48,16 @@ class SystemStats(BaseModel):
     storage_used_bytes: int
 
 
+class EmbeddingModelRegisterRequest(BaseModel):
+    name: str
+    rate_limit: Optional[float] = None  # Chunks per second; EMBEDDING_MIGRATION_RATE when unset
+
+
+class EmbeddingModelActivateRequest(BaseModel):
+    model_id: Optional[str] = None  # None switches back to the legacy document_chunks.embedding column
+    force: bool = False
+
+
 class ServiceHealth(BaseModel):
     api: str
     database: str
@@ -199,7 +217,7 @@ async def create_user(
         email=request.email,
         username=request.email.split('@')[0],
         full_name=request.email.split('@')[0],
-        hashed_password=get_password_hash(request.password),
+        hashed_password=await get_password_hash_async(request.password),
         primary_department=dept,
         is_superuser=request.is_superuser,
         is_active=True,
@@ -310,4 +328,59 @@ async def reindex_documents(
     return {
         "message": f"{len(documents)} documents queued for reindexing",
         "document_count": len(documents)
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/embedding-models")
+async def list_embedding_models(
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_superuser)
+):
+    """Registered embedding models with shadow build progress and projected completion."""
+
+    progress = await db.run_sync(lambda sync_db: build_progress(sync_db))
+    active = next((item for item in progress if item.status.value == "ACTIVE"), None)
+    return {
+        "active_model": active.name if active else None,
+        "models": [item.as_dict() for item in progress],
+    }
+
+
+@router.post("/embedding-models", status_code=status.HTTP_202_ACCEPTED)
+async def register_embedding_model(
+    request: EmbeddingModelRegisterRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_superuser)
+):
+    """Register a model; its vectors are built in the background while search keeps the active model."""
+
+    if request.rate_limit is not None and request.rate_limit <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="rate_limit must be positive")
+    try:
+        model = await db.run_sync(
+            lambda sync_db: register_model(sync_db, request.name, current_user.id, request.rate_limit)
+        )
+    except ModelAlreadyRegistered as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return {"id": str(model.id), "name": model.name, "status": model.status.value}
+
+
+@router.post("/embedding-models/activate")
+async def activate_embedding_model(
+    request: EmbeddingModelActivateRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_superuser)
+):
+    """Atomically switch the model searches read; refused while its shadow index is incomplete unless forced."""
+
+    try:
+        model_id = uuid.UUID(request.model_id) if request.model_id else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid model_id")
+    try:
+        model = await db.run_sync(lambda sync_db: activate_model(sync_db, model_id, request.force))
+    except ModelNotFound as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    except ShadowIncomplete as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return {"active_model": model.name if model else None}
@@ -1,45 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models import User
 from app.schemas import LoginRequest, TokenResponse, UserResponse, UserCreate
+from app.api.deps import get_current_active_user
 from app.auth import (
-    authenticate_user,
+    authenticate_user_async,
     create_access_token,
     create_refresh_token,
-    get_current_user as auth_get_current_user,
-    create_user as auth_create_user
+    create_user as auth_create_user,
+    get_password_hash_async,
 )
+from app.services.login_throttle import login_throttle
 
 router = APIRouter(prefix="/api/v1/auth", tags=["Authentication"])
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
-
-
-# Dependency to get current user
-async def get_current_active_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    user = auth_get_current_user(db, token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user"
-        )
-    return user
-
 
 @router.post("/register", response_model=UserResponse)
 async def register(
@@ -63,7 +42,8 @@ async def register(
         password=user_data.password,
         username=user_data.username,
         full_name=user_data.full_name,
-        department=user_data.primary_department
+        department=user_data.primary_department,
+        hashed_password=await get_password_hash_async(user_data.password),
     )
 
     return UserResponse.from_orm(user)
@@ -72,16 +52,28 @@ async def register(
 @router.post("/login", response_model=TokenResponse)
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    http_request: Request,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, request.email, request.password)
+    client_ip = http_request.client.host if http_request.client else None
+    retry_after = login_throttle.retry_after(request.email, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Zu viele fehlgeschlagene Anmeldeversuche. Bitte später erneut versuchen.",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+    user = await authenticate_user_async(db, request.email, request.password)
     if not user:
+        login_throttle.record_failure(request.email, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Ungültige E-Mail oder Passwort",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    login_throttle.reset(request.email)
     access_token = create_access_token(data={"sub": str(user.id)})
     refresh_token = create_refresh_token(data={"sub": str(user.id)})
 
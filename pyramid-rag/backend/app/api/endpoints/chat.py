@@ -1,14 +1,23 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, func, update
+from sqlalchemy import select, desc, update
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 
-from app.database import get_async_db
+from app.database import get_async_db, AsyncSessionLocal
 from app.models import ChatSession, ChatMessage, ChatType
 from app.api.deps import get_current_user
 from app.services.llm_service import LLMService
+from app.services.pagination import InvalidCursor, encode_cursor, keyset_after
+from app.services.chat_file_index import chat_file_index
+from app.services.chat_purge import delete_sessions, remove_files
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/chat", tags=["Chat"])
 
@@ -41,6 +50,15 @@ class ChatSessionResponse(BaseModel):
     message_count: int
 
 
+class ChatSessionSummary(ChatSessionResponse):
+    last_message_at: Optional[str]
+
+
+class ChatSidebarResponse(BaseModel):
+    sessions: List[ChatSessionSummary]
+    next_cursor: Optional[str]
+
+
 class ChatSessionCreate(BaseModel):
     title: Optional[str] = None
     folder_path: Optional[str] = None
@@ -62,37 +80,67 @@ async def list_chat_sessions(
     """List user's chat sessions."""
 
     stmt = (
-        select(
-            ChatSession,
-            func.count(ChatMessage.id).label("message_count")
-        )
-        .outerjoin(ChatMessage, ChatMessage.session_id == ChatSession.id)
+        select(ChatSession)
         .where(ChatSession.user_id == current_user.id)
-        .group_by(ChatSession.id)
         .order_by(desc(ChatSession.updated_at))
         .offset(skip)
         .limit(limit)
     )
 
     result = await db.execute(stmt)
-    rows = result.all()
-
-    session_responses = []
-    for session, message_count in rows:
-        session_responses.append(
-            ChatSessionResponse(
-                id=str(session.id),
-                title=session.title,
-                folder_path=session.folder_path,
-                chat_type=session.chat_type.value if session.chat_type else "NORMAL",
-                expires_at=session.expires_at.isoformat() if session.expires_at else None,
-                created_at=session.created_at.isoformat(),
-                updated_at=session.updated_at.isoformat(),
-                message_count=message_count or 0
-            )
+    return [_session_summary(session) for session in result.scalars().all()]
+
+
+@router.get("/sessions/sidebar", response_model=ChatSidebarResponse)
+async def list_sidebar_sessions(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Sidebar page of the user's sessions, most recently active first.
+
+    Reads the denormalized message_count/last_message_at columns and
+    continues after ``cursor`` via ix_chat_sessions_user_id_updated_at, so the
+    cost does not depend on message history or how far the user scrolled.
+    """
+    stmt = select(ChatSession).where(ChatSession.user_id == current_user.id)
+    try:
+        after = keyset_after(ChatSession.updated_at, ChatSession.id, cursor)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ungültiger Cursor"
         )
+    if after is not None:
+        stmt = stmt.where(after)
+    stmt = stmt.order_by(desc(ChatSession.updated_at), desc(ChatSession.id)).limit(limit)
+
+    result = await db.execute(stmt)
+    sessions = result.scalars().all()
+
+    next_cursor = None
+    if len(sessions) == limit:
+        next_cursor = encode_cursor(sessions[-1].updated_at, sessions[-1].id)
+
+    return ChatSidebarResponse(
+        sessions=[_session_summary(session) for session in sessions],
+        next_cursor=next_cursor
+    )
+
 
-    return session_responses
+def _session_summary(session: ChatSession) -> ChatSessionSummary:
+    return ChatSessionSummary(
+        id=str(session.id),
+        title=session.title,
+        folder_path=session.folder_path,
+        chat_type=session.chat_type.value if session.chat_type else "NORMAL",
+        expires_at=session.expires_at.isoformat() if session.expires_at else None,
+        created_at=session.created_at.isoformat(),
+        updated_at=session.updated_at.isoformat(),
+        message_count=session.message_count or 0,
+        last_message_at=session.last_message_at.isoformat() if session.last_message_at else None
+    )
 
 
 @router.post("/sessions", response_model=ChatSessionResponse)
@@ -281,6 +329,124 @@ async def send_chat_message(
         )
 
 
+@router.post("/sessions/{session_id}/messages/stream")
+async def stream_chat_message(
+    session_id: str,
+    message_data: ChatMessageCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Send a message and stream the answer as Server-Sent Events.
+
+    Emits a ``citations`` event once retrieval is done, ``message`` events with
+    token chunks while the model generates, and a final ``done`` event carrying
+    the persisted assistant message.
+    """
+
+    # Verify session belongs to user
+    session_result = await db.execute(
+        select(ChatSession).where(
+            ChatSession.id == session_id,
+            ChatSession.user_id == current_user.id
+        )
+    )
+    session = session_result.scalar_one_or_none()
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat-Sitzung nicht gefunden"
+        )
+
+    # Save user message before streaming starts
+    user_message = ChatMessage(
+        session_id=session.id,
+        role="user",
+        content=message_data.content,
+        meta_data={'use_rag': message_data.use_rag}
+    )
+    db.add(user_message)
+    await db.commit()
+
+    chat_session_id = session.id
+
+    async def sse_generator():
+        # The request-scoped session is released before the body is streamed,
+        # so the generator owns its own session for retrieval and persistence.
+        async with AsyncSessionLocal() as stream_db:
+            llm_service = LLMService()
+            assistant_response = ""
+            try:
+                async for event in llm_service.stream_rag_response(
+                    db=stream_db,
+                    user=current_user,
+                    query=message_data.content,
+                    use_rag=message_data.use_rag,
+                    search_mode=message_data.search_mode
+                ):
+                    if event["type"] == "citations":
+                        yield f"event: citations\ndata: {json.dumps({'retrieved_documents': event['retrieved_documents']})}\n\n"
+                    elif event["type"] == "chunk":
+                        assistant_response += event["chunk"]
+                        yield f"event: message\ndata: {json.dumps({'chunk': event['chunk']})}\n\n"
+                    elif event["type"] == "complete":
+                        response_data = event["payload"]
+                        ai_message = ChatMessage(
+                            session_id=chat_session_id,
+                            role="assistant",
+                            content=response_data["response"],
+                            meta_data={
+                                'use_rag': response_data["use_rag"],
+                                'retrieved_documents': response_data["retrieved_documents"],
+                                'tokens_used': response_data["tokens_used"],
+                                'processing_time': response_data["processing_time"],
+                                'time_to_first_token': response_data.get("time_to_first_token")
+                            }
+                        )
+                        stream_db.add(ai_message)
+                        await stream_db.execute(
+                            update(ChatSession)
+                            .where(ChatSession.id == chat_session_id)
+                            .values(updated_at=datetime.utcnow())
+                        )
+                        await stream_db.commit()
+                        await stream_db.refresh(ai_message)
+
+                        done_payload = ChatMessageResponse(
+                            id=str(ai_message.id),
+                            role=ai_message.role,
+                            content=ai_message.content,
+                            use_rag=response_data["use_rag"],
+                            retrieved_documents=response_data["retrieved_documents"],
+                            tokens_used=response_data["tokens_used"],
+                            processing_time=response_data["processing_time"],
+                            created_at=ai_message.created_at.isoformat()
+                        )
+                        yield f"event: done\ndata: {done_payload.model_dump_json()}\n\n"
+            except Exception as exc:
+                logger.exception("Chat streaming failed")
+                await stream_db.rollback()
+                try:
+                    error_message = ChatMessage(
+                        session_id=chat_session_id,
+                        role="assistant",
+                        content=assistant_response or f"Entschuldigung, es ist ein Fehler aufgetreten: {str(exc)}",
+                        meta_data={'use_rag': False, 'error': str(exc)}
+                    )
+                    stream_db.add(error_message)
+                    await stream_db.commit()
+                except Exception:
+                    logger.error("Failed to save error message for session %s", chat_session_id)
+                    await stream_db.rollback()
+                yield f"event: error\ndata: {json.dumps({'error': str(exc)})}\n\n"
+
+    return StreamingResponse(
+        sse_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.put("/sessions/{session_id}", response_model=ChatSessionResponse)
 async def update_chat_session(
     session_id: str,
@@ -316,22 +482,7 @@ async def update_chat_session(
     await db.commit()
     await db.refresh(session)
 
-    # Get message count
-    count_result = await db.execute(
-        select(func.count(ChatMessage.id)).where(ChatMessage.session_id == session_id)
-    )
-    message_count = count_result.scalar() or 0
-
-    return ChatSessionResponse(
-        id=str(session.id),
-        title=session.title,
-        folder_path=session.folder_path,
-        chat_type=session.chat_type.value,
-        expires_at=session.expires_at.isoformat() if session.expires_at else None,
-        created_at=session.created_at.isoformat(),
-        updated_at=session.updated_at.isoformat(),
-        message_count=message_count
-    )
+    return _session_summary(session)
 
 
 @router.delete("/sessions/{session_id}")
@@ -357,8 +508,10 @@ async def delete_chat_session(
             detail="Chat-Sitzung nicht gefunden"
         )
 
-    # Delete session (messages will be cascade deleted)
-    await db.delete(session)
+    # Set-based delete of messages, sources and chat files instead of ORM cascades
+    stats = await db.run_sync(lambda sync_db: delete_sessions(sync_db, [session.id]))
     await db.commit()
+    await asyncio.to_thread(remove_files, stats.file_paths)
+    chat_file_index.discard(session.id)
 
     return {"message": "Chat-Sitzung erfolgreich gelöscht"}
\ No newline at end of file
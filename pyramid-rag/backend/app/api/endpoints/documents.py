@@ -1,14 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from sqlalchemy import cast
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import cast, select
 from sqlalchemy.dialects.postgresql import JSONB
-from typing import Optional, List
+from typing import Literal, Optional, List
 from pathlib import Path
 from datetime import datetime
 import uuid
 import os
-import shutil
 import logging
 
 from app.database import get_db
@@ -17,12 +15,19 @@ from app.models import (
     Department, FileType, ChatFile, FileScope
 )
 from app.schemas import (
-    DocumentResponse, DocumentListResponse, DocumentCreate,
+    DocumentResponse, DocumentListItem, DocumentListResponse, DocumentCreate,
     DepartmentEnum, FileTypeEnum, FileScopeEnum,
     ChatFileDetailResponse
 )
-from app.auth import get_current_user as auth_get_current_user
+from app.api.deps import get_current_active_user, get_field_selection
 from app.utils.file_security import sanitize_filename, secure_join
+from app.services.pagination import InvalidCursor, count_rows, encode_cursor, keyset_after
+from app.services.response_encoding import FieldSelection, json_response
+from app.services.chat_file_index import chat_file_index
+from app.services.chunking import CHUNK_POSITION_KEYS
+from app.services.embedding_registry import store_chunk_vectors
+from app.services.sparse_encoder import store_sparse_terms
+from app.services.upload_writer import UploadTooLarge, write_upload
 
 logger = logging.getLogger(__name__)
 
@@ -49,40 +54,35 @@ router = APIRouter(prefix="/api/v1/documents", tags=["Documents"])
 UPLOAD_DIR = Path("data/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-
-# Dependency to get current user
-async def get_current_active_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    user = auth_get_current_user(db, token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user"
-        )
-    return user
+# Columns needed for DocumentListItem; content and meta_data are never loaded for lists
+LIST_COLUMNS = (
+    Document.id, Document.filename, Document.original_filename, Document.title,
+    Document.description, Document.department, Document.file_type, Document.file_size,
+    Document.mime_type, Document.language, Document.processed, Document.uploaded_by,
+    Document.created_at, Document.updated_at,
+)
 
 
 @router.get("", response_model=DocumentListResponse)
 async def list_documents(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: Literal["exact", "estimate", "none"] = Query("estimate"),
     department: Optional[DepartmentEnum] = None,
     file_type: Optional[FileTypeEnum] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Document)
+    """List documents newest first.
+
+    Pass ``next_cursor`` from the previous response as ``cursor`` to page
+    through results; ``page`` (OFFSET) is still accepted but slows down with
+    depth. ``count=estimate`` uses the planner's row estimate for large
+    results, ``count=none`` skips counting entirely.
+    """
+    query = select(Document).options(load_only(*LIST_COLUMNS))
 
     # Apply visibility-based access control
     if not current_user.is_superuser and current_user.primary_department != Department.MANAGEMENT:
@@ -91,7 +91,7 @@ async def list_documents(
         # 2. Documents from their department with visibility="department"
         # 3. Their own uploaded documents
 
-        query = query.filter(
+        query = query.where(
             (cast(Document.meta_data, JSONB)["visibility"].astext == "all") |
             ((cast(Document.meta_data, JSONB)["visibility"].astext == "department") &
              (Document.department == current_user.primary_department)) |
@@ -100,29 +100,51 @@ async def list_documents(
     # Management and Superusers can see everything (no filter needed)
 
     if department:
-        query = query.filter(Document.department == Department[department])
+        query = query.where(Document.department == Department[department])
 
     if file_type:
-        query = query.filter(Document.file_type == FileType[file_type.upper()])
+        query = query.where(Document.file_type == FileType[file_type.upper()])
+
+    # Cursor requests continue a listing whose total the client already has
+    total, total_is_estimate = count_rows(db, query, count) if cursor is None else (None, False)
+
+    # Keyset pagination on (created_at, id), served by ix_documents_created_at_id
+    try:
+        after = keyset_after(Document.created_at, Document.id, cursor)
+    except InvalidCursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ungültiger Cursor"
+        )
+    query = query.order_by(Document.created_at.desc(), Document.id.desc())
+    if after is not None:
+        query = query.where(after)
+    else:
+        query = query.offset((page - 1) * page_size)
+    documents = db.execute(query.limit(page_size)).scalars().all()
 
-    # Pagination
-    total = query.count()
-    documents = query.offset((page - 1) * page_size).limit(page_size).all()
+    next_cursor = None
+    if len(documents) == page_size:
+        next_cursor = encode_cursor(documents[-1].created_at, documents[-1].id)
 
     return DocumentListResponse(
-        documents=[DocumentResponse.from_orm(doc) for doc in documents],
+        documents=[DocumentListItem.from_orm(doc) for doc in documents],
         total=total,
+        total_is_estimate=total_is_estimate,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        next_cursor=next_cursor
     )
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: str,
+    fields: Optional[FieldSelection] = Depends(get_field_selection),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """One document; ``fields=-content`` skips the extracted text."""
     document = db.query(Document).filter(Document.id == document_id).first()
 
     if not document:
@@ -139,7 +161,7 @@ async def get_document(
                 detail="Access denied"
             )
 
-    return DocumentResponse.from_orm(document)
+    return json_response(DocumentResponse.from_orm(document), fields)
 
 
 @router.post("/upload")
@@ -148,6 +170,7 @@ async def upload_document_unified(
     scope: FileScopeEnum = Form(FileScopeEnum.GLOBAL),  # File scope toggle: GLOBAL vs CHAT
     visibility: str = Form("department"),  # "all" or "department" - who can see the file
     session_id: Optional[str] = Form(None),  # Required for CHAT scope
+    fields: Optional[FieldSelection] = Depends(get_field_selection),  # e.g. -content to skip the text
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -195,10 +218,14 @@ async def upload_document_unified(
     saved_filename = sanitize_filename(f"{file_id}{file_ext}", fallback_prefix="upload")
     file_path = secure_join(UPLOAD_DIR, saved_filename, fallback_prefix="upload")
 
-    # Save uploaded file
+    # Save uploaded file, hashing it in the same pass
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        stored = await write_upload(file, file_path)
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -206,21 +233,8 @@ async def upload_document_unified(
         )
 
     try:
-        # PROCESS WITH ADVANCED DOCUMENT PROCESSOR (2025)
-        processing_result = await document_processor.process_document(
-            file_path=file_path,
-            original_filename=original_display_name,
-            scope=scope
-        )
-
-        if not processing_result["success"]:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"Document processing failed: {processing_result.get('errors', 'Unknown error')}"
-            )
-
-        # Check for duplicate based on SHA-256 hash
-        file_hash = processing_result["file_hash"]
+        # Check for duplicate based on SHA-256 hash before any extraction or embedding
+        file_hash = stored.sha256
 
         if scope == FileScopeEnum.GLOBAL:
             # Check for duplicate in Document table (only for global files)
@@ -263,7 +277,7 @@ async def upload_document_unified(
                                 exc_info=True,
                             )
 
-                return {
+                return json_response({
                     "duplicate": True,
                     "existing_document_id": str(existing_doc.id),
                     "message": f"File already exists: {existing_doc.filename}",
@@ -277,7 +291,21 @@ async def upload_document_unified(
                     "scope": "GLOBAL",
                     "created_at": existing_doc.created_at.isoformat(),
                     "meta_data": existing_doc.meta_data,
-                }
+                }, fields)
+
+        # PROCESS WITH ADVANCED DOCUMENT PROCESSOR (2025)
+        processing_result = await document_processor.process_document(
+            file_path=file_path,
+            original_filename=original_display_name,
+            scope=scope,
+            file_hash=file_hash
+        )
+
+        if not processing_result["success"]:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Document processing failed: {processing_result.get('errors', 'Unknown error')}"
+            )
 
         response_metadata = processing_result.get("metadata") if isinstance(processing_result.get("metadata"), dict) else {}
         visibility_normalized = (visibility or "department").lower()
@@ -301,7 +329,7 @@ async def upload_document_unified(
                 original_filename=original_display_name,
                 file_path=str(file_path),
                 file_type=processing_result["file_type"],
-                file_size=os.path.getsize(file_path),
+                file_size=stored.size,
                 mime_type=processing_result["mime_type"],
                 file_hash=file_hash,
                 title=enhanced_metadata.get("title", original_display_name),
@@ -334,11 +362,10 @@ async def upload_document_unified(
                         embedding=embedding_vector,  # ✅ Store in chunk for fast search
                         meta_data={
                             "word_count": chunk_info["word_count"],
-                            "start_word": chunk_info.get("start_word"),
-                            "end_word": chunk_info.get("end_word"),
+                            **{key: chunk_info[key] for key in CHUNK_POSITION_KEYS if key in chunk_info},
                             "embedding_model": embedding_model_name
                         },
-                        token_count=chunk_info["word_count"],
+                        token_count=chunk_info.get("token_count") or chunk_info["word_count"],
                         created_at=datetime.utcnow()
                     )
                     db.add(chunk)
@@ -357,6 +384,14 @@ async def upload_document_unified(
                             model_name=embedding_model_name
                         )
                         db.add(embedding_record)
+                    store_chunk_vectors(
+                        db, embedding_model_name, document.id, [chunk_obj.id for chunk_obj in chunk_records], embeddings
+                    )
+
+                # Inverted postings for sparse (lexical) search
+                sparse_vectors = processing_result.get("sparse_vectors") or []
+                if sparse_vectors:
+                    store_sparse_terms(db, document.id, [chunk_obj.id for chunk_obj in chunk_records], sparse_vectors)
 
                 db.commit()  # ✅ Now BOTH tables are populated
 
@@ -372,7 +407,7 @@ async def upload_document_unified(
                 original_filename=original_display_name,
                 file_path=str(file_path),
                 file_type=processing_result["file_type"],
-                file_size=os.path.getsize(file_path),
+                file_size=stored.size,
                 mime_type=processing_result["mime_type"],
                 file_hash=file_hash,
                 title=chat_metadata.get("title", original_display_name),
@@ -388,17 +423,28 @@ async def upload_document_unified(
             db.add(chat_file)
             db.commit()
             db.refresh(chat_file)
+
+            # Chunks and embeddings go to the session's in-memory index; they
+            # are written to chat_file_chunks/chat_file_embeddings on eviction
+            await chat_file_index.add_file(
+                session_id=chat_file.session_id,
+                chat_file_id=chat_file.id,
+                title=chat_file.title or original_display_name,
+                chunks=processing_result.get("chunks") or [],
+                embeddings=processing_result.get("embeddings") or [],
+                model_name=chat_metadata.get("embedding_model"),
+            )
             document = chat_file  # For consistent return
             response_metadata = chat_metadata
 
-        return prepare_upload_response(
+        return json_response(prepare_upload_response(
             document=document,
             processing_result=processing_result,
             metadata=response_metadata,
             scope=scope,
             current_user=current_user,
             session_id=session_id,
-        )
+        ), fields)
 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -1,7 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from datetime import datetime
@@ -11,37 +9,17 @@ import uuid
 import json
 import logging
 
-from app.database import get_db
-from app.models import User
-from app.auth import get_current_user as auth_get_current_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.models import ChatSession, User
+from app.api.deps import get_current_active_user
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/mcp", tags=["MCP"])
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
-
-
-# Dependency to get current user
-async def get_current_active_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    user = auth_get_current_user(db, token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user"
-        )
-    return user
-
 
 # Request models for MCP
 class MCPQueryMode(str, Enum):
@@ -59,6 +37,8 @@ class MCPUngatedSearchRequest(BaseModel):
 
 
 class MCPMessageRequest(BaseModel):
+    # With a session_id the server keeps the conversation state, so only the
+    # new message has to be sent; full histories are still accepted.
     messages: List[Dict[str, Any]]
     tools: Optional[List[str]] = None
     session_id: Optional[str] = None
@@ -69,7 +49,7 @@ class MCPMessageRequest(BaseModel):
 async def mcp_search(
     request: MCPUngatedSearchRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Search documents via MCP-compatible response structure."""
     from app.vector_store import vector_store
@@ -112,15 +92,37 @@ async def mcp_search(
     }
 
 
+async def ensure_session_owner(db: AsyncSession, session_id: str, current_user: User) -> None:
+    """Reject a session id that names another user's chat session.
+
+    Ids that are not chat sessions (ad-hoc MCP sessions) only reach the
+    caller's own conversation state, which is keyed by user.
+    """
+    try:
+        session_uuid = uuid.UUID(str(session_id))
+    except ValueError:
+        return
+    owner_id = (
+        await db.execute(select(ChatSession.user_id).where(ChatSession.id == session_uuid))
+    ).scalar_one_or_none()
+    if owner_id is not None and owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found",
+        )
+
+
 @router.post("/message")
 async def process_mcp_message(
     request: MCPMessageRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Process MCP protocol message with enhanced functionality"""
+    if request.session_id:
+        await ensure_session_owner(db, request.session_id, current_user)
     try:
-        from app.services.mcp_gateway import get_mcp_gateway, initialize_mcp_gateway
+        from app.services.mcp_gateway import get_mcp_gateway
 
         session_id = request.session_id or f"session_{current_user.id}_{datetime.now().timestamp()}"
         department_value = (
@@ -130,10 +132,6 @@ async def process_mcp_message(
         )
 
         mcp_gateway = get_mcp_gateway(db)
-        if not mcp_gateway:
-            mcp_gateway = await initialize_mcp_gateway(db)
-        else:
-            mcp_gateway.update_session(db)
 
         context_payload = request.context or {}
         conversation = [dict(msg) for msg in request.messages]
@@ -255,16 +253,12 @@ async def process_mcp_message(
 @router.get("/tools")
 async def get_mcp_tools(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get available MCP tools"""
-    from app.services.mcp_gateway import get_mcp_gateway, initialize_mcp_gateway
+    from app.services.mcp_gateway import get_mcp_gateway
 
     mcp_gateway = get_mcp_gateway(db)
-    if not mcp_gateway:
-        mcp_gateway = await initialize_mcp_gateway(db)
-    else:
-        mcp_gateway.update_session(db)
 
     return {
         "tools": mcp_gateway.get_available_tools()
@@ -275,18 +269,14 @@ async def get_mcp_tools(
 async def get_mcp_context(
     session_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get MCP context summary"""
-    from app.services.mcp_gateway import get_mcp_gateway, initialize_mcp_gateway
+    from app.services.mcp_gateway import get_mcp_gateway
 
     mcp_gateway = get_mcp_gateway(db)
-    if not mcp_gateway:
-        mcp_gateway = await initialize_mcp_gateway(db)
-    else:
-        mcp_gateway.update_session(db)
 
-    context = mcp_gateway.get_context_summary(session_id)
+    context = await mcp_gateway.get_context_summary(session_id, str(current_user.id))
     if not context:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -300,32 +290,25 @@ async def get_mcp_context(
 async def clear_mcp_context(
     session_id: str,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Clear MCP context"""
-    from app.services.mcp_gateway import get_mcp_gateway, initialize_mcp_gateway
+    from app.services.mcp_gateway import get_mcp_gateway
 
     mcp_gateway = get_mcp_gateway(db)
-    if not mcp_gateway:
-        mcp_gateway = await initialize_mcp_gateway(db)
-    else:
-        mcp_gateway.update_session(db)
 
-    mcp_gateway.clear_context(session_id)
+    await mcp_gateway.clear_context(session_id, str(current_user.id))
     return {"message": "Context cleared"}
 
 
 @router.post("/stream")
 async def stream_mcp_chat(
     request: MCPMessageRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Stream MCP chat responses using Server-Sent Events"""
-    from app.services.mcp_gateway import get_mcp_gateway, initialize_mcp_gateway
-    from app.database import get_async_db
+    from app.services.mcp_gateway import get_mcp_gateway
     from app.models import ChatMessage
-    from sqlalchemy.ext.asyncio import AsyncSession
 
     session_id = request.session_id or str(uuid.uuid4())
     department_value = (
@@ -334,12 +317,6 @@ async def stream_mcp_chat(
         else str(current_user.primary_department)
     )
 
-    mcp_gateway = get_mcp_gateway(db)
-    if not mcp_gateway:
-        mcp_gateway = await initialize_mcp_gateway(db)
-    else:
-        mcp_gateway.update_session(db)
-
     context_payload = request.context or {}
     conversation = [dict(msg) for msg in request.messages]
     if not conversation:
@@ -393,8 +370,16 @@ async def stream_mcp_chat(
     conversation_for_gateway = conversation[: last_user_index + 1]
     user_content = user_message.get('content', '')
 
+    # The streaming body outlives request-scoped dependencies, so this
+    # session is owned by the generator and also backs the gateway's searches.
     async_db_gen = get_async_db()
     async_db: AsyncSession = await anext(async_db_gen)
+    try:
+        await ensure_session_owner(async_db, session_id, current_user)
+    except HTTPException:
+        await async_db.close()
+        raise
+    mcp_gateway = get_mcp_gateway(async_db)
     try:
         user_message_record = ChatMessage(
             session_id=uuid.UUID(session_id),
@@ -5,7 +5,8 @@ from pydantic import BaseModel
 
 from app.database import get_async_db
 from app.models import SearchMode, DocumentScope
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_field_selection
+from app.services.response_encoding import FieldSelection, json_response
 from app.services.search_service import SearchService
 
 router = APIRouter(prefix="/api/v1/search", tags=["Search"])
@@ -54,10 +55,11 @@ class SearchResponse(BaseModel):
 @router.post("/", response_model=SearchResponse)
 async def search_documents(
     search_request: SearchRequest,
+    fields: Optional[FieldSelection] = Depends(get_field_selection),
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    """Search documents using the specified mode."""
+    """Search documents using the specified mode; ``fields=`` selects response fields."""
 
     search_service = SearchService()
 
@@ -94,13 +96,13 @@ async def search_documents(
             )
         )
 
-    return SearchResponse(
+    return json_response(SearchResponse(
         query=search_request.query,
         mode=search_request.mode.value,
         total_results=len(result_items),
         results=result_items,
         processing_time=processing_time
-    )
+    ), fields)
 
 
 @router.get("/similar/{document_id}")
@@ -130,6 +132,7 @@ async def find_similar_documents(
 @router.post("/context")
 async def context_search(
     search_request: ContextSearchRequest,
+    fields: Optional[FieldSelection] = Depends(get_field_selection),
     db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
@@ -149,6 +152,9 @@ async def context_search(
     - Legal documents (context matters)
     - Multi-step instructions (need previous/next steps)
     - Tables and figures (need surrounding explanations)
+
+    ``fields=-results.full_context`` drops the joined text for clients that
+    read the separate chunks.
     """
 
     search_service = SearchService()
@@ -171,4 +177,4 @@ async def context_search(
     processing_time = time.time() - start_time
     context_results["processing_time"] = processing_time
 
-    return context_results
\ No newline at end of file
+    return json_response(context_results, fields)
\ No newline at end of file
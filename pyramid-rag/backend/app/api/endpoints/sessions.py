@@ -5,13 +5,12 @@ from pathlib import Path
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import ChatSession, ChatMessage, Document, FileType, User
-from app.auth import get_current_user as auth_get_current_user
+from app.api.deps import get_current_active_user
 
 logger = logging.getLogger(__name__)
 
@@ -19,32 +18,11 @@ logger = logging.getLogger(__name__)
 UPLOAD_DIR = Path("data/uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-# OAuth2 scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 router = APIRouter(prefix="/api/v1/chat/sessions", tags=["Chat Sessions"])
 
 
 # Dependency to get current user (matches main.py pattern)
-async def get_current_active_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from token."""
-    user = auth_get_current_user(db, token)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Inactive user"
-        )
-    return user
-
 
 class PublishSessionRequest(BaseModel):
     title: str
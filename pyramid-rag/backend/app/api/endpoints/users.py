@@ -5,9 +5,10 @@ from sqlalchemy import select, update, delete
 from pydantic import BaseModel, EmailStr
 
 from app.database import get_async_db
-from app.auth import get_password_hash
+from app.auth import get_password_hash_async
 from app.models import User, Department
 from app.api.deps import get_current_superuser, get_current_user
+from app.services.principal_cache import principal_cache
 
 router = APIRouter(prefix="/api/v1/users", tags=["Users"])
 
@@ -104,7 +105,7 @@ async def create_user(
     user = User(
         email=user_data.email,
         username=user_data.username,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         full_name=user_data.full_name,
         primary_department=user_data.primary_department,
         is_active=user_data.is_active,
@@ -205,6 +206,7 @@ async def update_user(
             update(User).where(User.id == user_id).values(**update_data)
         )
         await db.commit()
+        await principal_cache.invalidate(user_id)
         await db.refresh(user)
 
     # Log user update
@@ -266,5 +268,6 @@ async def delete_user(
 
     await db.execute(delete(User).where(User.id == user_id))
     await db.commit()
+    await principal_cache.invalidate(user_id)
 
     return {"message": "Benutzer erfolgreich gelöscht"}
\ No newline at end of file
@@ -1,14 +1,18 @@
 
+import asyncio
 import hashlib
 import logging
 import os
 import secrets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, Union
 
 import bcrypt
 from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.models import User
@@ -20,6 +24,14 @@ SECRET_KEY_ENV = 'SECRET_KEY'
 SECRET_KEY_FILE_ENV = 'SECRET_KEY_FILE'
 DEFAULT_SECRET_KEY_PATH = Path('data') / 'secret.key'
 
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the
+# event loop without letting a login burst starve the default executor.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '4'))
+LOGIN_CONCURRENCY_LIMIT = int(os.getenv('LOGIN_CONCURRENCY_LIMIT', str(PASSWORD_HASH_WORKERS * 2)))
+# Verified when the account does not exist, so unknown and known emails cost
+# the same bcrypt work (same scheme and cost factor as get_password_hash)
+DUMMY_PASSWORD_HASH = 'bcrypt_sha256$$2b$12$.BN43HNQOq/mFrnU7UQ.R.7gO6/8gQ1sQ1cP9jpuSpJJALgHkUC5i'
+
 
 def _load_secret_key() -> str:
     """Load the JWT secret key without falling back to a predictable default."""
@@ -102,6 +114,32 @@ def get_password_hash(password: str) -> str:
     return f'{BCRYPT_SHA256_PREFIX}{hashed}'
 
 
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix='password-hash',
+)
+_login_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_login_semaphore() -> asyncio.Semaphore:
+    global _login_semaphore
+    if _login_semaphore is None:
+        _login_semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY_LIMIT)
+    return _login_semaphore
+
+
+async def verify_password_async(plain_password: str, hashed_password: Union[str, bytes]) -> bool:
+    """Run ``verify_password`` on the bounded password executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Run ``get_password_hash`` on the bounded password executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -133,6 +171,7 @@ def authenticate_user(db: Session, email: str, password: str) -> Union[User, Non
     """Authenticate a user by email and password."""
     user = db.query(User).filter(User.email == email).first()
     if not user:
+        verify_password(password, DUMMY_PASSWORD_HASH)
         return None
 
     if not verify_password(password, user.hashed_password):
@@ -155,6 +194,37 @@ def authenticate_user(db: Session, email: str, password: str) -> Union[User, Non
     return user
 
 
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> Union[User, None]:
+    """Async variant of ``authenticate_user`` for request handlers.
+
+    At most ``LOGIN_CONCURRENCY_LIMIT`` logins verify passwords at once; the
+    rest wait their turn instead of queueing unbounded work on the executor.
+    """
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalar_one_or_none()
+
+    async with _get_login_semaphore():
+        if not user:
+            await verify_password_async(password, DUMMY_PASSWORD_HASH)
+            return None
+
+        if not await verify_password_async(password, user.hashed_password):
+            return None
+
+        hashed_value = _normalize_hashed_password(user.hashed_password)
+        if not hashed_value.startswith(BCRYPT_SHA256_PREFIX):
+            try:
+                user.hashed_password = await get_password_hash_async(password)
+            except Exception as exc:
+                logger.warning('Could not upgrade password hash for user %s: %s', email, exc)
+
+    user.last_login = datetime.utcnow()
+    await db.commit()
+    await db.refresh(user)
+
+    return user
+
+
 def get_current_user(db: Session, token: str) -> Union[User, None]:
     """Get current user from JWT token."""
     payload = decode_token(token)
@@ -180,9 +250,10 @@ def create_user(
     full_name: str,
     department: str,
     is_superuser: bool = False,
+    hashed_password: Optional[str] = None,
 ) -> User:
     """Create a new user."""
-    hashed_password = get_password_hash(password)
+    hashed_password = hashed_password or get_password_hash(password)
     user = User(
         email=email,
         username=username,
@@ -16,8 +16,10 @@ from sqlalchemy.orm import Session
 from app.models import Document, DocumentChunk, FileType
 from app.database import get_db
 try:
+    import importlib.util
     from app.embeddings_service import embeddings_service
-    EMBEDDINGS_AVAILABLE = True
+    # The model itself is loaded on first use; only check that it can be
+    EMBEDDINGS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
 except Exception as e:
     print(f"Warning: Embeddings service not available: {e}")
     embeddings_service = None
@@ -131,16 +133,19 @@ class DocumentProcessor:
     def extract_text_from_xlsx(self, file_path: str) -> str:
         """Extract text from Excel file"""
         try:
-            workbook = load_workbook(file_path, data_only=True)
-            text = ""
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                text += f"\nSheet: {sheet_name}\n"
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = "\t".join([str(cell) if cell else "" for cell in row])
-                    if row_text.strip():
-                        text += row_text + "\n"
-            return text
+            # Read-only mode streams rows instead of building every cell object
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            parts = []
+            try:
+                for sheet in workbook.worksheets:
+                    parts.append(f"\nSheet: {sheet.title}\n")
+                    for row in sheet.iter_rows(values_only=True):
+                        row_text = "\t".join([str(cell) if cell else "" for cell in row])
+                        if row_text.strip():
+                            parts.append(row_text + "\n")
+            finally:
+                workbook.close()
+            return "".join(parts)
         except Exception as e:
             print(f"Error extracting XLSX text: {e}")
             return ""
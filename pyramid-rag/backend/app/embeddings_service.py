@@ -5,15 +5,18 @@ Generates embeddings for documents using sentence-transformers
 
 import os
 import logging
-from typing import List, Optional
+import threading
+from typing import List, Optional, TYPE_CHECKING
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import UUID
 
 from app.models import Document, DocumentChunk, DocumentEmbedding
 from app.database import get_db
 
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 logger = logging.getLogger(__name__)
 
 class EmbeddingsService:
@@ -24,12 +27,24 @@ class EmbeddingsService:
         # This model produces 384-dimensional embeddings
         self.model_name = "paraphrase-multilingual-MiniLM-L12-v2"
         self.embedding_dim = 384
-        self.model: Optional[SentenceTransformer] = None
-        self._load_model()
+        # Loaded on first use so that importing this module does not pull in torch
+        self.model: Optional["SentenceTransformer"] = None
+        # Concurrent first requests (and the warm-up thread) must not each load the model
+        self._model_lock = threading.Lock()
+
+    def get_model(self) -> "SentenceTransformer":
+        """The sentence transformer, loaded once on first use"""
+        if self.model is None:
+            with self._model_lock:
+                if self.model is None:
+                    self._load_model()
+        return self.model
 
     def _load_model(self):
         """Load the sentence transformer model"""
         try:
+            from sentence_transformers import SentenceTransformer
+
             logger.info(f"Loading embedding model: {self.model_name}")
             self.model = SentenceTransformer(self.model_name)
             logger.info(f"Model loaded successfully. Embedding dimension: {self.embedding_dim}")
@@ -39,8 +54,7 @@ class EmbeddingsService:
 
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        if not self.model:
-            self._load_model()
+        self.get_model()
 
         if not text.strip():
             return [0.0] * self.embedding_dim
@@ -55,8 +69,7 @@ class EmbeddingsService:
 
     def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for a batch of texts (more efficient)"""
-        if not self.model:
-            self._load_model()
+        self.get_model()
 
         if not texts:
             return []
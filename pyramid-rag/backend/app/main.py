@@ -1,6 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
+import importlib
 import logging
 import time
 
@@ -18,7 +20,8 @@ logger.info("=" * 80)
 app = FastAPI(
     title="Pyramid RAG Platform",
     version="1.0.0",
-    description="Enterprise RAG Platform für Pyramid Computer GmbH"
+    description="Enterprise RAG Platform für Pyramid Computer GmbH",
+    default_response_class=ORJSONResponse
 )
 
 logger.info("✓ FastAPI application created")
@@ -46,61 +49,48 @@ app.add_middleware(
 )
 logger.info("✓ CORS middleware configured")
 
+# Outside CORS, so it sees the final headers: brotli/gzip above COMPRESSION_MIN_SIZE, streams untouched
+from app.services.response_encoding import CompressionMiddleware, HAS_BROTLI
+app.add_middleware(CompressionMiddleware)
+logger.info(f"✓ Compression middleware configured ({'brotli + gzip' if HAS_BROTLI else 'gzip'})")
+
+
+@app.middleware("http")
+async def bind_route_label(request: Request, call_next):
+    """Label stage latencies recorded during this request with its route template."""
+    from app.services import telemetry
+
+    token = telemetry.bind_route(telemetry.route_template(request.app.router, request.scope))
+    try:
+        return await call_next(request)
+    finally:
+        telemetry.reset_route(token)
+
 # Include API routers
-logger.info("Loading API routers (this may take some time for ML dependencies)...")
+# Endpoint modules only import lightweight code at module level; ML models are
+# loaded by the warm-up task after startup (see app.services.model_warmup).
+logger.info("Loading API routers...")
 router_start = time.time()
 
-logger.info("  - Loading system router...")
-from app.api.endpoints import system
-logger.info("  ✓ System router loaded")
-
-logger.info("  - Loading auth router...")
-from app.api.endpoints import auth
-logger.info("  ✓ Auth router loaded")
-
-logger.info("  - Loading documents router (heavy ML libraries - please wait)...")
-doc_start = time.time()
-from app.api.endpoints import documents
-logger.info(f"  ✓ Documents router loaded ({time.time() - doc_start:.1f}s)")
-
-logger.info("  - Loading chat router...")
-from app.api.endpoints import chat
-logger.info("  ✓ Chat router loaded")
-
-logger.info("  - Loading sessions router...")
-from app.api.endpoints import sessions
-logger.info("  ✓ Sessions router loaded")
-
-logger.info("  - Loading search router...")
-from app.api.endpoints import search
-logger.info("  ✓ Search router loaded")
-
-logger.info("  - Loading admin router...")
-from app.api.endpoints import admin
-logger.info("  ✓ Admin router loaded")
-
-logger.info("  - Loading users router...")
-from app.api.endpoints import users
-logger.info("  ✓ Users router loaded")
-
-logger.info("  - Loading MCP router...")
-from app.api.endpoints import mcp
-logger.info("  ✓ MCP router loaded")
-
-logger.info(f"✓ All routers loaded in {time.time() - router_start:.1f}s")
-
-# Register all routers
-logger.info("Registering routers with FastAPI...")
-app.include_router(system.router)          # Root, health, metrics, stats
-app.include_router(auth.router)            # /api/v1/auth/*
-app.include_router(documents.router)       # /api/v1/documents/*
-app.include_router(chat.router)            # /api/v1/chat/*
-app.include_router(sessions.router)        # /api/v1/chat/sessions/*
-app.include_router(search.router)          # /api/v1/search/*
-app.include_router(admin.router)           # /api/v1/admin/*
-app.include_router(users.router)           # /api/v1/users/*
-app.include_router(mcp.router)             # /api/v1/mcp/*
-logger.info("✓ All routers registered")
+ROUTER_MODULES = (
+    "system",      # Root, health, readiness, metrics, stats
+    "auth",        # /api/v1/auth/*
+    "documents",   # /api/v1/documents/*
+    "chat",        # /api/v1/chat/*
+    "sessions",    # /api/v1/chat/sessions/*
+    "search",      # /api/v1/search/*
+    "admin",       # /api/v1/admin/*
+    "users",       # /api/v1/users/*
+    "mcp",         # /api/v1/mcp/*
+)
+
+for module_name in ROUTER_MODULES:
+    module_start = time.time()
+    module = importlib.import_module(f"app.api.endpoints.{module_name}")
+    app.include_router(module.router)
+    logger.info(f"  ✓ {module_name} router loaded ({time.time() - module_start:.2f}s)")
+
+logger.info(f"✓ All routers loaded and registered in {time.time() - router_start:.1f}s")
 
 logger.info("=" * 80)
 logger.info("PYRAMID RAG PLATFORM - READY TO ACCEPT CONNECTIONS")
@@ -121,6 +111,23 @@ async def startup_event():
         logger.error(f"Startup initialization failed: {e}")
         # Don't raise - allow app to start even if initialization has issues
 
+    from app.services.metrics_collector import metrics_collector
+    from app.services.model_warmup import model_warmup
+    metrics_collector.start()
+    model_warmup.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks started at startup."""
+    from app.services.chat_file_index import chat_file_index
+    from app.services.metrics_collector import metrics_collector
+    from app.services.model_warmup import model_warmup
+
+    await metrics_collector.stop()
+    await model_warmup.stop()
+    await chat_file_index.spill_all()
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
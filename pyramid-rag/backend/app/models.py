@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Float, JSON, Table, Enum
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Float, JSON, Table, Enum, Index, event
 from sqlalchemy.dialects.postgresql import UUID
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.declarative import declarative_base
@@ -44,6 +44,13 @@ class SearchMode(enum.Enum):
     HYBRID = "HYBRID"       # Combined vector + keyword search
     VECTOR = "VECTOR"       # Pure semantic search
     KEYWORD = "KEYWORD"     # Pure keyword search
+    SPARSE = "SPARSE"       # BGE-M3 sparse lexical weights
+
+class EmbeddingModelStatus(enum.Enum):
+    BUILDING = "BUILDING"   # Shadow vectors being built, not searched
+    READY = "READY"         # Every chunk embedded and indexed, can be activated
+    ACTIVE = "ACTIVE"       # Searched; at most one model at a time
+    RETIRED = "RETIRED"     # Replaced; vectors kept but no longer maintained
 
 class DocumentScope(enum.Enum):
     PERSONAL = "PERSONAL"   # Only accessible by owner
@@ -87,6 +94,10 @@ class User(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Keyset pagination of listings: ORDER BY created_at DESC, id DESC
+        Index("ix_documents_created_at_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     filename = Column(String, nullable=False)
@@ -135,6 +146,52 @@ class DocumentChunk(Base):
     document = relationship("Document", back_populates="chunks")
     embeddings = relationship("DocumentEmbedding", back_populates="chunk", cascade="all, delete-orphan")
 
+class DocumentChunkTerm(Base):
+    """Inverted postings of BGE-M3 sparse lexical weights: one row per chunk and token."""
+    __tablename__ = "document_chunk_terms"
+    __table_args__ = (
+        # Sparse search reads the postings of the query's tokens only
+        Index("ix_document_chunk_terms_token_id", "token_id"),
+    )
+
+    chunk_id = Column(UUID(as_uuid=True), ForeignKey('document_chunks.id', ondelete="CASCADE"), primary_key=True)
+    token_id = Column(Integer, primary_key=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey('documents.id', ondelete="CASCADE"), nullable=False, index=True)
+    weight = Column(Float, nullable=False)
+
+class EmbeddingModel(Base):
+    """Registered embedding model whose vectors live in ``document_chunk_vectors``.
+
+    While none is ACTIVE, search reads the legacy ``document_chunks.embedding`` column.
+    """
+    __tablename__ = "embedding_models"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String, unique=True, nullable=False)
+    dimension = Column(Integer)  # Known after the first built batch
+    status = Column(Enum(EmbeddingModelStatus), nullable=False, default=EmbeddingModelStatus.BUILDING)
+    rate_limit = Column(Float)  # Chunks per second; EMBEDDING_MIGRATION_RATE when unset
+    last_error = Column(Text)
+    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    build_started_at = Column(DateTime)
+    build_completed_at = Column(DateTime)
+    activated_at = Column(DateTime)
+
+class DocumentChunkVector(Base):
+    """Shadow vectors: one row per chunk and registered model, of that model's dimension."""
+    __tablename__ = "document_chunk_vectors"
+    __table_args__ = (
+        # Progress counts; each model also gets a partial HNSW index when its build completes
+        Index("ix_document_chunk_vectors_model_id", "model_id"),
+    )
+
+    chunk_id = Column(UUID(as_uuid=True), ForeignKey('document_chunks.id', ondelete="CASCADE"), primary_key=True)
+    model_id = Column(UUID(as_uuid=True), ForeignKey('embedding_models.id', ondelete="CASCADE"), primary_key=True)
+    document_id = Column(UUID(as_uuid=True), ForeignKey('documents.id', ondelete="CASCADE"), nullable=False, index=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class DocumentEmbedding(Base):
     __tablename__ = "document_embeddings"
 
@@ -150,6 +207,12 @@ class DocumentEmbedding(Base):
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # Sidebar: a user's sessions by recent activity
+        Index("ix_chat_sessions_user_id_updated_at", "user_id", "updated_at"),
+        # Metrics: sessions active in the last hour
+        Index("ix_chat_sessions_updated_at", "updated_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False, index=True)
@@ -159,6 +222,9 @@ class ChatSession(Base):
     folder_path = Column(String)  # Optional: folder organization (can be null)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Maintained by the ChatMessage insert/delete hooks below
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime)
 
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
@@ -177,6 +243,31 @@ class ChatMessage(Base):
     session = relationship("ChatSession", back_populates="messages")
     sources = relationship("MessageSource", back_populates="message", cascade="all, delete-orphan")
 
+
+@event.listens_for(ChatMessage, "after_insert")
+def _count_inserted_message(mapper, connection, message):
+    """Keep the session summary in step with its messages, in the same transaction."""
+    sessions = ChatSession.__table__
+    connection.execute(
+        sessions.update()
+        .where(sessions.c.id == message.session_id)
+        .values(
+            message_count=sessions.c.message_count + 1,
+            last_message_at=message.created_at,
+            updated_at=message.created_at,
+        )
+    )
+
+
+@event.listens_for(ChatMessage, "after_delete")
+def _count_deleted_message(mapper, connection, message):
+    sessions = ChatSession.__table__
+    connection.execute(
+        sessions.update()
+        .where(sessions.c.id == message.session_id)
+        .values(message_count=sessions.c.message_count - 1)
+    )
+
 class MessageSource(Base):
     __tablename__ = "message_sources"
 
@@ -2,14 +2,22 @@ import httpx
 import json
 from typing import Dict, Any, Optional, List, AsyncGenerator
 import asyncio
+import hashlib
+import os
+import random
+import time
 from datetime import datetime
 
+from app.services import telemetry
+
 class OllamaClient:
     """Client for interacting with Ollama LLM"""
 
-    def __init__(self, base_url: str = "http://ollama:11434"):
-        self.base_url = base_url
-        self.model = "qwen2.5:7b"  # Using available model
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
+        self.model = os.getenv("OLLAMA_MODEL", "qwen2.5:7b")  # Using available model
+        # Keeps the model, and with it the KV cache of the last prompt, resident between turns
+        self.keep_alive = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
         self.timeout = 120  # seconds
         self.client = httpx.AsyncClient(timeout=self.timeout)
 
@@ -75,19 +83,21 @@ Frage: {query}
 Antwort:"""
 
         try:
-            response = await self.client.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "temperature": temperature,
-                    "num_predict": max_tokens,
-                    "stream": False
-                }
-            )
+            with telemetry.stage("llm_request", mode="generate"):
+                response = await self.client.post(
+                    f"{self.base_url}/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": prompt,
+                        "temperature": temperature,
+                        "num_predict": max_tokens,
+                        "stream": False
+                    }
+                )
 
             if response.status_code == 200:
                 result = response.json()
+                telemetry.record_ollama_generation(result, self.model, mode="generate")
                 return result.get("response", "Keine Antwort generiert.")
             else:
                 return f"Fehler bei der Antwortgenerierung: Status {response.status_code}"
@@ -103,7 +113,8 @@ Antwort:"""
         query: str,
         context: str = "",
         system_prompt: str = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        stats: Optional[Dict[str, Any]] = None
     ) -> AsyncGenerator[str, None]:
         """Generate a streaming response"""
 
@@ -121,6 +132,8 @@ Frage: {query}
 Antwort:"""
 
         try:
+            request_start = time.perf_counter()
+            first_token_seen = False
             async with self.client.stream(
                 "POST",
                 f"{self.base_url}/api/generate",
@@ -131,10 +144,19 @@ Antwort:"""
                     "stream": True
                 }
             ) as response:
+                # Headers arrive once Ollama has scheduled the request
+                telemetry.observe_stage("llm_queue", time.perf_counter() - request_start, mode="stream")
                 async for line in response.aiter_lines():
                     if line:
                         try:
                             data = json.loads(line)
+                            if data.get("response") and not first_token_seen:
+                                first_token_seen = True
+                                telemetry.record_time_to_first_token(time.perf_counter() - request_start, self.model)
+                            if data.get("done"):
+                                generation = telemetry.record_ollama_generation(data, self.model, mode="stream")
+                                if stats is not None:
+                                    stats.update(generation)
                             if "response" in data:
                                 yield data["response"]
                         except json.JSONDecodeError:
@@ -144,6 +166,56 @@ Antwort:"""
             print(f"Error in stream generation: {e}")
             yield "Fehler bei der Stream-Generierung."
 
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> AsyncGenerator[str, None]:
+        """Stream a reply via /api/chat.
+
+        Ollama reuses the cached KV state for the longest prompt prefix it has
+        already processed, so callers should keep earlier messages byte-identical
+        between turns and put per-turn material into the last message. Ollama's
+        timings for the request are written into ``stats`` when given.
+        """
+        try:
+            request_start = time.perf_counter()
+            first_token_seen = False
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/api/chat",
+                json={
+                    "model": self.model,
+                    "messages": messages,
+                    "keep_alive": self.keep_alive,
+                    "options": {"temperature": temperature},
+                    "stream": True
+                }
+            ) as response:
+                telemetry.observe_stage("llm_queue", time.perf_counter() - request_start, mode="chat")
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    content = (data.get("message") or {}).get("content")
+                    if content and not first_token_seen:
+                        first_token_seen = True
+                        telemetry.record_time_to_first_token(time.perf_counter() - request_start, self.model)
+                    if data.get("done"):
+                        generation = telemetry.record_ollama_generation(data, self.model, mode="chat")
+                        if stats is not None:
+                            stats.update(generation)
+                    if content:
+                        yield content
+
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield "Fehler bei der Stream-Generierung."
+
     async def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding using Ollama (if model supports it)"""
         try:
@@ -178,8 +250,9 @@ Antwort:"""
                 json={
                     "model": self.model,
                     "messages": messages,
-                    "temperature": temperature,
+                    "keep_alive": self.keep_alive,
                     "options": {
+                        "temperature": temperature,
                         "num_predict": max_tokens
                     },
                     "stream": False
@@ -188,6 +261,7 @@ Antwort:"""
 
             if response.status_code == 200:
                 result = response.json()
+                telemetry.record_ollama_generation(result, self.model, mode="chat")
                 return result.get("message", {}).get("content", "Keine Antwort generiert.")
             else:
                 return f"Fehler: Status {response.status_code}"
@@ -265,7 +339,21 @@ Zusammenfassung:"""
 
 # Fallback implementation when Ollama is not available
 class MockOllamaClient(OllamaClient):
-    """Mock Ollama client for testing without Ollama"""
+    """Mock Ollama client for testing without Ollama.
+
+    Answers and embeddings are deterministic so that the benchmark stand-in
+    server (``benchmarks/fake_ollama.py``) can serve the same content over HTTP.
+    """
+
+    @staticmethod
+    def demo_response(query: str) -> str:
+        return f"Dies ist eine Demo-Antwort für die Anfrage: '{query}'. In der Produktionsumgebung würde hier eine echte KI-Antwort generiert werden basierend auf dem Kontext."
+
+    @staticmethod
+    def demo_embedding(text: str, dimensions: int = 768) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
 
     async def check_health(self) -> Dict[str, Any]:
         return {
@@ -282,9 +370,16 @@ class MockOllamaClient(OllamaClient):
         temperature: float = 0.7,
         max_tokens: int = 2000
     ) -> str:
-        return f"Dies ist eine Demo-Antwort für die Anfrage: '{query}'. In der Produktionsumgebung würde hier eine echte KI-Antwort generiert werden basierend auf dem Kontext."
+        return self.demo_response(query)
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 2000
+    ) -> str:
+        question = messages[-1].get("content", "") if messages else ""
+        return self.demo_response(question.rsplit("Frage:", 1)[-1].strip())
 
     async def generate_embedding(self, text: str) -> List[float]:
-        # Return a random embedding
-        import random
-        return [random.random() for _ in range(768)]
\ No newline at end of file
+        return self.demo_embedding(text)
\ No newline at end of file
@@ -126,11 +126,30 @@ class DocumentResponse(DocumentBase):
     class Config:
         from_attributes = True
 
+class DocumentListItem(DocumentBase):
+    """Listing row: no ``content``/``meta_data``, which are never loaded for lists."""
+    id: UUID4
+    filename: str
+    original_filename: str
+    file_type: FileTypeEnum
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+    language: Optional[str] = None
+    processed: bool
+    uploaded_by: UUID4
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class DocumentListResponse(BaseModel):
-    documents: List[DocumentResponse]
-    total: int
+    documents: List[DocumentListItem]
+    total: Optional[int] = None
+    total_is_estimate: bool = False
     page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 # Chat Schemas
 class UploadedDocument(BaseModel):
@@ -4,41 +4,89 @@ Replaces both Ollama and old SentenceTransformer services with unified BGE-M3
 """
 import logging
 import os
-from typing import List, Optional, Dict, Any
+import threading
+from typing import List, Optional, Dict, Any, Sequence
 import numpy as np
 
+from app.services.chunking import get_chunking_engine
+from app.services.embedding_batches import EMBEDDING_TOKEN_BUDGET, encode_in_token_batches
+from app.services.onnx_backend import EMBEDDING_BACKEND, configure_torch_threads, load_onnx_model
+
 logger = logging.getLogger(__name__)
 
+# Chunks whose per-token features are held at once while indexing; batches
+# within a window follow the token budget (app.services.embedding_batches)
+FEATURE_WINDOW = int(os.getenv("EMBEDDING_FEATURE_WINDOW", "64"))
+
 # Lazy import to avoid loading on every import
 _sentence_transformer = None
 _embedding_model = None
+# The warm-up thread and the first search or upload may ask at the same time;
+# without the lock both would load the ~2 GB model
+_embedding_model_lock = threading.Lock()
 
 
 def get_embedding_model():
     """Lazy load the embedding model (singleton pattern)."""
-    global _sentence_transformer, _embedding_model
-
     if _embedding_model is None:
-        if _sentence_transformer is None:
-            try:
-                from sentence_transformers import SentenceTransformer
-                _sentence_transformer = SentenceTransformer
-            except ImportError:
-                logger.error("sentence-transformers not installed! Install with: pip install sentence-transformers")
-                raise
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                _load_embedding_model()
+    return _embedding_model
+
 
-        model_name = os.getenv('EMBEDDING_MODEL', 'BAAI/bge-m3')
-        device = os.getenv('EMBEDDING_DEVICE', 'cuda' if _check_cuda() else 'cpu')
+def _load_embedding_model() -> None:
+    global _sentence_transformer, _embedding_model
 
+    if _sentence_transformer is None:
+        try:
+            from sentence_transformers import SentenceTransformer
+            _sentence_transformer = SentenceTransformer
+        except ImportError:
+            logger.error("sentence-transformers not installed! Install with: pip install sentence-transformers")
+            raise
+
+    model_name = os.getenv('EMBEDDING_MODEL', 'BAAI/bge-m3')
+    device = os.getenv('EMBEDDING_DEVICE', 'cuda' if _check_cuda() else 'cpu')
+
+    if EMBEDDING_BACKEND == "onnx":
+        # Exported int8 model on ONNX Runtime (CPU nodes)
+        _embedding_model = load_onnx_model()
+    else:
+        if device == "cpu":
+            configure_torch_threads()
         logger.info(f"Loading BGE-M3 embedding model: {model_name} on {device}...")
         _embedding_model = _sentence_transformer(
             model_name,
             device=device,
             trust_remote_code=True  # Required for BGE-M3
         )
-        logger.info(f"✅ BGE-M3 loaded successfully! Dimensions: {_embedding_model.get_sentence_embedding_dimension()}")
+    logger.info(f"✅ BGE-M3 loaded successfully! Dimensions: {_embedding_model.get_sentence_embedding_dimension()}")
 
-    return _embedding_model
+
+def model_file(model_name: str, filename: str) -> str:
+    """Path of a file shipped with the model, from a local directory or the Hugging Face Hub."""
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, filename)
+    from huggingface_hub import hf_hub_download
+
+    return hf_hub_download(repo_id=model_name, filename=filename)
+
+
+def forward_features(model, texts: Sequence[str]) -> List[Dict[str, Any]]:
+    """All features of one forward pass per text.
+
+    ``output_value=None`` keeps ``input_ids``, ``attention_mask`` and the
+    per-token ``token_embeddings`` next to the pooled ``sentence_embedding``,
+    so BGE-M3's sparse and multi-vector heads need no second pass.
+    """
+    return encode_in_token_batches(model, list(texts), output_value=None)
+
+
+def to_numpy(value: Any) -> np.ndarray:
+    if hasattr(value, "detach"):
+        value = value.detach().float().cpu().numpy()
+    return np.asarray(value)
 
 
 def _check_cuda():
@@ -80,84 +128,19 @@ class BGEM3EmbeddingService:
         return self._model
 
     def count_tokens(self, text: str) -> int:
-        """Estimate token count (approximate for BGE-M3)."""
-        # BGE-M3 uses WordPiece tokenizer, roughly 1.3 tokens per word
-        words = len(text.split())
-        return int(words * 1.3)
+        """Token count from the BGE-M3 fast tokenizer (estimated when it is unavailable)."""
+        return get_chunking_engine().counter.count([text])[0]
 
     def chunk_text(
         self,
         text: str,
         chunk_size: Optional[int] = None,
         chunk_overlap: Optional[int] = None,
-        separator: str = "\n\n",
     ) -> List[Dict[str, Any]]:
         """Split text into overlapping chunks suitable for embedding."""
-        if not text.strip():
-            return []
-
         target_chunk_size = chunk_size or self.default_chunk_size
         target_overlap = chunk_overlap or self.default_chunk_overlap
-
-        # Split by separator
-        if separator in text:
-            segments = text.split(separator)
-        else:
-            # Fallback: split by sentences
-            segments = text.replace('. ', '.\n').split('\n')
-
-        chunks: List[Dict[str, Any]] = []
-        current_segment: List[str] = []
-        current_tokens = 0
-
-        for segment in segments:
-            segment = segment.strip()
-            if not segment:
-                continue
-
-            segment_tokens = self.count_tokens(segment)
-
-            # If current chunk + new segment exceeds limit, save current chunk
-            if current_tokens + segment_tokens > target_chunk_size and current_segment:
-                chunk_text = separator.join(current_segment) if separator == "\n\n" else ' '.join(current_segment)
-                chunks.append({
-                    'content': chunk_text,
-                    'token_count': self.count_tokens(chunk_text),
-                    'chunk_index': len(chunks),
-                    'word_count': len(chunk_text.split()),
-                    'character_count': len(chunk_text)
-                })
-
-                # Apply overlap
-                if target_overlap > 0 and current_segment:
-                    overlap_tokens = 0
-                    overlap_segments: List[str] = []
-                    for item in reversed(current_segment):
-                        item_tokens = self.count_tokens(item)
-                        if overlap_tokens + item_tokens > target_overlap:
-                            break
-                        overlap_segments.insert(0, item)
-                        overlap_tokens += item_tokens
-                    current_segment = overlap_segments
-                    current_tokens = overlap_tokens
-                else:
-                    current_segment = []
-                    current_tokens = 0
-
-            current_segment.append(segment)
-            current_tokens += segment_tokens
-
-        # Add remaining segments
-        if current_segment:
-            chunk_text = separator.join(current_segment) if separator == "\n\n" else ' '.join(current_segment)
-            chunks.append({
-                'content': chunk_text,
-                'token_count': self.count_tokens(chunk_text),
-                'chunk_index': len(chunks),
-                'word_count': len(chunk_text.split()),
-                'character_count': len(chunk_text)
-            })
-
+        chunks = get_chunking_engine().chunk(text, target_chunk_size, target_overlap)
         logger.info(f"Chunked text into {len(chunks)} chunks (target: {target_chunk_size} tokens, overlap: {target_overlap})")
         return chunks
 
@@ -177,12 +160,7 @@ class BGEM3EmbeddingService:
 
         try:
             logger.info(f"Generating embeddings for {len(texts)} texts with BGE-M3...")
-            embeddings = self.model.encode(
-                texts,
-                normalize_embeddings=normalize,
-                batch_size=32,  # Adjust based on GPU memory
-                show_progress_bar=False
-            )
+            embeddings = encode_in_token_batches(self.model, texts, normalize_embeddings=normalize)
 
             # Convert to list of numpy arrays
             result = [np.array(emb, dtype=np.float32) for emb in embeddings]
@@ -260,6 +238,7 @@ class BGEM3EmbeddingService:
         return {
             "model_name": self.model_name,
             "provider": "sentence-transformers",
+            "backend": EMBEDDING_BACKEND,
             "dimension": self.embedding_dim,
             "device": self.device,
             "supports_hybrid": True,  # BGE-M3 supports hybrid retrieval
@@ -271,7 +250,7 @@ class BGEM3EmbeddingService:
     def batch_encode(
         self,
         texts: List[str],
-        batch_size: int = 32,
+        token_budget: Optional[int] = None,
         show_progress: bool = True
     ) -> List[np.ndarray]:
         """
@@ -279,7 +258,7 @@ class BGEM3EmbeddingService:
 
         Args:
             texts: List of texts to encode
-            batch_size: Number of texts per batch (adjust based on GPU memory)
+            token_budget: Padded tokens per batch (default EMBEDDING_TOKEN_BUDGET, adjust based on GPU memory)
             show_progress: Whether to show progress bar
 
         Returns:
@@ -289,11 +268,12 @@ class BGEM3EmbeddingService:
             return []
 
         try:
-            logger.info(f"Batch encoding {len(texts)} texts (batch_size={batch_size})...")
-            embeddings = self.model.encode(
+            logger.info(f"Batch encoding {len(texts)} texts (token_budget={token_budget or EMBEDDING_TOKEN_BUDGET})...")
+            embeddings = encode_in_token_batches(
+                self.model,
                 texts,
+                token_budget=token_budget,
                 normalize_embeddings=True,
-                batch_size=batch_size,
                 show_progress_bar=show_progress,
                 convert_to_numpy=True
             )
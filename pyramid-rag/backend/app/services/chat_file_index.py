@@ -0,0 +1,305 @@
+"""Per-session vector index for files uploaded into a chat.
+
+CHAT-scope uploads are chunked and embedded like knowledge-base documents,
+but used to be stored only as full text, so the chat prompt could only show
+the first page of an upload. Their chunk embeddings are instead kept in an
+in-memory matrix per chat session, which the chat tool searches for the
+passages relevant to each question.
+
+Sessions are evicted least-recently-used once more than
+``CHAT_INDEX_MAX_CHUNKS`` chunks or ``CHAT_INDEX_MAX_SESSIONS`` sessions are
+held. Evicted files that were never written are spilled to
+``chat_file_chunks``/``chat_file_embeddings`` (as is everything on
+shutdown), and a session that is queried again is loaded back from there.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from app.models import ChatFile, ChatFileChunk, ChatFileEmbedding
+
+logger = logging.getLogger(__name__)
+
+CHAT_INDEX_MAX_CHUNKS = int(os.getenv("CHAT_INDEX_MAX_CHUNKS", "200000"))
+CHAT_INDEX_MAX_SESSIONS = int(os.getenv("CHAT_INDEX_MAX_SESSIONS", "500"))
+CHAT_INDEX_PASSAGES = int(os.getenv("CHAT_INDEX_PASSAGES", "4"))
+CHAT_INDEX_MIN_SCORE = float(os.getenv("CHAT_INDEX_MIN_SCORE", "0.1"))
+
+
+@dataclass
+class SessionIndex:
+    """Chunks of one chat session with their L2-normalised embeddings as rows."""
+
+    vectors: np.ndarray
+    chunks: List[Dict[str, Any]] = field(default_factory=list)
+    model_name: Optional[str] = None
+    # Files that exist only in memory so far
+    pending: Set[str] = field(default_factory=set)
+
+    @property
+    def file_ids(self) -> Set[str]:
+        return {chunk["chat_file_id"] for chunk in self.chunks}
+
+    def append(self, vectors: np.ndarray, chunks: List[Dict[str, Any]]) -> None:
+        self.vectors = np.vstack([self.vectors, vectors]) if len(self.chunks) else vectors
+        self.chunks.extend(chunks)
+
+
+def _normalised(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+SpillFunction = Callable[[str, SessionIndex, Set[str]], None]
+QueryEncoder = Callable[[Optional[str], str], Sequence[float]]
+
+
+def encode_with_model(model_name: Optional[str], text: str) -> np.ndarray:
+    """Query vector from the model a session's chunks were embedded with."""
+    from app.services.embedding_registry import get_model_encoder
+
+    encoder = get_model_encoder(model_name or os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3"))
+    embedding = encoder.encode(text, normalize_embeddings=True, show_progress_bar=False)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def write_to_database(session_id: str, index: SessionIndex, file_ids: Set[str]) -> None:
+    """Persist the chunks and embeddings of ``file_ids`` unless they already are."""
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        for file_id in file_ids:
+            file_uuid = uuid.UUID(file_id)
+            if db.execute(select(ChatFileChunk.id).where(ChatFileChunk.chat_file_id == file_uuid).limit(1)).first():
+                continue
+            chunk_rows, embedding_rows = [], []
+            for position, chunk in enumerate(index.chunks):
+                if chunk["chat_file_id"] != file_id:
+                    continue
+                chunk_id = uuid.uuid4()
+                chunk_rows.append({
+                    "id": chunk_id,
+                    "chat_file_id": file_uuid,
+                    "chunk_index": chunk["chunk_index"],
+                    "content": chunk["content"],
+                    "token_count": chunk.get("token_count"),
+                })
+                embedding_rows.append({
+                    "id": uuid.uuid4(),
+                    "chat_file_id": file_uuid,
+                    "chunk_id": chunk_id,
+                    "embedding": index.vectors[position].tolist(),
+                    "model_name": index.model_name,
+                })
+            if chunk_rows:
+                db.execute(insert(ChatFileChunk), chunk_rows)
+                db.execute(insert(ChatFileEmbedding), embedding_rows)
+        db.commit()
+
+
+class ChatFileIndex:
+    """LRU collection of ``SessionIndex`` objects keyed by chat session id."""
+
+    def __init__(
+        self,
+        max_chunks: int = CHAT_INDEX_MAX_CHUNKS,
+        max_sessions: int = CHAT_INDEX_MAX_SESSIONS,
+        spill: SpillFunction = write_to_database,
+        query_encoder: QueryEncoder = encode_with_model,
+    ) -> None:
+        self.max_chunks = max_chunks
+        self.max_sessions = max_sessions
+        self._spill_function = spill
+        self._query_encoder = query_encoder
+        self._sessions: "OrderedDict[str, SessionIndex]" = OrderedDict()
+        self._chunk_count = 0
+
+    @property
+    def chunk_count(self) -> int:
+        return self._chunk_count
+
+    def __contains__(self, session_id: object) -> bool:
+        return str(session_id) in self._sessions
+
+    async def add_file(
+        self,
+        session_id: Any,
+        chat_file_id: Any,
+        title: str,
+        chunks: Sequence[Dict[str, Any]],
+        embeddings: Sequence[Sequence[float]],
+        model_name: Optional[str] = None,
+    ) -> None:
+        """Index the chunks of a freshly uploaded chat file."""
+        if not chunks or not embeddings or len(chunks) != len(embeddings):
+            return
+        key, file_id = str(session_id), str(chat_file_id)
+        entries = [
+            {
+                "chat_file_id": file_id,
+                "chunk_index": position,
+                "title": title,
+                "content": chunk["content"],
+                "token_count": chunk.get("word_count"),
+            }
+            for position, chunk in enumerate(chunks)
+        ]
+        index = self._sessions.get(key)
+        if index is None:
+            index = SessionIndex(vectors=np.empty((0, 0), dtype=np.float32), model_name=model_name)
+            self._sessions[key] = index
+        index.append(_normalised(embeddings), entries)
+        index.pending.add(file_id)
+        self._chunk_count += len(entries)
+        self._sessions.move_to_end(key)
+        await self._evict(keep=key)
+
+    async def file_ids(self, session_id: Any, db=None) -> Set[str]:
+        """Ids of the session's indexed files, loading spilled ones from ``db`` on a miss."""
+        key = str(session_id)
+        index = self._sessions.get(key)
+        if index is None and db is not None:
+            index = await self._load(key, db)
+        if index is None:
+            return set()
+        self._sessions.move_to_end(key)
+        return index.file_ids
+
+    def embed_query(self, session_id: Any, text: str) -> Optional[Sequence[float]]:
+        """``text`` embedded by the session's index model, so the dimensions match (blocking)."""
+        index = self._sessions.get(str(session_id))
+        if index is None:
+            return None
+        return self._query_encoder(index.model_name, text)
+
+    def search(
+        self,
+        session_id: Any,
+        query_embedding: Sequence[float],
+        limit: int = CHAT_INDEX_PASSAGES,
+        file_ids: Optional[Iterable[str]] = None,
+        min_score: float = CHAT_INDEX_MIN_SCORE,
+    ) -> List[Dict[str, Any]]:
+        """Top chunks by cosine similarity, shaped like knowledge-base search results."""
+        index = self._sessions.get(str(session_id))
+        if index is None or not index.chunks:
+            return []
+        query = _normalised([query_embedding])[0]
+        if query.shape[0] != index.vectors.shape[1]:
+            logger.warning(f"Query embedding has {query.shape[0]} dimensions, chat index {index.vectors.shape[1]}")
+            return []
+
+        scores = index.vectors @ query
+        if file_ids is not None:
+            allowed = set(file_ids)
+            mask = np.fromiter((chunk["chat_file_id"] in allowed for chunk in index.chunks), dtype=bool, count=len(index.chunks))
+            scores = np.where(mask, scores, -np.inf)
+        top = np.argsort(-scores)[:limit]
+        results = []
+        for position in top:
+            score = float(scores[position])
+            if score < min_score:
+                break
+            chunk = index.chunks[position]
+            results.append({
+                "document_id": chunk["chat_file_id"],
+                "document_title": chunk["title"],
+                "chunk_id": None,
+                "chunk_index": chunk["chunk_index"],
+                "chunk_content": chunk["content"],
+                "similarity_score": round(score, 4),
+                "scope": "CHAT",
+                "source": "chat",
+            })
+        return results
+
+    def discard(self, session_id: Any) -> None:
+        index = self._sessions.pop(str(session_id), None)
+        if index is not None:
+            self._chunk_count -= len(index.chunks)
+
+    async def spill_all(self) -> None:
+        for key, index in list(self._sessions.items()):
+            await self._spill(key, index)
+
+    async def _load(self, key: str, db) -> Optional[SessionIndex]:
+        try:
+            session_uuid = uuid.UUID(key)
+        except ValueError:
+            return None
+        result = await db.execute(
+            select(
+                ChatFileChunk.chat_file_id,
+                ChatFileChunk.chunk_index,
+                ChatFileChunk.content,
+                ChatFileChunk.token_count,
+                ChatFile.title,
+                ChatFile.original_filename,
+                ChatFileEmbedding.embedding,
+                ChatFileEmbedding.model_name,
+            )
+            .join(ChatFileEmbedding, ChatFileEmbedding.chunk_id == ChatFileChunk.id)
+            .join(ChatFile, ChatFile.id == ChatFileChunk.chat_file_id)
+            .where(ChatFile.session_id == session_uuid)
+            .order_by(ChatFileChunk.chat_file_id, ChatFileChunk.chunk_index)
+        )
+        rows = result.all()
+        if not rows:
+            return None
+
+        index = SessionIndex(
+            vectors=_normalised([row.embedding for row in rows]),
+            chunks=[
+                {
+                    "chat_file_id": str(row.chat_file_id),
+                    "chunk_index": row.chunk_index,
+                    "title": row.title or row.original_filename,
+                    "content": row.content,
+                    "token_count": row.token_count,
+                }
+                for row in rows
+            ],
+            model_name=rows[0].model_name,
+        )
+        self._sessions[key] = index
+        self._chunk_count += len(index.chunks)
+        await self._evict(keep=key)
+        return index
+
+    async def _evict(self, keep: str) -> None:
+        while len(self._sessions) > 1 and (
+            self._chunk_count > self.max_chunks or len(self._sessions) > self.max_sessions
+        ):
+            key, index = next(iter(self._sessions.items()))
+            if key == keep:
+                break
+            del self._sessions[key]
+            self._chunk_count -= len(index.chunks)
+            await self._spill(key, index)
+
+    async def _spill(self, key: str, index: SessionIndex) -> None:
+        if not index.pending:
+            return
+        file_ids = set(index.pending)
+        try:
+            # Synchronous database writes stay off the event loop
+            await asyncio.to_thread(self._spill_function, key, index, file_ids)
+        except Exception as exc:
+            logger.warning(f"Could not spill chat index of session {key}: {exc}")
+            return
+        index.pending -= file_ids
+
+
+chat_file_index = ChatFileIndex()
@@ -0,0 +1,165 @@
+"""Set-based deletion of chat sessions and everything that hangs off them.
+
+Deleting a ``ChatSession`` through the ORM cascades loads every message,
+message source, chat file, chunk and embedding into memory and deletes
+them row by row. Here each dependent table is instead cleared with one
+``DELETE ... WHERE ... IN (subquery)`` per batch of sessions, children first.
+Uploaded files are removed from disk after the transaction commits.
+
+``purge_expired`` removes expired TEMPORARY sessions in batches of
+``CHAT_PURGE_BATCH_SIZE``. It runs from Celery beat and reports rows per
+second. ``delete_sessions`` is the same engine for explicit deletes.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session
+
+from app.models import (
+    ChatFile,
+    ChatFileChunk,
+    ChatFileEmbedding,
+    ChatMessage,
+    ChatSession,
+    ChatType,
+    MessageSource,
+)
+
+logger = logging.getLogger(__name__)
+
+CHAT_PURGE_BATCH_SIZE = int(os.getenv("CHAT_PURGE_BATCH_SIZE", "500"))
+CHAT_PURGE_MAX_BATCHES = int(os.getenv("CHAT_PURGE_MAX_BATCHES", "200"))
+
+
+@dataclass
+class PurgeStats:
+    sessions: int = 0
+    messages: int = 0
+    message_sources: int = 0
+    chat_files: int = 0
+    chunks: int = 0
+    embeddings: int = 0
+    files_removed: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    file_paths: List[str] = field(default_factory=list, repr=False)
+
+    @property
+    def rows(self) -> int:
+        return (
+            self.sessions + self.messages + self.message_sources
+            + self.chat_files + self.chunks + self.embeddings
+        )
+
+    @property
+    def rows_per_second(self) -> float:
+        return round(self.rows / self.seconds, 1) if self.seconds > 0 else 0.0
+
+    def merge(self, other: "PurgeStats") -> None:
+        for name in ("sessions", "messages", "message_sources", "chat_files", "chunks", "embeddings", "files_removed", "batches"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("file_paths")
+        data["seconds"] = round(self.seconds, 3)
+        data["rows"] = self.rows
+        data["rows_per_second"] = self.rows_per_second
+        return data
+
+
+def delete_sessions(db: Session, session_ids: Sequence[Any]) -> PurgeStats:
+    """Delete ``session_ids`` and their dependents without committing.
+
+    The paths of their uploaded files are returned in ``file_paths`` so the
+    caller can remove them once the transaction has committed.
+    """
+    stats = PurgeStats(batches=1)
+    if not session_ids:
+        return stats
+
+    session_ids = list(session_ids)
+    file_ids = select(ChatFile.id).where(ChatFile.session_id.in_(session_ids))
+    message_ids = select(ChatMessage.id).where(ChatMessage.session_id.in_(session_ids))
+    stats.file_paths = [
+        path for path in db.execute(select(ChatFile.file_path).where(ChatFile.session_id.in_(session_ids))).scalars()
+        if path
+    ]
+
+    def run(statement) -> int:
+        return db.execute(statement.execution_options(synchronize_session=False)).rowcount or 0
+
+    stats.message_sources = run(
+        delete(MessageSource).where(
+            or_(MessageSource.message_id.in_(message_ids), MessageSource.chat_file_id.in_(file_ids))
+        )
+    )
+    stats.embeddings = run(delete(ChatFileEmbedding).where(ChatFileEmbedding.chat_file_id.in_(file_ids)))
+    stats.chunks = run(delete(ChatFileChunk).where(ChatFileChunk.chat_file_id.in_(file_ids)))
+    stats.chat_files = run(delete(ChatFile).where(ChatFile.session_id.in_(session_ids)))
+    stats.messages = run(delete(ChatMessage).where(ChatMessage.session_id.in_(session_ids)))
+    stats.sessions = run(delete(ChatSession).where(ChatSession.id.in_(session_ids)))
+    return stats
+
+
+def remove_files(paths: Iterable[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            Path(path).unlink()
+            removed += 1
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            logger.warning(f"Could not remove chat upload {path}: {exc}")
+    return removed
+
+
+def purge_expired(
+    session_factory: Optional[Callable[[], Session]] = None,
+    batch_size: int = CHAT_PURGE_BATCH_SIZE,
+    max_batches: int = CHAT_PURGE_MAX_BATCHES,
+    now: Optional[datetime] = None,
+) -> PurgeStats:
+    """Delete expired TEMPORARY sessions, one committed batch at a time."""
+    if session_factory is None:
+        from app.database import SessionLocal as session_factory
+
+    cutoff = now or datetime.utcnow()
+    total = PurgeStats()
+    start = time.perf_counter()
+    for _ in range(max_batches):
+        with session_factory() as db:
+            session_ids = db.execute(
+                select(ChatSession.id)
+                .where(ChatSession.chat_type == ChatType.TEMPORARY, ChatSession.expires_at < cutoff)
+                .order_by(ChatSession.expires_at)
+                .limit(batch_size)
+                # Concurrent purges (overlapping beat runs) take disjoint batches
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not session_ids:
+                break
+            batch = delete_sessions(db, session_ids)
+            db.commit()
+        batch.files_removed = remove_files(batch.file_paths)
+        total.merge(batch)
+        if len(session_ids) < batch_size:
+            break
+    total.seconds = time.perf_counter() - start
+
+    if total.sessions:
+        logger.info(
+            f"Purged {total.sessions} expired chats ({total.rows} rows, {total.files_removed} files) "
+            f"in {total.batches} batches, {total.seconds:.2f}s, {total.rows_per_second} rows/s"
+        )
+    return total
@@ -0,0 +1,240 @@
+"""Token-budgeted text chunking on character offsets.
+
+This engine backs both ``DocumentProcessor.chunk_text`` and
+``BGEM3EmbeddingService.chunk_text``. The text is cut into segments
+(paragraphs, with over-long paragraphs cut at token boundaries), and each
+segment is only ever referenced by its ``(start, end)`` offsets. Segments are
+tokenized in batches with the embedding model's fast tokenizer, then packed
+into chunks of at most ``chunk_size`` tokens, with whole trailing segments of
+up to ``overlap`` tokens repeated at the start of the next chunk. A chunk's
+content is a single slice of the original text, so layout is preserved and
+nothing is re-joined or re-counted.
+
+Chunks carry ``start_char``/``end_char`` and, when the text has
+``[Page N]`` markers (as the PDF extractors write them), the pages they span.
+Without ``transformers`` or the tokenizer files, token counts fall back to
+the estimate of 1.3 tokens per word.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from transformers import AutoTokenizer
+    HAS_TRANSFORMERS = True
+except ImportError:
+    HAS_TRANSFORMERS = False
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", "512"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+TOKENIZER_BATCH_SIZE = int(os.getenv("TOKENIZER_BATCH_SIZE", "256"))
+
+# Positional fields copied into chunk meta_data; spreadsheet chunks carry sheet and rows instead,
+# structured documents their heading path
+CHUNK_POSITION_KEYS = (
+    "start_char", "end_char", "page_start", "page_end", "sheet", "start_row", "end_row", "heading_path",
+)
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+_PAGE_MARKER = re.compile(r"^\[Page (\d+)\]", re.MULTILINE)
+_WORD = re.compile(r"\S+")
+ESTIMATED_TOKENS_PER_WORD = 1.3
+
+
+class TokenCounter:
+    """Batched token counts from a Hugging Face fast tokenizer, loaded on first use."""
+
+    def __init__(self, model_name: Optional[str] = None) -> None:
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+        self._tokenizer = None
+        self._failed = not HAS_TRANSFORMERS
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None and not self._failed:
+            try:
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+            except Exception as exc:
+                self._failed = True
+                logger.warning(f"Tokenizer for {self.model_name} unavailable, estimating token counts: {exc}")
+        return self._tokenizer
+
+    @property
+    def exact(self) -> bool:
+        return self.tokenizer is not None
+
+    def count(self, texts: Sequence[str]) -> List[int]:
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return [round(len(text.split()) * ESTIMATED_TOKENS_PER_WORD) for text in texts]
+        counts: List[int] = []
+        for start in range(0, len(texts), TOKENIZER_BATCH_SIZE):
+            encoded = tokenizer(
+                list(texts[start:start + TOKENIZER_BATCH_SIZE]),
+                add_special_tokens=False,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )
+            counts.extend(len(ids) for ids in encoded["input_ids"])
+        return counts
+
+    def boundaries(self, text: str) -> List[int]:
+        """End offsets of the tokens of ``text`` (of its words when estimating)."""
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return [match.end() for match in _WORD.finditer(text)]
+        encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, return_attention_mask=False)
+        return [end for _, end in encoded["offset_mapping"]]
+
+
+@dataclass
+class _Segment:
+    start: int
+    end: int
+    tokens: int = 0
+
+
+def _paragraph_spans(text: str) -> List[Tuple[int, int]]:
+    spans = []
+    position = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        if match.start() > position:
+            spans.append((position, match.start()))
+        position = match.end()
+    if position < len(text):
+        spans.append((position, len(text)))
+    # Leading/trailing whitespace is not part of a segment
+    stripped = []
+    for start, end in spans:
+        segment = text[start:end]
+        left = len(segment) - len(segment.lstrip())
+        right = len(segment.rstrip())
+        if right > left:
+            stripped.append((start + left, start + right))
+    return stripped
+
+
+def _split_long(text: str, segment: _Segment, limit: int, counter: TokenCounter) -> List[_Segment]:
+    """Cut a segment longer than ``limit`` tokens at token ends, preferring whitespace."""
+    ends = counter.boundaries(text[segment.start:segment.end])
+    if not counter.exact:
+        limit = max(1, int(limit / ESTIMATED_TOKENS_PER_WORD))
+    pieces = []
+    token, start = 0, segment.start
+    while token < len(ends):
+        last = min(token + limit, len(ends)) - 1
+        cut = last
+        if last < len(ends) - 1:
+            # Back off to a token followed by whitespace, within the last quarter of the piece
+            floor = token + (3 * (last - token)) // 4
+            for candidate in range(last, floor - 1, -1):
+                if text[segment.start + ends[candidate]:segment.start + ends[candidate] + 1].isspace():
+                    cut = candidate
+                    break
+        end = segment.start + ends[cut]
+        pieces.append(_Segment(start, end, cut - token + 1))
+        start = end
+        while start < segment.end and text[start].isspace():
+            start += 1
+        token = cut + 1
+    pieces = [piece for piece in pieces if piece.end > piece.start]
+    if not counter.exact:
+        for piece, tokens in zip(pieces, counter.count([text[piece.start:piece.end] for piece in pieces])):
+            piece.tokens = tokens
+    return pieces
+
+
+class ChunkingEngine:
+    def __init__(self, counter: Optional[TokenCounter] = None) -> None:
+        self.counter = counter or TokenCounter()
+
+    def segments(self, text: str, chunk_size: int) -> List[_Segment]:
+        segments = [_Segment(start, end) for start, end in _paragraph_spans(text)]
+        counts = self.counter.count([text[segment.start:segment.end] for segment in segments])
+        result: List[_Segment] = []
+        for segment, tokens in zip(segments, counts):
+            segment.tokens = tokens
+            if tokens > chunk_size:
+                result.extend(_split_long(text, segment, chunk_size, self.counter))
+            else:
+                result.append(segment)
+        return result
+
+    def chunk(
+        self,
+        text: str,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        if not text or not text.strip():
+            return []
+        chunk_size = max(1, chunk_size or CHUNK_SIZE_TOKENS)
+        overlap = CHUNK_OVERLAP_TOKENS if overlap is None else overlap
+        overlap = max(0, min(overlap, chunk_size // 2))
+
+        segments = self.segments(text, chunk_size)
+        page_offsets, page_numbers = [], []
+        for match in _PAGE_MARKER.finditer(text):
+            page_offsets.append(match.start())
+            page_numbers.append(int(match.group(1)))
+
+        def page_at(offset: int) -> Optional[int]:
+            position = bisect.bisect_right(page_offsets, offset) - 1
+            return page_numbers[position] if position >= 0 else None
+
+        chunks: List[Dict[str, Any]] = []
+        first = 0
+        while first < len(segments):
+            last, tokens = first, segments[first].tokens
+            while last + 1 < len(segments) and tokens + segments[last + 1].tokens <= chunk_size:
+                last += 1
+                tokens += segments[last].tokens
+
+            start, end = segments[first].start, segments[last].end
+            content = text[start:end]
+            chunk = {
+                "content": content,
+                "chunk_index": len(chunks),
+                "start_char": start,
+                "end_char": end,
+                "token_count": tokens,
+                "word_count": len(content.split()),
+                "character_count": len(content),
+            }
+            if page_offsets:
+                chunk["page_start"] = page_at(start)
+                chunk["page_end"] = page_at(end - 1)
+            chunks.append(chunk)
+            if last + 1 >= len(segments):
+                break
+
+            # Repeat whole trailing segments worth up to ``overlap`` tokens
+            following, carried = last + 1, 0
+            while following - 1 > first and carried + segments[following - 1].tokens <= overlap:
+                following -= 1
+                carried += segments[following].tokens
+            first = following
+
+        return chunks
+
+
+_engine: Optional[ChunkingEngine] = None
+
+
+def get_chunking_engine() -> ChunkingEngine:
+    global _engine
+    if _engine is None:
+        _engine = ChunkingEngine()
+    return _engine
+
+
+def chunk_text(text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None) -> List[Dict[str, Any]]:
+    return get_chunking_engine().chunk(text, chunk_size, overlap)
@@ -0,0 +1,172 @@
+"""Server-side conversation state for MCP chat sessions.
+
+The MCP endpoints used to receive the whole conversation and every uploaded
+document on each turn and rebuilt the chat context from scratch, so request
+size and prompt assembly grew with the length of the chat while anything
+older than the history window was silently dropped. Instead, the state of a
+session (the recent message window, a rolling summary of everything older,
+the ingested documents and the ids of the messages already seen) is kept here
+keyed by user and session id, and a turn only has to carry the new message.
+Keying by user means a caller who guesses another user's session id only
+ever reads and writes their own state.
+
+State lives in-process and, when ``CONVERSATION_STATE_REDIS_URL`` is set, in
+Redis so that all workers see the same conversation.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import redis.asyncio as redis_asyncio
+    HAS_REDIS = True
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+    HAS_REDIS = False
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_STATE_TTL_SECONDS = float(os.getenv("CONVERSATION_STATE_TTL_SECONDS", "21600"))
+CONVERSATION_STATE_MAX_SESSIONS = int(os.getenv("CONVERSATION_STATE_MAX_SESSIONS", "2000"))
+CONVERSATION_STATE_REDIS_URL = os.getenv("CONVERSATION_STATE_REDIS_URL")
+# Older messages are folded into the summary in batches of this size, so the
+# summariser runs every few turns instead of on every one
+CONVERSATION_SUMMARY_BATCH = int(os.getenv("CONVERSATION_SUMMARY_BATCH", "4"))
+CONVERSATION_SUMMARY_MAX_CHARS = int(os.getenv("CONVERSATION_SUMMARY_MAX_CHARS", "1500"))
+MAX_TRACKED_MESSAGE_IDS = 500
+REDIS_KEY_PREFIX = "pyramid:conversation:"
+
+
+@dataclass
+class ConversationState:
+    """Everything the gateway needs to continue a session without its history."""
+
+    session_id: str
+    user_id: str
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    documents: List[Dict[str, Any]] = field(default_factory=list)
+    message_ids: List[str] = field(default_factory=list)
+    summary: str = ""
+    # Messages that left the window and wait for the background summariser
+    pending_summary: List[Dict[str, Any]] = field(default_factory=list)
+    summarized_messages: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def remember_ids(self, ids: List[str]) -> None:
+        self.message_ids.extend(ids)
+        if len(self.message_ids) > MAX_TRACKED_MESSAGE_IDS:
+            self.message_ids = self.message_ids[-MAX_TRACKED_MESSAGE_IDS:]
+
+    def take_overflow(self, window: int, batch: int = CONVERSATION_SUMMARY_BATCH) -> List[Dict[str, Any]]:
+        """Move the messages that should be folded into the summary to ``pending_summary``.
+
+        Nothing is moved until the window is exceeded by ``batch`` messages;
+        then everything older than the last ``window`` messages is taken.
+        """
+        if len(self.messages) < window + max(batch, 1):
+            return []
+        overflow = self.messages[:-window] if window > 0 else list(self.messages)
+        self.messages = self.messages[len(overflow):]
+        self.pending_summary.extend(overflow)
+        self.summarized_messages += len(overflow)
+        return overflow
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ConversationState":
+        return cls(**json.loads(raw))
+
+
+class ConversationStore:
+    """Conversation state keyed by (user, session) with LRU/TTL eviction and an optional Redis tier."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = CONVERSATION_STATE_TTL_SECONDS,
+        max_sessions: int = CONVERSATION_STATE_MAX_SESSIONS,
+        redis_url: Optional[str] = CONVERSATION_STATE_REDIS_URL,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+        self._redis = None
+        if redis_url and HAS_REDIS:
+            self._redis = redis_asyncio.from_url(redis_url, decode_responses=True)
+        elif redis_url:
+            logger.warning("CONVERSATION_STATE_REDIS_URL set but redis is not installed; keeping state in-process")
+
+    async def get(self, session_id: str, user_id: str) -> Optional[ConversationState]:
+        """Return ``user_id``'s state of ``session_id``."""
+        key = (str(user_id), session_id)
+        raw = None
+        if self._redis is not None:
+            # Redis is authoritative: another worker may have advanced the session
+            try:
+                raw = await self._redis.get(_redis_key(key))
+            except Exception as exc:
+                logger.warning(f"Conversation state Redis lookup failed: {exc}")
+                raw = self._get_local(key)
+        else:
+            raw = self._get_local(key)
+        if not raw:
+            return None
+        return ConversationState.from_json(raw)
+
+    async def save(self, state: ConversationState) -> None:
+        state.updated_at = time.time()
+        key = (str(state.user_id), state.session_id)
+        raw = state.to_json()
+        self._store_local(key, raw)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(_redis_key(key), raw, ex=max(int(self.ttl_seconds), 1))
+        except Exception as exc:
+            logger.warning(f"Conversation state Redis write failed: {exc}")
+
+    async def delete(self, session_id: str, user_id: str) -> None:
+        key = (str(user_id), session_id)
+        self._entries.pop(key, None)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(_redis_key(key))
+        except Exception as exc:
+            logger.warning(f"Conversation state Redis delete failed: {exc}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _get_local(self, key: Tuple[str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return raw
+
+    def _store_local(self, key: Tuple[str, str], raw: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, raw)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+
+def _redis_key(key: Tuple[str, str]) -> str:
+    user_id, session_id = key
+    return f"{REDIS_KEY_PREFIX}{user_id}:{session_id}"
+
+
+conversation_store = ConversationStore()
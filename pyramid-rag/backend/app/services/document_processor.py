@@ -4,15 +4,19 @@ Implements SHA-256 deduplication, metadata extraction, text chunking, and embedd
 """
 
 import hashlib
+import importlib.util
 import logging
 logger = logging.getLogger(__name__)
 import os
 import uuid
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import mimetypes
 
+import numpy as np
+
 # Document processing
 try:
     import fitz  # PyMuPDF
@@ -57,12 +61,9 @@ try:
 except ImportError:
     HAS_MAGIC = False
 
-# ML Libraries (for embeddings)
-try:
-    from sentence_transformers import SentenceTransformer
-    HAS_EMBEDDINGS = True
-except ImportError:
-    HAS_EMBEDDINGS = False
+# ML Libraries (for embeddings) - only probed here; torch/sentence-transformers
+# are imported when the model is first used so that startup stays fast
+HAS_EMBEDDINGS = importlib.util.find_spec("sentence_transformers") is not None
 
 # OCR (when available)
 try:
@@ -72,6 +73,20 @@ except ImportError:
     HAS_SURYA = False
 
 from app.models import FileType, Document, DocumentChunk, ChatFile, ChatFileChunk
+from app.services.chunking import CHUNK_SIZE_TOKENS, ESTIMATED_TOKENS_PER_WORD, get_chunking_engine
+from app.services.document_structure import (
+    StructuredDocument,
+    chunk_structured,
+    from_docx,
+    from_page_texts,
+    from_pptx,
+    from_pymupdf,
+)
+from app.services.embedding_batches import encode_in_token_batches
+from app.services.bge_m3_embedding_service import FEATURE_WINDOW, forward_features, to_numpy
+from app.services.late_interaction import LATE_INTERACTION_ENABLED, get_colbert_encoder, get_token_vector_store
+from app.services.sparse_encoder import SPARSE_INDEX_ENABLED, SparseVector, get_sparse_encoder
+from app.services.spreadsheet_extractor import extract_spreadsheet, is_spreadsheet
 from app.schemas import FileScopeEnum
 
 
@@ -82,44 +97,18 @@ class DocumentProcessor:
         self.upload_dir = Path("data/uploads")
         self.upload_dir.mkdir(parents=True, exist_ok=True)
 
-        # Initialize embedding model if available
-        self.embedding_model = None
+        # Embedding model is loaded lazily (see embedding_model)
+        self._embedding_model = None
+        self._embedding_model_failed = False
         # ✅ Upgraded to BGE-M3 (1024 dimensions, best multilingual performance)
         self.embedding_model_name = os.getenv('EMBEDDING_MODEL', 'BAAI/bge-m3')
-        preferred_device = os.getenv('EMBEDDING_DEVICE')
-        if preferred_device:
-            self.embedding_device = preferred_device
-        else:
-            try:
-                import torch  # type: ignore
-                self.embedding_device = 'cuda' if torch.cuda.is_available() else 'cpu'
-            except Exception:
-                self.embedding_device = 'cpu'
 
-        try:
-            self.chunk_size_words = int(os.getenv('DOC_CHUNK_SIZE_WORDS', os.getenv('EMBEDDING_CHUNK_SIZE', '512')))
-        except (TypeError, ValueError):
-            self.chunk_size_words = 512
+        # Chunk sizes are CHUNK_SIZE_TOKENS/CHUNK_OVERLAP_TOKENS (see app.services.chunking);
+        # spreadsheets group rows by words, so their budget is the token size in words
+        self.spreadsheet_chunk_words = max(1, int(CHUNK_SIZE_TOKENS / ESTIMATED_TOKENS_PER_WORD))
 
-        try:
-            self.chunk_overlap_words = int(os.getenv('DOC_CHUNK_OVERLAP_WORDS', os.getenv('EMBEDDING_CHUNK_OVERLAP', '50')))
-        except (TypeError, ValueError):
-            self.chunk_overlap_words = 50
-
-        if HAS_EMBEDDINGS:
-            try:
-                logger.info('Loading embedding model: %s (this may take a moment for BGE-M3)...', self.embedding_model_name)
-                self.embedding_model = SentenceTransformer(
-                    self.embedding_model_name,
-                    device=self.embedding_device,
-                    trust_remote_code=True  # Required for BGE-M3
-                )
-                logger.info('✅ Embedding model loaded: %s on %s (dimensions: %d)',
-                           self.embedding_model_name,
-                           self.embedding_device,
-                           self.embedding_model.get_sentence_embedding_dimension())
-            except Exception as e:
-                logger.warning('Could not load embedding model %s: %s', self.embedding_model_name, e)
+        # find_tables costs extra time per PDF page
+        self.pdf_detect_tables = os.getenv('PDF_DETECT_TABLES', 'true').lower() in ('1', 'true', 'yes')
 
         # Initialize OCR if available
         self.ocr_engine = None
@@ -130,6 +119,19 @@ class DocumentProcessor:
             except Exception as e:
                 print(f"Could not initialize OCR: {e}")
 
+    @property
+    def embedding_model(self):
+        """BGE-M3 model, shared with the search path and loaded on first use (or by the warm-up task)."""
+        if self._embedding_model is None and HAS_EMBEDDINGS and not self._embedding_model_failed:
+            from app.services.bge_m3_embedding_service import get_embedding_model
+
+            try:
+                self._embedding_model = get_embedding_model()
+            except Exception as e:
+                self._embedding_model_failed = True
+                logger.warning('Could not load embedding model %s: %s', self.embedding_model_name, e)
+        return self._embedding_model
+
     def _sanitize_text(self, text: str) -> str:
         """Strip characters (like NULL) that cannot be stored in Postgres TEXT."""
         if not text:
@@ -140,7 +142,7 @@ class DocumentProcessor:
         """Calculate SHA-256 hash of file for deduplication."""
         sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 sha256_hash.update(chunk)
         return sha256_hash.hexdigest()
 
@@ -162,9 +164,10 @@ class DocumentProcessor:
         type_mapping = {
             'pdf': FileType.PDF,
             'doc': FileType.WORD, 'docx': FileType.WORD,
-            'xls': FileType.EXCEL, 'xlsx': FileType.EXCEL,
+            'xls': FileType.EXCEL, 'xlsx': FileType.EXCEL, 'xlsm': FileType.EXCEL,
             'ppt': FileType.POWERPOINT, 'pptx': FileType.POWERPOINT,
             'txt': FileType.TEXT, 'md': FileType.TEXT, 'rst': FileType.TEXT,
+            'csv': FileType.TEXT, 'tsv': FileType.TEXT,
             'jpg': FileType.IMAGE, 'jpeg': FileType.IMAGE, 'png': FileType.IMAGE,
             'gif': FileType.IMAGE, 'bmp': FileType.IMAGE, 'tiff': FileType.IMAGE,
             'mp4': FileType.VIDEO, 'avi': FileType.VIDEO, 'mov': FileType.VIDEO,
@@ -177,19 +180,25 @@ class DocumentProcessor:
 
     def extract_text_content(self, file_path: Path, file_type: FileType) -> Tuple[str, Dict]:
         """Extract text content from various file formats."""
+        content, metadata, _ = self.extract_document(file_path, file_type)
+        return content, metadata
+
+    def extract_document(self, file_path: Path, file_type: FileType) -> Tuple[str, Dict, Optional[StructuredDocument]]:
+        """Extract text content, plus the document structure for PDF, DOCX and PPTX files."""
 
         content = ""
         metadata = {"extraction_method": "unknown", "success": False}
+        structure = None
 
         try:
             if file_type == FileType.PDF:
-                content, metadata = self._extract_pdf_text(file_path)
+                content, metadata, structure = self._extract_pdf_text(file_path)
             elif file_type == FileType.WORD and HAS_DOCX:
-                content, metadata = self._extract_docx_text(file_path)
+                content, metadata, structure = self._extract_docx_text(file_path)
             elif file_type == FileType.EXCEL and HAS_OPENPYXL:
                 content, metadata = self._extract_xlsx_text(file_path)
             elif file_type == FileType.POWERPOINT and HAS_PPTX:
-                content, metadata = self._extract_pptx_text(file_path)
+                content, metadata, structure = self._extract_pptx_text(file_path)
             elif file_type == FileType.TEXT:
                 content, metadata = self._extract_plain_text(file_path)
             else:
@@ -202,27 +211,24 @@ class DocumentProcessor:
                 "success": False,
                 "error": str(e)
             }
+            structure = None
 
-        return content, metadata
+        return content, metadata, structure
 
-    def _extract_pdf_text(self, file_path: Path) -> Tuple[str, Dict]:
+    def _extract_pdf_text(self, file_path: Path) -> Tuple[str, Dict, Optional[StructuredDocument]]:
         """Extract text from PDF using available libraries."""
         warnings: List[str] = []
 
         if HAS_PYMUPDF:
             try:
                 doc = fitz.open(str(file_path))
-                text_content = []
-
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    text = page.get_text()
-                    if text.strip():
-                        text_content.append(f"[Page {page_num + 1}]\n{text}")
-
-                page_count = len(doc)
-                doc.close()
-                content = "\n\n".join(text_content).strip()
+                try:
+                    # Font sizes mark headings, find_tables finds tables
+                    structure = from_pymupdf(doc, detect_tables=self.pdf_detect_tables)
+                    page_count = len(doc)
+                finally:
+                    doc.close()
+                content = structure.to_text().strip()
 
                 if content:
                     metadata = {
@@ -231,7 +237,7 @@ class DocumentProcessor:
                         "pages": page_count,
                         "character_count": len(content)
                     }
-                    return content, metadata
+                    return content, metadata, structure
 
                 warnings.append("pymupdf_extracted_empty_text")
 
@@ -242,6 +248,7 @@ class DocumentProcessor:
             try:
                 reader = PdfReader(str(file_path))
                 text_content = []
+                page_texts = []
                 for page_idx, page in enumerate(reader.pages, 1):
                     try:
                         text = page.extract_text() or ""
@@ -251,6 +258,7 @@ class DocumentProcessor:
                     text = text.strip()
                     if text:
                         text_content.append(f"[Page {page_idx}]\n{text}")
+                        page_texts.append((page_idx, text))
 
                 content = "\n\n".join(text_content).strip()
                 if content:
@@ -262,7 +270,7 @@ class DocumentProcessor:
                     }
                     if warnings:
                         metadata["warnings"] = warnings
-                    return content, metadata
+                    return content, metadata, from_page_texts(page_texts)
 
                 warnings.append("pypdf_extracted_empty_text")
 
@@ -273,77 +281,55 @@ class DocumentProcessor:
         if warnings:
             metadata = dict(metadata)
             metadata["warnings"] = warnings
-        return content, metadata
+        return content, metadata, None
 
-    def _extract_docx_text(self, file_path: Path) -> Tuple[str, Dict]:
-        """Extract text from DOCX files."""
+    def _extract_docx_text(self, file_path: Path) -> Tuple[str, Dict, Optional[StructuredDocument]]:
+        """Extract text from DOCX files, keeping headings, lists and tables."""
         try:
-            doc = DocxDocument(str(file_path))
-            paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-            content = "\n".join(paragraphs)
+            structure = from_docx(DocxDocument(str(file_path)))
+            content = structure.to_text()
 
             metadata = {
                 "extraction_method": "python-docx",
                 "success": True,
-                "paragraphs": len(paragraphs),
+                "paragraphs": sum(1 for block in structure.blocks if block.kind == "paragraph"),
+                "tables": sum(1 for block in structure.blocks if block.kind == "table"),
                 "character_count": len(content)
             }
 
-            return content, metadata
+            return content, metadata, structure
 
         except Exception as e:
             return "", {
                 "extraction_method": "docx_error",
                 "success": False,
                 "error": str(e)
-            }
+            }, None
 
     def _extract_xlsx_text(self, file_path: Path) -> Tuple[str, Dict]:
         """Extract text from Excel files."""
-        try:
-            workbook = openpyxl.load_workbook(str(file_path), data_only=True)
-            content_parts = []
-
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                content_parts.append(f"[Sheet: {sheet_name}]")
-
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = "\t".join([str(cell) if cell is not None else "" for cell in row])
-                    if row_text.strip():
-                        content_parts.append(row_text)
-
-            content = "\n".join(content_parts)
-
-            metadata = {
-                "extraction_method": "openpyxl",
-                "success": True,
-                "sheets": len(workbook.sheetnames),
-                "character_count": len(content)
-            }
+        content, metadata, _ = self._extract_spreadsheet(file_path)
+        return content, metadata
 
-            return content, metadata
+    def _extract_spreadsheet(self, file_path: Path) -> Tuple[str, Dict, List[Dict]]:
+        """Stream a workbook or CSV file into text and header-prefixed row-group chunks."""
+        try:
+            result = extract_spreadsheet(file_path, self.spreadsheet_chunk_words)
+            return result.content, result.metadata, result.chunks
 
         except Exception as e:
             return "", {
-                "extraction_method": "xlsx_error",
+                "extraction_method": "spreadsheet_error",
                 "success": False,
                 "error": str(e)
-            }
+            }, []
 
-    def _extract_pptx_text(self, file_path: Path) -> Tuple[str, Dict]:
-        """Extract text from PowerPoint files."""
+    def _extract_pptx_text(self, file_path: Path) -> Tuple[str, Dict, Optional[StructuredDocument]]:
+        """Extract text from PowerPoint files, with slide titles as headings."""
         try:
             presentation = Presentation(str(file_path))
-            content_parts = []
-
-            for i, slide in enumerate(presentation.slides, 1):
-                content_parts.append(f"[Slide {i}]")
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        content_parts.append(shape.text)
-
-            content = "\n".join(content_parts)
+            structure = from_pptx(presentation)
+            content = structure.to_text()
 
             metadata = {
                 "extraction_method": "python-pptx",
@@ -352,14 +338,14 @@ class DocumentProcessor:
                 "character_count": len(content)
             }
 
-            return content, metadata
+            return content, metadata, structure
 
         except Exception as e:
             return "", {
                 "extraction_method": "pptx_error",
                 "success": False,
                 "error": str(e)
-            }
+            }, None
 
     def _extract_plain_text(self, file_path: Path) -> Tuple[str, Dict]:
         """Extract plain text content."""
@@ -437,33 +423,11 @@ class DocumentProcessor:
         return metadata
 
     def chunk_text(self, text: str, chunk_size: Optional[int] = None, overlap: Optional[int] = None) -> List[Dict]:
-        """Intelligent text chunking for RAG."""
-        if not text.strip():
-            return []
-
-        effective_chunk = chunk_size or self.chunk_size_words
-        effective_overlap = overlap or self.chunk_overlap_words
-        effective_overlap = min(effective_overlap, effective_chunk - 1) if effective_chunk > 1 else 0
-
-        chunks: List[Dict[str, Any]] = []
-        words = text.split()
-        step = max(1, effective_chunk - effective_overlap)
-
-        for i in range(0, len(words), step):
-            chunk_words = words[i:i + effective_chunk]
-            chunk_text = " ".join(chunk_words)
-            chunk_text = self._sanitize_text(chunk_text)
-
-            if chunk_text.strip():
-                chunk_info = {
-                    "content": chunk_text,
-                    "start_word": i,
-                    "end_word": i + len(chunk_words),
-                    "word_count": len(chunk_words),
-                    "character_count": len(chunk_text)
-                }
-                chunks.append(chunk_info)
-
+        """Token-budgeted chunks on character offsets (sizes in BGE-M3 tokens, see app.services.chunking)."""
+        chunks = get_chunking_engine().chunk(text, chunk_size, overlap)
+        for chunk in chunks:
+            # Same-length replacement, so the offsets stay valid
+            chunk["content"] = self._sanitize_text(chunk["content"])
         return chunks
 
     def generate_embeddings(self, text_chunks: List[str]) -> List[List[float]]:
@@ -472,22 +436,55 @@ class DocumentProcessor:
             return []
 
         try:
-            embeddings = self.embedding_model.encode(text_chunks)
+            embeddings = encode_in_token_batches(self.embedding_model, text_chunks)
             return embeddings.tolist()
         except Exception as e:
             print(f"âŒ Embedding generation failed: {e}")
             return []
 
+    def _encode_for_index(self, chunk_texts: List[str], file_hash: str) -> Tuple[List[List[float]], List[SparseVector]]:
+        """Dense embeddings plus the enabled BGE-M3 heads, from one forward pass per chunk.
+
+        Sparse vectors are returned for ``document_chunk_terms``. Token vectors
+        are streamed to the token vector store under ``file_hash``, so a long
+        document never holds them all in memory. Returns nothing when no head is enabled.
+        """
+        sparse_encoder = get_sparse_encoder() if SPARSE_INDEX_ENABLED else None
+        if sparse_encoder is not None and not sparse_encoder.available:
+            sparse_encoder = None
+        colbert_encoder = get_colbert_encoder() if LATE_INTERACTION_ENABLED else None
+        if colbert_encoder is not None and not colbert_encoder.available:
+            colbert_encoder = None
+        if sparse_encoder is None and colbert_encoder is None:
+            return [], []
+
+        embeddings: List[List[float]] = []
+        sparse_vectors: List[SparseVector] = []
+        writer = get_token_vector_store().writer(file_hash) if colbert_encoder else nullcontext()
+        with writer:
+            for start in range(0, len(chunk_texts), FEATURE_WINDOW):
+                window = chunk_texts[start:start + FEATURE_WINDOW]
+                for features in forward_features(self.embedding_model, window):
+                    embeddings.append(to_numpy(features["sentence_embedding"]).astype(np.float32).tolist())
+                    if sparse_encoder is not None:
+                        sparse_vectors.append(sparse_encoder.vector_from_features(features))
+                    if colbert_encoder is not None:
+                        writer.append(colbert_encoder.vectors_from_features(features))
+        return embeddings, sparse_vectors
+
     async def process_document(
         self,
         file_path: Path,
         original_filename: str,
         scope: FileScopeEnum = FileScopeEnum.GLOBAL,
-        generate_embeddings: bool = True
+        generate_embeddings: bool = True,
+        file_hash: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Complete document processing pipeline.
 
+        ``file_hash`` skips re-reading the file when the caller hashed it while writing.
+
         Returns processing results with extracted content, metadata, chunks, and embeddings.
         """
 
@@ -501,6 +498,7 @@ class DocumentProcessor:
             "metadata": {},
             "chunks": [],
             "embeddings": [],
+            "sparse_vectors": [],
             "processing_time": 0,
             "errors": []
         }
@@ -509,15 +507,20 @@ class DocumentProcessor:
 
         try:
             # 1. Calculate file hash for deduplication
-            result["file_hash"] = self.calculate_file_hash(file_path)
+            result["file_hash"] = file_hash or self.calculate_file_hash(file_path)
 
             # 2. Detect file type and MIME type
             file_type, mime_type = self.detect_file_type(file_path, original_filename)
             result["file_type"] = file_type
             result["mime_type"] = mime_type
 
-            # 3. Extract text content
-            content, extraction_metadata = self.extract_text_content(file_path, file_type)
+            # 3. Extract text content (spreadsheets are chunked by row groups while streaming)
+            prepared_chunks: Optional[List[Dict]] = None
+            structure: Optional[StructuredDocument] = None
+            if is_spreadsheet(file_path):
+                content, extraction_metadata, prepared_chunks = self._extract_spreadsheet(file_path)
+            else:
+                content, extraction_metadata, structure = self.extract_document(file_path, file_type)
             content = self._sanitize_text(content)
             result["content"] = content
 
@@ -530,13 +533,27 @@ class DocumentProcessor:
 
             # 6. Generate text chunks
             if content.strip():
-                chunks = self.chunk_text(content)
+                if structure is not None and structure.blocks:
+                    # Heading-prefixed chunks that keep lists and table rows self-contained
+                    prepared_chunks = chunk_structured(structure)
+                if prepared_chunks:
+                    chunks = [{**chunk, "content": self._sanitize_text(chunk["content"])} for chunk in prepared_chunks]
+                else:
+                    chunks = self.chunk_text(content)
                 result["chunks"] = chunks
 
                 # 7. Generate embeddings (only if requested)
                 if generate_embeddings and chunks and self.embedding_model:
                     chunk_texts = [chunk["content"] for chunk in chunks]
-                    embeddings = self.generate_embeddings(chunk_texts)
+                    embeddings = []
+                    # Only knowledge-base documents get term postings and token vectors
+                    if scope == FileScopeEnum.GLOBAL:
+                        try:
+                            embeddings, result["sparse_vectors"] = self._encode_for_index(chunk_texts, result["file_hash"])
+                        except Exception as e:
+                            logger.warning(f"Sparse/multi-vector encoding failed, storing dense embeddings only: {e}")
+                    if not embeddings:
+                        embeddings = self.generate_embeddings(chunk_texts)
                     result["embeddings"] = embeddings
                     if embeddings and self.embedding_model_name:
                         metadata = result.setdefault("metadata", {})
@@ -0,0 +1,430 @@
+"""Structured document model and structure-aware chunking.
+
+The DOCX, PPTX and PDF extractors build a ``StructuredDocument``: a flat,
+ordered list of blocks (headings with their level, paragraphs, lists with
+their items, tables with a header row). ``to_text`` renders it as the plain
+``content`` stored on the document. ``chunk_structured`` turns it into
+self-contained chunks, following ``Erweiterte Indexierung.txt``:
+
+* every chunk starts with its heading path, e.g.
+  ``HR-Richtlinie - 3 Urlaub - 3.2 Urlaubsanspruch``, however far back the
+  heading is
+* a list stays in one chunk with its intro sentence; when a long list has to
+  be split, every part repeats the intro
+* table rows are rendered with their column names
+  (``[Tabelle: Gehälter, Spalten: Betrag, Ort] Betrag: 15.000 € | Ort: Freiburg``)
+
+Chunks are packed up to ``chunk_size`` tokens with the token counter of
+``app.services.chunking``. Chunks never cross a heading. Paragraphs longer
+than the budget are cut by ``ChunkingEngine``.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.services.chunking import CHUNK_SIZE_TOKENS, ChunkingEngine, get_chunking_engine
+
+_BULLET = re.compile(r"^\s*[•▪◦●○■□➢►✓\-–*]\s+")
+# "1." or "a)" only starts a list item when the following marker continues the
+# sequence; on its own it is as likely "z. B. ..." or "1. Quartal ..."
+_ENUMERATION = re.compile(r"^\s*(\()?(\d{1,3}|[a-z])([.)])\s+")
+HEADING_SEPARATOR = " - "
+
+
+@dataclass
+class Block:
+    kind: str  # "heading", "paragraph", "list" or "table"
+    text: str = ""
+    level: int = 0
+    items: List[str] = field(default_factory=list)
+    rows: List[List[str]] = field(default_factory=list)
+    page: Optional[int] = None
+
+
+@dataclass
+class StructuredDocument:
+    blocks: List[Block] = field(default_factory=list)
+    title: Optional[str] = None
+    # Marker written by to_text when the page changes ("Page" for PDFs, "Slide" for slides)
+    page_marker: Optional[str] = None
+
+    def add(self, block: Block) -> None:
+        if block.kind == "list" and self.blocks and self.blocks[-1].kind == "list" and self.blocks[-1].page == block.page:
+            self.blocks[-1].items.extend(block.items)
+        else:
+            self.blocks.append(block)
+
+    def to_text(self) -> str:
+        parts: List[str] = []
+        page = None
+        for block in self.blocks:
+            if self.page_marker and block.page is not None and block.page != page:
+                page = block.page
+                parts.append(f"[{self.page_marker} {page}]")
+            if block.kind == "list":
+                parts.append("\n".join(f"- {item}" for item in block.items))
+            elif block.kind == "table":
+                parts.append("\n".join("\t".join(row) for row in block.rows))
+            else:
+                parts.append(block.text)
+        return "\n\n".join(part for part in parts if part)
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def _enumerated(lines: Sequence[str]) -> Set[int]:
+    """Indexes of the lines whose "1."/"a)" markers form a sequence with the next or previous marker.
+
+    Markers are compared in order of appearance, so wrapped item text between
+    two markers does not break the sequence. The markers stay part of the text.
+    """
+    markers = []
+    for index, line in enumerate(lines):
+        match = _ENUMERATION.match(line)
+        if match:
+            opening, value, closing = match.groups()
+            number = int(value) if value.isdigit() else ord(value) - ord("a") + 1
+            markers.append((index, (bool(opening), value.isdigit(), closing), number))
+    listed: Set[int] = set()
+    for (index, style, number), (next_index, next_style, next_number) in zip(markers, markers[1:]):
+        if style == next_style and next_number == number + 1:
+            listed.update((index, next_index))
+    return listed
+
+
+def blocks_from_text(text: str, page: Optional[int] = None) -> List[Block]:
+    """Paragraphs and bullet lists of plain text, e.g. from a PDF without layout information."""
+    blocks: List[Block] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = [line.strip() for line in paragraph.splitlines() if line.strip()]
+        enumerated = _enumerated(lines)
+        lead: List[str] = []
+        items: List[str] = []
+        for index, line in enumerate(lines):
+            if _BULLET.match(line):
+                items.append(_BULLET.sub("", line))
+            elif index in enumerated:
+                items.append(line)
+            elif items:
+                items[-1] += " " + line
+            else:
+                lead.append(line)
+        if lead:
+            blocks.append(Block("paragraph", _clean(" ".join(lead)), page=page))
+        if items:
+            blocks.append(Block("list", items=[_clean(item) for item in items], page=page))
+    return blocks
+
+
+# --- DOCX -------------------------------------------------------------------
+
+def _docx_heading_level(style_name: str) -> Optional[int]:
+    name = (style_name or "").lower()
+    if name in ("title", "titel"):
+        return 1
+    match = re.match(r"(?:heading|überschrift)\s*(\d)", name)
+    return int(match.group(1)) + 1 if match else None
+
+
+def _docx_is_list(paragraph) -> bool:
+    name = (paragraph.style.name if paragraph.style is not None else "").lower()
+    if name.startswith("list") or "liste" in name or "aufzählung" in name:
+        return True
+    properties = paragraph._p.pPr
+    return properties is not None and properties.numPr is not None
+
+
+def from_docx(document, title: Optional[str] = None) -> StructuredDocument:
+    """Walk a python-docx ``Document`` body in order, keeping tables where they occur."""
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    structured = StructuredDocument(title=title or _clean(document.core_properties.title) or None)
+    for element in document.element.body.iterchildren():
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag == "p":
+            paragraph = Paragraph(element, document)
+            text = _clean(paragraph.text)
+            if not text:
+                continue
+            level = _docx_heading_level(paragraph.style.name if paragraph.style is not None else "")
+            if level is not None:
+                structured.add(Block("heading", text, level=level))
+            elif _docx_is_list(paragraph):
+                structured.add(Block("list", items=[text]))
+            else:
+                structured.add(Block("paragraph", text))
+        elif tag == "tbl":
+            rows = []
+            for row in Table(element, document).rows:
+                cells, previous = [], None
+                for cell in row.cells:
+                    # Merged cells repeat the same underlying cell element
+                    if cell._tc is not previous:
+                        cells.append(_clean(cell.text))
+                    previous = cell._tc
+                if any(cells):
+                    rows.append(cells)
+            if rows:
+                structured.add(Block("table", rows=rows))
+    return structured
+
+
+# --- PPTX -------------------------------------------------------------------
+
+def from_pptx(presentation) -> StructuredDocument:
+    """Slide titles become headings, body placeholders lists, tables stay tables."""
+    structured = StructuredDocument(page_marker="Slide")
+    for number, slide in enumerate(presentation.slides, 1):
+        title_shape = slide.shapes.title
+        if title_shape is not None and _clean(title_shape.text):
+            structured.add(Block("heading", _clean(title_shape.text), level=1, page=number))
+        for shape in slide.shapes:
+            if title_shape is not None and shape.shape_id == title_shape.shape_id:
+                continue
+            if getattr(shape, "has_table", False) and shape.has_table:
+                rows = [[_clean(cell.text) for cell in row.cells] for row in shape.table.rows]
+                rows = [row for row in rows if any(row)]
+                if rows:
+                    structured.add(Block("table", rows=rows, page=number))
+                continue
+            if not getattr(shape, "has_text_frame", False) or not shape.has_text_frame:
+                continue
+            paragraphs = [(paragraph.level, _clean("".join(run.text for run in paragraph.runs))) for paragraph in shape.text_frame.paragraphs]
+            paragraphs = [(level, text) for level, text in paragraphs if text]
+            bulleted = shape.is_placeholder and len(paragraphs) > 1
+            enumerated = _enumerated([text for _, text in paragraphs])
+            for index, (level, text) in enumerate(paragraphs):
+                if bulleted or level > 0 or index in enumerated or _BULLET.match(text):
+                    structured.add(Block("list", items=[_BULLET.sub("", text)], page=number))
+                else:
+                    structured.add(Block("paragraph", text, page=number))
+    return structured
+
+
+# --- PDF --------------------------------------------------------------------
+
+def _inside(bbox: Sequence[float], areas: Iterable[Sequence[float]]) -> bool:
+    x0, y0, x1, y1 = bbox
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    return any(a[0] <= cx <= a[2] and a[1] <= cy <= a[3] for a in areas)
+
+
+def from_pymupdf(document, detect_tables: bool = True) -> StructuredDocument:
+    """Use PyMuPDF's text dict: font sizes give headings, ``find_tables`` gives tables."""
+    pages: List[Tuple[int, List[Tuple[str, float, Sequence[float]]], List[List[List[str]]], List[Sequence[float]]]] = []
+    sizes: Dict[float, int] = {}
+    for index in range(len(document)):
+        page = document.load_page(index)
+        tables, table_areas = [], []
+        if detect_tables:
+            try:
+                for table in page.find_tables().tables:
+                    rows = [[_clean(cell or "") for cell in row] for row in table.extract()]
+                    rows = [row for row in rows if any(row)]
+                    if len(rows) > 1:
+                        tables.append(rows)
+                        table_areas.append(tuple(table.bbox))
+            except Exception:
+                tables, table_areas = [], []
+        lines = []
+        for block in page.get_text("dict").get("blocks", []):
+            if block.get("type") != 0 or _inside(block["bbox"], table_areas):
+                continue
+            block_lines = []
+            block_size = 0.0
+            for line in block.get("lines", []):
+                spans = line.get("spans", [])
+                text = "".join(span.get("text", "") for span in spans)
+                if not text.strip():
+                    continue
+                size = max(span.get("size", 0.0) for span in spans)
+                block_size = max(block_size, size)
+                block_lines.append(text)
+                rounded = round(size, 1)
+                sizes[rounded] = sizes.get(rounded, 0) + len(text)
+            if block_lines:
+                lines.append(("\n".join(block_lines), round(block_size, 1), block["bbox"]))
+        pages.append((index + 1, lines, tables, table_areas))
+
+    body_size = max(sizes, key=sizes.get) if sizes else 0.0
+    heading_sizes = sorted({size for _, lines, _, _ in pages for _, size, _ in lines if size >= body_size * 1.15}, reverse=True)
+    levels = {size: min(position + 1, 6) for position, size in enumerate(heading_sizes)}
+
+    structured = StructuredDocument(page_marker="Page")
+    for number, lines, tables, _ in pages:
+        for text, size, _ in lines:
+            flat = _clean(text)
+            if size in levels and len(flat) <= 150 and not flat.endswith("."):
+                structured.add(Block("heading", flat, level=levels[size], page=number))
+            else:
+                for block in blocks_from_text(text, page=number):
+                    structured.add(block)
+        for rows in tables:
+            structured.add(Block("table", rows=rows, page=number))
+    return structured
+
+
+def from_page_texts(pages: Iterable[Tuple[int, str]]) -> StructuredDocument:
+    """Plain per-page text (pypdf) without font information: paragraphs and bullet lists only."""
+    structured = StructuredDocument(page_marker="Page")
+    for number, text in pages:
+        for block in blocks_from_text(text, page=number):
+            structured.add(block)
+    return structured
+
+
+# --- Chunking ---------------------------------------------------------------
+
+@dataclass
+class _Unit:
+    path: Tuple[str, ...]
+    text: str
+    lead: Optional[str] = None
+    page: Optional[int] = None
+    tokens: int = 0
+    # Kind of the block the unit came from
+    kind: str = "paragraph"
+
+
+def _table_units(block: Block, path: Tuple[str, ...], table_number: int) -> List[_Unit]:
+    header, *body = block.rows
+    if not body:
+        return [_Unit(path, " | ".join(header), page=block.page, kind="table")]
+    columns = [name or f"Spalte {index + 1}" for index, name in enumerate(header)]
+    caption = path[-1] if path else f"Tabelle {table_number}"
+    lead = f"[Tabelle: {caption}, Spalten: {', '.join(columns)}]"
+    units = []
+    for row in body:
+        pairs = [f"{columns[index] if index < len(columns) else f'Spalte {index + 1}'}: {value}" for index, value in enumerate(row) if value]
+        if pairs:
+            units.append(_Unit(path, " | ".join(pairs), lead=lead, page=block.page, kind="table"))
+    return units
+
+
+def _units(document: StructuredDocument) -> List[_Unit]:
+    units: List[_Unit] = []
+    headings: List[Tuple[int, str]] = []
+    tables = 0
+    for block in document.blocks:
+        path = tuple(text for _, text in headings)
+        if block.kind == "heading":
+            headings = [(level, text) for level, text in headings if level < block.level]
+            headings.append((block.level, block.text))
+        elif block.kind == "paragraph":
+            units.append(_Unit(path, block.text, page=block.page))
+        elif block.kind == "list":
+            lead = None
+            # The intro sentence right before a list belongs to it
+            previous = units[-1] if units else None
+            if previous is not None and previous.kind == "paragraph" and previous.path == path and previous.page == block.page:
+                lead = units.pop().text
+            units.extend(_Unit(path, f"- {item}", lead=lead, page=block.page, kind="list") for item in block.items)
+        elif block.kind == "table" and block.rows:
+            tables += 1
+            units.extend(_table_units(block, path, tables))
+    return units
+
+
+def _detach_long_leads(units: List[_Unit], lead_tokens: Dict[str, int], limit: int) -> List[_Unit]:
+    """Turn intros over ``limit`` tokens back into paragraphs instead of repeating them per list part."""
+    detached: List[_Unit] = []
+    previous: Optional[_Unit] = None
+    for unit in units:
+        if unit.lead and lead_tokens[unit.lead] > limit:
+            if previous is None or previous.kind != "list" or previous.lead != unit.lead:
+                detached.append(_Unit(unit.path, unit.lead, page=unit.page, tokens=lead_tokens[unit.lead]))
+            previous = unit
+            unit = _Unit(unit.path, unit.text, page=unit.page, tokens=unit.tokens, kind=unit.kind)
+        else:
+            previous = unit
+        detached.append(unit)
+    return detached
+
+
+def chunk_structured(
+    document: StructuredDocument,
+    chunk_size: Optional[int] = None,
+    engine: Optional[ChunkingEngine] = None,
+) -> List[Dict[str, Any]]:
+    engine = engine or get_chunking_engine()
+    chunk_size = max(1, chunk_size or CHUNK_SIZE_TOKENS)
+    units = _units(document)
+    if not units:
+        return []
+
+    prefixes = {
+        unit.path: HEADING_SEPARATOR.join(([document.title] if document.title else []) + list(unit.path))
+        for unit in units
+    }
+    leads = {unit.lead for unit in units if unit.lead}
+    texts = [unit.text for unit in units] + list(prefixes.values()) + list(leads)
+    counts = engine.counter.count(texts)
+    for unit, tokens in zip(units, counts):
+        unit.tokens = tokens
+    prefix_tokens = dict(zip(prefixes.values(), counts[len(units):len(units) + len(prefixes)]))
+    lead_tokens = dict(zip(leads, counts[len(units) + len(prefixes):]))
+    units = _detach_long_leads(units, lead_tokens, chunk_size // 2)
+
+    chunks: List[Dict[str, Any]] = []
+    lines: List[str] = []
+    pages: List[int] = []
+    state = {"path": None, "lead": None, "tokens": 0}
+
+    def flush() -> None:
+        if lines:
+            prefix = prefixes[state["path"]]
+            content = "\n".join(([prefix] if prefix else []) + lines)
+            chunk = {
+                "content": content,
+                "chunk_index": len(chunks),
+                "token_count": state["tokens"],
+                "word_count": len(content.split()),
+                "character_count": len(content),
+                "heading_path": list(state["path"]),
+            }
+            if pages:
+                chunk["page_start"], chunk["page_end"] = min(pages), max(pages)
+            chunks.append(chunk)
+        lines.clear()
+        pages.clear()
+        state["lead"] = None
+        state["tokens"] = prefix_tokens.get(prefixes.get(state["path"], ""), 0)
+
+    for unit in units:
+        if unit.path != state["path"]:
+            flush()
+            state["path"] = unit.path
+            state["tokens"] = prefix_tokens[prefixes[unit.path]]
+        base = prefix_tokens[prefixes[unit.path]]
+        lead_cost = lead_tokens[unit.lead] if unit.lead and unit.lead != state["lead"] else 0
+        budget = chunk_size - base - (lead_tokens[unit.lead] if unit.lead else 0)
+
+        if unit.tokens > budget:
+            # A single paragraph larger than a chunk is cut on its own
+            flush()
+            for piece in engine.chunk(unit.text, max(1, budget), 0):
+                lines.extend(([unit.lead] if unit.lead else []) + [piece["content"]])
+                state["tokens"] += piece["token_count"] + (lead_tokens[unit.lead] if unit.lead else 0)
+                if unit.page is not None:
+                    pages.append(unit.page)
+                flush()
+            continue
+
+        if lines and state["tokens"] + lead_cost + unit.tokens > chunk_size:
+            flush()
+            lead_cost = lead_tokens[unit.lead] if unit.lead else 0
+        if unit.lead and unit.lead != state["lead"]:
+            lines.append(unit.lead)
+        state["lead"] = unit.lead
+        lines.append(unit.text)
+        state["tokens"] += lead_cost + unit.tokens
+        if unit.page is not None:
+            pages.append(unit.page)
+    flush()
+    return chunks
@@ -0,0 +1,117 @@
+"""Length-bucketed, token-budgeted batching for the embedding model.
+
+A transformer batch is padded to its longest input. A fixed ``batch_size``
+therefore pays for the longest chunk in every batch: one 512-token chunk
+among 31 table rows makes the whole batch cost 32 x 512 tokens.
+SentenceTransformer's own length sort (by characters, within one call)
+helps, but a fixed batch of short texts is still small and one of long
+texts still large.
+
+``encode_in_token_batches`` counts tokens with the model's tokenizer and
+sorts the inputs longest first. It then cuts batches so that padded tokens
+(batch size x longest input) stay within ``EMBEDDING_TOKEN_BUDGET``, capped
+at ``EMBEDDING_MAX_BATCH_SIZE``. Short inputs travel in large batches, long
+ones in small batches, and outputs are returned in the original order.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_TOKEN_BUDGET = int(os.getenv("EMBEDDING_TOKEN_BUDGET", "16384"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128"))
+
+
+def token_lengths(model, texts: Sequence[str]) -> List[int]:
+    """Input lengths in tokens, with special tokens and the model's truncation applied."""
+    limit = getattr(model, "max_seq_length", None)
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is not None and callable(tokenizer):
+        encoded = tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            truncation=bool(limit),
+            max_length=limit,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    from app.services.chunking import get_chunking_engine
+
+    lengths = [count + 2 for count in get_chunking_engine().counter.count(list(texts))]
+    return [min(length, limit) for length in lengths] if limit else lengths
+
+
+def plan_batches(
+    lengths: Sequence[int],
+    token_budget: int = EMBEDDING_TOKEN_BUDGET,
+    max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+) -> List[List[int]]:
+    """Indices grouped longest first into batches whose padded size fits ``token_budget``.
+
+    An input longer than the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index], reverse=True)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    for index in order:
+        if current and ((len(current) + 1) * longest > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        if not current:
+            # Sorted longest first, so a batch's first input sets its padded length
+            longest = max(1, lengths[index])
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padded_tokens(lengths: Sequence[int], batches: Sequence[Sequence[int]]) -> int:
+    return sum(len(batch) * max(lengths[index] for index in batch) for batch in batches if batch)
+
+
+def encode_in_token_batches(
+    model,
+    texts: Sequence[str],
+    token_budget: Optional[int] = None,
+    max_batch_size: Optional[int] = None,
+    **encode_kwargs: Any,
+):
+    """``model.encode(texts, **encode_kwargs)`` with token-budgeted batches, in input order.
+
+    Returns a stacked array, or a list of per-text feature dicts with ``output_value=None``.
+    """
+    if not texts:
+        return [] if encode_kwargs.get("output_value", "sentence_embedding") is None else np.zeros((0, 0), dtype=np.float32)
+    # One progress bar per batch would be noise; log batch progress instead
+    show_progress = encode_kwargs.pop("show_progress_bar", False)
+    encode_kwargs.pop("batch_size", None)
+
+    lengths = token_lengths(model, texts)
+    batches = plan_batches(lengths, token_budget or EMBEDDING_TOKEN_BUDGET, max_batch_size or EMBEDDING_MAX_BATCH_SIZE)
+    logger.debug(
+        f"Encoding {len(texts)} texts in {len(batches)} batches, "
+        f"{sum(lengths)} tokens padded to {padded_tokens(lengths, batches)}"
+    )
+
+    outputs: List[Any] = [None] * len(texts)
+    for number, batch in enumerate(batches, 1):
+        encoded = model.encode(
+            [texts[index] for index in batch], batch_size=len(batch), show_progress_bar=False, **encode_kwargs
+        )
+        for index, value in zip(batch, encoded):
+            outputs[index] = value
+        if show_progress:
+            logger.info(f"Encoded batch {number}/{len(batches)} ({len(batch)} texts)")
+    if encode_kwargs.get("output_value", "sentence_embedding") is None:
+        return outputs
+    return np.stack([np.asarray(value) for value in outputs])
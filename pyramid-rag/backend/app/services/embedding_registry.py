@@ -0,0 +1,434 @@
+"""Embedding model registry: shadow builds and an atomic model switch.
+
+Changing ``EMBEDDING_MODEL`` used to mean a full offline reprocess, since
+every vector lives in the fixed-dimension ``document_chunks.embedding``
+column. That column stays the index of the configured model. Other models
+are registered here (``POST /api/v1/admin/embedding-models``), and their
+vectors go into ``document_chunk_vectors``, one row per chunk and model:
+
+* BUILDING: the ``build_shadow_vectors`` beat task embeds the chunks that
+  have no vector for the model yet, at most ``EMBEDDING_MIGRATION_RATE``
+  chunks per second (or the model's ``rate_limit``). Ingestion and search
+  keep the rest of the embedding node. Searches are not affected.
+* READY: no chunk is missing. The model has its own partial HNSW index.
+* ACTIVE: ``activate_model`` retires the previous model and activates the
+  new one in a single transaction. Search processes re-read the active model
+  at most every ``EMBEDDING_REGISTRY_TTL`` seconds. Each query encodes and
+  reads with the same model, so a query during the switch sees either the
+  old index or the new one, never a mix.
+
+The builder also keeps READY and ACTIVE models current as documents arrive.
+Vectors of retired models, and the legacy column, stay in place. Switching
+back is the same flip.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models import DocumentChunk, DocumentChunkVector, EmbeddingModel, EmbeddingModelStatus
+from app.services.bge_m3_embedding_service import get_embedding_model
+from app.services.embedding_batches import encode_in_token_batches
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MIGRATION_RATE = float(os.getenv("EMBEDDING_MIGRATION_RATE", "20"))
+EMBEDDING_MIGRATION_BATCH = int(os.getenv("EMBEDDING_MIGRATION_BATCH", "64"))
+EMBEDDING_MIGRATION_TICK_SECONDS = float(os.getenv("EMBEDDING_MIGRATION_TICK_SECONDS", "60"))
+EMBEDDING_REGISTRY_TTL = float(os.getenv("EMBEDDING_REGISTRY_TTL", "10"))
+
+MAINTAINED_STATUSES = (EmbeddingModelStatus.BUILDING, EmbeddingModelStatus.READY, EmbeddingModelStatus.ACTIVE)
+
+
+class ModelNotFound(LookupError):
+    pass
+
+
+class ModelAlreadyRegistered(Exception):
+    pass
+
+
+class ShadowIncomplete(Exception):
+    def __init__(self, name: str, missing: int) -> None:
+        super().__init__(f"{name} is missing vectors for {missing} chunks")
+        self.missing = missing
+
+
+@dataclass(frozen=True)
+class ActiveModel:
+    id: uuid.UUID
+    name: str
+    dimension: int
+
+    def vector_expression(self, alias: Optional[str] = "v") -> str:
+        """The cast the model's partial HNSW index is built on."""
+        column = f"{alias}.embedding" if alias else "embedding"
+        return f"({column}::vector({int(self.dimension)}))"
+
+    def distance_expression(self, parameter: str = "query_embedding", alias: Optional[str] = "v") -> str:
+        """Cosine distance to ``:parameter`` on the indexed cast; ORDER BY it ASC for an index scan."""
+        return f"{self.vector_expression(alias)} <=> :{parameter}::vector({int(self.dimension)})"
+
+    def join_clause(self, alias: str = "v") -> str:
+        # Literal model id, so the partial index predicate is implied by the join; the
+        # index is only scanned when the query also orders by distance_expression()
+        return f"JOIN document_chunk_vectors {alias} ON {alias}.chunk_id = dc.id AND {alias}.model_id = '{uuid.UUID(str(self.id))}'"
+
+
+@dataclass
+class BuildProgress:
+    id: uuid.UUID
+    name: str
+    status: EmbeddingModelStatus
+    dimension: Optional[int]
+    embedded: int
+    total: int
+    rate_limit: float
+    build_started_at: Optional[datetime]
+    build_completed_at: Optional[datetime]
+    activated_at: Optional[datetime]
+    last_error: Optional[str]
+    now: datetime
+
+    @property
+    def missing(self) -> int:
+        return max(0, self.total - self.embedded)
+
+    @property
+    def chunks_per_second(self) -> float:
+        """Observed build rate since the first batch, throttling and idle ticks included."""
+        if not self.build_started_at or self.build_completed_at:
+            return 0.0
+        elapsed = (self.now - self.build_started_at).total_seconds()
+        return self.embedded / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        if not self.missing:
+            return 0.0
+        rate = self.chunks_per_second or (self.rate_limit if self.status == EmbeddingModelStatus.BUILDING else 0.0)
+        return self.missing / rate if rate > 0 else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        eta = self.eta_seconds
+        return {
+            "id": str(self.id),
+            "name": self.name,
+            "status": self.status.value,
+            "dimension": self.dimension,
+            "embedded_chunks": self.embedded,
+            "total_chunks": self.total,
+            "missing_chunks": self.missing,
+            "percent_complete": round(100.0 * self.embedded / self.total, 2) if self.total else 100.0,
+            "rate_limit": self.rate_limit,
+            "chunks_per_second": round(self.chunks_per_second, 2),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "projected_completion": (
+                (self.now + timedelta(seconds=eta)).isoformat() if eta is not None and self.missing else None
+            ),
+            "build_started_at": self.build_started_at.isoformat() if self.build_started_at else None,
+            "build_completed_at": self.build_completed_at.isoformat() if self.build_completed_at else None,
+            "activated_at": self.activated_at.isoformat() if self.activated_at else None,
+            "last_error": self.last_error,
+        }
+
+
+def missing_chunks_statement(model_id, limit: Optional[int], after=None):
+    """Chunks without a vector for ``model_id``, in id order after the keyset cursor ``after``."""
+    statement = (
+        select(DocumentChunk.id, DocumentChunk.document_id, DocumentChunk.content)
+        .outerjoin(
+            DocumentChunkVector,
+            and_(DocumentChunkVector.chunk_id == DocumentChunk.id, DocumentChunkVector.model_id == model_id),
+        )
+        .where(DocumentChunkVector.chunk_id.is_(None))
+    )
+    if after is not None:
+        statement = statement.where(DocumentChunk.id > after)
+    return statement.order_by(DocumentChunk.id).limit(limit)
+
+
+def index_name(model_id) -> str:
+    return f"ix_document_chunk_vectors_hnsw_{uuid.UUID(str(model_id)).hex[:16]}"
+
+
+def create_vector_index(session: Session, model: EmbeddingModel) -> None:
+    """Partial HNSW index over the model's rows, built without blocking writes."""
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    active = ActiveModel(model.id, model.name, model.dimension)
+    statement = (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(model.id)} ON document_chunk_vectors "
+        f"USING hnsw ({active.vector_expression(None)} vector_cosine_ops) "
+        f"WHERE model_id = '{uuid.UUID(str(model.id))}'"
+    )
+    engine = getattr(bind, "engine", bind)
+    # CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(statement))
+
+
+_encoders: Dict[str, Any] = {}
+_encoders_lock = threading.Lock()
+
+
+def get_model_encoder(name: str):
+    """The configured model, or a SentenceTransformer for another registered one."""
+    if name == os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3"):
+        return get_embedding_model()
+    with _encoders_lock:
+        if name not in _encoders:
+            from sentence_transformers import SentenceTransformer
+
+            device = os.getenv("EMBEDDING_DEVICE", "cpu")
+            logger.info(f"Loading registered embedding model {name} on {device}")
+            _encoders[name] = SentenceTransformer(name, device=device, trust_remote_code=True)
+        return _encoders[name]
+
+
+def register_model(session: Session, name: str, created_by=None, rate_limit: Optional[float] = None) -> EmbeddingModel:
+    """Start (or resume, for a retired model) a shadow build of ``name``."""
+    model = session.execute(select(EmbeddingModel).where(EmbeddingModel.name == name)).scalar_one_or_none()
+    if model is not None and model.status != EmbeddingModelStatus.RETIRED:
+        raise ModelAlreadyRegistered(f"{name} is already registered ({model.status.value})")
+    if model is None:
+        model = EmbeddingModel(name=name, created_by=created_by)
+        session.add(model)
+    model.status = EmbeddingModelStatus.BUILDING
+    model.rate_limit = rate_limit
+    model.build_started_at = None
+    model.build_completed_at = None
+    model.last_error = None
+    session.commit()
+    logger.info(f"Registered embedding model {name} for a shadow build")
+    return model
+
+
+def build_progress(session: Session, now: Optional[datetime] = None) -> List[BuildProgress]:
+    now = now or datetime.utcnow()
+    total = session.execute(select(func.count(DocumentChunk.id))).scalar_one()
+    embedded = dict(
+        session.execute(
+            select(DocumentChunkVector.model_id, func.count()).group_by(DocumentChunkVector.model_id)
+        ).all()
+    )
+    models = session.execute(select(EmbeddingModel).order_by(EmbeddingModel.created_at)).scalars()
+    return [
+        BuildProgress(
+            id=model.id,
+            name=model.name,
+            status=model.status,
+            dimension=model.dimension,
+            embedded=embedded.get(model.id, 0),
+            total=total,
+            rate_limit=model.rate_limit or EMBEDDING_MIGRATION_RATE,
+            build_started_at=model.build_started_at,
+            build_completed_at=model.build_completed_at,
+            activated_at=model.activated_at,
+            last_error=model.last_error,
+            now=now,
+        )
+        for model in models
+    ]
+
+
+def activate_model(session: Session, model_id=None, force: bool = False) -> Optional[EmbeddingModel]:
+    """Make ``model_id`` the searched model, or the legacy column with ``None``, in one transaction.
+
+    Refuses a model that is still building or missing chunks unless ``force``;
+    the builder keeps an active model current, so forced gaps close on the next ticks.
+    """
+    # Lock every registry row so concurrent switches serialize
+    models = session.execute(select(EmbeddingModel).with_for_update()).scalars().all()
+    target = None
+    if model_id is not None:
+        target = next((model for model in models if str(model.id) == str(model_id)), None)
+        if target is None:
+            raise ModelNotFound(f"Embedding model {model_id} is not registered")
+        missing = session.execute(
+            select(func.count()).select_from(missing_chunks_statement(target.id, None).subquery())
+        ).scalar_one()
+        complete = target.status in (EmbeddingModelStatus.READY, EmbeddingModelStatus.ACTIVE) and not missing
+        # Without a single built batch the dimension, and so the query cast, is unknown
+        if target.dimension is None or not (complete or force):
+            session.rollback()
+            raise ShadowIncomplete(target.name, missing)
+
+    now = datetime.utcnow()
+    for model in models:
+        if model.status == EmbeddingModelStatus.ACTIVE and model is not target:
+            model.status = EmbeddingModelStatus.RETIRED
+    if target is not None and target.status != EmbeddingModelStatus.ACTIVE:
+        target.status = EmbeddingModelStatus.ACTIVE
+        target.activated_at = now
+    session.commit()
+    invalidate_active_model()
+    logger.info(f"Active embedding model: {target.name if target else 'legacy document_chunks.embedding'}")
+    return target
+
+
+def store_chunk_vectors(session: Session, model_name: Optional[str], document_id, chunk_ids: Sequence, embeddings: Sequence) -> int:
+    """Write freshly ingested vectors for the registered model of the same name, saving the builder a pass."""
+    if not model_name or not chunk_ids:
+        return 0
+    model = session.execute(
+        select(EmbeddingModel.id, EmbeddingModel.dimension).where(
+            EmbeddingModel.name == model_name, EmbeddingModel.status.in_(MAINTAINED_STATUSES)
+        )
+    ).first()
+    if model is None:
+        return 0
+    rows = [
+        {"chunk_id": chunk_id, "model_id": model.id, "document_id": document_id, "embedding": list(embedding)}
+        for chunk_id, embedding in zip(chunk_ids, embeddings)
+        if embedding is not None and (model.dimension is None or len(embedding) == model.dimension)
+    ]
+    if rows:
+        session.execute(insert(DocumentChunkVector), rows)
+    return len(rows)
+
+
+def _build_model(
+    session: Session,
+    model_id,
+    deadline: float,
+    encoder_loader: Callable[[str], Any],
+    batch_size: int,
+    clock: Callable[[], float],
+    sleep: Callable[[float], None],
+) -> int:
+    embedded = 0
+    after = None
+    while clock() < deadline:
+        started = clock()
+        # Per-batch row lock: a second builder skips the model instead of duplicating work
+        model = session.execute(
+            select(EmbeddingModel)
+            .where(EmbeddingModel.id == model_id, EmbeddingModel.status.in_(MAINTAINED_STATUSES))
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if model is None:
+            session.rollback()
+            break
+
+        rows = session.execute(missing_chunks_statement(model.id, batch_size, after)).all()
+        if not rows and after is not None:
+            # Wrap around once: chunks ingested meanwhile may sort before the cursor
+            session.rollback()
+            after = None
+            continue
+        if not rows:
+            if model.status == EmbeddingModelStatus.BUILDING and model.dimension:
+                session.commit()
+                create_vector_index(session, model)
+                model.status = EmbeddingModelStatus.READY
+                model.build_completed_at = datetime.utcnow()
+                logger.info(f"Shadow build of {model.name} complete")
+            session.commit()
+            break
+
+        vectors = encode_in_token_batches(
+            encoder_loader(model.name), [row.content for row in rows], normalize_embeddings=True
+        )
+        if model.dimension is None:
+            model.dimension = int(vectors.shape[1])
+        elif vectors.shape[1] != model.dimension:
+            raise ValueError(f"{model.name} produced {vectors.shape[1]} dimensions, registered with {model.dimension}")
+        session.execute(
+            insert(DocumentChunkVector),
+            [
+                {"chunk_id": row.id, "model_id": model.id, "document_id": row.document_id, "embedding": vector.tolist()}
+                for row, vector in zip(rows, vectors)
+            ],
+        )
+        model.build_started_at = model.build_started_at or datetime.utcnow()
+        model.last_error = None
+        rate = model.rate_limit or EMBEDDING_MIGRATION_RATE
+        session.commit()
+        embedded += len(rows)
+        after = rows[-1].id
+
+        pause = len(rows) / rate - (clock() - started)
+        if clock() + pause >= deadline:
+            break
+        if pause > 0:
+            sleep(pause)
+    return embedded
+
+
+def build_shadow_vectors(
+    session_factory: Optional[Callable[[], Session]] = None,
+    budget_seconds: float = EMBEDDING_MIGRATION_TICK_SECONDS,
+    encoder_loader: Callable[[str], Any] = get_model_encoder,
+    batch_size: int = EMBEDDING_MIGRATION_BATCH,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, int]:
+    """One throttled beat tick: embed missing chunks of every maintained model within ``budget_seconds``."""
+    if session_factory is None:
+        from app.database import SessionLocal
+
+        session_factory = SessionLocal
+
+    deadline = clock() + budget_seconds
+    embedded: Dict[str, int] = {}
+    session = session_factory()
+    try:
+        models = session.execute(
+            select(EmbeddingModel.id, EmbeddingModel.name)
+            .where(EmbeddingModel.status.in_(MAINTAINED_STATUSES))
+            .order_by(EmbeddingModel.created_at)
+        ).all()
+        session.rollback()
+        for model_id, name in models:
+            if clock() >= deadline:
+                break
+            try:
+                embedded[name] = _build_model(session, model_id, deadline, encoder_loader, batch_size, clock, sleep)
+            except Exception as exc:
+                session.rollback()
+                logger.error(f"Shadow build of {name} failed: {exc}", exc_info=True)
+                model = session.get(EmbeddingModel, model_id)
+                if model is not None:
+                    model.last_error = str(exc)[:2000]
+                    session.commit()
+    finally:
+        session.close()
+    return embedded
+
+
+_active_model: Optional[ActiveModel] = None
+_active_model_expires = 0.0
+
+
+def invalidate_active_model() -> None:
+    global _active_model_expires
+    _active_model_expires = 0.0
+
+
+async def get_active_model(db) -> Optional[ActiveModel]:
+    """The ACTIVE registered model, cached for ``EMBEDDING_REGISTRY_TTL`` seconds; ``None`` means the legacy column."""
+    global _active_model, _active_model_expires
+    if time.monotonic() < _active_model_expires:
+        return _active_model
+    row = (
+        await db.execute(
+            select(EmbeddingModel.id, EmbeddingModel.name, EmbeddingModel.dimension).where(
+                EmbeddingModel.status == EmbeddingModelStatus.ACTIVE
+            )
+        )
+    ).first()
+    _active_model = ActiveModel(row.id, row.name, row.dimension) if row is not None and row.dimension else None
+    _active_model_expires = time.monotonic() + EMBEDDING_REGISTRY_TTL
+    return _active_model
@@ -0,0 +1,271 @@
+"""ColBERT-style late-interaction rescoring with BGE-M3's multi-vector output.
+
+BGE-M3 projects every token's hidden state with ``colbert_linear`` and
+normalizes the result. A query and a passage are scored by MaxSim: for each
+query token take its best dot product with any passage token, then average
+over the query tokens. This is much finer than one pooled vector per chunk,
+so it replaces the cosine score of the top ``LATE_INTERACTION_CANDIDATES``
+results of ``SearchService.vector_search``.
+
+Token vectors are written at ingestion, from the same forward pass as the
+dense embedding. They are stored as float16 on disk, not in Postgres. Each
+document (keyed by its file hash) gets one ``.tvec`` file holding the token
+matrix and the first token row of every chunk, indexed by ``chunk_index``.
+Reads go through ``np.memmap``, so only the candidates' rows are paged in.
+At 1024 dimensions a token costs 2 KiB, which is about 1 MiB for a full
+512-token chunk.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.bge_m3_embedding_service import forward_features, get_embedding_model, model_file, to_numpy
+
+logger = logging.getLogger(__name__)
+
+LATE_INTERACTION_ENABLED = os.getenv("LATE_INTERACTION_ENABLED", "false").lower() in ("1", "true", "yes")
+LATE_INTERACTION_CANDIDATES = int(os.getenv("LATE_INTERACTION_CANDIDATES", "50"))
+TOKEN_VECTOR_DIR = Path(os.getenv("TOKEN_VECTOR_DIR", "data/token_vectors"))
+TOKEN_VECTOR_OPEN_FILES = int(os.getenv("TOKEN_VECTOR_OPEN_FILES", "256"))
+
+
+def load_colbert_head(model_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Transposed weight matrix and bias of BGE-M3's ``colbert_linear`` layer."""
+    import torch
+
+    path = os.getenv("COLBERT_HEAD_PATH") or model_file(model_name, "colbert_linear.pt")
+    state = torch.load(path, map_location="cpu")
+    weight = state["weight"].float().numpy().T.copy()
+    bias = state["bias"].float().numpy() if "bias" in state else np.zeros(weight.shape[1], dtype=np.float32)
+    return weight, bias
+
+
+class ColbertEncoder:
+    """Normalized token vectors from the shared BGE-M3 model, loaded on first use."""
+
+    def __init__(self, model=None, head: Optional[Tuple[np.ndarray, np.ndarray]] = None, model_name: Optional[str] = None) -> None:
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+        self._model = model
+        self._head = head
+        self._failed = False
+
+    def _load(self) -> bool:
+        if self._failed:
+            return False
+        if self._model is not None and self._head is not None:
+            return True
+        try:
+            if self._model is None:
+                self._model = get_embedding_model()
+            if self._head is None:
+                self._head = load_colbert_head(self.model_name)
+        except Exception as exc:
+            self._failed = True
+            logger.warning(f"ColBERT head for {self.model_name} unavailable, late interaction is disabled: {exc}")
+            return False
+        return True
+
+    @property
+    def available(self) -> bool:
+        return self._load()
+
+    def vectors_from_features(self, features: Dict[str, Any]) -> np.ndarray:
+        """Token vectors (float32, one row per token after [CLS]) from ``forward_features`` output."""
+        weight, bias = self._head
+        hidden = to_numpy(features["token_embeddings"])
+        mask = features.get("attention_mask")
+        length = int(to_numpy(mask).sum()) if mask is not None else len(hidden)
+        vectors = hidden[1:length].astype(np.float32) @ weight + bias
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def encode_query(self, query: str) -> Optional[np.ndarray]:
+        if not self._load():
+            return None
+        return self.vectors_from_features(forward_features(self._model, [query])[0])
+
+
+def maxsim_scores(query_vectors: np.ndarray, candidates: Sequence[np.ndarray]) -> np.ndarray:
+    """MaxSim of the query against every candidate's token vectors in one matrix product.
+
+    The candidates' tokens are stacked into one float32 matrix, so a single
+    matmul and ``np.maximum.reduceat`` over the candidate boundaries score all
+    of them. Candidates without tokens score ``-inf``.
+    """
+    scores = np.full(len(candidates), -np.inf, dtype=np.float32)
+    present = [index for index, tokens in enumerate(candidates) if len(tokens)]
+    if not present or not len(query_vectors):
+        return scores
+    lengths = np.array([len(candidates[index]) for index in present])
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    tokens = np.concatenate([candidates[index] for index in present], dtype=np.float32)
+    similarities = tokens @ np.asarray(query_vectors, dtype=np.float32).T
+    best = np.maximum.reduceat(similarities, starts, axis=0)
+    scores[present] = best.mean(axis=1)
+    return scores
+
+
+_TRAILER = np.dtype([("chunks", "<i8"), ("dim", "<i8")])
+
+
+class _TokenVectorWriter:
+    def __init__(self, store: "TokenVectorStore", key: str) -> None:
+        self.store = store
+        self.key = key
+        self.offsets = [0]
+        self.dim = 0
+        self.path = store.path(key)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._handle = open(self._tmp, "wb")
+
+    def append(self, vectors: np.ndarray) -> None:
+        """Add the token vectors of the next chunk (in ``chunk_index`` order)."""
+        if len(vectors):
+            self.dim = vectors.shape[1]
+        self._handle.write(np.ascontiguousarray(vectors, dtype=np.float16).tobytes())
+        self.offsets.append(self.offsets[-1] + len(vectors))
+
+    def commit(self) -> None:
+        self._handle.write(np.asarray(self.offsets, dtype="<i8").tobytes())
+        self._handle.write(np.array([(len(self.offsets) - 1, self.dim)], dtype=_TRAILER).tobytes())
+        self._handle.close()
+        # One file, replaced atomically: readers see the old or the new document, never a mix
+        os.replace(self._tmp, self.path)
+        self.store.forget(self.key)
+
+    def abort(self) -> None:
+        self._handle.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "_TokenVectorWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class TokenVectorStore:
+    """Memory-mapped float16 token vectors per document, read by ``(key, chunk_index)``.
+
+    A ``.tvec`` file holds the float16 token rows of all chunks, then the
+    int64 chunk offsets, then a ``(chunks, dim)`` trailer.
+    """
+
+    def __init__(self, directory: Path = TOKEN_VECTOR_DIR, max_open: int = TOKEN_VECTOR_OPEN_FILES) -> None:
+        self.directory = Path(directory)
+        self.max_open = max_open
+        self._open: "OrderedDict[str, Tuple[Tuple[int, int], np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.tvec"
+
+    def writer(self, key: str) -> _TokenVectorWriter:
+        return _TokenVectorWriter(self, key)
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._open.pop(key, None)
+
+    def delete(self, key: str) -> None:
+        self.forget(key)
+        self.path(key).unlink(missing_ok=True)
+
+    def _mapped(self, key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        path = self.path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._open.get(key)
+            if cached is not None and cached[0] == version:
+                self._open.move_to_end(key)
+                return cached[1], cached[2]
+
+        with open(path, "rb") as handle:
+            handle.seek(stat.st_size - _TRAILER.itemsize)
+            trailer = np.frombuffer(handle.read(_TRAILER.itemsize), dtype=_TRAILER)[0]
+            chunks, dim = int(trailer["chunks"]), int(trailer["dim"])
+            offsets_start = stat.st_size - _TRAILER.itemsize - 8 * (chunks + 1)
+            handle.seek(offsets_start)
+            offsets = np.frombuffer(handle.read(8 * (chunks + 1)), dtype="<i8")
+        total = int(offsets[-1])
+        if total and dim:
+            vectors = np.memmap(path, dtype=np.float16, mode="r", shape=(total, dim))
+        else:
+            vectors = np.zeros((0, dim), dtype=np.float16)
+        with self._lock:
+            self._open[key] = (version, offsets, vectors)
+            self._open.move_to_end(key)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return offsets, vectors
+
+    def chunk_vectors(self, key: str, chunk_index: int) -> Optional[np.ndarray]:
+        mapped = self._mapped(key)
+        if mapped is None:
+            return None
+        offsets, vectors = mapped
+        if not 0 <= chunk_index < len(offsets) - 1:
+            return None
+        return vectors[offsets[chunk_index]:offsets[chunk_index + 1]]
+
+
+def rescore(
+    query_vectors: np.ndarray,
+    results: List[Dict[str, Any]],
+    store: TokenVectorStore,
+    score_key: str = "late_interaction_score",
+) -> List[Dict[str, Any]]:
+    """Order ``results`` (with ``file_hash`` and ``chunk_index``) by MaxSim.
+
+    Results without stored token vectors keep their order after the rescored ones.
+    """
+    candidates: List[np.ndarray] = []
+    for result in results:
+        tokens = None
+        if result.get("file_hash"):
+            tokens = store.chunk_vectors(result["file_hash"], result.get("chunk_index", 0))
+        candidates.append(tokens if tokens is not None else np.zeros((0, 0), dtype=np.float16))
+
+    scores = maxsim_scores(query_vectors, candidates)
+    rescored, remaining = [], []
+    for result, score in zip(results, scores.tolist()):
+        if np.isfinite(score):
+            rescored.append({**result, score_key: score})
+        else:
+            remaining.append(result)
+    rescored.sort(key=lambda result: result[score_key], reverse=True)
+    return rescored + remaining
+
+
+_encoder: Optional[ColbertEncoder] = None
+_store: Optional[TokenVectorStore] = None
+
+
+def get_colbert_encoder() -> ColbertEncoder:
+    global _encoder
+    if _encoder is None:
+        _encoder = ColbertEncoder()
+    return _encoder
+
+
+def get_token_vector_store() -> TokenVectorStore:
+    global _store
+    if _store is None:
+        _store = TokenVectorStore()
+    return _store
@@ -4,6 +4,9 @@ from typing import List, Optional, Dict, Any, AsyncGenerator
 from datetime import datetime
 import asyncio
 import os
+import time
+from app.models import SearchMode
+from app.services import telemetry
 from app.services.search_service import SearchService
 from app.services.ollama_embedding_service import OllamaEmbeddingService
 
@@ -74,13 +77,15 @@ class LLMService:
 
         try:
             async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload
-                )
+                with telemetry.stage("llm_request", mode="generate"):
+                    response = await client.post(
+                        f"{self.base_url}/api/generate",
+                        json=payload
+                    )
 
                 if response.status_code == 200:
                     result = response.json()
+                    telemetry.record_ollama_generation(result, self.model, mode="generate")
                     return result.get("response", "")
                 else:
                     raise Exception(f"LLM API error: {response.status_code}")
@@ -116,42 +121,52 @@ class LLMService:
 
         try:
             async with httpx.AsyncClient(timeout=self.timeout) as client:
+                request_start = time.perf_counter()
+                first_token_seen = False
                 async with client.stream(
                     "POST",
                     f"{self.base_url}/api/generate",
                     json=payload
                 ) as response:
+                    telemetry.observe_stage("llm_queue", time.perf_counter() - request_start, mode="stream")
                     async for line in response.aiter_lines():
                         if line:
                             try:
                                 data = json.loads(line)
+                                if data.get("response") and not first_token_seen:
+                                    first_token_seen = True
+                                    telemetry.record_time_to_first_token(time.perf_counter() - request_start, self.model)
                                 if "response" in data:
                                     yield data["response"]
                                 if data.get("done", False):
+                                    telemetry.record_ollama_generation(data, self.model, mode="stream")
                                     break
                             except json.JSONDecodeError:
                                 continue
         except Exception as e:
             yield f"Error: {str(e)}"
 
-    async def generate_rag_response(
+    async def retrieve_context(
         self,
         db,
         user,
         query: str,
         use_rag: bool = True,
         search_mode: str = "hybrid",
-        temperature: float = None,
-        max_tokens: int = None,
-        stream: bool = False
     ) -> Dict[str, Any]:
-        """Generate response with optional RAG context."""
+        """Run the RAG search and build the prompt context plus citation list."""
 
         retrieved_documents = []
         context = None
         search_results = None
 
         if use_rag:
+            if isinstance(search_mode, str):
+                try:
+                    search_mode = SearchMode(search_mode.upper())
+                except ValueError:
+                    search_mode = SearchMode.HYBRID
+
             # Perform document search
             search_results = await self.search_service.search(
                 db=db,
@@ -179,30 +194,115 @@ class LLMService:
 
                 context = "\n\n".join(context_parts)
 
-        # Generate response
-        start_time = datetime.utcnow()
+        return {
+            "context": context,
+            "retrieved_documents": retrieved_documents,
+            "search_results": search_results,
+        }
+
+    async def generate_rag_response(
+        self,
+        db,
+        user,
+        query: str,
+        use_rag: bool = True,
+        search_mode: str = "hybrid",
+        temperature: float = None,
+        max_tokens: int = None,
+        stream: bool = False
+    ) -> Dict[str, Any]:
+        """Generate response with optional RAG context."""
 
         if stream:
-            # For streaming, we'll collect the response
-            response_parts = []
-            async for chunk in self.generate_response_stream(
-                prompt=query,
-                context=context,
+            # Drain the streaming generator; callers that want tokens as they
+            # arrive should iterate stream_rag_response directly.
+            result: Dict[str, Any] = {}
+            async for event in self.stream_rag_response(
+                db=db,
+                user=user,
+                query=query,
+                use_rag=use_rag,
+                search_mode=search_mode,
                 temperature=temperature,
                 max_tokens=max_tokens
             ):
-                response_parts.append(chunk)
-                # You could yield chunks here for real streaming
-            response = "".join(response_parts)
-        else:
-            response = await self.generate_response(
-                prompt=query,
-                context=context,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
+                if event["type"] == "complete":
+                    result = event["payload"]
+            return result
+
+        retrieval = await self.retrieve_context(db, user, query, use_rag, search_mode)
+        context = retrieval["context"]
+
+        # Generate response
+        start_time = datetime.utcnow()
+        response = await self.generate_response(
+            prompt=query,
+            context=context,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        processing_time = (datetime.utcnow() - start_time).total_seconds()
+
+        return self._build_rag_result(query, context, response, use_rag, retrieval, processing_time)
+
+    async def stream_rag_response(
+        self,
+        db,
+        user,
+        query: str,
+        use_rag: bool = True,
+        search_mode: str = "hybrid",
+        temperature: float = None,
+        max_tokens: int = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Stream a RAG answer as events.
+
+        Yields a ``citations`` event as soon as retrieval finishes, one ``chunk``
+        event per token batch received from Ollama and a final ``complete``
+        event carrying the same payload as ``generate_rag_response``.
+        """
+
+        retrieval = await self.retrieve_context(db, user, query, use_rag, search_mode)
+        context = retrieval["context"]
+
+        yield {
+            "type": "citations",
+            "retrieved_documents": retrieval["retrieved_documents"],
+        }
+
+        start_time = datetime.utcnow()
+        first_token_time = None
+        response_parts = []
+        async for chunk in self.generate_response_stream(
+            prompt=query,
+            context=context,
+            temperature=temperature,
+            max_tokens=max_tokens
+        ):
+            if not chunk:
+                continue
+            if first_token_time is None:
+                first_token_time = (datetime.utcnow() - start_time).total_seconds()
+            response_parts.append(chunk)
+            yield {"type": "chunk", "chunk": chunk}
 
         processing_time = (datetime.utcnow() - start_time).total_seconds()
+        result = self._build_rag_result(
+            query, context, "".join(response_parts), use_rag, retrieval, processing_time
+        )
+        result["time_to_first_token"] = first_token_time
+        yield {"type": "complete", "payload": result}
+
+    def _build_rag_result(
+        self,
+        query: str,
+        context: Optional[str],
+        response: str,
+        use_rag: bool,
+        retrieval: Dict[str, Any],
+        processing_time: float
+    ) -> Dict[str, Any]:
+        """Assemble the response payload shared by blocking and streaming paths."""
 
         # Count tokens (approximate)
         prompt_tokens = self.embedding_service.count_tokens(
@@ -213,8 +313,8 @@ class LLMService:
         return {
             "response": response,
             "use_rag": use_rag,
-            "retrieved_documents": retrieved_documents,
-            "search_results": search_results,
+            "retrieved_documents": retrieval["retrieved_documents"],
+            "search_results": retrieval["search_results"],
             "tokens_used": prompt_tokens + response_tokens,
             "processing_time": processing_time,
             "model": self.model
@@ -0,0 +1,99 @@
+"""In-process throttling of failed login attempts per account and client IP."""
+
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+LOGIN_THROTTLE_WINDOW_SECONDS = float(os.getenv("LOGIN_THROTTLE_WINDOW_SECONDS", "900"))
+LOGIN_MAX_FAILURES_PER_ACCOUNT = int(os.getenv("LOGIN_MAX_FAILURES_PER_ACCOUNT", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+# Accounts and IPs tracked at once; beyond this the least recently failing are forgotten
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "10000"))
+
+
+class LoginThrottle:
+    """Sliding-window failure counter.
+
+    A throttled request is rejected before any bcrypt work is done, so
+    password guessing cannot be used to tie up the password executor.
+    Keys are kept in order of their last failure: expired ones are dropped
+    from the front and at most ``max_keys`` are tracked, so failures with
+    random emails or addresses cannot grow the table without bound.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = LOGIN_THROTTLE_WINDOW_SECONDS,
+        max_per_account: int = LOGIN_MAX_FAILURES_PER_ACCOUNT,
+        max_per_ip: int = LOGIN_MAX_FAILURES_PER_IP,
+        max_keys: int = LOGIN_THROTTLE_MAX_KEYS,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.max_per_account = max_per_account
+        self.max_per_ip = max_per_ip
+        self.max_keys = max_keys
+        # Only the newest failures decide whether a key is throttled
+        self._max_attempts = max(max_per_account, max_per_ip)
+        self._failures: "OrderedDict[str, Deque[float]]" = OrderedDict()
+
+    def retry_after(self, email: str, client_ip: Optional[str]) -> Optional[float]:
+        """Seconds until the caller may try again, or None if not throttled."""
+        now = time.monotonic()
+        waits = [
+            self._wait(self._account_key(email), self.max_per_account, now),
+            self._wait(self._ip_key(client_ip), self.max_per_ip, now),
+        ]
+        waits = [wait for wait in waits if wait]
+        return max(waits) if waits else None
+
+    def record_failure(self, email: str, client_ip: Optional[str]) -> None:
+        now = time.monotonic()
+        for key in (self._account_key(email), self._ip_key(client_ip)):
+            attempts = self._failures.pop(key, None)
+            if attempts is None:
+                attempts = deque(maxlen=self._max_attempts)
+            attempts.append(now)
+            self._failures[key] = attempts
+        self._prune(now)
+
+    def reset(self, email: str) -> None:
+        """Clear the account counter after a successful login."""
+        self._failures.pop(self._account_key(email), None)
+
+    def __len__(self) -> int:
+        return len(self._failures)
+
+    def _prune(self, now: float) -> None:
+        while self._failures:
+            attempts = next(iter(self._failures.values()))
+            if now - attempts[-1] < self.window_seconds and len(self._failures) <= self.max_keys:
+                break
+            self._failures.popitem(last=False)
+
+    def _wait(self, key: str, limit: int, now: float) -> Optional[float]:
+        attempts = self._failures.get(key)
+        if not attempts:
+            return None
+        while attempts and now - attempts[0] >= self.window_seconds:
+            attempts.popleft()
+        if not attempts:
+            self._failures.pop(key, None)
+            return None
+        if len(attempts) < limit:
+            return None
+        return self.window_seconds - (now - attempts[0])
+
+    @staticmethod
+    def _account_key(email: str) -> str:
+        return f"account:{(email or '').strip().lower()}"
+
+    @staticmethod
+    def _ip_key(client_ip: Optional[str]) -> str:
+        return f"ip:{client_ip or 'unknown'}"
+
+
+login_throttle = LoginThrottle()
@@ -8,22 +8,64 @@ async-native `OllamaClient`.
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import os
+import time
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Set, Tuple
 
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Document, DocumentChunk
+from app.models import ChatMessage, ChatSession, Document, DocumentChunk
 from app.ollama_client import OllamaClient
+from app.services import telemetry
+from app.services.chat_file_index import chat_file_index
+from app.services.conversation_store import (
+    CONVERSATION_SUMMARY_BATCH,
+    CONVERSATION_SUMMARY_MAX_CHARS,
+    ConversationState,
+    ConversationStore,
+    conversation_store as shared_conversation_store,
+)
 from app.vector_store import VectorStore
 MAX_MANUAL_DOCUMENT_CHARS = 2000
 MAX_SEARCH_SNIPPET_CHARS = 600
 HISTORY_MESSAGE_LIMIT = 5
+# Messages are folded into the rolling summary in batches, so up to a batch
+# more than the limit can be waiting in the window
+HISTORY_PROMPT_WINDOW = HISTORY_MESSAGE_LIMIT + CONVERSATION_SUMMARY_BATCH
+SUMMARY_LINE_CHARS = 200
+SUMMARY_SYSTEM_PROMPT = (
+    "Du fasst Unterhaltungen fuer einen KI-Assistenten zusammen. "
+    "Ergaenze die bisherige Zusammenfassung um die neuen Nachrichten. "
+    "Behalte Fakten, Entscheidungen, offene Fragen und genannte Dokumente, "
+    "lasse Hoeflichkeitsfloskeln weg und antworte in hoechstens fuenf Saetzen auf Deutsch."
+)
+# "chat" sends /api/chat requests with a stable prefix so Ollama can reuse its
+# KV cache across turns; "generate" keeps the single-prompt /api/generate path
+OLLAMA_TRANSPORT = os.getenv("OLLAMA_TRANSPORT", "chat")
+CHAT_SYSTEM_PROMPT = (
+    "Du bist ein hilfreicher KI-Assistent fuer die Pyramid Computer GmbH. "
+    "Der Benutzer gehoert zur Abteilung {department}. "
+    "Antworte auf Deutsch, ausser der Benutzer fordert explizit etwas anderes an. "
+    "Vermeide Spekulationen und verweise klar auf die verwendeten Quellen. "
+    "Dokumentausschnitte sind im Format [DOC_X] nummeriert. Nutze sie nur, wenn sie relevant sind, "
+    "zitiere sie in eckigen Klammern und beende die Antwort mit einer Quellenzeile, z. B. 'Quellen: [DOC_1] Titel'. "
+    "Wenn mehrere Quellen passen, kombiniere sie konsistent und fuehre alle auf. "
+    "Falls keine passenden Dokumente vorliegen, erlaeutere dies offen und antworte nur, wenn du dir sicher bist."
+)
+# OllamaClient.generate_response reports failures as text instead of raising
+OLLAMA_ERROR_PREFIXES = (
+    "Fehler bei der Antwortgenerierung",
+    "Die Anfrage hat zu lange gedauert",
+    "Es ist ein Fehler bei der Antwortgenerierung",
+)
 
 
 logger = logging.getLogger(__name__)
@@ -61,6 +103,7 @@ class MCPContext:
     department: str
     messages: List[MCPMessage] = field(default_factory=list)
     documents: List[Dict[str, Any]] = field(default_factory=list)
+    summary: str = ""
     temperature: float = 0.7
 
     def add_documents(self, docs: List[Dict[str, Any]], max_documents: int = 5, mark_recent: bool = False) -> None:
@@ -114,6 +157,73 @@ def _truncate_text(value: str, max_chars: int) -> str:
     return sanitized[:max_chars].rstrip() + "..."
 
 
+def _speaker(role: Optional[str]) -> str:
+    return "User" if role == "user" else "Assistant"
+
+
+def _extractive_summary(previous: str, messages: List[Dict[str, Any]]) -> str:
+    """Fallback summary: the previous one plus one shortened line per message, newest kept."""
+    lines = [previous] if previous else []
+    for message in messages:
+        content = _truncate_text(message.get("content") or "", SUMMARY_LINE_CHARS)
+        if content:
+            lines.append(f"{_speaker(message.get('role'))}: {content}")
+    summary = "\n".join(lines)
+    if len(summary) > CONVERSATION_SUMMARY_MAX_CHARS:
+        summary = "..." + summary[-CONVERSATION_SUMMARY_MAX_CHARS:].lstrip()
+    return summary
+
+
+def _build_chat_messages(
+    context: MCPContext,
+    message: str,
+    system_prompt: str,
+    pinned_sections: List[str],
+    retrieval_sections: List[str],
+    turn_notes: List[str],
+) -> List[Dict[str, str]]:
+    """Order the /api/chat prompt from most to least stable.
+
+    Ollama only re-processes the prompt after the longest prefix it still has
+    cached. The system prompt, pinned uploads and the rolling summary rarely
+    change, the history only grows until it is folded into the summary, and
+    everything specific to this turn (retrieved chunks, priority hints, the
+    question) goes into the final message.
+    """
+    system_parts = [system_prompt]
+    if pinned_sections:
+        system_parts.append("Angehaengte Dokumente:\n" + "\n\n".join(pinned_sections))
+    if context.summary:
+        system_parts.append("Zusammenfassung des bisherigen Gespraechs:\n" + context.summary)
+    chat_messages = [{"role": "system", "content": "\n\n".join(system_parts)}]
+
+    history = context.messages
+    if history and history[-1].role == "user" and history[-1].content == message:
+        history = history[:-1]
+    for msg in history[-(HISTORY_PROMPT_WINDOW - 1):]:
+        chat_messages.append({"role": "user" if msg.role == "user" else "assistant", "content": msg.content})
+
+    turn_parts = []
+    if retrieval_sections:
+        turn_parts.append("Kontext:\n" + "\n\n".join(retrieval_sections))
+    turn_parts.extend(turn_notes)
+    turn_parts.append(f"Frage: {message}")
+    chat_messages.append({"role": "user", "content": "\n\n".join(turn_parts)})
+    return chat_messages
+
+
+def _unseen_messages(state: ConversationState, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Messages of this request that the stored state does not contain yet."""
+    seen = set(state.message_ids)
+    pending = [message for message in messages if not (message.get("id") and str(message["id"]) in seen)]
+    # Clients without message ids may still replay the whole conversation;
+    # everything up to the last assistant reply is already in the state.
+    for index in range(len(pending) - 1, -1, -1):
+        if pending[index].get("role") == "assistant":
+            return pending[index + 1:]
+    return pending
+
+
 def _ensure_list_of_dicts(value: Any) -> List[Dict[str, Any]]:
     if not value:
         return []
@@ -124,13 +234,29 @@ def _ensure_list_of_dicts(value: Any) -> List[Dict[str, Any]]:
     return []
 
 
-class MCPTool:
-    """Base class for MCP tools."""
+@dataclass
+class ToolContext:
+    """Request-scoped resources handed to a tool invocation.
 
-    def __init__(self, db: Session):
-        self.db = db
+    Tools keep no per-request attributes, so one instance serves every
+    concurrent chat; the session, caller identity and clients live here.
+    """
 
-    async def execute(self, **kwargs: Any) -> Dict[str, Any]:  # pragma: no cover - interface
+    db: AsyncSession
+    user_id: Optional[str] = None
+    department: Optional[str] = None
+    ollama_client: Optional[OllamaClient] = None
+    vector_store: Optional[VectorStore] = None
+
+    def scope_department(self, requested: Optional[str]) -> Optional[str]:
+        """Enforce the caller's department ACL over tool-supplied arguments."""
+        return self.department or requested
+
+
+class MCPTool:
+    """Base class for stateless MCP tools."""
+
+    async def execute(self, ctx: ToolContext, **kwargs: Any) -> Dict[str, Any]:  # pragma: no cover - interface
         raise NotImplementedError
 
 
@@ -139,22 +265,26 @@ class DocumentSearchTool(MCPTool):
 
     async def execute(
         self,
+        ctx: ToolContext,
         query: str,
         department: Optional[str] = None,
         limit: int = 10,
         **_: Any,
     ) -> Dict[str, Any]:
-        documents = self.db.query(Document).filter(Document.is_active.is_(True))
+        department = ctx.scope_department(department)
+        stmt = select(Document)
 
         if department:
-            documents = documents.filter(Document.department == department)
+            stmt = stmt.where(Document.department == department)
 
         if query:
             like = f"%{query}%"
-            documents = documents.filter(
+            stmt = stmt.where(
                 or_(Document.filename.ilike(like), Document.title.ilike(like))
             )
 
+        result = await ctx.db.execute(stmt.limit(limit))
+
         results = [
             {
                 "id": str(doc.id),
@@ -164,7 +294,7 @@ class DocumentSearchTool(MCPTool):
                 "file_type": doc.file_type,
                 "created_at": doc.created_at.isoformat() if doc.created_at else None,
             }
-            for doc in documents.limit(limit).all()
+            for doc in result.scalars().all()
         ]
 
         return {"success": True, "documents": results}
@@ -173,22 +303,19 @@ class DocumentSearchTool(MCPTool):
 class VectorSearchTool(MCPTool):
     """Semantic search backed by the vector store."""
 
-    def __init__(self, db: Session, vector_store: VectorStore):
-        super().__init__(db)
-        self.vector_store = vector_store
-
     async def execute(
         self,
+        ctx: ToolContext,
         query: str,
         department: Optional[str] = None,
         limit: int = 5,
         **_: Any,
     ) -> Dict[str, Any]:
-        results = await self.vector_store.semantic_search(
+        results = await ctx.vector_store.semantic_search(
             query=query,
-            db=self.db,
+            db=ctx.db,
             limit=limit,
-            user_department=department,
+            user_department=ctx.scope_department(department),
         )
         return {
             "success": True,
@@ -201,22 +328,19 @@ class VectorSearchTool(MCPTool):
 class KeywordSearchTool(MCPTool):
     """Keyword search against chunk content."""
 
-    def __init__(self, db: Session, vector_store: VectorStore):
-        super().__init__(db)
-        self.vector_store = vector_store
-
     async def execute(
         self,
+        ctx: ToolContext,
         query: str,
         department: Optional[str] = None,
         limit: int = 10,
         **_: Any,
     ) -> Dict[str, Any]:
-        results = await self.vector_store.keyword_search(
+        results = await ctx.vector_store.keyword_search(
             query=query,
-            db=self.db,
+            db=ctx.db,
             limit=limit,
-            user_department=department,
+            user_department=ctx.scope_department(department),
         )
         return {
             "success": True,
@@ -229,12 +353,9 @@ class KeywordSearchTool(MCPTool):
 class HybridSearchTool(MCPTool):
     """Hybrid search that blends vector and keyword signals."""
 
-    def __init__(self, db: Session, vector_store: VectorStore):
-        super().__init__(db)
-        self.vector_store = vector_store
-
     async def execute(
         self,
+        ctx: ToolContext,
         query: str,
         department: Optional[str] = None,
         limit: int = 10,
@@ -242,11 +363,11 @@ class HybridSearchTool(MCPTool):
         keyword_weight: float = 0.3,
         **_: Any,
     ) -> Dict[str, Any]:
-        results = await self.vector_store.hybrid_search(
+        results = await ctx.vector_store.hybrid_search(
             query=query,
-            db=self.db,
+            db=ctx.db,
             limit=limit,
-            user_department=department,
+            user_department=ctx.scope_department(department),
             semantic_weight=semantic_weight,
             keyword_weight=keyword_weight,
         )
@@ -263,11 +384,13 @@ class RagDocResourceTool(MCPTool):
 
     async def execute(
         self,
+        ctx: ToolContext,
         document_id: str,
         chunk_id: Optional[str] = None,
         **_: Any,
     ) -> Dict[str, Any]:
-        document = self.db.query(Document).filter(Document.id == document_id).one_or_none()
+        result = await ctx.db.execute(select(Document).where(Document.id == document_id))
+        document = result.scalar_one_or_none()
         if not document:
             return {"success": False, "error": "Document not found"}
 
@@ -282,11 +405,10 @@ class RagDocResourceTool(MCPTool):
         }
 
         if chunk_id:
-            chunk = (
-                self.db.query(DocumentChunk)
-                .filter(DocumentChunk.id == chunk_id)
-                .one_or_none()
+            chunk_result = await ctx.db.execute(
+                select(DocumentChunk).where(DocumentChunk.id == chunk_id)
             )
+            chunk = chunk_result.scalar_one_or_none()
             if not chunk:
                 return {"success": False, "error": "Chunk not found"}
             payload["chunk"] = {
@@ -303,42 +425,50 @@ class PreparedChat:
 
     message: str
     context: MCPContext
+    ollama_client: OllamaClient
     system_prompt: str
     context_text: str
     citations: List[Dict[str, Any]]
     metadata: Dict[str, Any]
+    chat_messages: Optional[List[Dict[str, str]]] = None
+    llm_stats: Dict[str, Any] = field(default_factory=dict)
 
 
 class ChatTool(MCPTool):
     """Chat tool that orchestrates RAG searches and Ollama calls."""
 
-    def __init__(self, db: Session, ollama_client: OllamaClient, vector_store: VectorStore):
-        super().__init__(db)
-        self.ollama_client = ollama_client
-        self.vector_store = vector_store
-
     async def execute(
         self,
+        ctx: ToolContext,
         message: str,
         context: MCPContext,
         rag_enabled: bool = True,
         **_: Any,
     ) -> Dict[str, Any]:
-        prepared = await self.prepare_chat(message, context, rag_enabled=rag_enabled)
-        response_text = await self.ollama_client.generate_response(
-            query=prepared.message,
-            context=prepared.context_text,
-            system_prompt=prepared.system_prompt,
-            temperature=context.temperature,
-        )
+        prepared = await self.prepare_chat(ctx, message, context, rag_enabled=rag_enabled)
+        if prepared.chat_messages is not None:
+            response_text = await prepared.ollama_client.chat_completion(
+                prepared.chat_messages,
+                temperature=context.temperature,
+            )
+        else:
+            response_text = await prepared.ollama_client.generate_response(
+                query=prepared.message,
+                context=prepared.context_text,
+                system_prompt=prepared.system_prompt,
+                temperature=context.temperature,
+            )
         return self._finalize_response(prepared, response_text)
 
     async def prepare_chat(
         self,
+        ctx: ToolContext,
         message: str,
         context: MCPContext,
         rag_enabled: bool = True,
     ) -> PreparedChat:
+        started = time.perf_counter()
+        retrieval_seconds = 0.0
         alias_counter = 1
 
         def next_alias() -> str:
@@ -350,14 +480,13 @@ class ChatTool(MCPTool):
         citations: List[Dict[str, Any]] = []
         metadata: Dict[str, Any] = {
             "rag_enabled": rag_enabled,
-            "model": getattr(self.ollama_client, "model", None),
+            "model": getattr(ctx.ollama_client, "model", None),
             "context_messages": len(context.messages),
         }
 
+        # Upload order, not recency, so aliases and the pinned prompt block stay
+        # identical between turns; recent uploads are flagged per turn instead.
         manual_docs = list(context.documents)
-        recent_manual_docs = [doc for doc in manual_docs if doc.get("is_recent")]
-        other_manual_docs = [doc for doc in manual_docs if not doc.get("is_recent")]
-        manual_docs = recent_manual_docs + other_manual_docs
 
         metadata["manual_documents"] = [
             str(doc.get("id") or doc.get("document_id"))
@@ -366,21 +495,65 @@ class ChatTool(MCPTool):
         ]
         metadata["total_uploaded_documents"] = len(manual_docs)
 
+        # Chat uploads that are chunked and indexed contribute the passages
+        # relevant to this question instead of their first characters
+        chat_passages: List[Dict[str, Any]] = []
+        indexed_doc_ids: Set[str] = set()
+        chat_doc_ids = {
+            str(doc.get("document_id") or doc.get("id"))
+            for doc in manual_docs
+            if doc.get("scope", "CHAT") == "CHAT"
+        }
+        if chat_doc_ids:
+            chat_files_start = time.perf_counter()
+            try:
+                indexed_doc_ids = chat_doc_ids & await chat_file_index.file_ids(context.session_id, ctx.db)
+                if indexed_doc_ids:
+                    with telemetry.stage("chat_files"):
+                        # The index's own model (BGE-M3), not the legacy search embedder
+                        query_embedding = await asyncio.to_thread(
+                            chat_file_index.embed_query, context.session_id, message
+                        )
+                        if query_embedding is not None:
+                            chat_passages = chat_file_index.search(
+                                context.session_id, query_embedding, file_ids=indexed_doc_ids
+                            )
+            except Exception as exc:
+                logger.warning(f"Chat file index lookup failed for session {context.session_id}: {exc}")
+                chat_passages = []
+            retrieval_seconds += time.perf_counter() - chat_files_start
+        metadata["chat_file_passages"] = len(chat_passages)
+        # Indexed files are never pinned, so the pinned block and its aliases do not
+        # depend on which files match the question; one without a relevant passage
+        # contributes its leading text to this turn's section instead
+        passage_doc_ids = {passage["document_id"] for passage in chat_passages}
+        uploads = [
+            (position, doc, True)
+            for position, doc in enumerate(manual_docs)
+            if str(doc.get("document_id") or doc.get("id")) not in indexed_doc_ids
+        ] + [
+            (position, doc, False)
+            for position, doc in enumerate(manual_docs)
+            if str(doc.get("document_id") or doc.get("id")) in indexed_doc_ids - passage_doc_ids
+        ]
+
         context_sections: List[str] = []
+        pinned_sections: List[str] = []
+        retrieval_sections: List[str] = []
         search_results: List[Dict[str, Any]] = []
         context_documents_summary: List[Dict[str, Any]] = []
         priority_documents: List[Dict[str, Any]] = []
         priority_aliases: List[str] = []
 
         # First add uploaded documents so aliases remain stable
-        for idx, doc in enumerate(manual_docs):
+        for idx, doc, pinned in uploads:
             raw_content = doc.get("content") or doc.get("content_preview") or ""
             content = _sanitize_text(raw_content)
             if not content:
                 continue
+            document_id = str(doc.get("document_id") or doc.get("id") or uuid.uuid4())
 
             alias = next_alias()
-            document_id = str(doc.get("document_id") or doc.get("id") or uuid.uuid4())
             scope = doc.get("scope", "CHAT")
             source = "chat" if scope == "CHAT" else "knowledge_base"
             title = doc.get("title") or doc.get("filename") or f"Dokument {idx + 1}"
@@ -392,6 +565,10 @@ class ChatTool(MCPTool):
             context_sections.append(
                 f"[{alias}] {title} - Quelle: {source_label}{priority_label}\n{truncated_content}"
             )
+            if pinned:
+                pinned_sections.append(f"[{alias}] {title} - Quelle: {source_label}\n{truncated_content}")
+            else:
+                retrieval_sections.append(context_sections[-1])
 
             relevance = 2.5 if is_recent else 1.0
             citation_entry = {
@@ -418,18 +595,64 @@ class ChatTool(MCPTool):
             if is_recent:
                 priority_aliases.append(alias)
                 priority_documents.append(summary_entry)
+
+        recent_doc_ids = {
+            str(doc.get("document_id") or doc.get("id")) for doc in manual_docs if doc.get("is_recent")
+        }
+        for passage in chat_passages:
+            chunk = _sanitize_text(passage.get("chunk_content") or "")
+            if not chunk:
+                continue
+            alias = next_alias()
+            document_id = passage["document_id"]
+            title = passage.get("document_title") or "Dokument"
+            is_recent = document_id in recent_doc_ids
+            priority_label = " [PRIORITAET HOCH]" if is_recent else ""
+            section = (
+                f"[{alias}] {title} - Quelle: Chat-Upload{priority_label}\n"
+                f"{_truncate_text(chunk, MAX_SEARCH_SNIPPET_CHARS)}"
+            )
+            context_sections.append(section)
+            retrieval_sections.append(section)
+            citations.append({
+                "alias": alias,
+                "document_id": document_id,
+                "document_title": title,
+                "chunk_id": None,
+                "chunk_index": passage.get("chunk_index"),
+                "relevance_score": passage.get("similarity_score", 0.0),
+                "snippet": chunk[:200],
+                "scope": "CHAT",
+                "source": "chat",
+                "is_recent": is_recent,
+            })
+            summary_entry = {
+                "alias": alias,
+                "document_id": document_id,
+                "title": title,
+                "scope": "CHAT",
+                "source": "chat",
+                "is_recent": is_recent,
+            }
+            context_documents_summary.append(summary_entry)
+            if is_recent:
+                priority_aliases.append(alias)
+                priority_documents.append(summary_entry)
         if priority_documents:
             metadata["priority_documents"] = priority_documents
             metadata["priority_aliases"] = priority_aliases
             metadata["priority_document_count"] = len(priority_documents)
 
         if rag_enabled:
-            search_results = await self.vector_store.hybrid_search(
-                query=message,
-                db=self.db,
-                limit=5,
-                user_department=context.department,
-            )
+            retrieval_start = time.perf_counter()
+            with telemetry.stage("retrieval", mode="hybrid"):
+                search_results = await ctx.vector_store.hybrid_search(
+                    query=message,
+                    db=ctx.db,
+                    limit=5,
+                    user_department=ctx.scope_department(context.department),
+                )
+            retrieval_seconds += time.perf_counter() - retrieval_start
             metadata["search_results_found"] = len(search_results)
 
             for result in search_results:
@@ -445,9 +668,9 @@ class ChatTool(MCPTool):
                 source = result.get("source") or "knowledge_base"
                 snippet = _truncate_text(chunk, MAX_SEARCH_SNIPPET_CHARS)
 
-                context_sections.append(
-                    f"[{alias}] {title} - Quelle: Wissensdatenbank\n{snippet}"
-                )
+                section = f"[{alias}] {title} - Quelle: Wissensdatenbank\n{snippet}"
+                context_sections.append(section)
+                retrieval_sections.append(section)
 
                 relevance = (
                     result.get("hybrid_score")
@@ -478,7 +701,11 @@ class ChatTool(MCPTool):
         else:
             metadata["search_results_found"] = 0
 
-        history_slice = context.messages[-HISTORY_MESSAGE_LIMIT:]
+        if context.summary:
+            context_sections.append("Zusammenfassung des bisherigen Gespraechs:\n" + context.summary)
+        metadata["summary_chars"] = len(context.summary)
+
+        history_slice = context.messages[-HISTORY_PROMPT_WINDOW:]
         if history_slice:
             history_lines = []
             for msg in history_slice:
@@ -490,54 +717,58 @@ class ChatTool(MCPTool):
         metadata["search_results"] = search_results
         metadata["context_documents"] = context_documents_summary
         metadata["citation_aliases"] = [c.get("alias") for c in citations]
-        metadata["history_window"] = min(len(context.messages), HISTORY_MESSAGE_LIMIT)
-
-        has_multiple_docs = len(context_documents_summary) > 1
-        if context_documents_summary:
-            instruction_parts = [
-                "Dir stehen nummerierte Dokumentausschnitte im Format [DOC_X] zur Verfuegung.",
-                "Nutze sie nur, wenn sie relevant sind, und zitiere sie in eckigen Klammern.",
-                "Beende die Antwort mit einer Quellenzeile, z. B. 'Quellen: [DOC_1] Titel'.",
-            ]
-            if has_multiple_docs:
-                instruction_parts.append(
-                    "Wenn mehrere Quellen passen, kombiniere sie konsistent und fuehre alle auf."
-                )
-            if priority_aliases:
-                alias_list = ", ".join(priority_aliases)
-                instruction_parts.append(
-                    f"Bevorzuge die zuletzt hochgeladenen Dokumente {alias_list}, sofern sie zur Frage passen."
-                )
-            doc_instruction = " ".join(instruction_parts)
-        else:
-            doc_instruction = (
-                "Falls keine passenden RAG-Dokumente vorliegen, erlaeutere dies offen und antworte nur, wenn du dir sicher bist."
-            )
-
-        system_prompt = (
-            "Du bist ein hilfreicher KI-Assistent fuer die Pyramid Computer GmbH. "
-            f"Der Benutzer gehoert zur Abteilung {context.department}. "
-            "Antworte auf Deutsch, ausser der Benutzer fordert explizit etwas anderes an. "
-            "Vermeide Spekulationen und verweise klar auf die verwendeten Quellen. "
-            f"{doc_instruction}"
+        metadata["history_window"] = min(len(context.messages), HISTORY_PROMPT_WINDOW)
+
+        # Both transports share CHAT_SYSTEM_PROMPT, so the /api/chat prefix stays
+        # byte-identical across turns; the turn-specific hint is kept separate
+        priority_note = (
+            f"Bevorzuge die zuletzt hochgeladenen Dokumente {', '.join(priority_aliases)}, sofern sie zur Frage passen."
+            if priority_aliases
+            else None
         )
+        system_prompt = CHAT_SYSTEM_PROMPT.format(department=context.department)
 
         context_text = "\n\n".join(context_sections)
+        chat_messages = None
+        if OLLAMA_TRANSPORT == "chat":
+            turn_notes = [priority_note] if priority_note else []
+            chat_messages = _build_chat_messages(
+                context, message, system_prompt, pinned_sections, retrieval_sections, turn_notes
+            )
+        elif priority_note:
+            system_prompt = f"{system_prompt} {priority_note}"
+        metadata["llm_transport"] = OLLAMA_TRANSPORT
+        # Prompt assembly only; retrieval is reported as its own stage
+        telemetry.observe_stage("context_build", time.perf_counter() - started - retrieval_seconds)
 
         return PreparedChat(
             message=message,
             context=context,
+            ollama_client=ctx.ollama_client,
             system_prompt=system_prompt,
             context_text=context_text,
             citations=citations,
             metadata=metadata,
+            chat_messages=chat_messages,
         )
+
     async def stream_chunks(self, prepared: PreparedChat) -> AsyncGenerator[str, None]:
-        async for chunk in self.ollama_client.generate_stream(
+        if prepared.chat_messages is not None:
+            async for chunk in prepared.ollama_client.chat_stream(
+                prepared.chat_messages,
+                temperature=prepared.context.temperature,
+                stats=prepared.llm_stats,
+            ):
+                if chunk:
+                    yield chunk
+            return
+
+        async for chunk in prepared.ollama_client.generate_stream(
             query=prepared.message,
             context=prepared.context_text,
             system_prompt=prepared.system_prompt,
             temperature=prepared.context.temperature,
+            stats=prepared.llm_stats,
         ):
             if chunk:
                 yield chunk
@@ -554,62 +785,269 @@ class ChatTool(MCPTool):
         }
         payload.update(prepared.metadata)
         payload["context_tokens"] = self._estimate_tokens(prepared.context)
+        if prepared.llm_stats:
+            payload["llm_stats"] = prepared.llm_stats
         payload["documents"] = prepared.citations
         return payload
 
     @staticmethod
     def _estimate_tokens(context: MCPContext) -> int:
-        total_chars = sum(len(msg.content) for msg in context.messages)
+        total_chars = len(context.summary) + sum(len(msg.content) for msg in context.messages)
         return max(total_chars // 4, 1)
 
 
+TOOL_REGISTRY: Dict[ToolType, MCPTool] = {
+    ToolType.DOCUMENT_SEARCH: DocumentSearchTool(),
+    ToolType.VECTOR_SEARCH: VectorSearchTool(),
+    ToolType.KEYWORD_SEARCH: KeywordSearchTool(),
+    ToolType.HYBRID_SEARCH: HybridSearchTool(),
+    ToolType.RAG_DOC_RESOURCE: RagDocResourceTool(),
+    ToolType.CHAT: ChatTool(),
+}
+
+
 class MCPGateway:
-    """Facade that coordinates tools and chat sessions."""
+    """Facade that coordinates tools and chat sessions for one request."""
 
     def __init__(
         self,
-        db_session: Session,
+        db_session: AsyncSession,
         ollama_client: Optional[OllamaClient] = None,
         vector_store: Optional[VectorStore] = None,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        conversation_store: Optional[ConversationStore] = None,
     ) -> None:
         self.db = db_session
         self.ollama_client = ollama_client or OllamaClient()
         self.vector_store = vector_store or VectorStore()
-        self.tools: Dict[ToolType, MCPTool] = {
-            ToolType.DOCUMENT_SEARCH: DocumentSearchTool(self.db),
-            ToolType.VECTOR_SEARCH: VectorSearchTool(self.db, self.vector_store),
-            ToolType.KEYWORD_SEARCH: KeywordSearchTool(self.db, self.vector_store),
-            ToolType.HYBRID_SEARCH: HybridSearchTool(self.db, self.vector_store),
-            ToolType.RAG_DOC_RESOURCE: RagDocResourceTool(self.db),
-            ToolType.CHAT: ChatTool(self.db, self.ollama_client, self.vector_store),
+        # Used to give parallel tool calls their own session; an AsyncSession
+        # cannot run overlapping statements.
+        self.session_factory = session_factory
+        self.conversation_store = conversation_store or shared_conversation_store
+        self.tools = TOOL_REGISTRY
+
+    def _tool_context(self, context: MCPContext, db: Optional[AsyncSession] = None) -> ToolContext:
+        return ToolContext(
+            db=db if db is not None else self.db,
+            user_id=context.user_id,
+            department=context.department,
+            ollama_client=self.ollama_client,
+            vector_store=self.vector_store,
+        )
+
+    async def _handle_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        context: MCPContext,
+    ) -> Dict[str, Any]:
+        """Execute the tool calls of one turn, concurrently when sessions allow."""
+        if len(tool_calls) > 1 and self.session_factory is not None:
+            results = await asyncio.gather(
+                *(self._run_tool_call(call, context, own_session=True) for call in tool_calls)
+            )
+        else:
+            results = [await self._run_tool_call(call, context) for call in tool_calls]
+
+        return {
+            "success": all(entry["result"].get("success", False) for entry in results),
+            "type": "tool",
+            "content": "",
+            "citations": [],
+            "metadata": {"tool_results": results},
         }
 
-    def update_session(self, db_session: Session) -> None:
-        self.db = db_session
-        for tool in self.tools.values():
-            tool.db = db_session
+    async def _run_tool_call(
+        self,
+        call: Dict[str, Any],
+        context: MCPContext,
+        own_session: bool = False,
+    ) -> Dict[str, Any]:
+        function = call.get("function") or call
+        name = function.get("name")
+        arguments = function.get("arguments") or {}
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                arguments = {}
+
+        entry: Dict[str, Any] = {"tool_call_id": call.get("id"), "name": name}
+        try:
+            tool = self.tools[ToolType(name)]
+        except (KeyError, ValueError):
+            entry["result"] = {"success": False, "error": f"Unknown tool: {name}"}
+            return entry
+
+        if isinstance(tool, ChatTool):
+            arguments = {**arguments, "context": context}
+
+        try:
+            if own_session:
+                async with self.session_factory() as db:
+                    entry["result"] = await tool.execute(self._tool_context(context, db), **arguments)
+            else:
+                entry["result"] = await tool.execute(self._tool_context(context), **arguments)
+        except Exception as exc:
+            logger.exception("Tool call %s failed", name)
+            entry["result"] = {"success": False, "error": str(exc)}
+        return entry
 
-    def _build_context(
+    async def _load_context(
         self,
         session_id: str,
         user_id: str,
         department: str,
         messages: List[Dict[str, Any]],
         uploaded_documents: Optional[List[Dict[str, Any]]] = None,
-    ) -> MCPContext:
-        """Construct a transient MCPContext from provided conversation state."""
-        context = MCPContext(session_id=session_id, user_id=user_id, department=department)
+    ) -> Tuple[MCPContext, ConversationState]:
+        """Restore the session's stored state and apply only the messages it has not seen."""
+        state = await self.conversation_store.get(session_id, user_id)
+        if state is None:
+            state = ConversationState(session_id=session_id, user_id=str(user_id))
+            new_messages = list(messages)
+            if not any(message.get("role") == "assistant" for message in messages):
+                state.messages = await self._history_from_database(session_id, user_id, messages)
+        else:
+            new_messages = _unseen_messages(state, messages)
+
+        context = MCPContext(
+            session_id=session_id,
+            user_id=user_id,
+            department=department,
+            documents=[{**doc, "is_recent": False} for doc in state.documents],
+            # Until the background summariser has folded them in, messages that
+            # left the window are carried as shortened lines
+            summary=(
+                _extractive_summary(state.summary, state.pending_summary)
+                if state.pending_summary
+                else state.summary
+            ),
+        )
+        for stored in state.messages:
+            self._add_message(context, stored)
+
         base_documents = _ensure_list_of_dicts(uploaded_documents)
         if base_documents:
             self._ingest_documents(context, base_documents)
-        last_index = len(messages) - 1
-        for index, message in enumerate(messages):
+        last_index = len(new_messages) - 1
+        for index, message in enumerate(new_messages):
             docs = _ensure_list_of_dicts(message.get("uploaded_documents"))
             if docs:
                 mark_recent = index == last_index and message.get("role", "user") == "user"
                 self._ingest_documents(context, docs, mark_recent=mark_recent)
             self._add_message(context, message)
-        return context
+        state.remember_ids([str(message.get("id") or uuid.uuid4()) for message in new_messages])
+        return context, state
+
+    async def _history_from_database(
+        self,
+        session_id: str,
+        user_id: str,
+        pending: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """Recover the recent window from chat_messages when no state is stored (expired, restart)."""
+        try:
+            session_uuid = uuid.UUID(str(session_id))
+            owner_uuid = uuid.UUID(str(user_id))
+        except ValueError:
+            return []
+        try:
+            result = await self.db.execute(
+                select(ChatMessage.role, ChatMessage.content)
+                .join(ChatSession, ChatSession.id == ChatMessage.session_id)
+                .where(ChatMessage.session_id == session_uuid, ChatSession.user_id == owner_uuid)
+                .order_by(ChatMessage.created_at.desc())
+                .limit(HISTORY_MESSAGE_LIMIT + len(pending))
+            )
+            rows = result.all()
+        except Exception as exc:
+            logger.warning(f"Could not restore history for session {session_id}: {exc}")
+            return []
+
+        history = [{"role": role, "content": content} for role, content in reversed(rows)]
+        # /mcp/stream stores the new user message before the gateway runs
+        for message in reversed(pending):
+            if not history:
+                break
+            last = history[-1]
+            if last["role"] != message.get("role", "user") or last["content"] != message.get("content", ""):
+                break
+            history.pop()
+        return history[-HISTORY_MESSAGE_LIMIT:]
+
+    async def _persist_state(self, context: MCPContext, state: ConversationState) -> None:
+        """Store the turn and queue messages that left the history window for the summary.
+
+        The summary is an LLM call, so it runs as a background task after the
+        turn has been stored instead of delaying the response.
+        """
+        state.messages = [{"role": msg.role, "content": msg.content} for msg in context.messages]
+        # Only the prompt-sized prefix is ever used; one extra character keeps
+        # the truncation marker when the document is rebuilt from the state.
+        state.documents = [
+            {**doc, "content": doc.get("content", "")[: MAX_MANUAL_DOCUMENT_CHARS + 1], "is_recent": False}
+            for doc in context.documents
+        ]
+        state.take_overflow(HISTORY_MESSAGE_LIMIT)
+        try:
+            await self.conversation_store.save(state)
+        except Exception:
+            logger.exception("Could not store conversation state for session %s", state.session_id)
+            return
+        if state.pending_summary:
+            self._schedule_summary(state.session_id, state.user_id)
+
+    def _schedule_summary(self, session_id: str, user_id: str) -> None:
+        key = (str(user_id), session_id)
+        running = _summary_tasks.get(key)
+        if running is not None and not running.done():
+            # The running task re-reads the state and picks up the new messages
+            return
+        task = asyncio.create_task(self._summarize_pending(session_id, str(user_id)))
+        _summary_tasks[key] = task
+        task.add_done_callback(lambda done: _summary_tasks.pop(key, None) if _summary_tasks.get(key) is done else None)
+
+    async def _summarize_pending(self, session_id: str, user_id: str) -> None:
+        """Fold ``pending_summary`` into the summary until nothing is pending."""
+        try:
+            while True:
+                state = await self.conversation_store.get(session_id, user_id)
+                if state is None or not state.pending_summary:
+                    return
+                batch, previous = list(state.pending_summary), state.summary
+                summary = await self._update_summary(previous, batch)
+
+                # A turn may have been stored meanwhile; apply only on top of what was summarised
+                current = await self.conversation_store.get(session_id, user_id)
+                if current is None or current.summary != previous or current.pending_summary[: len(batch)] != batch:
+                    return
+                current.summary = summary
+                current.pending_summary = current.pending_summary[len(batch):]
+                await self.conversation_store.save(current)
+        except Exception:
+            logger.exception("Background conversation summary failed for session %s", session_id)
+
+    async def _update_summary(self, previous: str, messages: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(
+            f"{_speaker(message.get('role'))}: {message.get('content', '')}" for message in messages
+        )
+        prior = f"Bisherige Zusammenfassung:\n{previous}\n\n" if previous else ""
+        summary = ""
+        try:
+            with telemetry.stage("summary"):
+                summary = await self.ollama_client.generate_response(
+                    query="Aktualisiere die Zusammenfassung des Gespraechs.",
+                    context=f"{prior}Neue Nachrichten:\n{transcript}",
+                    system_prompt=SUMMARY_SYSTEM_PROMPT,
+                    temperature=0.2,
+                    max_tokens=400,
+                )
+        except Exception as exc:
+            logger.warning(f"Conversation summary failed: {exc}")
+        summary = _sanitize_text(summary or "")
+        if not summary or summary.startswith(OLLAMA_ERROR_PREFIXES):
+            return _extractive_summary(previous, messages)
+        return _truncate_text(summary, CONVERSATION_SUMMARY_MAX_CHARS)
 
     @staticmethod
     def _find_last_user_index(messages: List[Dict[str, Any]]) -> Optional[int]:
@@ -668,7 +1106,7 @@ class MCPGateway:
 
         relevant_messages = messages[: last_user_index + 1]
         base_documents = (context_payload or {}).get("uploaded_documents")
-        context = self._build_context(
+        context, state = await self._load_context(
             session_id=session_id,
             user_id=user_id,
             department=department,
@@ -690,10 +1128,12 @@ class MCPGateway:
         chat_tool = self.tools[ToolType.CHAT]
         assert isinstance(chat_tool, ChatTool)
         chat_result = await chat_tool.execute(
+            self._tool_context(context),
             message=last_message_dict.get("content", ""),
             context=context,
             rag_enabled=rag_enabled,
         )
+        await self._persist_state(context, state)
 
         return {
             "success": chat_result.get("success", False),
@@ -726,7 +1166,7 @@ class MCPGateway:
 
         relevant_messages = messages[: last_user_index + 1]
         base_documents = (context_payload or {}).get("uploaded_documents")
-        context = self._build_context(
+        context, state = await self._load_context(
             session_id=session_id,
             user_id=user_id,
             department=department,
@@ -744,6 +1184,7 @@ class MCPGateway:
         chat_tool = self.tools[ToolType.CHAT]
         assert isinstance(chat_tool, ChatTool)
         prepared = await chat_tool.prepare_chat(
+            self._tool_context(context),
             last_message_dict.get("content", ""),
             context,
             rag_enabled=rag_enabled,
@@ -761,6 +1202,9 @@ class MCPGateway:
 
         final_response = "".join(response_buffer)
         completion = chat_tool.finalize_stream(prepared, final_response)
+        # Stored before the final event so a client that disconnects right
+        # after "done" still leaves a consistent state behind
+        await self._persist_state(context, state)
         yield {
             "type": "complete",
             "payload": {
@@ -833,27 +1277,62 @@ class MCPGateway:
             },
         }
 
-    def clear_context(self, session_id: str) -> None:
-        """Stateless gateway retains no server-side session context."""
-        return None
-
-    def get_context_summary(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Stateless gateway does not maintain in-memory context summaries."""
-        return None
-
-
-_mcp_gateway_instance: Optional[MCPGateway] = None
+    async def clear_context(self, session_id: str, user_id: str) -> None:
+        """Forget ``user_id``'s stored conversation state of ``session_id``."""
+        await self.conversation_store.delete(session_id, user_id)
 
-
-def get_mcp_gateway(db: Session = None) -> Optional[MCPGateway]:
-    global _mcp_gateway_instance
-    if _mcp_gateway_instance is None and db is not None:
-        _mcp_gateway_instance = MCPGateway(db)
-    return _mcp_gateway_instance
+    async def get_context_summary(self, session_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        state = await self.conversation_store.get(session_id, user_id)
+        if state is None:
+            return None
+        return {
+            "session_id": state.session_id,
+            "summary": state.summary,
+            "summarized_messages": state.summarized_messages,
+            "pending_summary_messages": len(state.pending_summary),
+            "recent_messages": len(state.messages),
+            "message_ids": len(state.message_ids),
+            "documents": [
+                {"id": doc.get("id"), "title": doc.get("title"), "scope": doc.get("scope")}
+                for doc in state.documents
+            ],
+            "updated_at": datetime.utcfromtimestamp(state.updated_at).isoformat(),
+        }
 
 
-async def initialize_mcp_gateway(db: Session) -> MCPGateway:
-    global _mcp_gateway_instance
-    _mcp_gateway_instance = MCPGateway(db)
-    logger.info("MCP gateway initialised")
-    return _mcp_gateway_instance
+_shared_ollama_client: Optional[OllamaClient] = None
+_shared_vector_store: Optional[VectorStore] = None
+# One background summary per (user, session) at a time
+_summary_tasks: Dict[Tuple[str, str], "asyncio.Task[None]"] = {}
+
+
+async def wait_for_summaries() -> None:
+    """Wait for the background conversation summaries scheduled so far (tests, shutdown)."""
+    tasks = [task for task in _summary_tasks.values() if not task.done()]
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_mcp_gateway(db: AsyncSession) -> MCPGateway:
+    """Return a gateway bound to the caller's request-scoped session.
+
+    Tools are stateless singletons and receive a ``ToolContext`` per call, so
+    every request gets its own cheap gateway instead of swapping the session
+    on a shared instance. The Ollama HTTP client and the vector store are
+    created once and shared across requests.
+    """
+    from app.database import AsyncSessionLocal
+
+    global _shared_ollama_client, _shared_vector_store
+    if _shared_ollama_client is None:
+        _shared_ollama_client = OllamaClient()
+        logger.info("MCP gateway resources initialised")
+    if _shared_vector_store is None:
+        _shared_vector_store = VectorStore()
+    return MCPGateway(
+        db,
+        ollama_client=_shared_ollama_client,
+        vector_store=_shared_vector_store,
+        session_factory=AsyncSessionLocal,
+        conversation_store=shared_conversation_store,
+    )
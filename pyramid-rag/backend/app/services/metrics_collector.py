@@ -0,0 +1,210 @@
+"""Background collector for system metrics.
+
+Scrapes of ``/metrics`` and the admin system endpoints used to run a dozen
+``COUNT(*)`` queries and a blocking ``psutil.cpu_percent(interval=1)`` per
+request. The collector refreshes those aggregates on an interval instead and
+keeps the rendered Prometheus text in memory, so a scrape is a dict lookup.
+
+Table sizes come from ``pg_class.reltuples`` (maintained by autovacuum and
+ANALYZE). The filtered counts that have no estimate, and the exact count for
+a table that has never been analysed, scan whole tables; they are refreshed
+on the much longer ``METRICS_AGGREGATE_REFRESH_SECONDS`` interval and served
+from cache in between.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+METRICS_REFRESH_SECONDS = float(os.getenv("METRICS_REFRESH_SECONDS", "30"))
+METRICS_AGGREGATE_REFRESH_SECONDS = float(os.getenv("METRICS_AGGREGATE_REFRESH_SECONDS", "900"))
+
+ESTIMATED_TABLES = {
+    "documents": "pyramid_documents_total",
+    "document_chunks": "pyramid_chunks_total",
+    "users": "pyramid_users_total",
+    "chat_sessions": "pyramid_chat_sessions_total",
+    "chat_messages": "pyramid_chat_messages_total",
+}
+
+AGGREGATE_QUERIES = {
+    "pyramid_documents_processed": "SELECT count(*) FROM documents WHERE processed = true",
+    "pyramid_documents_failed": "SELECT count(*) FROM documents WHERE processing_error IS NOT NULL",
+    "pyramid_users_active": "SELECT count(*) FROM users WHERE is_active = true",
+    "pyramid_users_admin": "SELECT count(*) FROM users WHERE is_superuser = true",
+    "pyramid_chunks_with_embeddings": "SELECT count(*) FROM document_chunks WHERE embedding IS NOT NULL",
+}
+
+
+def _sample_host() -> Dict[str, float]:
+    import psutil
+
+    memory = psutil.virtual_memory()
+    disk = psutil.disk_usage("/")
+    return {
+        # interval=None reports usage since the previous call without sleeping
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "memory_total_bytes": memory.total,
+        "memory_used_bytes": memory.used,
+        "memory_percent": memory.percent,
+        "disk_total_bytes": disk.total,
+        "disk_used_bytes": disk.used,
+        "disk_percent": disk.percent,
+    }
+
+
+class MetricsCollector:
+    """Periodically refreshes database and host metrics into memory."""
+
+    def __init__(
+        self,
+        session_factory=None,
+        interval: float = METRICS_REFRESH_SECONDS,
+        aggregate_interval: float = METRICS_AGGREGATE_REFRESH_SECONDS,
+    ) -> None:
+        self._session_factory = session_factory
+        self.interval = interval
+        self.aggregate_interval = aggregate_interval
+        # Full-scan counts, kept between their (slower) refreshes
+        self._aggregates: Dict[str, float] = {}
+        self._aggregates_at: Optional[float] = None
+        self.values: Dict[str, float] = {}
+        self.database: Dict[str, Any] = {}
+        self.host: Dict[str, float] = {}
+        self.prometheus_text = ""
+        self.collected_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def ensure_collected(self) -> None:
+        """Collect once if nothing has been gathered yet (e.g. first scrape)."""
+        if self.collected_at is None:
+            await self.refresh()
+
+    async def refresh(self) -> None:
+        async with self._refresh_lock:
+            started = time.perf_counter()
+            values: Dict[str, float] = {}
+            database: Dict[str, Any] = {}
+            try:
+                values.update(await self._collect_database(database))
+            except Exception as exc:
+                logger.warning(f"Database metrics collection failed: {exc}")
+                database["error"] = str(exc)
+
+            try:
+                host = await asyncio.to_thread(_sample_host)
+            except Exception as exc:
+                logger.warning(f"Host metrics collection failed: {exc}")
+                host = {}
+            for key in ("cpu_percent", "memory_percent", "disk_percent"):
+                if key in host:
+                    values[f"pyramid_system_{key}"] = host[key]
+
+            values["pyramid_metrics_collection_seconds"] = round(time.perf_counter() - started, 4)
+            self.values = values
+            self.database = database
+            self.host = host
+            self.prometheus_text = self.render(values)
+            self.collected_at = datetime.utcnow()
+
+    async def _collect_database(self, database: Dict[str, Any]) -> Dict[str, float]:
+        values: Dict[str, float] = {}
+        async with self.session_factory() as db:
+            size = await db.execute(text("SELECT pg_database_size(current_database())"))
+            values["pyramid_database_size_bytes"] = size.scalar() or 0
+
+            connections = await db.execute(
+                text("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+            )
+            values["pyramid_database_connections"] = connections.scalar() or 0
+
+            estimates = await db.execute(
+                text("SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r' AND relname = ANY(:names)"),
+                {"names": list(ESTIMATED_TABLES)},
+            )
+            refresh_aggregates = (
+                self._aggregates_at is None or time.monotonic() - self._aggregates_at >= self.aggregate_interval
+            )
+            aggregates = {} if refresh_aggregates else dict(self._aggregates)
+            for relname, reltuples in estimates.all():
+                metric = ESTIMATED_TABLES[relname]
+                if reltuples is None or reltuples < 0:
+                    # Never analysed (reltuples = -1): an exact count, cached like the aggregates
+                    if metric not in aggregates:
+                        exact = await db.execute(text(f"SELECT count(*) FROM {relname}"))
+                        aggregates[metric] = exact.scalar() or 0
+                    reltuples = aggregates[metric]
+                values[metric] = reltuples
+
+            if refresh_aggregates:
+                for metric, query in AGGREGATE_QUERIES.items():
+                    result = await db.execute(text(query))
+                    aggregates[metric] = result.scalar() or 0
+            for metric in AGGREGATE_QUERIES:
+                values[metric] = aggregates.get(metric, 0)
+            self._aggregates = aggregates
+            if refresh_aggregates:
+                self._aggregates_at = time.monotonic()
+
+            # Index range scans (ix_documents_created_at_id, ix_chat_sessions_updated_at),
+            # cheap enough for every refresh
+            now = datetime.utcnow()
+            recent = await db.execute(
+                text(
+                    "SELECT "
+                    "(SELECT count(*) FROM documents WHERE created_at >= :week_ago), "
+                    "(SELECT count(*) FROM chat_sessions WHERE updated_at >= :hour_ago)"
+                ),
+                {"week_ago": now - timedelta(days=7), "hour_ago": now - timedelta(hours=1)},
+            )
+            documents_this_week, active_chats = recent.one()
+            values["pyramid_documents_last_7d"] = documents_this_week or 0
+            values["pyramid_chat_sessions_active_1h"] = active_chats or 0
+
+            version = await db.execute(text("SELECT version()"))
+            database["version"] = version.scalar()
+        return values
+
+    @staticmethod
+    def render(values: Dict[str, float]) -> str:
+        lines: List[str] = [f"{name} {value}" for name, value in sorted(values.items())]
+        return "\n".join(lines) + "\n"
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.error(f"Metrics refresh failed: {exc}")
+            await asyncio.sleep(self.interval)
+
+
+metrics_collector = MetricsCollector()
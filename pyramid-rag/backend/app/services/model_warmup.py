@@ -0,0 +1,117 @@
+"""Background warm-up of ML models after startup.
+
+The API answers ``/health`` as soon as the routers are registered; the
+embedding models (BGE-M3 for documents, several seconds to load plus the
+first-inference kernel compilation, and the MiniLM model that chat and
+``VectorStore`` searches embed queries with) are loaded here on a worker
+thread instead of at import time. ``/ready`` reports the per-model state so load balancers and the
+frontend can wait for ``ready`` before sending searches.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+@dataclass
+class ModelState:
+    status: str = PENDING
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+    loaded_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "seconds": self.seconds,
+            "error": self.error,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+        }
+
+
+def _load_embedding_model() -> None:
+    from app.services.bge_m3_embedding_service import get_embedding_model
+
+    model = get_embedding_model()
+    # The first encode() allocates buffers and picks kernels; pay that here too
+    model.encode(["warm-up"], normalize_embeddings=True)
+
+
+def _load_search_embedding_model() -> None:
+    from app.embeddings_service import embeddings_service
+
+    embeddings_service.get_model().encode(["warm-up"], normalize_embeddings=True)
+
+
+class ModelWarmup:
+    """Loads registered models one after another on a background task."""
+
+    def __init__(self, loaders: Optional[Dict[str, Callable[[], None]]] = None, enabled: bool = MODEL_WARMUP_ENABLED) -> None:
+        self.loaders = loaders if loaders is not None else {
+            "embedding": _load_embedding_model,
+            "search_embedding": _load_search_embedding_model,
+        }
+        self.enabled = enabled
+        self.states: Dict[str, ModelState] = {
+            name: ModelState(status=PENDING if enabled else DISABLED) for name in self.loaders
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """True once every model has loaded; disabled warm-up counts as ready (models load on demand)."""
+        return all(state.status in (READY, DISABLED) for state in self.states.values())
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self) -> None:
+        for name, loader in self.loaders.items():
+            state = self.states[name]
+            if state.status == READY:
+                continue
+            state.status = LOADING
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(loader)
+            except Exception as exc:
+                state.status = FAILED
+                state.error = str(exc)
+                logger.error(f"Warm-up of {name} model failed: {exc}")
+            else:
+                state.status = READY
+                state.error = None
+                state.loaded_at = datetime.utcnow()
+                logger.info(f"✓ {name} model warmed up")
+            finally:
+                state.seconds = round(time.perf_counter() - started, 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: state.to_dict() for name, state in self.states.items()}
+
+
+model_warmup = ModelWarmup()
@@ -0,0 +1,122 @@
+"""ONNX Runtime int8 backend for the BGE-M3 embedding model.
+
+Our ingestion and API nodes are CPU-only. With ``EMBEDDING_BACKEND=onnx``,
+``get_embedding_model`` loads an exported, dynamically quantized (int8) ONNX
+version of the model through SentenceTransformer's ``backend="onnx"``
+instead of the fp32 PyTorch one. The model object is still a
+SentenceTransformer, so ``encode`` behaves the same for every caller. That
+includes ``output_value=None``, which the sparse and multi-vector heads use.
+
+``export_onnx_model.py export`` writes the model to ``ONNX_MODEL_DIR``, and
+``export_onnx_model.py validate`` checks cosine agreement with PyTorch.
+
+Thread settings are per node:
+
+* ``EMBEDDING_THREADS``: intra-op threads, for both backends. The default
+  is the physical core count, since hyper-threads do not speed up GEMMs.
+* ``EMBEDDING_INTER_OP_THREADS``: defaults to 1. BGE-M3 is one sequential
+  graph, and more inter-op threads only compete for the same cores.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", "data/models/bge-m3-onnx"))
+# sentence-transformers quantization presets: arm64, avx2, avx512, avx512_vnni
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx512_vnni")
+EMBEDDING_INTER_OP_THREADS = int(os.getenv("EMBEDDING_INTER_OP_THREADS", "1"))
+
+
+def embedding_threads() -> int:
+    configured = os.getenv("EMBEDDING_THREADS")
+    if configured:
+        return max(1, int(configured))
+    try:
+        import psutil
+
+        physical = psutil.cpu_count(logical=False)
+    except ImportError:
+        physical = None
+    return physical or os.cpu_count() or 1
+
+
+def quantized_file_name(quantization: str = ONNX_QUANTIZATION) -> str:
+    return f"onnx/model_qint8_{quantization}.onnx"
+
+
+def session_options(intra_op_threads: Optional[int] = None, inter_op_threads: int = EMBEDDING_INTER_OP_THREADS):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads or embedding_threads()
+    options.inter_op_num_threads = inter_op_threads
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def configure_torch_threads() -> None:
+    import torch
+
+    torch.set_num_threads(embedding_threads())
+    try:
+        torch.set_num_interop_threads(EMBEDDING_INTER_OP_THREADS)
+    except RuntimeError:
+        # Only allowed before the first parallel op; keep whatever is set
+        pass
+
+
+def load_onnx_model(
+    model_dir: Path = ONNX_MODEL_DIR,
+    file_name: Optional[str] = None,
+    intra_op_threads: Optional[int] = None,
+):
+    """The exported model as a SentenceTransformer on ONNX Runtime's CPU provider."""
+    file_name = file_name or quantized_file_name()
+    if not (Path(model_dir) / file_name).exists():
+        raise FileNotFoundError(
+            f"{Path(model_dir) / file_name} not found; run 'python export_onnx_model.py export' first"
+        )
+    from sentence_transformers import SentenceTransformer
+
+    options = session_options(intra_op_threads)
+    logger.info(
+        f"Loading ONNX embedding model {model_dir}/{file_name} "
+        f"({options.intra_op_num_threads} intra-op / {options.inter_op_num_threads} inter-op threads)"
+    )
+    return SentenceTransformer(
+        str(model_dir),
+        device="cpu",
+        backend="onnx",
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": options,
+        },
+    )
+
+
+def export_quantized_model(
+    model_name: str,
+    output_dir: Path = ONNX_MODEL_DIR,
+    quantization: str = ONNX_QUANTIZATION,
+) -> Path:
+    """Export ``model_name`` to ONNX and write its dynamically int8-quantized variant to ``output_dir``."""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # Loads the repository's ONNX graph, or exports one when it has none
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx", trust_remote_code=True)
+    model.save(str(output_dir))
+    export_dynamic_quantized_onnx_model(model, quantization, str(output_dir))
+    path = output_dir / quantized_file_name(quantization)
+    logger.info(f"Quantized ONNX model written to {path}")
+    return path
@@ -0,0 +1,170 @@
+"""Short-lived cache of authenticated user principals.
+
+Every authenticated request used to decode the JWT and then load the full
+``User`` row. The API only needs a handful of fields for ACL decisions, so
+those are cached per user id in-process and, when ``USER_CACHE_REDIS_URL`` is
+set, in Redis so workers share lookups. The short TTL bounds how long another
+worker's in-process copy can lag behind an invalidation.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from app.models import Department
+
+try:
+    import redis.asyncio as redis_asyncio
+    HAS_REDIS = True
+except ImportError:  # pragma: no cover - optional dependency
+    redis_asyncio = None
+    HAS_REDIS = False
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+REDIS_KEY_PREFIX = "pyramid:principal:"
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Read-only snapshot of the user fields the API needs per request.
+
+    Attribute names mirror ``User`` so endpoints and services that read
+    ``current_user.id`` or ``current_user.primary_department`` work unchanged.
+    """
+
+    id: uuid.UUID
+    email: str
+    username: str
+    full_name: Optional[str]
+    primary_department: Department
+    is_active: bool
+    is_superuser: bool
+    created_at: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: Any) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            full_name=user.full_name,
+            primary_department=user.primary_department,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+            created_at=user.created_at,
+            last_login=user.last_login,
+        )
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": str(self.id),
+            "email": self.email,
+            "username": self.username,
+            "full_name": self.full_name,
+            "primary_department": self.primary_department.value,
+            "is_active": self.is_active,
+            "is_superuser": self.is_superuser,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "last_login": self.last_login.isoformat() if self.last_login else None,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "UserPrincipal":
+        data = json.loads(raw)
+        return cls(
+            id=uuid.UUID(data["id"]),
+            email=data["email"],
+            username=data["username"],
+            full_name=data.get("full_name"),
+            primary_department=Department(data["primary_department"]),
+            is_active=data["is_active"],
+            is_superuser=data["is_superuser"],
+            created_at=datetime.fromisoformat(data["created_at"]) if data.get("created_at") else None,
+            last_login=datetime.fromisoformat(data["last_login"]) if data.get("last_login") else None,
+        )
+
+
+class PrincipalCache:
+    """TTL cache for ``UserPrincipal`` objects with an optional Redis tier."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = USER_CACHE_TTL_SECONDS,
+        max_entries: int = USER_CACHE_MAX_ENTRIES,
+        redis_url: Optional[str] = USER_CACHE_REDIS_URL,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, UserPrincipal]]" = OrderedDict()
+        self._redis = None
+        if redis_url and HAS_REDIS:
+            self._redis = redis_asyncio.from_url(redis_url, decode_responses=True)
+        elif redis_url:
+            logger.warning("USER_CACHE_REDIS_URL set but redis is not installed; using in-process cache only")
+
+    async def get(self, user_id: str) -> Optional[UserPrincipal]:
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, principal = entry
+            if expires_at > time.monotonic():
+                return principal
+            self._entries.pop(key, None)
+
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.get(REDIS_KEY_PREFIX + key)
+        except Exception as exc:
+            logger.warning(f"Principal cache Redis lookup failed: {exc}")
+            return None
+        if not raw:
+            return None
+        principal = UserPrincipal.from_json(raw)
+        self._store_local(key, principal)
+        return principal
+
+    async def set(self, principal: UserPrincipal) -> None:
+        key = str(principal.id)
+        self._store_local(key, principal)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.set(REDIS_KEY_PREFIX + key, principal.to_json(), ex=max(int(self.ttl_seconds), 1))
+        except Exception as exc:
+            logger.warning(f"Principal cache Redis write failed: {exc}")
+
+    async def invalidate(self, user_id: Any) -> None:
+        key = str(user_id)
+        self._entries.pop(key, None)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.delete(REDIS_KEY_PREFIX + key)
+        except Exception as exc:
+            logger.warning(f"Principal cache Redis invalidation failed: {exc}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _store_local(self, key: str, principal: UserPrincipal) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+principal_cache = PrincipalCache()
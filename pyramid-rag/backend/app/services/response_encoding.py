@@ -0,0 +1,189 @@
+"""Response encoding: orjson serialization, field projection and compression.
+
+Upload, document and (context) search responses carry document text. That
+is 8,000 characters per upload, the whole ``content`` of a duplicate or a
+document, and a ``full_context`` per context-search hit. Three things keep
+those cheap:
+
+* ``ORJSONResponse`` is the app-wide default response class. ``json_response``
+  also skips ``jsonable_encoder``, because orjson serializes datetimes, UUIDs,
+  enums and numpy values natively.
+* ``fields=`` selects parts of a response. ``fields=id,title`` keeps only
+  those keys, and ``fields=-content,-results.full_context`` drops keys.
+  Dotted paths reach into nested objects and apply to every element of a list.
+* ``CompressionMiddleware`` applies brotli (when the ``brotli`` package is
+  installed) or gzip to single-body responses of at least
+  ``COMPRESSION_MIN_SIZE`` bytes with a compressible content type. Streamed
+  responses, such as chat events and file downloads, pass through unchanged,
+  so their chunks are never held back.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Quality 4-5 is the usual dynamic-content trade-off; 11 is for static assets
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+FieldTree = Dict[str, "FieldTree"]
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+@dataclass
+class FieldSelection:
+    include: FieldTree = field(default_factory=dict)
+    exclude: FieldTree = field(default_factory=dict)
+
+    def apply(self, payload: Any) -> Any:
+        if self.include:
+            payload = _include(payload, self.include)
+        if self.exclude:
+            payload = _exclude(payload, self.exclude)
+        return payload
+
+
+def parse_fields(fields: Optional[str]) -> Optional[FieldSelection]:
+    """``"a,b.c,-d"`` as a selection; ``None`` for an absent or empty parameter."""
+    if not fields or not fields.strip():
+        return None
+    selection = FieldSelection()
+    for raw in fields.split(","):
+        path = raw.strip()
+        tree = selection.include
+        if path.startswith("-"):
+            path, tree = path[1:], selection.exclude
+        parts = path.split(".")
+        if not path or not all(part.strip() for part in parts):
+            raise InvalidFields(f"Invalid field path: {raw.strip()!r}")
+        for part in parts:
+            tree = tree.setdefault(part.strip(), {})
+    return selection
+
+
+def _include(value: Any, tree: FieldTree) -> Any:
+    if isinstance(value, list):
+        return [_include(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _include(value[key], subtree) if subtree else value[key] for key, subtree in tree.items() if key in value}
+    return value
+
+
+def _exclude(value: Any, tree: FieldTree) -> Any:
+    if isinstance(value, list):
+        return [_exclude(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: _exclude(item, tree[key]) if tree.get(key) else item
+            for key, item in value.items()
+            if key not in tree or tree[key]
+        }
+    return value
+
+
+def json_response(payload: Any, fields: Optional[FieldSelection] = None, status_code: int = 200) -> ORJSONResponse:
+    """``payload`` (a dict or pydantic model) projected by ``fields`` and serialized by orjson."""
+    if hasattr(payload, "model_dump"):
+        payload = payload.model_dump()
+    if fields is not None:
+        payload = fields.apply(payload)
+    return ORJSONResponse(content=payload, status_code=status_code)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """``br`` or ``gzip`` as accepted by the client (q-values honoured), else ``None``."""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    if HAS_BROTLI and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """Brotli/gzip for complete responses above a size threshold (pure ASGI, streaming-safe)."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,16 +1,36 @@
+import logging
+import os
+import time
 from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, text, and_, or_, func
+from sqlalchemy import select, text, and_, or_, func, case
 from sqlalchemy.dialects.postgresql import ARRAY
 import numpy as np
 
-from app.models import Document, DocumentChunk, SearchMode, DocumentScope
+from app.models import Document, DocumentChunk, DocumentChunkTerm, SearchMode, DocumentScope
 from app.services.bge_m3_embedding_service import BGEM3EmbeddingService  # ✅ Upgraded to BGE-M3
+from app.services.embedding_registry import ActiveModel, get_active_model, get_model_encoder
+from app.services.late_interaction import (
+    LATE_INTERACTION_CANDIDATES,
+    LATE_INTERACTION_ENABLED,
+    get_colbert_encoder,
+    get_token_vector_store,
+    rescore,
+)
+from app.services.sparse_encoder import get_sparse_encoder
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Keyword leg of hybrid search: "fulltext" (to_tsvector('german', ...)) or "sparse" (BGE-M3 term postings)
+KEYWORD_BACKEND = os.getenv("KEYWORD_BACKEND", "fulltext").lower()
 
 
 class SearchService:
     def __init__(self):
         self.embedding_service = BGEM3EmbeddingService()  # ✅ Now using BGE-M3 (1024 dimensions)
+        self.sparse_encoder = get_sparse_encoder()
+        self.colbert_encoder = get_colbert_encoder() if LATE_INTERACTION_ENABLED else None
 
     async def search(
         self,
@@ -26,18 +46,23 @@ class SearchService:
     ) -> Dict[str, Any]:
         """Perform search based on the specified mode."""
 
-        if mode == SearchMode.VECTOR:
-            results = await self.vector_search(
-                db, query, user, scope, department, limit, offset, min_score
-            )
-        elif mode == SearchMode.KEYWORD:
-            results = await self.keyword_search(
-                db, query, user, scope, department, limit, offset
-            )
-        else:  # HYBRID
-            results = await self.hybrid_search(
-                db, query, user, scope, department, limit, offset, min_score
-            )
+        with telemetry.search_mode(mode.value.lower()), telemetry.stage("search_total"):
+            if mode == SearchMode.VECTOR:
+                results = await self.vector_search(
+                    db, query, user, scope, department, limit, offset, min_score
+                )
+            elif mode == SearchMode.KEYWORD:
+                results = await self.keyword_search(
+                    db, query, user, scope, department, limit, offset
+                )
+            elif mode == SearchMode.SPARSE:
+                results = await self.sparse_search(
+                    db, query, user, scope, department, limit, offset
+                )
+            else:  # HYBRID
+                results = await self.hybrid_search(
+                    db, query, user, scope, department, limit, offset, min_score
+                )
 
         return {
             "query": query,
@@ -59,36 +84,54 @@ class SearchService:
         offset: int = 0,
         min_score: float = 0.5
     ) -> List[Dict[str, Any]]:
-        """Perform vector similarity search using embeddings."""
+        """Perform vector similarity search using embeddings.
+
+        With ``LATE_INTERACTION_ENABLED``, the top ``LATE_INTERACTION_CANDIDATES``
+        chunks are re-ranked by MaxSim over their BGE-M3 token vectors before
+        pagination.
+
+        Reads the registry's ACTIVE model (``document_chunk_vectors``) when
+        there is one, the legacy ``document_chunks.embedding`` column otherwise.
+        """
+
+        active_model = await get_active_model(db)
 
         # Generate query embedding
-        query_embedding = self.embedding_service.generate_query_embedding(query)
+        with telemetry.stage("embedding", mode="vector"):
+            query_embedding = self._query_embedding(query, active_model)
 
         # Build base query with access control
         base_query = await self._build_access_controlled_query(
             db, user, scope, department
         )
 
-        # Perform vector search using pgvector
-        # Using cosine similarity (1 - cosine_distance)
-        vector_query = text("""
+        # Perform vector search using pgvector. The HNSW index is only scanned for
+        # ORDER BY <indexed expression> <=> <query> ascending, so rows are ordered
+        # by distance and similarity (1 - cosine distance) is derived in the select list
+        if active_model is None:
+            distance, vector_join = "dc.embedding <=> :query_embedding::vector", ""
+        else:
+            distance, vector_join = active_model.distance_expression(), active_model.join_clause()
+        vector_query = text(f"""
             SELECT
                 dc.id,
                 dc.document_id,
                 dc.chunk_index,
                 dc.content,
-                1 - (dc.embedding <=> :query_embedding::vector) as similarity,
+                1 - ({distance}) as similarity,
                 d.title,
                 d.filename,
                 d.scope,
                 d.department,
-                d.created_at
+                d.created_at,
+                d.file_hash
             FROM document_chunks dc
+            {vector_join}
             JOIN documents d ON dc.document_id = d.id
             WHERE
-                1 - (dc.embedding <=> :query_embedding::vector) >= :min_score
+                ({distance}) <= 1 - :min_score
                 AND d.id IN :allowed_docs
-            ORDER BY similarity DESC
+            ORDER BY {distance}
             LIMIT :limit OFFSET :offset
         """)
 
@@ -97,18 +140,24 @@ class SearchService:
             db, user, scope, department
         )
 
-        result = await db.execute(
-            vector_query,
-            {
-                "query_embedding": query_embedding.tolist(),
-                "min_score": min_score,
-                "allowed_docs": allowed_docs,
-                "limit": limit,
-                "offset": offset
-            }
-        )
+        rerank = self.colbert_encoder is not None and self.colbert_encoder.available
+        # Re-ranking needs every candidate up to the requested page
+        fetch_limit = max(LATE_INTERACTION_CANDIDATES, offset + limit) if rerank else limit
+        fetch_offset = 0 if rerank else offset
 
-        rows = result.fetchall()
+        with telemetry.stage("ann", mode="vector"):
+            result = await db.execute(
+                vector_query,
+                {
+                    "query_embedding": query_embedding.tolist(),
+                    "min_score": min_score,
+                    "allowed_docs": allowed_docs,
+                    "limit": fetch_limit,
+                    "offset": fetch_offset
+                }
+            )
+
+            rows = result.fetchall()
 
         # Format results
         results = []
@@ -123,9 +172,41 @@ class SearchService:
                 "filename": row.filename,
                 "scope": row.scope,
                 "department": row.department,
-                "created_at": row.created_at.isoformat()
+                "created_at": row.created_at.isoformat(),
+                "file_hash": row.file_hash,
+                "embedding_model": active_model.name if active_model else self.embedding_service.model_name
             })
 
+        if rerank and results:
+            results = self._late_interaction_rescore(query, results)[offset:offset + limit]
+
+        return results
+
+    def _query_embedding(self, query: str, active_model: Optional[ActiveModel]) -> np.ndarray:
+        """Query vector from the same model as the index being read."""
+        if active_model is None or active_model.name == self.embedding_service.model_name:
+            return self.embedding_service.generate_query_embedding(query)
+        embedding = get_model_encoder(active_model.name).encode(
+            query, normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.asarray(embedding, dtype=np.float32)
+
+    def _late_interaction_rescore(self, query: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Order candidates by MaxSim; the stage's added latency is recorded per query."""
+
+        start = time.perf_counter()
+        with telemetry.stage("late_interaction", mode="vector"):
+            query_vectors = self.colbert_encoder.encode_query(query)
+            if query_vectors is not None:
+                results = rescore(query_vectors, results, get_token_vector_store())
+        added_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.debug(f"Late-interaction rescoring of {len(results)} candidates took {added_ms} ms")
+        for result in results:
+            if "late_interaction_score" in result:
+                # MaxSim replaces the single-vector cosine, which is kept for reference
+                result["dense_similarity_score"] = result["similarity_score"]
+                result["similarity_score"] = result["late_interaction_score"]
+            result["late_interaction_ms"] = added_ms
         return results
 
     async def keyword_search(
@@ -140,6 +221,45 @@ class SearchService:
     ) -> List[Dict[str, Any]]:
         """Perform full-text keyword search."""
 
+        stmt = await self._fulltext_statement(query, user, scope, department, limit, offset)
+
+        with telemetry.stage("fulltext", mode="keyword"):
+            result = await db.execute(stmt)
+            rows = result.all()
+
+        # Format results
+        results = []
+        for row in rows:
+            doc = row[0]
+            rank = row[1]
+
+            # Highlight matching text
+            highlighted = await self._highlight_matches(doc.content, query)
+
+            results.append({
+                "document_id": str(doc.id),
+                "title": doc.title,
+                "filename": doc.filename,
+                "content_preview": highlighted[:500],
+                "relevance_score": float(rank),
+                "scope": doc.scope,
+                "department": doc.department,
+                "created_at": doc.created_at.isoformat()
+            })
+
+        return results
+
+    async def _fulltext_statement(
+        self,
+        query: str,
+        user,
+        scope: Optional[DocumentScope] = None,
+        department: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ):
+        """Documents ranked by ts_rank of the German tsvector of their content."""
+
         # Prepare search query for PostgreSQL full-text search
         search_query = func.plainto_tsquery('german', query)
 
@@ -158,33 +278,85 @@ class SearchService:
         stmt = await self._apply_access_control(stmt, user, scope, department)
 
         # Order by relevance and apply pagination
-        stmt = stmt.order_by(text('rank DESC')).limit(limit).offset(offset)
+        return stmt.order_by(text('rank DESC')).limit(limit).offset(offset)
 
-        result = await db.execute(stmt)
-        rows = result.all()
+    async def sparse_search(
+        self,
+        db: AsyncSession,
+        query: str,
+        user,
+        scope: Optional[DocumentScope] = None,
+        department: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Rank chunks by the dot product of BGE-M3 sparse lexical weights.
 
-        # Format results
-        results = []
-        for row in rows:
-            doc = row[0]
-            rank = row[1]
+        Only the postings of the query's tokens are read and summed per chunk in
+        SQL. Without the sparse head this falls back to full-text search.
+        """
 
-            # Highlight matching text
-            highlighted = await self._highlight_matches(doc.content, query)
+        if not self.sparse_encoder.available:
+            logger.debug("Sparse encoder unavailable, using full-text keyword search")
+            return await self.keyword_search(db, query, user, scope, department, limit, offset)
+
+        with telemetry.stage("embedding", mode="sparse"):
+            query_terms = self.sparse_encoder.encode_query(query)
+        if not query_terms:
+            return []
+
+        stmt = await self._sparse_statement(query_terms, user, scope, department, limit, offset)
 
+        with telemetry.stage("sparse", mode="sparse"):
+            result = await db.execute(stmt)
+            rows = result.all()
+
+        results = []
+        for chunk, document, score in rows:
             results.append({
-                "document_id": str(doc.id),
-                "title": doc.title,
-                "filename": doc.filename,
-                "content_preview": highlighted[:500],
-                "relevance_score": float(rank),
-                "scope": doc.scope,
-                "department": doc.department,
-                "created_at": doc.created_at.isoformat()
+                "chunk_id": str(chunk.id),
+                "document_id": str(document.id),
+                "chunk_index": chunk.chunk_index,
+                "content": chunk.content[:500],  # Preview
+                "relevance_score": float(score),
+                "document_title": document.title,
+                "filename": document.filename,
+                "department": document.department.value if document.department else None,
+                "created_at": document.created_at.isoformat() if document.created_at else None
             })
 
         return results
 
+    async def _sparse_statement(
+        self,
+        query_terms: Dict[int, float],
+        user,
+        scope: Optional[DocumentScope] = None,
+        department: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ):
+        """Top chunks by sum(query weight * posting weight) over the shared tokens."""
+
+        query_weight = case(query_terms, value=DocumentChunkTerm.token_id, else_=0.0)
+        score = func.sum(DocumentChunkTerm.weight * query_weight).label("score")
+
+        ranked = select(DocumentChunkTerm.chunk_id, score).join(
+            Document, Document.id == DocumentChunkTerm.document_id
+        ).where(
+            DocumentChunkTerm.token_id.in_(list(query_terms))
+        )
+        ranked = await self._apply_access_control(ranked, user, scope, department)
+        ranked = ranked.group_by(DocumentChunkTerm.chunk_id).order_by(
+            score.desc()
+        ).limit(limit).offset(offset).subquery()
+
+        return select(DocumentChunk, Document, ranked.c.score).join(
+            ranked, ranked.c.chunk_id == DocumentChunk.id
+        ).join(
+            Document, Document.id == DocumentChunk.document_id
+        ).order_by(ranked.c.score.desc())
+
     async def hybrid_search(
         self,
         db: AsyncSession,
@@ -194,23 +366,33 @@ class SearchService:
         department: Optional[str] = None,
         limit: int = 20,
         offset: int = 0,
-        min_score: float = 0.5
+        min_score: float = 0.5,
+        keyword_backend: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Combine vector and keyword search with score fusion."""
+        """Combine vector and keyword search with score fusion.
+
+        ``keyword_backend`` ("fulltext" or "sparse") overrides ``KEYWORD_BACKEND``.
+        """
 
         # Perform both searches
         vector_results = await self.vector_search(
             db, query, user, scope, department, limit * 2, 0, min_score
         )
 
-        keyword_results = await self.keyword_search(
-            db, query, user, scope, department, limit * 2, 0
-        )
+        if (keyword_backend or KEYWORD_BACKEND) == "sparse":
+            keyword_results = await self.sparse_search(
+                db, query, user, scope, department, limit * 2, 0
+            )
+        else:
+            keyword_results = await self.keyword_search(
+                db, query, user, scope, department, limit * 2, 0
+            )
 
         # Combine and rerank results using Reciprocal Rank Fusion (RRF)
-        combined_results = self._reciprocal_rank_fusion(
-            vector_results, keyword_results
-        )
+        with telemetry.stage("fusion", mode="hybrid"):
+            combined_results = self._reciprocal_rank_fusion(
+                vector_results, keyword_results
+            )
 
         # Apply pagination
         paginated_results = combined_results[offset:offset + limit]
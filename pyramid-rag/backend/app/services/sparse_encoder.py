@@ -0,0 +1,147 @@
+"""BGE-M3 sparse lexical weights.
+
+Besides its dense vector, BGE-M3 scores every input token with
+``relu(sparse_linear(hidden_state))``. A text's sparse vector maps each
+token id to its largest weight, with special tokens left out, and two texts
+are scored by the dot product over the token ids they share. Because the
+weights come from the multilingual tokenizer and encoder, this works the
+same for German, English and mixed documents, unlike
+``to_tsvector('german', ...)``.
+
+The dense SentenceTransformer already computes the hidden states, so the
+encoder reads them from the same forward pass (``forward_features``) and
+applies the ``sparse_linear.pt`` head that ships with the model. The model
+is not loaded a second time, as FlagEmbedding's ``BGEM3FlagModel`` would do.
+At ingestion, ``DocumentProcessor`` derives the dense vector and the sparse
+vector from one pass with ``vector_from_features``.
+
+Sparse vectors are stored as inverted postings in ``document_chunk_terms``
+(see ``store_sparse_terms``). They are scored in SQL by
+``SearchService.sparse_search``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+
+from app.services.bge_m3_embedding_service import forward_features, get_embedding_model, model_file, to_numpy
+
+logger = logging.getLogger(__name__)
+
+SPARSE_INDEX_ENABLED = os.getenv("SPARSE_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# Postings below this weight are dropped; 0 keeps every token BGE-M3 weights
+SPARSE_MIN_WEIGHT = float(os.getenv("SPARSE_MIN_WEIGHT", "0.0"))
+
+SparseVector = Dict[int, float]
+
+
+def load_sparse_head(model_name: str) -> Tuple[np.ndarray, float]:
+    """Weight vector and bias of BGE-M3's ``sparse_linear`` layer."""
+    import torch
+
+    path = os.getenv("SPARSE_HEAD_PATH") or model_file(model_name, "sparse_linear.pt")
+    state = torch.load(path, map_location="cpu")
+    weight = state["weight"].float().numpy().reshape(-1)
+    bias = float(state["bias"].float().numpy().reshape(-1)[0]) if "bias" in state else 0.0
+    return weight, bias
+
+
+class SparseEncoder:
+    """Sparse lexical weights from the shared BGE-M3 model, loaded on first use."""
+
+    def __init__(
+        self,
+        model=None,
+        head: Optional[Tuple[np.ndarray, float]] = None,
+        model_name: Optional[str] = None,
+        min_weight: float = SPARSE_MIN_WEIGHT,
+    ) -> None:
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+        self.min_weight = min_weight
+        self._model = model
+        self._head = head
+        self._special_ids: Optional[set] = None
+        self._failed = False
+
+    def _load(self) -> bool:
+        if self._failed:
+            return False
+        if self._model is not None and self._head is not None:
+            return True
+        try:
+            if self._model is None:
+                self._model = get_embedding_model()
+            if self._head is None:
+                self._head = load_sparse_head(self.model_name)
+        except Exception as exc:
+            self._failed = True
+            logger.warning(f"Sparse head for {self.model_name} unavailable, sparse vectors are disabled: {exc}")
+            return False
+        return True
+
+    @property
+    def available(self) -> bool:
+        return self._load()
+
+    @property
+    def special_ids(self) -> set:
+        if self._special_ids is None:
+            tokenizer = getattr(self._model, "tokenizer", None)
+            self._special_ids = set(getattr(tokenizer, "all_special_ids", None) or [])
+        return self._special_ids
+
+    def vector_from_features(self, features: Dict[str, Any]) -> SparseVector:
+        """Sparse vector of one text from its ``forward_features`` output."""
+        weight, bias = self._head
+        hidden = to_numpy(features["token_embeddings"])
+        input_ids = to_numpy(features["input_ids"]).reshape(-1)
+        mask = features.get("attention_mask")
+        length = int(to_numpy(mask).sum()) if mask is not None else len(input_ids)
+
+        scores = np.maximum(hidden[:length].astype(np.float32) @ weight + bias, 0.0)
+        vector: SparseVector = {}
+        special_ids = self.special_ids
+        for token_id, score in zip(input_ids[:length].tolist(), scores.tolist()):
+            if token_id in special_ids or score <= self.min_weight:
+                continue
+            if score > vector.get(token_id, 0.0):
+                vector[token_id] = score
+        return vector
+
+    def encode(self, texts: Sequence[str]) -> List[SparseVector]:
+        if not texts or not self._load():
+            return []
+        return [self.vector_from_features(features) for features in forward_features(self._model, texts)]
+
+    def encode_query(self, query: str) -> SparseVector:
+        vectors = self.encode([query])
+        return vectors[0] if vectors else {}
+
+
+_encoder: Optional[SparseEncoder] = None
+
+
+def get_sparse_encoder() -> SparseEncoder:
+    global _encoder
+    if _encoder is None:
+        _encoder = SparseEncoder()
+    return _encoder
+
+
+def store_sparse_terms(session, document_id, chunk_ids: Sequence, vectors: Sequence[SparseVector]) -> int:
+    """Bulk-insert the postings of a document's chunks with a sync Session; returns the row count."""
+    from app.models import DocumentChunkTerm
+
+    rows = [
+        {"chunk_id": chunk_id, "token_id": token_id, "document_id": document_id, "weight": weight}
+        for chunk_id, vector in zip(chunk_ids, vectors)
+        for token_id, weight in vector.items()
+    ]
+    if rows:
+        session.execute(insert(DocumentChunkTerm), rows)
+    return len(rows)
@@ -0,0 +1,230 @@
+"""Streaming text extraction and chunking for spreadsheets (xlsx and CSV).
+
+``openpyxl.load_workbook`` without ``read_only=True`` builds a cell object
+for every cell before the first row can be read, which takes minutes and
+gigabytes for large ERP exports. Workbooks are instead opened read-only and
+walked with row iterators, CSV files are read with ``csv.reader``, and only
+the rendered row strings are kept.
+
+Rows are grouped into chunks of about ``chunk_size_words`` words. Each chunk
+starts with its sheet name and the sheet's header row, so every chunk stays
+self-describing once it is retrieved on its own. ``SPREADSHEET_MAX_ROWS``
+(per sheet) and ``SPREADSHEET_MAX_COLUMNS`` cap what is read; 0 disables a cap.
+"""
+
+from __future__ import annotations
+
+import codecs
+import csv
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import openpyxl
+    HAS_OPENPYXL = True
+except ImportError:
+    HAS_OPENPYXL = False
+
+logger = logging.getLogger(__name__)
+
+SPREADSHEET_MAX_ROWS = int(os.getenv("SPREADSHEET_MAX_ROWS", "0"))
+SPREADSHEET_MAX_COLUMNS = int(os.getenv("SPREADSHEET_MAX_COLUMNS", "200"))
+
+WORKBOOK_EXTENSIONS = {".xlsx", ".xlsm"}
+CSV_EXTENSIONS = {".csv", ".tsv"}
+CSV_ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+CSV_SAMPLE_BYTES = 64 * 1024
+
+
+def is_spreadsheet(file_path: Path) -> bool:
+    return file_path.suffix.lower() in WORKBOOK_EXTENSIONS | CSV_EXTENSIONS
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).replace("\t", " ").replace("\n", " ").strip()
+
+
+@dataclass
+class SpreadsheetResult:
+    content: str
+    chunks: List[Dict[str, Any]]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class _RowGrouper:
+    """Packs the rows of one sheet into header-prefixed chunks."""
+
+    def __init__(
+        self,
+        sheet: str,
+        header_row: int,
+        header: List[str],
+        chunk_size_words: int,
+        chunks: List[Dict[str, Any]],
+        word_offset: int,
+    ) -> None:
+        self.prefix = f"[Sheet: {sheet}]\n" + " | ".join(header)
+        self.prefix_words = len(self.prefix.split())
+        # The header is repeated in every chunk; always leave room for some rows
+        self.budget = max(chunk_size_words - self.prefix_words, chunk_size_words // 2, 1)
+        self.sheet = sheet
+        self.chunks = chunks
+        self.word_offset = word_offset
+        self.lines: List[str] = []
+        self.words = 0
+        self.start_row = self.end_row = header_row
+        self.emitted = False
+
+    def add(self, row_number: int, cells: List[str]) -> None:
+        line = " | ".join(cells)
+        words = len(line.split())
+        if self.lines and self.words + words > self.budget:
+            self.flush()
+        if not self.lines:
+            self.start_row = row_number
+        self.lines.append(line)
+        self.words += words
+        self.end_row = row_number
+
+    def flush(self, final: bool = False) -> None:
+        # A sheet with nothing but a header still gets one chunk
+        if not self.lines and (self.emitted or not final):
+            return
+        content = "\n".join([self.prefix, *self.lines])
+        word_count = self.prefix_words + self.words
+        self.chunks.append({
+            "content": content,
+            "start_word": self.word_offset,
+            "end_word": self.word_offset + word_count,
+            "word_count": word_count,
+            "character_count": len(content),
+            "sheet": self.sheet,
+            "start_row": self.start_row,
+            "end_row": self.end_row,
+        })
+        self.word_offset += word_count
+        self.emitted = True
+        self.lines = []
+        self.words = 0
+
+
+def _trimmed(values: Sequence[Any], max_columns: int) -> List[str]:
+    if max_columns:
+        values = values[:max_columns]
+    cells = [_cell_text(value) for value in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return cells
+
+
+def _iter_workbook(file_path: Path, max_columns: int) -> Iterator[Tuple[str, Iterator[List[str]]]]:
+    workbook = openpyxl.load_workbook(str(file_path), read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = (
+                _trimmed(values, max_columns)
+                for values in sheet.iter_rows(values_only=True, max_col=max_columns or None)
+            )
+            yield sheet.title, rows
+    finally:
+        # Read-only workbooks keep the zip file open until closed
+        workbook.close()
+
+
+def _detect_csv_format(file_path: Path) -> Tuple[str, str]:
+    with open(file_path, "rb") as handle:
+        sample = handle.read(CSV_SAMPLE_BYTES)
+    for encoding in CSV_ENCODINGS:
+        try:
+            # Incremental so a multi-byte character cut off at the sample end is not an error
+            text = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        encoding, text = "latin-1", sample.decode("latin-1")
+
+    if file_path.suffix.lower() == ".tsv":
+        return encoding, "\t"
+    try:
+        delimiter = csv.Sniffer().sniff(text, delimiters=",;\t|").delimiter
+    except csv.Error:
+        # German Excel exports use semicolons
+        delimiter = ";" if text.count(";") > text.count(",") else ","
+    return encoding, delimiter
+
+
+def _iter_csv(file_path: Path, max_columns: int) -> Iterator[Tuple[str, Iterator[List[str]]]]:
+    encoding, delimiter = _detect_csv_format(file_path)
+    with open(file_path, "r", encoding=encoding, newline="") as handle:
+        rows = (_trimmed(values, max_columns) for values in csv.reader(handle, delimiter=delimiter))
+        yield file_path.stem, rows
+
+
+def extract_spreadsheet(
+    file_path: Path,
+    chunk_size_words: int,
+    max_rows: int = SPREADSHEET_MAX_ROWS,
+    max_columns: int = SPREADSHEET_MAX_COLUMNS,
+) -> SpreadsheetResult:
+    """Extract the text of a workbook or CSV file together with its row-group chunks."""
+    suffix = file_path.suffix.lower()
+    if suffix in CSV_EXTENSIONS:
+        sheets: Iterable[Tuple[str, Iterator[List[str]]]] = _iter_csv(file_path, max_columns)
+        method = "csv_stream"
+    elif HAS_OPENPYXL:
+        sheets = _iter_workbook(file_path, max_columns)
+        method = "openpyxl_read_only"
+    else:
+        raise RuntimeError("openpyxl is not installed")
+
+    content_parts: List[str] = []
+    chunks: List[Dict[str, Any]] = []
+    sheet_count = row_count = 0
+    truncated_sheets: List[str] = []
+    word_offset = 0
+
+    for sheet_name, rows in sheets:
+        sheet_count += 1
+        content_parts.append(f"[Sheet: {sheet_name}]")
+        grouper: Optional[_RowGrouper] = None
+        sheet_rows = 0
+        for row_number, cells in enumerate(rows, 1):
+            if not any(cells):
+                continue
+            content_parts.append("\t".join(cells))
+            if grouper is None:
+                # The first non-empty row is taken as the header
+                grouper = _RowGrouper(sheet_name, row_number, cells, chunk_size_words, chunks, word_offset)
+                continue
+            if max_rows and sheet_rows >= max_rows:
+                content_parts.pop()
+                truncated_sheets.append(sheet_name)
+                break
+            grouper.add(row_number, cells)
+            sheet_rows += 1
+        if grouper is not None:
+            grouper.flush(final=True)
+            word_offset = grouper.word_offset
+        row_count += sheet_rows
+
+    content = "\n".join(content_parts)
+    metadata = {
+        "extraction_method": method,
+        "success": True,
+        "sheets": sheet_count,
+        "rows": row_count,
+        "character_count": len(content),
+    }
+    if truncated_sheets:
+        metadata["truncated_sheets"] = truncated_sheets
+        metadata["max_rows"] = max_rows
+        logger.info(f"Spreadsheet {file_path.name} truncated to {max_rows} rows in {len(truncated_sheets)} sheets")
+    return SpreadsheetResult(content=content, chunks=chunks, metadata=metadata)
@@ -0,0 +1,181 @@
+"""Stage-level latency instrumentation for retrieval and generation.
+
+Each pipeline stage (query embedding, ANN scan, full-text search, fusion,
+context building, LLM queueing, prefill, decoding) is recorded in the
+``pyramid_stage_duration_seconds`` histogram with ``stage``, ``route`` and
+``mode`` labels. Generation additionally records time-to-first-token and
+decode throughput derived from Ollama's ``eval_count``/``eval_duration``.
+
+Prometheus metrics are served at ``/metrics`` next to the collector snapshot.
+OpenTelemetry spans are emitted per stage when ``OTEL_TRACING_ENABLED=true``
+and the SDK is installed; exporter setup is left to the OTel environment.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from prometheus_client import Histogram, generate_latest
+    HAS_PROMETHEUS = True
+except ImportError:  # pragma: no cover - optional dependency
+    HAS_PROMETHEUS = False
+
+try:
+    from opentelemetry import trace
+    HAS_OPENTELEMETRY = True
+except ImportError:  # pragma: no cover - optional dependency
+    HAS_OPENTELEMETRY = False
+
+logger = logging.getLogger(__name__)
+
+OTEL_TRACING_ENABLED = os.getenv("OTEL_TRACING_ENABLED", "false").lower() == "true"
+
+_current_route: contextvars.ContextVar[str] = contextvars.ContextVar("pyramid_route", default="background")
+_current_mode: contextvars.ContextVar[str] = contextvars.ContextVar("pyramid_mode", default="")
+
+_tracer = trace.get_tracer("pyramid.rag") if HAS_OPENTELEMETRY and OTEL_TRACING_ENABLED else None
+
+if HAS_PROMETHEUS:
+    STAGE_DURATION = Histogram(
+        "pyramid_stage_duration_seconds",
+        "Latency of individual retrieval and generation stages",
+        ["stage", "route", "mode"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    )
+    TIME_TO_FIRST_TOKEN = Histogram(
+        "pyramid_llm_time_to_first_token_seconds",
+        "Time from sending the generation request to the first streamed token",
+        ["route", "model"],
+        buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60),
+    )
+    DECODE_TOKENS_PER_SECOND = Histogram(
+        "pyramid_llm_decode_tokens_per_second",
+        "Decode throughput reported by Ollama (eval_count / eval_duration)",
+        ["route", "model"],
+        buckets=(1, 2.5, 5, 10, 15, 20, 30, 40, 60, 80, 120),
+    )
+    PREFILL_TOKENS_PER_SECOND = Histogram(
+        "pyramid_llm_prefill_tokens_per_second",
+        "Prompt processing throughput (prompt_eval_count / prompt_eval_duration)",
+        ["route", "model"],
+        buckets=(10, 50, 100, 250, 500, 1000, 2000, 4000, 8000),
+    )
+
+
+def bind_route(route: str) -> contextvars.Token:
+    """Label subsequent stage observations in this context with ``route``."""
+    return _current_route.set(route)
+
+
+def reset_route(token: contextvars.Token) -> None:
+    _current_route.reset(token)
+
+
+def current_route() -> str:
+    return _current_route.get()
+
+
+@contextmanager
+def search_mode(mode: str) -> Iterator[None]:
+    """Set the ``mode`` label for nested stages, e.g. so hybrid's vector leg reports ``hybrid``."""
+    token = _current_mode.set(mode)
+    try:
+        yield
+    finally:
+        _current_mode.reset(token)
+
+
+def route_template(app: Any, scope: Dict[str, Any]) -> str:
+    """Resolve the path template (e.g. ``/api/v1/chat/sessions/{session_id}``) for a request."""
+    from starlette.routing import Match
+
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope.get("path", "unknown"))
+    return "unmatched"
+
+
+def _effective_mode(mode: str) -> str:
+    # An enclosing search_mode() takes precedence over a stage's own default
+    return _current_mode.get() or mode or ""
+
+
+def observe_stage(name: str, seconds: float, mode: str = "") -> None:
+    if HAS_PROMETHEUS:
+        STAGE_DURATION.labels(stage=name, route=current_route(), mode=_effective_mode(mode)).observe(seconds)
+
+
+@contextmanager
+def stage(name: str, mode: str = "") -> Iterator[None]:
+    """Time a pipeline stage and, when tracing is enabled, wrap it in a span."""
+    span_context = _tracer.start_as_current_span(f"pyramid.{name}") if _tracer else nullcontext()
+    start = time.perf_counter()
+    with span_context as span:
+        if span is not None:
+            span.set_attribute("pyramid.route", current_route())
+            span.set_attribute("pyramid.mode", _effective_mode(mode))
+        try:
+            yield
+        finally:
+            observe_stage(name, time.perf_counter() - start, mode)
+
+
+def ollama_generation_stats(data: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Convert the nanosecond counters of Ollama's final response into seconds and rates."""
+
+    def seconds(key: str) -> Optional[float]:
+        value = data.get(key)
+        return value / 1e9 if value else None
+
+    eval_seconds = seconds("eval_duration")
+    prompt_eval_seconds = seconds("prompt_eval_duration")
+    eval_count = data.get("eval_count")
+    prompt_eval_count = data.get("prompt_eval_count")
+    return {
+        "load_seconds": seconds("load_duration"),
+        "prefill_seconds": prompt_eval_seconds,
+        "decode_seconds": eval_seconds,
+        "total_seconds": seconds("total_duration"),
+        "prompt_tokens": prompt_eval_count,
+        "completion_tokens": eval_count,
+        "prefill_tokens_per_second": (
+            prompt_eval_count / prompt_eval_seconds if prompt_eval_count and prompt_eval_seconds else None
+        ),
+        "decode_tokens_per_second": eval_count / eval_seconds if eval_count and eval_seconds else None,
+    }
+
+
+def record_ollama_generation(data: Dict[str, Any], model: str, mode: str) -> Dict[str, Optional[float]]:
+    """Record Ollama's server-side timings (from the ``done`` message) as stages."""
+    stats = ollama_generation_stats(data)
+    if HAS_PROMETHEUS:
+        route = current_route()
+        for stage_name, key in (
+            ("llm_load", "load_seconds"),
+            ("llm_prefill", "prefill_seconds"),
+            ("llm_decode", "decode_seconds"),
+        ):
+            if stats[key] is not None:
+                STAGE_DURATION.labels(stage=stage_name, route=route, mode=mode).observe(stats[key])
+        if stats["decode_tokens_per_second"] is not None:
+            DECODE_TOKENS_PER_SECOND.labels(route=route, model=model).observe(stats["decode_tokens_per_second"])
+        if stats["prefill_tokens_per_second"] is not None:
+            PREFILL_TOKENS_PER_SECOND.labels(route=route, model=model).observe(stats["prefill_tokens_per_second"])
+    return stats
+
+
+def record_time_to_first_token(seconds: float, model: str) -> None:
+    if HAS_PROMETHEUS:
+        TIME_TO_FIRST_TOKEN.labels(route=current_route(), model=model).observe(seconds)
+
+
+def render_latest() -> str:
+    """Prometheus text for the stage histograms (empty without prometheus_client)."""
+    if not HAS_PROMETHEUS:
+        return ""
+    return generate_latest().decode("utf-8")
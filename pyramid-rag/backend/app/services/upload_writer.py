@@ -0,0 +1,74 @@
+"""Streaming writer for uploaded files.
+
+Uploads are copied to disk in ``UPLOAD_CHUNK_BYTES`` blocks while their
+SHA-256 is computed in the same pass. Disk writes and hashing run in a
+worker thread, so the event loop is never blocked. The hash is then known
+before any extraction starts, which lets the upload endpoint answer a
+duplicate without running the document pipeline. Uploads larger than
+``MAX_UPLOAD_SIZE`` are aborted as soon as the limit is passed and the
+partial file is removed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(5 * 1024 ** 3)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int) -> None:
+        super().__init__(f"Upload exceeds the limit of {limit} bytes")
+        self.limit = limit
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+
+
+class _HashingWriter:
+    def __init__(self, handle: BinaryIO) -> None:
+        self.handle = handle
+        self.digest = hashlib.sha256()
+
+    def write(self, block: bytes) -> None:
+        # hashlib releases the GIL for large buffers, so both run off the event loop
+        self.digest.update(block)
+        self.handle.write(block)
+
+
+async def write_upload(
+    upload,
+    destination: Path,
+    max_bytes: int = MAX_UPLOAD_SIZE,
+    chunk_bytes: int = UPLOAD_CHUNK_BYTES,
+) -> StoredUpload:
+    """Stream ``upload`` (a Starlette ``UploadFile``) to ``destination`` and hash it."""
+    size = 0
+    try:
+        with open(destination, "wb") as handle:
+            writer = _HashingWriter(handle)
+            while True:
+                block = await upload.read(chunk_bytes)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await asyncio.to_thread(writer.write, block)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    return StoredUpload(path=destination, size=size, sha256=writer.digest.hexdigest())
@@ -4,7 +4,7 @@ import logging
 import os
 
 from app.database import async_engine, AsyncSessionLocal
-from app.auth import get_password_hash
+from app.auth import get_password_hash_async, verify_password_async
 from app.models import User, Department, Base
 
 logger = logging.getLogger(__name__)
@@ -43,7 +43,11 @@ async def create_admin_user():
             )
             existing_admin = result.first()
 
-            new_password_hash = get_password_hash(admin_password)
+            if existing_admin and await verify_password_async(admin_password, existing_admin.hashed_password):
+                logger.info("Admin user password already matches environment configuration")
+                return
+
+            new_password_hash = await get_password_hash_async(admin_password)
 
             if not existing_admin:
                 # Create admin user
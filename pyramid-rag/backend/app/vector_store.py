@@ -1,24 +1,65 @@
+import asyncio
 import logging
+import time
 from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, cast
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, func, cast, select
 from sqlalchemy.dialects.postgresql import JSONB
 
 from app.models import Document, DocumentChunk, DocumentEmbedding, Department
-from app.embeddings_service import embeddings_service
+from app.services import telemetry
 
 logger = logging.getLogger(__name__)
 
+
+def _department_filter(user_department: Optional[str]):
+    """Build the department/visibility ACL clause shared by all search modes."""
+    if not user_department:
+        return None
+    try:
+        dept_enum = Department(user_department)
+    except ValueError:
+        logger.warning(f"Invalid department: {user_department}")
+        return None
+
+    visibility_json = cast(Document.meta_data, JSONB)["visibility"].astext
+    allowed_departments_json = cast(Document.meta_data, JSONB)["allowed_departments"]
+    return or_(
+        Document.department == dept_enum,
+        visibility_json == "all",
+        and_(
+            allowed_departments_json.isnot(None),
+            allowed_departments_json.contains([dept_enum.value]),
+        ),
+        and_(
+            allowed_departments_json.isnot(None),
+            allowed_departments_json.contains([dept_enum.name]),
+        ),
+        and_(
+            allowed_departments_json.isnot(None),
+            allowed_departments_json.contains(["ALL"]),
+        ),
+    )
+
+
 class VectorStore:
     """Vector store for semantic document search"""
 
-    def __init__(self):
-        self.embeddings_service = embeddings_service
+    def __init__(self, embeddings_service=None):
+        self._embeddings_service = embeddings_service
+
+    @property
+    def embeddings_service(self):
+        """Resolve the embedding backend on first use instead of at import time."""
+        if self._embeddings_service is None:
+            from app.embeddings_service import embeddings_service
+            self._embeddings_service = embeddings_service
+        return self._embeddings_service
 
     async def semantic_search(
         self,
         query: str,
-        db: Session,
+        db: AsyncSession,
         limit: int = 10,
         similarity_threshold: float = 0.1,
         user_department: Optional[str] = None,
@@ -29,10 +70,13 @@ class VectorStore:
         """
         try:
             logger.info(f"Performing semantic search for query: '{query[:100]}...'")
-            query_embedding = embeddings_service.generate_embedding(query)
+            embeddings_service = self.embeddings_service
+            # Model inference is CPU bound; keep it off the event loop
+            with telemetry.stage("embedding", mode="vector"):
+                query_embedding = await asyncio.to_thread(embeddings_service.generate_embedding, query)
 
             # Build base query
-            base_query = db.query(
+            stmt = select(
                 DocumentEmbedding,
                 DocumentChunk,
                 Document
@@ -40,39 +84,19 @@ class VectorStore:
                 DocumentChunk, DocumentEmbedding.chunk_id == DocumentChunk.id
             ).join(
                 Document, DocumentEmbedding.document_id == Document.id
-            ).filter(
+            ).where(
                 DocumentEmbedding.model_name == embeddings_service.model_name
             )
 
             # Apply department-based access control
-            if user_department:
-                try:
-                    dept_enum = Department(user_department)
-                    visibility_json = cast(Document.meta_data, JSONB)["visibility"].astext
-                    allowed_departments_json = cast(Document.meta_data, JSONB)["allowed_departments"]
-                    base_query = base_query.filter(
-                        or_(
-                            Document.department == dept_enum,
-                            visibility_json == "all",
-                            and_(
-                                allowed_departments_json.isnot(None),
-                                allowed_departments_json.contains([dept_enum.value]),
-                            ),
-                            and_(
-                                allowed_departments_json.isnot(None),
-                                allowed_departments_json.contains([dept_enum.name]),
-                            ),
-                            and_(
-                                allowed_departments_json.isnot(None),
-                                allowed_departments_json.contains(["ALL"]),
-                            ),
-                        )
-                    )
-                except ValueError:
-                    logger.warning(f"Invalid department: {user_department}")
+            access_clause = _department_filter(user_department)
+            if access_clause is not None:
+                stmt = stmt.where(access_clause)
 
             # Get all matching embeddings
-            embeddings_data = base_query.all()
+            with telemetry.stage("ann", mode="vector"):
+                result = await db.execute(stmt)
+                embeddings_data = result.all()
 
             if not embeddings_data:
                 logger.info("No embeddings found matching the criteria")
@@ -133,7 +157,7 @@ class VectorStore:
     async def keyword_search(
         self,
         query: str,
-        db: Session,
+        db: AsyncSession,
         limit: int = 10,
         user_department: Optional[str] = None,
         filters: Optional[Dict[str, Any]] = None
@@ -145,7 +169,10 @@ class VectorStore:
             logger.info(f"Performing keyword search for query: '{query[:100]}...'")
 
             search_terms = query.lower().split()
-            base_query = db.query(
+            if not search_terms:
+                return []
+
+            stmt = select(
                 DocumentChunk,
                 Document
             ).join(
@@ -153,39 +180,19 @@ class VectorStore:
             )
 
             # Apply department-based access control
-            if user_department:
-                try:
-                    dept_enum = Department(user_department)
-                    visibility_json = cast(Document.meta_data, JSONB)["visibility"].astext
-                    allowed_departments_json = cast(Document.meta_data, JSONB)["allowed_departments"]
-                    base_query = base_query.filter(
-                        or_(
-                            Document.department == dept_enum,
-                            visibility_json == "all",
-                            and_(
-                                allowed_departments_json.isnot(None),
-                                allowed_departments_json.contains([dept_enum.value]),
-                            ),
-                            and_(
-                                allowed_departments_json.isnot(None),
-                                allowed_departments_json.contains([dept_enum.name]),
-                            ),
-                            and_(
-                                allowed_departments_json.isnot(None),
-                                allowed_departments_json.contains(["ALL"]),
-                            ),
-                        )
-                    )
-                except ValueError:
-                    logger.warning(f"Invalid department: {user_department}")
+            access_clause = _department_filter(user_department)
+            if access_clause is not None:
+                stmt = stmt.where(access_clause)
 
             # Apply keyword filters
             keyword_conditions = []
             for term in search_terms:
                 keyword_conditions.append(DocumentChunk.content.ilike(f'%{term}%'))
 
-            base_query = base_query.filter(or_(*keyword_conditions))
-            search_results = base_query.limit(limit * 2).all()
+            stmt = stmt.where(or_(*keyword_conditions)).limit(limit * 2)
+            with telemetry.stage("fulltext", mode="keyword"):
+                result = await db.execute(stmt)
+                search_results = result.all()
 
             # Rank results by keyword matches
             results = []
@@ -232,7 +239,7 @@ class VectorStore:
     async def hybrid_search(
         self,
         query: str,
-        db: Session,
+        db: AsyncSession,
         limit: int = 10,
         semantic_weight: float = 0.7,
         keyword_weight: float = 0.3,
@@ -246,12 +253,15 @@ class VectorStore:
             logger.info(f"Performing hybrid search for query: '{query[:100]}...'")
 
             # Perform both searches
-            semantic_results = await self.semantic_search(
-                query, db, limit * 2, user_department=user_department, filters=filters
-            )
-            keyword_results = await self.keyword_search(
-                query, db, limit * 2, user_department=user_department, filters=filters
-            )
+            with telemetry.search_mode("hybrid"):
+                semantic_results = await self.semantic_search(
+                    query, db, limit * 2, user_department=user_department, filters=filters
+                )
+                keyword_results = await self.keyword_search(
+                    query, db, limit * 2, user_department=user_department, filters=filters
+                )
+
+            fusion_start = time.perf_counter()
 
             # Combine and score results
             combined_results = {}
@@ -285,6 +295,7 @@ class VectorStore:
 
             # Sort by hybrid score and limit results
             final_results.sort(key=lambda x: x['hybrid_score'], reverse=True)
+            telemetry.observe_stage("fusion", time.perf_counter() - fusion_start, mode="hybrid")
             return final_results[:limit]
 
         except Exception as e:
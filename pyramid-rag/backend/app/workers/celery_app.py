@@ -8,7 +8,8 @@ celery_app = Celery(
     backend=os.getenv('CELERY_RESULT_BACKEND', 'redis://pyramid-redis:6379/0'),
     include=[
         "app.workers.document_tasks",
-        "app.workers.embedding_tasks"
+        "app.workers.embedding_tasks",
+        "app.workers.maintenance_tasks"
     ]
 )
 
@@ -24,4 +25,15 @@ celery_app.conf.update(
     task_reject_on_worker_lost=True,
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    beat_schedule={
+        "purge-expired-chats": {
+            "task": "app.workers.maintenance_tasks.purge_expired_chats",
+            "schedule": float(os.getenv('CHAT_PURGE_INTERVAL_SECONDS', '900')),
+        },
+        "build-shadow-embeddings": {
+            "task": "app.workers.embedding_tasks.build_shadow_vectors",
+            # Each tick works for at most this long, so ticks do not pile up
+            "schedule": float(os.getenv('EMBEDDING_MIGRATION_TICK_SECONDS', '60')),
+        },
+    },
 )
\ No newline at end of file
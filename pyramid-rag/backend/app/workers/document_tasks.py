@@ -7,8 +7,11 @@ from celery import shared_task
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.database import SessionLocal
-from app.models import Document, DocumentChunk, DocumentEmbedding
+from app.models import Document, DocumentChunk, DocumentChunkTerm, DocumentChunkVector, DocumentEmbedding
+from app.services.chunking import CHUNK_POSITION_KEYS
 from app.services.document_processor import DocumentProcessor
+from app.services.embedding_registry import store_chunk_vectors
+from app.services.sparse_encoder import SparseVector, store_sparse_terms
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +19,8 @@ document_processor = DocumentProcessor()
 
 
 def _clear_existing_chunks(session, document_id: str) -> None:
+    session.query(DocumentChunkTerm).filter(DocumentChunkTerm.document_id == document_id).delete(synchronize_session=False)
+    session.query(DocumentChunkVector).filter(DocumentChunkVector.document_id == document_id).delete(synchronize_session=False)
     session.query(DocumentEmbedding).filter(DocumentEmbedding.document_id == document_id).delete(synchronize_session=False)
     session.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete(synchronize_session=False)
 
@@ -26,8 +31,12 @@ def _store_chunks_and_embeddings(
     chunks: List[Dict[str, Any]],
     embeddings: List[List[float]],
     embedding_model: Optional[str],
+    sparse_vectors: Optional[List[SparseVector]] = None,
 ) -> None:
+    sparse_vectors = sparse_vectors or []
     resolved_model = embedding_model or (document.meta_data or {}).get("embedding_model")
+    stored_chunk_ids = []
+    stored_embeddings = []
 
     for index, chunk_info in enumerate(chunks):
         content = chunk_info.get("content", "")
@@ -37,8 +46,7 @@ def _store_chunks_and_embeddings(
         word_count = chunk_info.get("word_count")
         metadata = {
             "word_count": word_count,
-            "start_word": chunk_info.get("start_word"),
-            "end_word": chunk_info.get("end_word"),
+            **{key: chunk_info[key] for key in CHUNK_POSITION_KEYS if key in chunk_info},
         }
 
         chunk = DocumentChunk(
@@ -48,7 +56,7 @@ def _store_chunks_and_embeddings(
             content_length=chunk_info.get("character_count"),
             embedding=embeddings[index] if index < len(embeddings) else None,
             meta_data=metadata,
-            token_count=word_count,
+            token_count=chunk_info.get("token_count") or word_count,
         )
         session.add(chunk)
         session.flush()
@@ -61,6 +69,14 @@ def _store_chunks_and_embeddings(
                 model_name=resolved_model,
             )
             session.add(embedding_row)
+            stored_chunk_ids.append(chunk.id)
+            stored_embeddings.append(embeddings[index])
+
+        if index < len(sparse_vectors):
+            store_sparse_terms(session, document.id, [chunk.id], [sparse_vectors[index]])
+
+    # Registered model of the same name: no shadow build pass needed for these chunks
+    store_chunk_vectors(session, resolved_model, document.id, stored_chunk_ids, stored_embeddings)
 
 
 def _mark_document_error(document_id: str, message: str) -> None:
@@ -144,7 +160,9 @@ def process_document(document_id: str):
         document.processing_error = None
         document.processed = True
 
-        _store_chunks_and_embeddings(session, document, chunks, embeddings, metadata.get("embedding_model"))
+        _store_chunks_and_embeddings(
+            session, document, chunks, embeddings, metadata.get("embedding_model"), result.get("sparse_vectors"),
+        )
 
         session.commit()
         logger.info("Document %s processed successfully", document_id)
@@ -1,8 +1,16 @@
 from celery import shared_task
 import logging
 
+from app.services.embedding_registry import build_shadow_vectors as build_registered_models
+
 logger = logging.getLogger(__name__)
 
+@shared_task(name="app.workers.embedding_tasks.build_shadow_vectors")
+def build_shadow_vectors():
+    """Embed missing chunks of registered models at the throttled migration rate."""
+    embedded = build_registered_models()
+    return {"status": "success", "embedded": embedded}
+
 @shared_task
 def create_embeddings(text_chunks: list):
     """Create embeddings for text chunks."""
@@ -0,0 +1,12 @@
+from celery import shared_task
+import logging
+
+from app.services.chat_purge import purge_expired
+
+logger = logging.getLogger(__name__)
+
+@shared_task(name="app.workers.maintenance_tasks.purge_expired_chats")
+def purge_expired_chats():
+    """Delete expired temporary chat sessions in bounded batches."""
+    stats = purge_expired()
+    return {"status": "success", **stats.as_dict()}
@@ -0,0 +1 @@
+"""Load tests and benchmarks. Run modules from the backend directory, e.g. ``python -m benchmarks.suite``."""
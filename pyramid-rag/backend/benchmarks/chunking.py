@@ -0,0 +1,141 @@
+"""Chunking micro-benchmark.
+
+Chunks a synthetic document (paragraphs with ``[Page N]`` markers, 10 MB by
+default) with:
+
+* ``word_windows``: the former ``DocumentProcessor.chunk_text``, which
+  re-joins whitespace-split word windows
+* ``segment_packing``: the former ``BGEM3EmbeddingService.chunk_text``, which
+  joins segments and re-counts every chunk and overlap candidate
+* ``engine``: ``app.services.chunking.ChunkingEngine``, with offsets and
+  batched token counts
+
+    python -m benchmarks.chunking --megabytes 10 --repeats 3
+
+The engine uses the BGE-M3 fast tokenizer when ``transformers`` and the
+tokenizer files are available; the output reports whether counts were exact.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.corpus import synthetic_text
+from benchmarks.stats import summarize
+
+
+def synthetic_document(megabytes: float, seed: int) -> str:
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    parts: List[str] = []
+    size, page = 0, 1
+    while size < target:
+        page_parts = [f"[Page {page}]"]
+        for _ in range(rng.randint(3, 8)):
+            page_parts.append(synthetic_text(rng, rng.randint(20, 220)))
+        page_text = "\n\n".join(page_parts)
+        parts.append(page_text)
+        size += len(page_text) + 2
+        page += 1
+    return "\n\n".join(parts)
+
+
+def word_windows(text: str, chunk_size: int = 512, overlap: int = 50) -> List[Dict[str, Any]]:
+    chunks = []
+    words = text.split()
+    step = max(1, chunk_size - overlap)
+    for i in range(0, len(words), step):
+        chunk_words = words[i:i + chunk_size]
+        chunk_text = " ".join(chunk_words)
+        if chunk_text.strip():
+            chunks.append({"content": chunk_text, "start_word": i, "word_count": len(chunk_words)})
+    return chunks
+
+
+def segment_packing(text: str, chunk_size: int = 512, overlap: int = 64, separator: str = "\n\n") -> List[Dict[str, Any]]:
+    def count_tokens(value: str) -> int:
+        return int(len(value.split()) * 1.3)
+
+    segments = text.split(separator)
+    chunks: List[Dict[str, Any]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for segment in segments:
+        segment = segment.strip()
+        if not segment:
+            continue
+        segment_tokens = count_tokens(segment)
+        if current_tokens + segment_tokens > chunk_size and current:
+            chunk_text = separator.join(current)
+            chunks.append({"content": chunk_text, "token_count": count_tokens(chunk_text)})
+            overlap_tokens, overlap_segments = 0, []
+            for item in reversed(current):
+                item_tokens = count_tokens(item)
+                if overlap_tokens + item_tokens > overlap:
+                    break
+                overlap_segments.insert(0, item)
+                overlap_tokens += item_tokens
+            current, current_tokens = overlap_segments, overlap_tokens
+        current.append(segment)
+        current_tokens += segment_tokens
+    if current:
+        chunk_text = separator.join(current)
+        chunks.append({"content": chunk_text, "token_count": count_tokens(chunk_text)})
+    return chunks
+
+
+def measure(name: str, chunker: Callable[[str], List[Dict[str, Any]]], text: str, repeats: int) -> Dict[str, Any]:
+    durations = []
+    chunks: List[Dict[str, Any]] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        durations.append(time.perf_counter() - start)
+    best = min(durations)
+    result = {
+        "chunks": len(chunks),
+        "latency": summarize(durations),
+        "chunks_per_second": round(len(chunks) / best, 1),
+        "megabytes_per_second": round(len(text) / 1024 / 1024 / best, 2),
+    }
+    print(f"{name:16s} {len(chunks):6d} chunks, best {best:.2f}s, {result['chunks_per_second']} chunks/s", file=sys.stderr)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=10.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--chunk-tokens", type=int, default=512)
+    parser.add_argument("--overlap-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app.services.chunking import ChunkingEngine
+
+    text = synthetic_document(args.megabytes, args.seed)
+    engine = ChunkingEngine()
+    # Load the tokenizer outside the measurement
+    exact = engine.counter.exact
+
+    results = {
+        "word_windows": measure("word_windows", lambda value: word_windows(value, args.chunk_tokens), text, args.repeats),
+        "segment_packing": measure(
+            "segment_packing", lambda value: segment_packing(value, args.chunk_tokens, args.overlap_tokens), text, args.repeats
+        ),
+        "engine": measure("engine", lambda value: engine.chunk(value, args.chunk_tokens, args.overlap_tokens), text, args.repeats),
+    }
+    print(json.dumps({
+        "characters": len(text),
+        "tokenizer": engine.counter.model_name if exact else "estimate",
+        "chunk_tokens": args.chunk_tokens,
+        "overlap_tokens": args.overlap_tokens,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Synthetic corpus for benchmarks.
+
+Documents and chunks are generated from a fixed vocabulary with a seeded RNG,
+so the same ``--documents/--chunks-per-document/--seed`` always produces the
+same rows. Embeddings are random unit vectors of the ``document_chunks``
+column's dimension; they exercise the ANN index without loading a model.
+All rows are tagged with ``meta_data.benchmark`` and a ``bench-`` filename
+prefix so they can be removed again with ``purge_corpus``.
+"""
+
+import hashlib
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import delete, insert, or_, select
+
+VOCABULARY = (
+    "Wartung Installation Kiosk Terminal Firmware Gehäuse Display Touchscreen Netzteil Lieferung "
+    "Rechnung Angebot Kunde Reklamation Garantie Prüfung Qualität Produktion Montage Schraube "
+    "Kabel Anschluss Treiber Update Sicherheit Zertifikat Handbuch Anleitung Ersatzteil Lager "
+    "Bestellung Vertrag Projekt Termin Support Ticket Fehler Diagnose Temperatur Lüfter "
+    "Mainboard Speicher Festplatte Netzwerk Drucker Scanner Kamera Software Lizenz Schulung"
+).split()
+
+BENCHMARK_PREFIX = "bench-"
+
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 16))
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def sample_queries(seed: int, count: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    return [" ".join(rng.sample(VOCABULARY, rng.randint(1, 3))) for _ in range(count)]
+
+
+def _unit_vectors(rng: np.random.Generator, count: int, dimensions: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def seed_corpus(
+    db,
+    owner_id: uuid.UUID,
+    documents: int,
+    chunks_per_document: int,
+    seed: int = 42,
+    words_per_chunk: int = 120,
+    batch_size: int = 50,
+    with_chunks: bool = True,
+) -> Dict[str, int]:
+    """Insert the synthetic corpus with a sync Session; existing benchmark rows are kept.
+
+    ``with_chunks=False`` only stores the documents (with full ``content``),
+    which is enough for listing benchmarks and much faster at 100k rows.
+    """
+    from app.models import Department, Document, DocumentChunk, FileType
+
+    dimensions = DocumentChunk.__table__.c.embedding.type.dim
+    rng = random.Random(seed)
+    vector_rng = np.random.default_rng(seed)
+    departments = list(Department)
+    created = datetime.utcnow()
+
+    existing = set(
+        db.execute(
+            select(Document.file_hash).where(Document.filename.like(f"{BENCHMARK_PREFIX}{seed}-%"))
+        ).scalars()
+    )
+
+    inserted_documents = 0
+    inserted_chunks = 0
+    for start in range(0, documents, batch_size):
+        document_rows = []
+        chunk_rows = []
+        for index in range(start, min(start + batch_size, documents)):
+            filename = f"{BENCHMARK_PREFIX}{seed}-{index:06d}.txt"
+            file_hash = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+            # Keep the RNG streams aligned whether or not the row already exists
+            chunks = [synthetic_text(rng, words_per_chunk) for _ in range(chunks_per_document)]
+            vectors = _unit_vectors(vector_rng, chunks_per_document, dimensions) if with_chunks else []
+            if file_hash in existing:
+                continue
+
+            document_id = uuid.uuid4()
+            content = "\n\n".join(chunks)
+            document_rows.append({
+                "id": document_id,
+                "filename": filename,
+                "original_filename": filename,
+                "file_path": f"/benchmarks/{filename}",
+                "file_type": FileType.TEXT,
+                "file_size": len(content.encode("utf-8")),
+                "mime_type": "text/plain",
+                "file_hash": file_hash,
+                "title": f"Benchmark-Dokument {index}",
+                "content": content,
+                "language": "de",
+                "meta_data": {"benchmark": True, "seed": seed},
+                "department": departments[index % len(departments)],
+                "uploaded_by": owner_id,
+                "processed": True,
+                "created_at": created - timedelta(minutes=index),
+                "updated_at": created - timedelta(minutes=index),
+            })
+            for chunk_index, (text, vector) in enumerate(zip(chunks, vectors)):
+                chunk_rows.append({
+                    "id": uuid.uuid4(),
+                    "document_id": document_id,
+                    "chunk_index": chunk_index,
+                    "content": text,
+                    "content_length": len(text),
+                    "embedding": vector.tolist(),
+                    "meta_data": {"benchmark": True},
+                    "token_count": len(text.split()),
+                })
+
+        if document_rows:
+            db.execute(insert(Document), document_rows)
+            if chunk_rows:
+                db.execute(insert(DocumentChunk), chunk_rows)
+            db.commit()
+            inserted_documents += len(document_rows)
+            inserted_chunks += len(chunk_rows)
+
+    return {
+        "documents": inserted_documents,
+        "chunks": inserted_chunks,
+        "skipped_documents": documents - inserted_documents,
+        "embedding_dimensions": dimensions,
+    }
+
+
+def purge_corpus(db) -> int:
+    """Delete every benchmark document, including uploads made by the suite."""
+    from app.models import Document, DocumentChunk, DocumentChunkTerm, DocumentChunkVector, DocumentEmbedding
+
+    # Uploads are stored under a generated name, so match the original one too
+    is_benchmark = or_(
+        Document.filename.like(f"{BENCHMARK_PREFIX}%"),
+        Document.original_filename.like(f"{BENCHMARK_PREFIX}%"),
+    )
+    benchmark_documents = select(Document.id).where(is_benchmark)
+    db.execute(delete(DocumentEmbedding).where(DocumentEmbedding.document_id.in_(benchmark_documents)))
+    db.execute(delete(DocumentChunkTerm).where(DocumentChunkTerm.document_id.in_(benchmark_documents)))
+    db.execute(delete(DocumentChunkVector).where(DocumentChunkVector.document_id.in_(benchmark_documents)))
+    db.execute(delete(DocumentChunk).where(DocumentChunk.document_id.in_(benchmark_documents)))
+    result = db.execute(delete(Document).where(is_benchmark), execution_options={"synchronize_session": False})
+    db.commit()
+    return result.rowcount or 0
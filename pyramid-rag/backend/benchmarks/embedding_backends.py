@@ -0,0 +1,114 @@
+"""Embedding backend throughput benchmark.
+
+Embeds the same synthetic chunks with each ``EMBEDDING_BACKEND``, each in a
+fresh process so that load time, threads and peak RSS are its own:
+
+* ``torch``: the fp32 SentenceTransformer
+* ``onnx``: the int8 model exported by ``export_onnx_model.py export``
+
+    python -m benchmarks.embedding_backends --chunks 2000 --chunk-words 300 --threads 8
+
+Reports chunks/second over ``--repeats`` passes after one warm-up batch,
+together with load time and peak RSS. ``--threads`` sets
+``EMBEDDING_THREADS`` for both backends; leave it out to use the node's
+physical core count.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.corpus import synthetic_text
+from benchmarks.stats import summarize
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BACKENDS = ("torch", "onnx")
+
+
+def synthetic_chunks(count: int, words: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [synthetic_text(rng, rng.randint(words // 2, words)) for _ in range(count)]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs inside the measured child process; EMBEDDING_BACKEND is already set."""
+    from app.services.bge_m3_embedding_service import get_embedding_model
+    from app.services.onnx_backend import embedding_threads
+
+    chunks = synthetic_chunks(args.chunks, args.chunk_words, args.seed)
+    start = time.perf_counter()
+    model = get_embedding_model()
+    load_seconds = time.perf_counter() - start
+    model.encode(chunks[:args.batch_size], batch_size=args.batch_size, normalize_embeddings=True)
+
+    durations = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        model.encode(chunks, batch_size=args.batch_size, normalize_embeddings=True)
+        durations.append(time.perf_counter() - start)
+    best = min(durations)
+    return {
+        "threads": embedding_threads(),
+        "load_seconds": round(load_seconds, 2),
+        "pass_latency": summarize(durations),
+        "chunks_per_second": round(len(chunks) / best, 1),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_child(backend: str, args: argparse.Namespace) -> Dict[str, Any]:
+    env = {**os.environ, "EMBEDDING_BACKEND": backend, "EMBEDDING_DEVICE": "cpu"}
+    if args.threads:
+        env["EMBEDDING_THREADS"] = str(args.threads)
+    command = [
+        sys.executable, "-m", "benchmarks.embedding_backends", "--child",
+        "--chunks", str(args.chunks), "--chunk-words", str(args.chunk_words),
+        "--batch-size", str(args.batch_size), "--repeats", str(args.repeats), "--seed", str(args.seed),
+    ]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"}
+    return json.loads(completed.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunk-words", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args)))
+        return
+
+    results = {}
+    for backend in args.backends:
+        results[backend] = run_child(backend, args)
+        print(f"{backend:6s} {results[backend]}", file=sys.stderr)
+    if all("chunks_per_second" in results.get(backend, {}) for backend in BACKENDS):
+        results["onnx_speedup"] = round(results["onnx"]["chunks_per_second"] / results["torch"]["chunks_per_second"], 2)
+
+    print(json.dumps({
+        "chunks": args.chunks,
+        "chunk_words": args.chunk_words,
+        "batch_size": args.batch_size,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
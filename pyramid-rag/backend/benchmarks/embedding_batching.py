@@ -0,0 +1,148 @@
+"""Embedding batch planning benchmark: padding waste and tokens/second.
+
+Builds a mixed-length chunk set shaped like structure-aware chunking output:
+full body chunks near the chunk size, short headings, list items and table
+rows, and medium-length section tails, shuffled per document. It then batches
+the set three ways:
+
+* ``fixed_document_order``: ``--batch-size`` chunks in document order
+* ``fixed_sorted``: ``--batch-size`` chunks after a length sort, which is
+  what SentenceTransformer.encode does inside a single call
+* ``token_budget``: ``app.services.embedding_batches.plan_batches`` with
+  ``--token-budget`` padded tokens and at most ``--max-batch-size`` chunks
+
+    python -m benchmarks.embedding_batching --chunks 2000 --token-budget 16384
+    python -m benchmarks.embedding_batching --chunks 1000 --measure
+
+For each plan it reports real tokens, padded tokens, the padding share and
+the batch count; these need no model. ``--measure`` loads the configured
+embedding model (``EMBEDDING_BACKEND``), encodes every plan batch by batch
+over ``--repeats`` passes and adds real tokens/second and the speedup over
+``fixed_document_order``.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.corpus import synthetic_text
+from benchmarks.stats import summarize
+
+# Share of chunks and their length range in words (about 1.3 BGE-M3 tokens per word)
+CHUNK_MIX = (
+    (0.55, 280, 390),  # body chunks near the 512-token chunk size
+    (0.25, 4, 40),  # headings, list items, table rows
+    (0.20, 40, 280),  # section and document tails
+)
+
+
+def mixed_chunks(count: int, chunks_per_document: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    chunks = []
+    while len(chunks) < count:
+        document = []
+        for _ in range(min(chunks_per_document, count - len(chunks))):
+            pick = rng.random()
+            for share, low, high in CHUNK_MIX:
+                if pick < share:
+                    break
+                pick -= share
+            document.append(synthetic_text(rng, rng.randint(low, high)))
+        rng.shuffle(document)
+        chunks.extend(document)
+    return chunks
+
+
+def fixed_batches(order: List[int], batch_size: int) -> List[List[int]]:
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def plans(lengths: List[int], args: argparse.Namespace) -> Dict[str, List[List[int]]]:
+    from app.services.embedding_batches import plan_batches
+
+    indices = list(range(len(lengths)))
+    return {
+        "fixed_document_order": fixed_batches(indices, args.batch_size),
+        "fixed_sorted": fixed_batches(sorted(indices, key=lambda index: -lengths[index]), args.batch_size),
+        "token_budget": plan_batches(lengths, args.token_budget, args.max_batch_size),
+    }
+
+
+def measure(model, texts: List[str], batches: List[List[int]], repeats: int) -> List[float]:
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for batch in batches:
+            model.encode(
+                [texts[index] for index in batch],
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--chunks-per-document", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=16384)
+    parser.add_argument("--max-batch-size", type=int, default=128)
+    parser.add_argument("--measure", action="store_true", help="Load the embedding model and time each plan")
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app.services.chunking import get_chunking_engine
+    from app.services.embedding_batches import padded_tokens, token_lengths
+
+    texts = mixed_chunks(args.chunks, args.chunks_per_document, args.seed)
+    model = None
+    if args.measure:
+        from app.services.bge_m3_embedding_service import get_embedding_model
+
+        model = get_embedding_model()
+        lengths = token_lengths(model, texts)
+    else:
+        lengths = token_lengths(None, texts)
+    real = sum(lengths)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, batches in plans(lengths, args).items():
+        padded = padded_tokens(lengths, batches)
+        results[name] = {
+            "batches": len(batches),
+            "real_tokens": real,
+            "padded_tokens": padded,
+            "padding_share": round(1 - real / padded, 4),
+        }
+        if model is not None:
+            # Warm-up on the first batch so one-time allocation is not charged to a plan
+            measure(model, texts, batches[:1], 1)
+            durations = measure(model, texts, batches, args.repeats)
+            results[name]["pass_latency"] = summarize(durations)
+            results[name]["tokens_per_second"] = round(real / min(durations), 1)
+        print(f"{name:22s} {results[name]}", file=sys.stderr)
+
+    if model is not None:
+        baseline = results["fixed_document_order"]["tokens_per_second"]
+        for name in results:
+            results[name]["speedup"] = round(results[name]["tokens_per_second"] / baseline, 2)
+
+    print(json.dumps({
+        "chunks": len(texts),
+        "batch_size": args.batch_size,
+        "token_budget": args.token_budget,
+        "max_batch_size": args.max_batch_size,
+        "token_counts": "exact" if model is not None or get_chunking_engine().counter.exact else "estimated",
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
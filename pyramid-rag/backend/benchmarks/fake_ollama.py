@@ -0,0 +1,234 @@
+"""Deterministic stand-in for the Ollama HTTP API.
+
+Serves the subset of endpoints the backend uses (``/api/tags``,
+``/api/generate``, ``/api/chat``, ``/api/embeddings``, ``/api/embed``) with
+the canned answers and hash-seeded embeddings of ``MockOllamaClient``.
+Generation streams one word per token at ``--tokens-per-second`` after a
+prefill delay proportional to the prompt length, and the final message
+carries Ollama's nanosecond timing counters so stage metrics stay realistic.
+Like Ollama's runner, it keeps the last prompt (plus its answer) as a single
+cached slot and only charges prefill for tokens after the common prefix
+(``--no-prefix-cache`` disables this):
+
+    python -m benchmarks.fake_ollama --port 11500 --tokens-per-second 30
+
+The backend is pointed at it with ``OLLAMA_BASE_URL=http://localhost:11500``.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.ollama_client import MockOllamaClient
+
+DEFAULT_MODELS = ("qwen2.5:7b", "bge-m3:latest")
+
+
+def _prompt_tokens(text: str) -> int:
+    return max(1, len(text.split()))
+
+
+def _last_user_message(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return message.get("content", "")
+    return ""
+
+
+def _question(prompt: str) -> str:
+    return prompt.rsplit("Frage:", 1)[-1].split("\n", 1)[0].strip() or prompt[-80:]
+
+
+def _common_prefix(left: List[str], right: List[str]) -> int:
+    length = 0
+    for a, b in zip(left, right):
+        if a != b:
+            break
+        length += 1
+    return length
+
+
+def create_app(
+    tokens_per_second: float = 30.0,
+    prefill_tokens_per_second: float = 1500.0,
+    max_tokens: int = 200,
+    embedding_dimensions: int = 768,
+    models: tuple = DEFAULT_MODELS,
+    prefix_cache: bool = True,
+) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    cached_tokens: List[str] = []
+
+    def answer_tokens(query: str, num_predict: Optional[int]) -> List[str]:
+        words = MockOllamaClient.demo_response(query).split()
+        limit = min(num_predict or max_tokens, max_tokens)
+        tokens = [(" " if index else "") + word for index, word in enumerate(words)]
+        while len(tokens) < limit:
+            tokens.extend(f" {word}" for word in words)
+        return tokens[:limit]
+
+    def timings(prompt_tokens: int, eval_count: int, prefill: float, decode: float) -> Dict[str, Any]:
+        return {
+            "total_duration": int((prefill + decode) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": int(decode * 1e9),
+        }
+
+    async def generate(prompt: str, query: str, options: Dict[str, Any], message_key: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        words = prompt.split()
+        reused = _common_prefix(words, cached_tokens) if prefix_cache else 0
+        prompt_tokens = max(1, len(words) - reused)
+        prefill = prompt_tokens / prefill_tokens_per_second
+        await asyncio.sleep(prefill)
+
+        tokens = answer_tokens(query, options.get("num_predict"))
+        cached_tokens[:] = words + "".join(tokens).split()
+        decode_start = time.perf_counter()
+        for token in tokens:
+            await asyncio.sleep(1 / tokens_per_second)
+            if message_key:
+                yield {"message": {"role": "assistant", "content": token}, "done": False}
+            else:
+                yield {"response": token, "done": False}
+
+        final = {"done": True, "done_reason": "stop"}
+        final.update(timings(prompt_tokens, len(tokens), prefill, time.perf_counter() - decode_start))
+        if message_key:
+            final["message"] = {"role": "assistant", "content": ""}
+        else:
+            final["response"] = ""
+        yield final
+
+    async def respond(payload: Dict[str, Any], prompt: str, query: str, message_key: Optional[str]):
+        options = dict(payload.get("options") or {})
+        if "num_predict" in payload:
+            options["num_predict"] = payload["num_predict"]
+        events = generate(prompt, query, options, message_key)
+        base = {"model": payload.get("model", models[0]), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+        if payload.get("stream", True):
+            async def body():
+                async for event in events:
+                    yield json.dumps({**base, **event}) + "\n"
+
+            return StreamingResponse(body(), media_type="application/x-ndjson")
+
+        text_parts: List[str] = []
+        final: Dict[str, Any] = {}
+        async for event in events:
+            if event.get("done"):
+                final = event
+            elif message_key:
+                text_parts.append(event["message"]["content"])
+            else:
+                text_parts.append(event["response"])
+        if message_key:
+            final["message"] = {"role": "assistant", "content": "".join(text_parts)}
+        else:
+            final["response"] = "".join(text_parts)
+        return JSONResponse({**base, **final})
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name, "model": name} for name in models]}
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.post("/api/generate")
+    async def api_generate(request: Request):
+        payload = await request.json()
+        prompt = payload.get("prompt", "")
+        return await respond(payload, prompt, _question(prompt), message_key=None)
+
+    @app.post("/api/chat")
+    async def api_chat(request: Request):
+        payload = await request.json()
+        messages = payload.get("messages") or []
+        # Stand-in for the chat template: role markers around every message
+        prompt = "\n".join(f"<{message.get('role', 'user')}> {message.get('content', '')}" for message in messages)
+        return await respond(payload, prompt, _question(_last_user_message(messages)), message_key="message")
+
+    @app.post("/api/embeddings")
+    async def api_embeddings(request: Request):
+        payload = await request.json()
+        return {"embedding": MockOllamaClient.demo_embedding(payload.get("prompt", ""), embedding_dimensions)}
+
+    @app.post("/api/embed")
+    async def api_embed(request: Request):
+        payload = await request.json()
+        inputs = payload.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return {
+            "model": payload.get("model", models[-1]),
+            "embeddings": [MockOllamaClient.demo_embedding(text, embedding_dimensions) for text in inputs],
+        }
+
+    return app
+
+
+class FakeOllamaServer:
+    """Runs the fake server on a background thread for the duration of a ``with`` block."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11500, **app_options: Any) -> None:
+        self.host = host
+        self.port = port
+        config = uvicorn.Config(create_app(**app_options), host=host, port=port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Fake Ollama failed to start on port {self.port}")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-second", type=float, default=30.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=1500.0)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--embedding-dimensions", type=int, default=768)
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Charge prefill for the whole prompt every time")
+    args = parser.parse_args()
+
+    app = create_app(
+        tokens_per_second=args.tokens_per_second,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        max_tokens=args.max_tokens,
+        embedding_dimensions=args.embedding_dimensions,
+        prefix_cache=not args.no_prefix_cache,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Login storm benchmark.
+
+Measures login throughput and search latency against a running API while a
+burst of logins is in flight, e.g. the 8 a.m. rush:
+
+    python -m benchmarks.login_storm --base-url http://localhost:18000 \
+        --email admin@pyramid-computer.de --password "$ADMIN_PASSWORD"
+
+Search latency is sampled twice: once on an idle server and once while the
+storm runs. With password hashing on the event loop the second set of
+percentiles grows by roughly the bcrypt cost per queued login.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.stats import summarize
+
+
+async def login_once(client: httpx.AsyncClient, email: str, password: str) -> httpx.Response:
+    return await client.post("/api/v1/auth/login", json={"email": email, "password": password})
+
+
+async def search_loop(client: httpx.AsyncClient, token: str, query: str, stop: asyncio.Event) -> List[float]:
+    latencies: List[float] = []
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.post("/api/v1/search/", json={"query": query, "limit": 5}, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> Dict[str, object]:
+    limits = httpx.Limits(max_connections=args.concurrency + args.searchers + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60.0, limits=limits) as client:
+        response = await login_once(client, args.email, args.password)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        stop = asyncio.Event()
+        searchers = [asyncio.create_task(search_loop(client, token, args.query, stop)) for _ in range(args.searchers)]
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle_latencies = [value for task in searchers for value in await task]
+
+        stop = asyncio.Event()
+        searchers = [asyncio.create_task(search_loop(client, token, args.query, stop)) for _ in range(args.searchers)]
+        semaphore = asyncio.Semaphore(args.concurrency)
+        statuses: Dict[int, int] = {}
+
+        async def storm_login() -> None:
+            async with semaphore:
+                result = await login_once(client, args.email, args.password)
+                statuses[result.status_code] = statuses.get(result.status_code, 0) + 1
+
+        storm_start = time.perf_counter()
+        await asyncio.gather(*(storm_login() for _ in range(args.logins)))
+        storm_seconds = time.perf_counter() - storm_start
+        stop.set()
+        storm_latencies = [value for task in searchers for value in await task]
+
+    return {
+        "logins": args.logins,
+        "login_concurrency": args.concurrency,
+        "login_status_codes": statuses,
+        "storm_seconds": round(storm_seconds, 3),
+        "logins_per_second": round(args.logins / storm_seconds, 2) if storm_seconds else None,
+        "search_idle": summarize(idle_latencies),
+        "search_during_storm": summarize(storm_latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:18000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--searchers", type=int, default=4)
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--query", default="Wartung")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Prefill benchmark for multi-turn MCP chats.
+
+Runs the same conversations through ``MCPGateway.stream_chat`` once per
+Ollama transport. ``generate`` rebuilds a single ``/api/generate`` prompt
+every turn. ``chat`` sends ``/api/chat`` messages with a stable prefix and
+``keep_alive``. For each turn it reports Ollama's prefill time, the prompt
+tokens actually evaluated, and the client-side time to first token:
+
+    python -m benchmarks.prefix_cache --ollama-url http://localhost:11434 --turns 5
+
+Without ``--ollama-url``, the fake server from ``benchmarks.fake_ollama`` is
+started. It models Ollama's single-slot prefix cache. Each conversation
+pins one synthetic upload and gets fresh synthetic retrieval results on
+every turn, as a knowledge-base search would. No database is needed.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from contextlib import ExitStack
+from typing import Any, Dict, List
+
+from benchmarks.corpus import sample_queries, synthetic_text
+from benchmarks.stats import summarize
+
+TRANSPORTS = ("generate", "chat")
+
+
+class SyntheticVectorStore:
+    """Returns three query-seeded chunks, so retrieval differs on every turn."""
+
+    def __init__(self, words_per_chunk: int) -> None:
+        self.words_per_chunk = words_per_chunk
+
+    async def hybrid_search(self, query: str, **_: Any) -> List[Dict[str, Any]]:
+        rng = random.Random(query)
+        return [
+            {
+                "document_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "document_title": f"Handbuch {index + 1}",
+                "chunk_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "chunk_content": synthetic_text(rng, self.words_per_chunk),
+                "hybrid_score": 1.0 / (index + 1),
+            }
+            for index in range(3)
+        ]
+
+
+async def run_conversation(base_url: str, transport: str, questions: List[str], upload: str, words_per_chunk: int) -> List[Dict[str, Any]]:
+    from app.ollama_client import OllamaClient
+    from app.services import mcp_gateway
+    from app.services.conversation_store import ConversationStore
+
+    mcp_gateway.OLLAMA_TRANSPORT = transport
+    client = OllamaClient(base_url=base_url)
+    gateway = mcp_gateway.MCPGateway(
+        db_session=None,
+        ollama_client=client,
+        vector_store=SyntheticVectorStore(words_per_chunk),
+        conversation_store=ConversationStore(),
+    )
+    session_id = str(uuid.uuid4())
+    uploads = [{"id": session_id, "title": "Wartungsbericht", "content": upload}]
+
+    turns = []
+    try:
+        for index, question in enumerate(questions):
+            start = time.perf_counter()
+            first_token = None
+            payload: Dict[str, Any] = {}
+            async for event in gateway.stream_chat(
+                messages=[{"role": "user", "content": question}],
+                session_id=session_id,
+                user_id="bench",
+                department="Support",
+                context_payload={"uploaded_documents": uploads if index == 0 else []},
+            ):
+                if event["type"] == "chunk" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif event["type"] == "complete":
+                    payload = event["payload"]
+                elif event["type"] == "error":
+                    raise RuntimeError(event.get("error"))
+            stats = payload.get("metadata", {}).get("llm_stats", {})
+            turns.append({
+                "ttft_seconds": first_token,
+                "prefill_seconds": stats.get("prefill_seconds"),
+                "prompt_tokens": stats.get("prompt_tokens"),
+            })
+    finally:
+        await client.close()
+    return turns
+
+
+def aggregate(conversations: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    rows = []
+    for turn in range(len(conversations[0])):
+        samples = [conversation[turn] for conversation in conversations]
+        prefill = [s["prefill_seconds"] for s in samples if s["prefill_seconds"] is not None]
+        ttft = [s["ttft_seconds"] for s in samples if s["ttft_seconds"] is not None]
+        tokens = [s["prompt_tokens"] for s in samples if s["prompt_tokens"] is not None]
+        rows.append({
+            "turn": turn + 1,
+            "prefill": summarize(prefill) if prefill else None,
+            "ttft": summarize(ttft) if ttft else None,
+            "prompt_tokens_mean": round(sum(tokens) / len(tokens), 1) if tokens else None,
+        })
+    return rows
+
+
+async def run(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    conversations = [
+        (sample_queries(args.seed + index, args.turns), synthetic_text(rng, args.upload_words))
+        for index in range(args.conversations)
+    ]
+    results: Dict[str, Any] = {}
+    for transport in TRANSPORTS:
+        runs = [
+            await run_conversation(base_url, transport, questions, upload, args.chunk_words)
+            for questions, upload in conversations
+        ]
+        rows = aggregate(runs)
+        first, last = rows[0], rows[-1]
+        results[transport] = {
+            "turns": rows,
+            f"prefill_p50_turn_1_vs_{args.turns}_ms": [
+                first["prefill"]["p50_ms"] if first["prefill"] else None,
+                last["prefill"]["p50_ms"] if last["prefill"] else None,
+            ],
+        }
+        print(f"{transport:9s} prefill p50 turn 1 / turn {args.turns}: "
+              f"{results[transport][f'prefill_p50_turn_1_vs_{args.turns}_ms']} ms", file=sys.stderr)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ollama-url", help="Real Ollama to measure; the fake server is used when omitted")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--upload-words", type=int, default=300, help="Size of the pinned upload")
+    parser.add_argument("--chunk-words", type=int, default=80, help="Size of each retrieved chunk")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fake-port", type=int, default=11501)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=500.0)
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        base_url = args.ollama_url
+        if not base_url:
+            from benchmarks.fake_ollama import FakeOllamaServer
+
+            server = stack.enter_context(FakeOllamaServer(
+                port=args.fake_port,
+                tokens_per_second=200.0,
+                prefill_tokens_per_second=args.prefill_tokens_per_second,
+                max_tokens=60,
+            ))
+            base_url = server.base_url
+        results = asyncio.run(run(args, base_url))
+
+    print(json.dumps({
+        "ollama": args.ollama_url or "fake",
+        "turns": args.turns,
+        "conversations": args.conversations,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
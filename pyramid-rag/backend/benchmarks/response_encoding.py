@@ -0,0 +1,165 @@
+"""Response encoding benchmark: serialization CPU and bytes on the wire.
+
+Builds the three payloads that carry document text, with the same keys as the
+endpoints return:
+
+* ``upload``: the upload response with its 8,000-character ``content`` excerpt
+* ``document``: ``GET /documents/{id}`` with the whole ``content`` of a
+  ``--document-words`` document (also the shape of a duplicate upload)
+* ``context_search``: ``POST /search/context`` with ``--results`` hits, each
+  with ``--context-window`` chunks on either side and their ``full_context``
+
+    python -m benchmarks.response_encoding
+    python -m benchmarks.response_encoding --document-words 60000 --repeats 200
+
+For each payload it times ``jsonable_encoder`` + ``JSONResponse`` (the
+previous path) against ``json_response`` (orjson) and reports raw, gzip and,
+when the ``brotli`` package is installed, brotli sizes with compression
+time. The same numbers are reported for the payload after the ``fields=``
+projection a lean client would send.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from benchmarks.corpus import synthetic_text
+from benchmarks.stats import summarize
+
+# What a client that does not render the text would request
+PROJECTIONS = {
+    "upload": "-content",
+    "document": "-content",
+    "context_search": "-results.full_context",
+}
+
+
+def chunk(rng: random.Random, index: int) -> Dict[str, Any]:
+    return {"chunk_id": str(uuid.uuid4()), "chunk_index": index, "content": synthetic_text(rng, rng.randint(250, 380))}
+
+
+def payloads(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    created = datetime(2026, 10, 18, 9, 30)
+    text = synthetic_text(rng, args.document_words)
+    document_id = uuid.uuid4()
+    user_id = uuid.uuid4()
+    common = {
+        "title": "Wartungshandbuch Terminal X200",
+        "filename": f"{document_id}.pdf",
+        "original_filename": "Wartungshandbuch_X200.pdf",
+        "file_type": "pdf",
+        "file_size": len(text) * 2,
+        "mime_type": "application/pdf",
+        "content_preview": text[:200] + "...",
+        "content_length": len(text),
+        "meta_data": {"allowed_departments": ["Service", "Technik"], "scope": "GLOBAL", "pages": 48},
+        "processed": True,
+    }
+
+    upload = dict(common, success=True, message="Dokument in der Firmendatenbank gespeichert.", duplicate=False,
+                  document_id=str(document_id), content=text[:8000], uploaded_by=str(user_id),
+                  created_at=created.isoformat(), updated_at=created.isoformat(), chunks_created=96,
+                  embeddings_generated=True, processing_time=4.21, language="de", scope="GLOBAL")
+    # The document endpoint hands over native types; orjson serializes them without a conversion pass
+    document = dict(common, id=document_id, content=text, uploaded_by=user_id, created_at=created,
+                    updated_at=created + timedelta(minutes=3), department="Service", scope="GLOBAL",
+                    chunks_created=96, embeddings_generated=True, processing_time=4.21)
+
+    results = []
+    for hit in range(args.results):
+        start = rng.randint(0, 80)
+        chunks = [chunk(rng, start + offset) for offset in range(2 * args.context_window + 1)]
+        results.append({
+            "document_id": str(uuid.uuid4()),
+            "document_title": f"Dokument {hit}",
+            "filename": f"dokument_{hit}.pdf",
+            "similarity_score": round(0.9 - hit * 0.02, 4),
+            "hybrid_score": round(0.8 - hit * 0.02, 4),
+            "main_chunk": chunks[args.context_window],
+            "context_before": chunks[:args.context_window],
+            "context_after": chunks[args.context_window + 1:],
+            "full_context": "\n\n".join(item["content"] for item in chunks),
+            "total_context_chunks": len(chunks),
+            "context_window_used": args.context_window,
+        })
+    context_search = {
+        "query": "Wie wird der Kartenleser kalibriert?",
+        "mode": "hybrid",
+        "total_results": len(results),
+        "results": results,
+        "context_window": args.context_window,
+        "processing_time": 0.184,
+    }
+    return {"upload": upload, "document": document, "context_search": context_search}
+
+
+def timed(function: Callable[[], Any], repeats: int) -> List[float]:
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def wire(body: bytes, repeats: int) -> Dict[str, Any]:
+    from app.services import response_encoding
+
+    sizes: Dict[str, Any] = {"raw_bytes": len(body)}
+    encodings = ["gzip"] + (["br"] if response_encoding.HAS_BROTLI else [])
+    for encoding in encodings:
+        compressed = response_encoding.compress(body, encoding)
+        sizes[f"{encoding}_bytes"] = len(compressed)
+        sizes[f"{encoding}_ratio"] = round(len(compressed) / len(body), 4)
+        sizes[f"{encoding}_latency"] = summarize(timed(lambda: response_encoding.compress(body, encoding), repeats))
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--document-words", type=int, default=20000)
+    parser.add_argument("--results", type=int, default=10)
+    parser.add_argument("--context-window", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from app.services.response_encoding import HAS_BROTLI, json_response, parse_fields
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, payload in payloads(args).items():
+        baseline = summarize(timed(lambda: JSONResponse(jsonable_encoder(payload)).body, args.repeats))
+        fast = summarize(timed(lambda: json_response(payload).body, args.repeats))
+        fields = parse_fields(PROJECTIONS[name])
+        results[name] = {
+            "json_latency": baseline,
+            "orjson_latency": fast,
+            "serialization_speedup": round(baseline["mean_ms"] / fast["mean_ms"], 2) if fast["mean_ms"] else None,
+            "full": wire(json_response(payload).body, args.repeats),
+            "fields": PROJECTIONS[name],
+            "projected": wire(json_response(payload, fields).body, args.repeats),
+        }
+        print(f"{name:15s} {results[name]['full']['raw_bytes']} bytes, "
+              f"x{results[name]['serialization_speedup']} serialization", file=sys.stderr)
+
+    print(json.dumps({
+        "document_words": args.document_words,
+        "results_per_search": args.results,
+        "context_window": args.context_window,
+        "repeats": args.repeats,
+        "brotli": HAS_BROTLI,
+        "payloads": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Spreadsheet extraction benchmark.
+
+Writes a synthetic ERP-style export (an xlsx workbook and the same rows as
+CSV) and extracts it in a fresh process per run, so that each run's peak RSS
+is its own:
+
+* ``legacy``: ``openpyxl.load_workbook(data_only=True)`` walking every sheet,
+  as ``DocumentProcessor`` did before
+* ``streaming``: ``extract_spreadsheet`` on the workbook (read-only mode,
+  row iterators, header-prefixed row-group chunks)
+* ``streaming_csv``: ``extract_spreadsheet`` on the CSV file
+
+    python -m benchmarks.spreadsheet_extraction --rows 1000000
+
+The legacy mode needs several GB for a million rows; leave it out with
+``--modes streaming streaming_csv`` on small machines.
+"""
+
+import argparse
+import csv
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from benchmarks.corpus import synthetic_text
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MODES = ("legacy", "streaming", "streaming_csv")
+HEADER = ["Artikelnummer", "Bezeichnung", "Lieferant", "Menge", "Einzelpreis", "Lager", "Bemerkung"]
+
+
+def synthetic_rows(rows: int, seed: int):
+    rng = random.Random(seed)
+    suppliers = [f"Lieferant {index}" for index in range(50)]
+    for index in range(rows):
+        yield [
+            f"A-{index:08d}",
+            synthetic_text(rng, 3),
+            rng.choice(suppliers),
+            rng.randint(1, 500),
+            round(rng.uniform(0.5, 900.0), 2),
+            f"L{rng.randint(1, 40):02d}",
+            synthetic_text(rng, 6) if rng.random() < 0.3 else None,
+        ]
+
+
+def write_inputs(directory: Path, rows: int, seed: int) -> Dict[str, Path]:
+    import openpyxl
+
+    workbook_path, csv_path = directory / "export.xlsx", directory / "export.csv"
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Export")
+    sheet.append(HEADER)
+    with open(csv_path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle, delimiter=";")
+        writer.writerow(HEADER)
+        for row in synthetic_rows(rows, seed):
+            sheet.append(row)
+            writer.writerow(["" if value is None else value for value in row])
+    workbook.save(workbook_path)
+    return {"xlsx": workbook_path, "csv": csv_path}
+
+
+def extract(mode: str, path: Path, chunk_words: int) -> Dict[str, Any]:
+    """Runs inside the measured child process."""
+    start = time.perf_counter()
+    if mode == "legacy":
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(str(path), data_only=True)
+        parts, rows = [], 0
+        for sheet_name in workbook.sheetnames:
+            parts.append(f"[Sheet: {sheet_name}]")
+            for row in workbook[sheet_name].iter_rows(values_only=True):
+                row_text = "\t".join([str(cell) if cell is not None else "" for cell in row])
+                if row_text.strip():
+                    parts.append(row_text)
+                    rows += 1
+        content, chunks = "\n".join(parts), None
+        rows -= 1  # header
+    else:
+        from app.services.spreadsheet_extractor import extract_spreadsheet
+
+        result = extract_spreadsheet(path, chunk_words, max_rows=0, max_columns=0)
+        content, chunks, rows = result.content, len(result.chunks), result.metadata["rows"]
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "characters": len(content),
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(rows / seconds) if seconds else None,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_child(mode: str, path: Path, chunk_words: int) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.spreadsheet_extraction", "--child", mode, str(path), "--chunk-words", str(chunk_words)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"exit {completed.returncode}"}
+    return json.loads(completed.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--chunk-words", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(extract(args.child[0], Path(args.child[1]), args.chunk_words)))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="spreadsheet-bench-") as directory:
+        print(f"Writing {args.rows} rows ...", file=sys.stderr)
+        inputs = write_inputs(Path(directory), args.rows, args.seed)
+        results = {}
+        for mode in args.modes:
+            path = inputs["csv"] if mode == "streaming_csv" else inputs["xlsx"]
+            results[mode] = run_child(mode, path, args.chunk_words)
+            print(f"{mode:14s} {results[mode]}", file=sys.stderr)
+        sizes = {name: round(path.stat().st_size / 1024 / 1024, 1) for name, path in inputs.items()}
+
+    print(json.dumps({"rows": args.rows, "file_size_mb": sizes, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
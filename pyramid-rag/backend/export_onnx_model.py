@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Export and validate the int8 ONNX version of the embedding model.
+
+    python export_onnx_model.py export --quantization avx512_vnni
+    python export_onnx_model.py validate --texts sample.txt --min-cosine 0.99
+
+``export`` writes the ONNX graph and its dynamically quantized variant to
+ONNX_MODEL_DIR. ``validate`` embeds the same texts with the PyTorch model and
+the ONNX model. It reports per-text cosine agreement and whether each text
+keeps its nearest neighbour, and exits with status 1 when the lowest cosine
+is below ``--min-cosine``. Use ``avx2`` on CPUs without AVX-512 VNNI and
+``arm64`` on ARM nodes.
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.onnx_backend import (
+    ONNX_MODEL_DIR,
+    ONNX_QUANTIZATION,
+    export_quantized_model,
+    load_onnx_model,
+    quantized_file_name,
+)
+
+import logging
+import os
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_texts(path, count, seed):
+    if path:
+        content = Path(path).read_text(encoding="utf-8")
+        texts = [part.strip() for part in content.split("\n\n") if part.strip()]
+        return texts[:count] if count else texts
+    from benchmarks.corpus import synthetic_text
+
+    rng = random.Random(seed)
+    return [synthetic_text(rng, rng.randint(20, 300)) for _ in range(count)]
+
+
+def nearest_neighbours(embeddings):
+    similarities = embeddings @ embeddings.T
+    np.fill_diagonal(similarities, -np.inf)
+    return similarities.argmax(axis=1)
+
+
+def validate(args):
+    from sentence_transformers import SentenceTransformer
+
+    texts = load_texts(args.texts, args.count, args.seed)
+    logger.info(f"Embedding {len(texts)} texts with both backends")
+
+    reference = SentenceTransformer(args.model, device="cpu", trust_remote_code=True)
+    expected = reference.encode(texts, normalize_embeddings=True, batch_size=args.batch_size, convert_to_numpy=True)
+    del reference
+
+    quantized = load_onnx_model(Path(args.model_dir), quantized_file_name(args.quantization))
+    actual = quantized.encode(texts, normalize_embeddings=True, batch_size=args.batch_size, convert_to_numpy=True)
+
+    cosines = np.sum(expected * actual, axis=1)
+    same_neighbour = nearest_neighbours(expected) == nearest_neighbours(actual)
+    report = {
+        "texts": len(texts),
+        "quantization": args.quantization,
+        "cosine": {
+            "min": round(float(cosines.min()), 5),
+            "p1": round(float(np.percentile(cosines, 1)), 5),
+            "mean": round(float(cosines.mean()), 5),
+        },
+        "nearest_neighbour_agreement": round(float(same_neighbour.mean()), 4),
+        "min_cosine": args.min_cosine,
+        "passed": bool(cosines.min() >= args.min_cosine),
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if report["passed"] else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and validate the int8 ONNX embedding model")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3"))
+    parser.add_argument("--model-dir", default=str(ONNX_MODEL_DIR))
+    parser.add_argument("--quantization", default=ONNX_QUANTIZATION, choices=("arm64", "avx2", "avx512", "avx512_vnni"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("export", help="Export and quantize the model")
+
+    check = commands.add_parser("validate", help="Compare ONNX and PyTorch embeddings")
+    check.add_argument("--texts", help="UTF-8 file with texts separated by blank lines (default: synthetic German text)")
+    check.add_argument("--count", type=int, default=500)
+    check.add_argument("--batch-size", type=int, default=16)
+    check.add_argument("--min-cosine", type=float, default=0.99)
+    check.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_quantized_model(args.model, Path(args.model_dir), args.quantization)
+        return 0
+    return validate(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""documents keyset pagination index
+
+Revision ID: 3f6c2a9d1b7e
+Revises: d34f9b291c85
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6c2a9d1b7e'
+down_revision: Union[str, None] = 'd34f9b291c85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built concurrently so that listings stay available on large tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_documents_created_at_id',
+            'documents',
+            ['created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_documents_created_at_id',
+            table_name='documents',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
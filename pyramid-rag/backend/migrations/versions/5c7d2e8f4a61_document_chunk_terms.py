@@ -0,0 +1,40 @@
+"""document chunk sparse term postings
+
+Revision ID: 5c7d2e8f4a61
+Revises: 8b1e4d7c2a90
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '5c7d2e8f4a61'
+down_revision: Union[str, None] = '8b1e4d7c2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled at ingestion; existing documents get postings when they are reprocessed
+    op.create_table(
+        'document_chunk_terms',
+        sa.Column('chunk_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('token_id', sa.Integer(), nullable=False),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['chunk_id'], ['document_chunks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('chunk_id', 'token_id'),
+    )
+    op.create_index('ix_document_chunk_terms_token_id', 'document_chunk_terms', ['token_id'], unique=False)
+    op.create_index('ix_document_chunk_terms_document_id', 'document_chunk_terms', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunk_terms_document_id', table_name='document_chunk_terms')
+    op.drop_index('ix_document_chunk_terms_token_id', table_name='document_chunk_terms')
+    op.drop_table('document_chunk_terms')
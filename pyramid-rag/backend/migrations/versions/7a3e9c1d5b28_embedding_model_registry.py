@@ -0,0 +1,62 @@
+"""embedding model registry and shadow vectors
+
+Revision ID: 7a3e9c1d5b28
+Revises: 5c7d2e8f4a61
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import pgvector.sqlalchemy
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3e9c1d5b28'
+down_revision: Union[str, None] = '5c7d2e8f4a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'embedding_models',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('dimension', sa.Integer(), nullable=True),
+        sa.Column('status', sa.Enum('BUILDING', 'READY', 'ACTIVE', 'RETIRED', name='embeddingmodelstatus'), nullable=False),
+        sa.Column('rate_limit', sa.Float(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_by', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('build_started_at', sa.DateTime(), nullable=True),
+        sa.Column('build_completed_at', sa.DateTime(), nullable=True),
+        sa.Column('activated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+    )
+    # Untyped vector column: dimensions differ per model, each model's HNSW index casts to its own
+    op.create_table(
+        'document_chunk_vectors',
+        sa.Column('chunk_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('model_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('document_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('embedding', pgvector.sqlalchemy.Vector(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['chunk_id'], ['document_chunks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['model_id'], ['embedding_models.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('chunk_id', 'model_id'),
+    )
+    op.create_index('ix_document_chunk_vectors_model_id', 'document_chunk_vectors', ['model_id'], unique=False)
+    op.create_index('ix_document_chunk_vectors_document_id', 'document_chunk_vectors', ['document_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_document_chunk_vectors_document_id', table_name='document_chunk_vectors')
+    op.drop_index('ix_document_chunk_vectors_model_id', table_name='document_chunk_vectors')
+    op.drop_table('document_chunk_vectors')
+    op.drop_table('embedding_models')
+    op.execute("DROP TYPE IF EXISTS embeddingmodelstatus")
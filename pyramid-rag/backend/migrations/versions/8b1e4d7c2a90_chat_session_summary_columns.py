@@ -0,0 +1,47 @@
+"""chat session summary columns
+
+Revision ID: 8b1e4d7c2a90
+Revises: 3f6c2a9d1b7e
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e4d7c2a90'
+down_revision: Union[str, None] = '3f6c2a9d1b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_sessions', sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('chat_sessions', sa.Column('last_message_at', sa.DateTime(), nullable=True))
+
+    # One-off backfill; afterwards the ChatMessage insert/delete hooks keep these current
+    op.execute(
+        """
+        UPDATE chat_sessions AS s
+        SET message_count = m.message_count,
+            last_message_at = m.last_message_at
+        FROM (
+            SELECT session_id, count(*) AS message_count, max(created_at) AS last_message_at
+            FROM chat_messages
+            GROUP BY session_id
+        ) AS m
+        WHERE m.session_id = s.id
+        """
+    )
+    # Keyset pagination compares (updated_at, id); NULLs would drop out of the sidebar
+    op.execute("UPDATE chat_sessions SET updated_at = COALESCE(last_message_at, created_at, now()) WHERE updated_at IS NULL")
+
+    op.create_index('ix_chat_sessions_user_id_updated_at', 'chat_sessions', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_sessions_user_id_updated_at', table_name='chat_sessions')
+    op.drop_column('chat_sessions', 'last_message_at')
+    op.drop_column('chat_sessions', 'message_count')
@@ -0,0 +1,40 @@
+"""chat sessions recent-activity index
+
+Revision ID: e2b6f9a4c3d1
+Revises: 7a3e9c1d5b28
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6f9a4c3d1'
+down_revision: Union[str, None] = '7a3e9c1d5b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The metrics collector counts sessions active in the last hour on every
+    # refresh; ix_chat_sessions_user_id_updated_at leads with user_id and cannot serve it
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_chat_sessions_updated_at',
+            'chat_sessions',
+            ['updated_at'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_chat_sessions_updated_at',
+            table_name='chat_sessions',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -105,3 +105,104 @@ def test_authenticate_user_upgrades_legacy_hash(monkeypatch: pytest.MonkeyPatch)
     assert result is user
     assert user.hashed_password.startswith(auth.BCRYPT_SHA256_PREFIX)
     assert session.commit.called
+
+
+def test_async_password_hashing_keeps_event_loop_responsive():
+    import asyncio
+    from app import auth
+
+    async def scenario():
+        ticks = 0
+        stop = asyncio.Event()
+
+        async def heartbeat():
+            nonlocal ticks
+            while not stop.is_set():
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        beat = asyncio.create_task(heartbeat())
+        hashes = await asyncio.gather(*(auth.get_password_hash_async(f'pw-{i}') for i in range(4)))
+        stop.set()
+        await beat
+        return hashes, ticks
+
+    hashes, ticks = asyncio.run(scenario())
+
+    assert all(auth.verify_password(f'pw-{i}', hashed) for i, hashed in enumerate(hashes))
+    # A blocked loop would record a single tick for the whole hashing burst
+    assert ticks > 5
+
+
+def test_authenticate_user_async_upgrades_legacy_hash():
+    import asyncio
+    from unittest.mock import AsyncMock, MagicMock
+    from app import auth
+
+    password = 'legacy-pass'
+    legacy_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    user = SimpleNamespace(email='user@example.com', hashed_password=legacy_hash, last_login=None)
+
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=SimpleNamespace(scalar_one_or_none=lambda: user))
+    session.commit = AsyncMock()
+    session.refresh = AsyncMock()
+
+    assert asyncio.run(auth.authenticate_user_async(session, user.email, 'wrong')) is None
+    result = asyncio.run(auth.authenticate_user_async(session, user.email, password))
+
+    assert result is user
+    assert user.hashed_password.startswith(auth.BCRYPT_SHA256_PREFIX)
+    assert user.last_login is not None
+    assert session.commit.await_count == 1
+
+
+def test_login_throttle_blocks_account_and_ip_after_repeated_failures():
+    from app.services.login_throttle import LoginThrottle
+
+    throttle = LoginThrottle(window_seconds=60, max_per_account=3, max_per_ip=5)
+
+    for _ in range(3):
+        assert throttle.retry_after('Anna@Pyramid.local', '10.0.0.1') is None
+        throttle.record_failure('Anna@Pyramid.local', '10.0.0.1')
+
+    assert throttle.retry_after('anna@pyramid.local', '10.0.0.2') > 0
+    assert throttle.retry_after('bob@pyramid.local', '10.0.0.1') is None
+
+    throttle.record_failure('bob@pyramid.local', '10.0.0.1')
+    throttle.record_failure('carl@pyramid.local', '10.0.0.1')
+    assert throttle.retry_after('dora@pyramid.local', '10.0.0.1') > 0
+
+    throttle.reset('anna@pyramid.local')
+    assert throttle.retry_after('anna@pyramid.local', '10.0.0.2') is None
+
+
+def test_login_throttle_forgets_expired_and_excess_keys(monkeypatch: pytest.MonkeyPatch):
+    from app.services import login_throttle
+
+    clock = [1000.0]
+    monkeypatch.setattr(login_throttle.time, 'monotonic', lambda: clock[0])
+    throttle = login_throttle.LoginThrottle(window_seconds=60, max_per_account=3, max_per_ip=5, max_keys=50)
+
+    for index in range(200):
+        throttle.record_failure(f'random-{index}@example.com', f'10.0.{index // 256}.{index % 256}')
+    assert len(throttle) == 50
+
+    clock[0] += 61
+    throttle.record_failure('anna@pyramid.local', '10.1.0.1')
+    assert len(throttle) == 2
+
+
+def test_unknown_account_costs_a_password_verification():
+    import asyncio
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from app import auth
+
+    session = MagicMock()
+    session.execute = AsyncMock(return_value=SimpleNamespace(scalar_one_or_none=lambda: None))
+
+    with patch.object(auth, 'verify_password', wraps=auth.verify_password) as verify:
+        assert asyncio.run(auth.authenticate_user_async(session, 'nobody@example.com', 'guess')) is None
+
+    verify.assert_called_once_with('guess', auth.DUMMY_PASSWORD_HASH)
+    assert not auth.verify_password('guess', auth.DUMMY_PASSWORD_HASH)
@@ -0,0 +1,46 @@
+import asyncio
+
+import httpx
+
+from app.ollama_client import MockOllamaClient, OllamaClient
+from benchmarks.fake_ollama import create_app
+from benchmarks.stats import percentile
+from benchmarks.suite import compare
+
+
+def test_fake_ollama_streams_deterministic_answer_with_timings():
+    client = OllamaClient(base_url="http://fake-ollama")
+    client.client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=create_app(tokens_per_second=1000, max_tokens=8))
+    )
+
+    async def consume():
+        first = "".join([chunk async for chunk in client.generate_stream("Wartung")])
+        second = await client.generate_response("Wartung")
+        return first, second
+
+    streamed, complete = asyncio.run(consume())
+
+    assert streamed == complete
+    assert streamed.split() == MockOllamaClient.demo_response("Wartung").split()[:8]
+
+
+def test_fake_ollama_embeddings_match_mock_client():
+    transport = httpx.ASGITransport(app=create_app(embedding_dimensions=16))
+
+    async def embed():
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake-ollama") as client:
+            response = await client.post("/api/embeddings", json={"model": "bge-m3", "prompt": "Kiosk"})
+            return response.json()["embedding"]
+
+    assert asyncio.run(embed()) == MockOllamaClient.demo_embedding("Kiosk", 16)
+
+
+def test_percentile_and_baseline_comparison():
+    assert percentile([0.1, 0.2, 0.3, 0.4], 50) == 0.2
+    current = {"scenarios": {"search_hybrid": {"latency": {"p50_ms": 110, "p95_ms": 200, "p99_ms": 300}, "throughput_rps": 45}}}
+    baseline = {"scenarios": {"search_hybrid": {"latency": {"p50_ms": 100, "p95_ms": 250, "p99_ms": 300}, "throughput_rps": 50}}}
+
+    assert compare(current, baseline) == {
+        "search_hybrid": {"p50_ms": 10.0, "p95_ms": -20.0, "p99_ms": 0.0, "throughput_rps": -10.0}
+    }
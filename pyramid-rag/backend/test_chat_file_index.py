@@ -0,0 +1,155 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import mcp_gateway
+from app.services.chat_file_index import ChatFileIndex
+from app.services.conversation_store import ConversationStore
+
+SESSION = "6f1c4a52-3b1e-4d6a-9c55-0d4a1f2b7e01"
+OTHER_SESSION = "0b5e2c1d-7a44-4f0e-8d21-9e3c6b5a4f10"
+
+
+def one_hot(position, dimensions=4):
+    return [1.0 if index == position else 0.0 for index in range(dimensions)]
+
+
+def chunks(*texts):
+    return [{"content": text, "word_count": len(text.split())} for text in texts]
+
+
+def test_search_returns_relevant_passages_of_the_requested_files():
+    index = ChatFileIndex(spill=lambda *args: None)
+    asyncio.run(index.add_file(SESSION, "file-a", "Handbuch", chunks("Einleitung", "Pumpe P-100 warten"), [one_hot(0), one_hot(1)]))
+    asyncio.run(index.add_file(SESSION, "file-b", "Preise", chunks("Preisliste"), [one_hot(2)]))
+
+    hits = index.search(SESSION, [0.1, 0.9, 0.0, 0.0], limit=2)
+
+    assert hits[0]["document_id"] == "file-a"
+    assert hits[0]["chunk_content"] == "Pumpe P-100 warten"
+    assert hits[0]["chunk_index"] == 1
+    assert hits[0]["scope"] == "CHAT"
+    assert index.search(SESSION, one_hot(1), file_ids={"file-b"}) == []
+    assert index.search(SESSION, [1.0, 0.0]) == []
+
+
+def test_least_recently_used_session_is_spilled_once():
+    spilled = []
+    index = ChatFileIndex(max_chunks=3, spill=lambda session_id, session_index, file_ids: spilled.append((session_id, file_ids)))
+
+    asyncio.run(index.add_file(SESSION, "file-a", "A", chunks("eins", "zwei"), [one_hot(0), one_hot(1)]))
+    asyncio.run(index.add_file(OTHER_SESSION, "file-b", "B", chunks("drei", "vier"), [one_hot(2), one_hot(3)]))
+
+    assert spilled == [(SESSION, {"file-a"})]
+    assert SESSION not in index
+    assert OTHER_SESSION in index
+    assert index.chunk_count == 2
+
+    asyncio.run(index.spill_all())
+    asyncio.run(index.spill_all())
+    assert spilled[1:] == [(OTHER_SESSION, {"file-b"})]
+
+
+def test_spilled_session_is_loaded_back_from_the_database():
+    rows = [
+        SimpleNamespace(chat_file_id="file-a", chunk_index=0, content="Pumpe P-100 warten", token_count=3,
+                        title="Handbuch", original_filename="handbuch.pdf", embedding=one_hot(1), model_name="m"),
+    ]
+
+    class FakeSession:
+        async def execute(self, stmt):
+            return SimpleNamespace(all=lambda: rows)
+
+    index = ChatFileIndex(spill=lambda *args: None)
+
+    assert asyncio.run(index.file_ids(SESSION, FakeSession())) == {"file-a"}
+    assert index.search(SESSION, one_hot(1))[0]["document_title"] == "Handbuch"
+
+
+class LegacyEmbeddings:
+    """The 384-dimension search embedder, which does not match the chat index."""
+
+    def generate_embedding(self, text):
+        return [1.0] * 384
+
+
+def index_model_encoder(calls):
+    def encode(model_name, text):
+        calls.append(model_name)
+        # Questions about the pump point at chunk 1, anything else nowhere near the chunks
+        return one_hot(1) if "Pumpe" in text else [0.0, 0.0, 0.0, 1.0]
+
+    return encode
+
+
+class RecordingClient:
+    model = "fake"
+
+    def __init__(self):
+        self.requests = []
+
+    async def chat_stream(self, messages, temperature=0.7, stats=None):
+        self.requests.append(messages)
+        yield "ok"
+
+
+class EmptyVectorStore:
+    embeddings_service = LegacyEmbeddings()
+
+    async def hybrid_search(self, **_):
+        return []
+
+
+UPLOADS = [
+    {"id": "file-a", "title": "Handbuch", "content": "Titelseite " * 300, "scope": "CHAT"},
+    {"id": "file-b", "title": "Notiz", "content": "Rueckruf am Montag", "scope": "CHAT"},
+]
+
+
+def chat_turn(monkeypatch, question, encoder_calls):
+    index = ChatFileIndex(spill=lambda *args: None, query_encoder=index_model_encoder(encoder_calls))
+    asyncio.run(index.add_file(
+        SESSION, "file-a", "Handbuch", chunks("Titelseite", "Pumpe P-100 warten"), [one_hot(0), one_hot(1)],
+        model_name="BAAI/bge-m3",
+    ))
+    monkeypatch.setattr(mcp_gateway, "chat_file_index", index)
+    client = RecordingClient()
+    gateway = mcp_gateway.MCPGateway(
+        db_session=None, ollama_client=client, vector_store=EmptyVectorStore(), conversation_store=ConversationStore()
+    )
+
+    async def consume():
+        return [
+            event
+            async for event in gateway.stream_chat(
+                [{"role": "user", "content": question}], SESSION, "u1", "Support",
+                {"rag_enabled": False, "uploaded_documents": UPLOADS},
+            )
+        ]
+
+    return client, asyncio.run(consume())
+
+
+def test_chat_prompt_uses_indexed_passages_instead_of_the_first_page(monkeypatch):
+    encoder_calls = []
+    client, events = chat_turn(monkeypatch, "Wie warte ich die Pumpe?", encoder_calls)
+
+    system, question = client.requests[0][0]["content"], client.requests[0][-1]["content"]
+    assert "Titelseite" not in system
+    assert "[DOC_1] Notiz" in system
+    assert "[DOC_2] Handbuch - Quelle: Chat-Upload\nPumpe P-100 warten" in question
+    metadata = events[-1]["payload"]["metadata"]
+    assert metadata["chat_file_passages"] == 1
+    assert [c["document_id"] for c in events[-1]["payload"]["citations"]] == ["file-b", "file-a"]
+    # The question is embedded by the index's model, not the 384-dimension search embedder
+    assert encoder_calls == ["BAAI/bge-m3"]
+
+
+def test_indexed_file_without_a_relevant_passage_keeps_its_leading_text(monkeypatch):
+    client, events = chat_turn(monkeypatch, "Wann ist der Rueckruf?", [])
+
+    system, question = client.requests[0][0]["content"], client.requests[0][-1]["content"]
+    assert events[-1]["payload"]["metadata"]["chat_file_passages"] == 0
+    # Only the unindexed upload is pinned; the indexed one is part of this turn
+    assert "[DOC_1] Notiz" in system
+    assert "Handbuch" not in system
+    assert "[DOC_2] Handbuch - Quelle: Chat-Upload\nTitelseite" in question
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import (
+    ChatFile,
+    ChatFileChunk,
+    ChatFileEmbedding,
+    ChatMessage,
+    ChatSession,
+    ChatType,
+    Department,
+    FileType,
+    MessageSource,
+    User,
+)
+from app.services.chat_purge import purge_expired
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def make_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables = [
+        User.__table__, ChatSession.__table__, ChatMessage.__table__, MessageSource.__table__,
+        ChatFile.__table__, ChatFileChunk.__table__, ChatFileEmbedding.__table__,
+    ]
+    User.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)
+
+
+def add_chat(db, user, chat_type, expires_at, upload_path=None):
+    chat = ChatSession(user=user, title="Chat", chat_type=chat_type, expires_at=expires_at)
+    db.add(chat)
+    db.flush()
+    message = ChatMessage(session_id=chat.id, role="user", content="Hallo")
+    db.add(message)
+    if upload_path is not None:
+        upload = ChatFile(
+            session_id=chat.id, filename="a.txt", original_filename="a.txt", file_path=str(upload_path),
+            file_type=FileType.TEXT, uploaded_by=user.id,
+        )
+        db.add(upload)
+        db.flush()
+        chunk = ChatFileChunk(chat_file_id=upload.id, chunk_index=0, content="Pumpe")
+        db.add(chunk)
+        db.flush()
+        db.add(ChatFileEmbedding(chat_file_id=upload.id, chunk_id=chunk.id))
+        db.add(MessageSource(message_id=message.id, chat_file_id=upload.id))
+    return chat.id
+
+
+def test_only_expired_temporary_chats_are_purged_with_their_files(tmp_path):
+    factory = make_factory()
+    expired_file = tmp_path / "expired.txt"
+    expired_file.write_text("x")
+    with factory() as db:
+        user = User(email="a@example.com", username="a", hashed_password="x", primary_department=Department.SUPPORT)
+        db.add(user)
+        db.flush()
+        for _ in range(3):
+            add_chat(db, user, ChatType.TEMPORARY, NOW - timedelta(days=1), upload_path=expired_file)
+        active = add_chat(db, user, ChatType.TEMPORARY, NOW + timedelta(days=1))
+        normal = add_chat(db, user, ChatType.NORMAL, None)
+        db.commit()
+
+    stats = purge_expired(factory, batch_size=2, now=NOW)
+
+    assert stats.sessions == 3
+    assert stats.batches == 2
+    assert (stats.messages, stats.chat_files, stats.chunks, stats.embeddings, stats.message_sources) == (3, 3, 3, 3, 3)
+    assert stats.files_removed == 1
+    assert not expired_file.exists()
+    assert stats.as_dict()["rows"] == 18
+    with factory() as db:
+        assert set(db.execute(select(ChatSession.id)).scalars()) == {active, normal}
+        assert db.scalar(select(func.count()).select_from(ChatMessage)) == 2
+        assert db.scalar(select(func.count()).select_from(ChatFile)) == 0
+
+    assert purge_expired(factory, batch_size=2, now=NOW).sessions == 0
@@ -0,0 +1,58 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models import ChatMessage, ChatSession, Department, MessageSource, User
+from app.services.pagination import encode_cursor, keyset_after
+
+
+def make_session():
+    engine = create_engine("sqlite://")
+    tables = [User.__table__, ChatSession.__table__, ChatMessage.__table__, MessageSource.__table__]
+    User.metadata.create_all(engine, tables=tables)
+    return Session(engine)
+
+
+def test_message_hooks_maintain_session_summary():
+    with make_session() as db:
+        user = User(email="a@example.com", username="a", hashed_password="x", primary_department=Department.SUPPORT)
+        chat = ChatSession(user=user, title="Wartung")
+        db.add_all([user, chat])
+        db.commit()
+
+        first = ChatMessage(session_id=chat.id, role="user", content="Hallo", created_at=datetime(2026, 10, 18, 9, 0))
+        second = ChatMessage(session_id=chat.id, role="assistant", content="Hi", created_at=datetime(2026, 10, 18, 9, 1))
+        db.add_all([first, second])
+        db.commit()
+        db.refresh(chat)
+
+        assert chat.message_count == 2
+        assert chat.last_message_at == datetime(2026, 10, 18, 9, 1)
+        assert chat.updated_at == datetime(2026, 10, 18, 9, 1)
+
+        db.delete(first)
+        db.commit()
+        db.refresh(chat)
+
+        assert chat.message_count == 1
+
+
+def test_sidebar_query_reads_summary_without_joining_messages():
+    cursor = encode_cursor(datetime(2026, 10, 18), uuid.uuid4())
+    stmt = (
+        select(ChatSession)
+        .where(ChatSession.user_id == uuid.uuid4())
+        .where(keyset_after(ChatSession.updated_at, ChatSession.id, cursor))
+        .order_by(ChatSession.updated_at.desc(), ChatSession.id.desc())
+        .limit(50)
+    )
+
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    assert "chat_messages" not in sql
+    assert "GROUP BY" not in sql
+    assert "chat_sessions.message_count" in sql
+    assert "(chat_sessions.updated_at, chat_sessions.id) < (" in sql
@@ -0,0 +1,60 @@
+from app.services.chunking import ChunkingEngine, TokenCounter
+
+
+class WordCounter(TokenCounter):
+    """One token per whitespace-separated word, recording the batches it sees."""
+
+    def __init__(self):
+        super().__init__("test")
+        self._failed = True
+        self.batches = []
+
+    exact = True
+
+    def count(self, texts):
+        self.batches.append(len(texts))
+        return [len(text.split()) for text in texts]
+
+
+def paragraph(index, words=4):
+    return " ".join(f"w{index}_{position}" for position in range(words))
+
+
+def test_chunks_are_slices_of_the_text_with_offsets_and_pages():
+    text = "[Page 1]\n" + "\n\n".join(paragraph(i) for i in range(3)) + "\n\n[Page 2]\n" + "\n\n".join(paragraph(i) for i in range(3, 6))
+    counter = WordCounter()
+
+    chunks = ChunkingEngine(counter).chunk(text, chunk_size=10, overlap=4)
+
+    assert counter.batches == [6]
+    for chunk in chunks:
+        assert text[chunk["start_char"]:chunk["end_char"]] == chunk["content"]
+        assert chunk["token_count"] <= 10
+    assert "\n\n" in chunks[0]["content"]
+    assert chunks[0]["page_start"] == 1
+    assert chunks[-1]["page_end"] == 2
+    # The last paragraph of one chunk opens the next
+    assert chunks[1]["content"].startswith(chunks[0]["content"].split("\n\n")[-1])
+    assert chunks[-1]["content"].endswith(paragraph(5))
+
+
+def test_long_paragraph_is_cut_at_token_boundaries():
+    text = " ".join(f"wort{index}" for index in range(25))
+
+    chunks = ChunkingEngine(WordCounter()).chunk(text, chunk_size=10, overlap=0)
+
+    assert [chunk["word_count"] for chunk in chunks] == [10, 10, 5]
+    assert " ".join(chunk["content"] for chunk in chunks) == text
+    assert "page_start" not in chunks[0]
+
+
+def test_fallback_estimate_keeps_pieces_within_the_budget():
+    counter = TokenCounter("test")
+    counter._failed = True
+    text = " ".join(f"wort{index}" for index in range(40))
+
+    chunks = ChunkingEngine(counter).chunk(text, chunk_size=13, overlap=0)
+
+    assert counter.count(["Pumpe P-100 warten"]) == [4]
+    assert [chunk["word_count"] for chunk in chunks] == [10, 10, 10, 10]
+    assert all(chunk["token_count"] == 13 for chunk in chunks)
@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+
+from app.services import mcp_gateway
+from app.services.conversation_store import ConversationState, ConversationStore
+from app.services.mcp_gateway import HISTORY_MESSAGE_LIMIT, MCPGateway, wait_for_summaries
+
+
+@pytest.fixture(autouse=True)
+def generate_transport(monkeypatch):
+    # The assertions read the single /api/generate context text
+    monkeypatch.setattr(mcp_gateway, "OLLAMA_TRANSPORT", "generate")
+
+
+class RecordingOllamaClient:
+    model = "fake"
+
+    def __init__(self):
+        self.contexts = []
+        self.summaries = 0
+
+    async def generate_stream(self, query, context="", system_prompt=None, temperature=0.7, stats=None):
+        self.contexts.append(context)
+        yield f"Antwort auf {query}"
+
+    async def generate_response(self, query, context="", system_prompt=None, temperature=0.7, max_tokens=2000):
+        self.summaries += 1
+        return f"Zusammenfassung {self.summaries}"
+
+
+class NoSearchVectorStore:
+    async def hybrid_search(self, **_):
+        return []
+
+
+def run_turn(gateway, text, session_id="s1", user_id="u1", documents=None):
+    async def consume():
+        events = [
+            event
+            async for event in gateway.stream_chat(
+                messages=[{"role": "user", "content": text}],
+                session_id=session_id,
+                user_id=user_id,
+                department="Support",
+                context_payload={"rag_enabled": False, "uploaded_documents": documents or []},
+            )
+        ]
+        # Summaries run after the turn; let them finish before the loop closes
+        await wait_for_summaries()
+        return events
+
+    return asyncio.run(consume())
+
+
+def test_turns_carry_only_the_new_message_and_prompt_stays_bounded():
+    store = ConversationStore()
+    ollama = RecordingOllamaClient()
+    gateway = MCPGateway(db_session=None, ollama_client=ollama, vector_store=NoSearchVectorStore(), conversation_store=store)
+    manual = [{"id": "doc-1", "title": "Handbuch", "content": "Pumpe P-100 warten"}]
+
+    run_turn(gateway, "frage 1", documents=manual)
+    for turn in range(2, 41):
+        events = run_turn(gateway, f"frage {turn}")
+
+    state = asyncio.run(store.get("s1", "u1"))
+    assert ollama.summaries > 0
+    assert state.summary.startswith("Zusammenfassung")
+    assert state.summarized_messages + len(state.messages) == 80
+    assert len(state.messages) < HISTORY_MESSAGE_LIMIT + 4
+    assert len(state.message_ids) == 40
+    assert [doc["id"] for doc in state.documents] == ["doc-1"]
+
+    last_context = ollama.contexts[-1]
+    assert "Zusammenfassung des bisherigen Gespraechs" in last_context
+    assert "Pumpe P-100 warten" in last_context
+    assert "User: frage 40" in last_context
+    assert "frage 1\n" not in last_context
+    assert len(last_context) < len(ollama.contexts[9]) * 2
+    assert events[-1]["payload"]["metadata"]["summary_chars"] > 0
+
+
+def test_replayed_history_is_not_applied_twice():
+    store = ConversationStore()
+    gateway = MCPGateway(db_session=None, ollama_client=RecordingOllamaClient(), vector_store=NoSearchVectorStore(), conversation_store=store)
+    run_turn(gateway, "frage 1")
+
+    replay = [
+        {"role": "user", "content": "frage 1"},
+        {"role": "assistant", "content": "Antwort auf frage 1"},
+        {"role": "user", "content": "frage 2"},
+    ]
+
+    async def consume():
+        return [event async for event in gateway.stream_chat(replay, "s1", "u1", "Support", {"rag_enabled": False})]
+
+    asyncio.run(consume())
+
+    state = asyncio.run(store.get("s1", "u1"))
+    assert [message["content"] for message in state.messages] == [
+        "frage 1", "Antwort auf frage 1", "frage 2", "Antwort auf frage 2",
+    ]
+
+
+def test_state_is_scoped_to_its_owner_and_can_be_cleared():
+    store = ConversationStore()
+    asyncio.run(store.save(ConversationState(session_id="s1", user_id="u1", summary="geheim")))
+    gateway = MCPGateway(db_session=None, ollama_client=RecordingOllamaClient(), vector_store=NoSearchVectorStore(), conversation_store=store)
+
+    assert asyncio.run(gateway.get_context_summary("s1", "u2")) is None
+    asyncio.run(gateway.clear_context("s1", "u2"))
+    assert asyncio.run(gateway.get_context_summary("s1", "u1"))["summary"] == "geheim"
+
+    asyncio.run(gateway.clear_context("s1", "u1"))
+    assert asyncio.run(store.get("s1", "u1")) is None
+
+
+def test_store_evicts_least_recently_used_sessions():
+    store = ConversationStore(max_sessions=2)
+    for session_id in ("a", "b"):
+        asyncio.run(store.save(ConversationState(session_id=session_id, user_id="u")))
+    asyncio.run(store.get("a", "u"))
+    asyncio.run(store.save(ConversationState(session_id="c", user_id="u")))
+
+    assert asyncio.run(store.get("b", "u")) is None
+    assert asyncio.run(store.get("a", "u")) is not None
+
+
+def test_foreign_user_cannot_overwrite_the_owners_state():
+    store = ConversationStore()
+    gateway = MCPGateway(db_session=None, ollama_client=RecordingOllamaClient(), vector_store=NoSearchVectorStore(), conversation_store=store)
+    asyncio.run(store.save(ConversationState(session_id="s1", user_id="u1", summary="geheim", messages=[{"role": "user", "content": "frage"}])))
+
+    run_turn(gateway, "andere frage", user_id="u2")
+
+    owner = asyncio.run(store.get("s1", "u1"))
+    assert owner.summary == "geheim"
+    assert [message["content"] for message in owner.messages] == ["frage"]
+    assert "geheim" not in asyncio.run(store.get("s1", "u2")).summary
+
+
+class BlockedSummaryClient(RecordingOllamaClient):
+    def __init__(self):
+        super().__init__()
+        self.release = None
+
+    async def generate_response(self, query, context="", system_prompt=None, temperature=0.7, max_tokens=2000):
+        await self.release.wait()
+        return await super().generate_response(query, context, system_prompt, temperature, max_tokens)
+
+
+def test_summary_runs_after_the_turn_is_stored():
+    store = ConversationStore()
+    ollama = BlockedSummaryClient()
+    gateway = MCPGateway(db_session=None, ollama_client=ollama, vector_store=NoSearchVectorStore(), conversation_store=store)
+
+    async def conversation():
+        ollama.release = asyncio.Event()
+        for turn in range(1, HISTORY_MESSAGE_LIMIT + 2):
+            events = [
+                event
+                async for event in gateway.stream_chat(
+                    [{"role": "user", "content": f"frage {turn}"}], "s1", "u1", "Support", {"rag_enabled": False}
+                )
+            ]
+        # The turn completed while the summariser is still waiting on the model
+        pending = await store.get("s1", "u1")
+        ollama.release.set()
+        await wait_for_summaries()
+        return events, pending, await store.get("s1", "u1")
+
+    events, pending, summarised = asyncio.run(conversation())
+
+    assert events[-1]["type"] == "complete"
+    assert pending.pending_summary and pending.summary == ""
+    assert "frage 1" in ollama.contexts[-1]
+    assert summarised.pending_summary == []
+    assert summarised.summary == "Zusammenfassung 1"
+
+
+def test_mcp_endpoints_reject_another_users_chat_session():
+    import uuid
+    from types import SimpleNamespace
+
+    from fastapi import HTTPException
+
+    from app.api.endpoints.mcp import ensure_session_owner
+
+    owner, intruder, session_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    class OwnerLookup:
+        async def execute(self, stmt):
+            return SimpleNamespace(scalar_one_or_none=lambda: owner)
+
+    asyncio.run(ensure_session_owner(OwnerLookup(), str(session_id), SimpleNamespace(id=owner)))
+    asyncio.run(ensure_session_owner(OwnerLookup(), "session_adhoc", SimpleNamespace(id=intruder)))
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(ensure_session_owner(OwnerLookup(), str(session_id), SimpleNamespace(id=intruder)))
+    assert rejected.value.status_code == 404
@@ -0,0 +1,174 @@
+import fitz
+from docx import Document as DocxDocument
+from pptx import Presentation
+
+from app.services.chunking import ChunkingEngine, TokenCounter
+from app.services.document_structure import (
+    Block,
+    StructuredDocument,
+    blocks_from_text,
+    chunk_structured,
+    from_docx,
+    from_pptx,
+    from_pymupdf,
+)
+
+
+class WordCounter(TokenCounter):
+    exact = True
+
+    def __init__(self):
+        super().__init__("test")
+        self._failed = True
+
+    def count(self, texts):
+        return [len(text.split()) for text in texts]
+
+
+ENGINE = ChunkingEngine(WordCounter())
+
+
+def write_policy(path):
+    document = DocxDocument()
+    document.core_properties.title = "HR-Richtlinie"
+    document.add_heading("3 Urlaub", level=1)
+    document.add_heading("3.2 Urlaubsanspruch", level=2)
+    document.add_paragraph("Der Anspruch richtet sich nach:")
+    for item in ("Betriebszugehörigkeit", "Arbeitszeitmodell", "Alter"):
+        document.add_paragraph(item, style="List Bullet")
+    document.add_heading("4 Gehälter", level=1)
+    table = document.add_table(rows=3, cols=3)
+    for row, values in zip(table.rows, [("Betrag", "Ort", "Abteilung"), ("15.000 €", "Freiburg", "HR-Abteilung"), ("12.000 €", "Ulm", "IT")]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    document.save(path)
+
+
+def test_docx_chunks_carry_heading_path_list_intro_and_table_columns(tmp_path):
+    write_policy(tmp_path / "policy.docx")
+
+    structure = from_docx(DocxDocument(str(tmp_path / "policy.docx")))
+    chunks = chunk_structured(structure, chunk_size=200, engine=ENGINE)
+
+    assert [block.kind for block in structure.blocks] == ["heading", "heading", "paragraph", "list", "heading", "table"]
+    assert chunks[0]["content"] == (
+        "HR-Richtlinie - 3 Urlaub - 3.2 Urlaubsanspruch\n"
+        "Der Anspruch richtet sich nach:\n- Betriebszugehörigkeit\n- Arbeitszeitmodell\n- Alter"
+    )
+    assert chunks[0]["heading_path"] == ["3 Urlaub", "3.2 Urlaubsanspruch"]
+    assert chunks[1]["content"] == (
+        "HR-Richtlinie - 4 Gehälter\n"
+        "[Tabelle: 4 Gehälter, Spalten: Betrag, Ort, Abteilung]\n"
+        "Betrag: 15.000 € | Ort: Freiburg | Abteilung: HR-Abteilung\n"
+        "Betrag: 12.000 € | Ort: Ulm | Abteilung: IT"
+    )
+    assert "- Arbeitszeitmodell" in structure.to_text()
+
+
+def test_split_list_repeats_heading_and_intro():
+    structure = StructuredDocument(blocks=[
+        Block("heading", "Sicherheit", level=1),
+        Block("paragraph", "Vor der Wartung gilt:"),
+        Block("list", items=[f"Schritt {index} ausführen" for index in range(6)]),
+    ])
+
+    chunks = chunk_structured(structure, chunk_size=13, engine=ENGINE)
+
+    assert len(chunks) == 3
+    for chunk in chunks:
+        assert chunk["content"].startswith("Sicherheit\nVor der Wartung gilt:\n- Schritt")
+        assert chunk["token_count"] <= 13
+
+
+def test_pptx_slide_titles_become_headings(tmp_path):
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+    slide.shapes.title.text = "Wartungsplan"
+    body = slide.placeholders[1].text_frame
+    body.text = "Filter tauschen"
+    body.add_paragraph().text = "Dichtungen prüfen"
+    presentation.save(tmp_path / "plan.pptx")
+
+    structure = from_pptx(Presentation(str(tmp_path / "plan.pptx")))
+    chunks = chunk_structured(structure, chunk_size=100, engine=ENGINE)
+
+    assert chunks == [{
+        "content": "Wartungsplan\n- Filter tauschen\n- Dichtungen prüfen",
+        "chunk_index": 0,
+        "token_count": 7,
+        "word_count": 7,
+        "character_count": len(chunks[0]["content"]),
+        "heading_path": ["Wartungsplan"],
+        "page_start": 1,
+        "page_end": 1,
+    }]
+    assert structure.to_text().startswith("[Slide 1]\n\nWartungsplan")
+
+
+def test_pdf_headings_are_detected_from_font_size(tmp_path):
+    pdf = fitz.open()
+    page = pdf.new_page()
+    page.insert_text((72, 72), "Pumpenwartung", fontsize=20)
+    page.insert_text((72, 110), "Die Pumpe wird jaehrlich geprueft.", fontsize=11)
+    page.insert_text((72, 130), "Dabei wird das Lager gefettet.", fontsize=11)
+    pdf.save(tmp_path / "manual.pdf")
+
+    with fitz.open(tmp_path / "manual.pdf") as document:
+        structure = from_pymupdf(document, detect_tables=False)
+    chunks = chunk_structured(structure, chunk_size=100, engine=ENGINE)
+
+    assert structure.blocks[0].kind == "heading"
+    assert chunks[0]["content"].startswith("Pumpenwartung\nDie Pumpe wird jaehrlich geprueft.")
+    assert chunks[0]["page_start"] == 1
+
+
+def test_plain_text_keeps_abbreviations_and_enumeration_markers():
+    text = (
+        "z. B. Pumpen und Ventile\n"
+        "1. Quartal war gut\n\n"
+        "Die Schritte:\n"
+        "1. Strom abschalten\n"
+        "2. Filter tauschen\n"
+        "- Protokoll ausfuellen"
+    )
+
+    blocks = blocks_from_text(text)
+
+    assert [block.kind for block in blocks] == ["paragraph", "paragraph", "list"]
+    assert blocks[0].text == "z. B. Pumpen und Ventile 1. Quartal war gut"
+    assert blocks[2].items == ["1. Strom abschalten", "2. Filter tauschen", "Protokoll ausfuellen"]
+
+
+def test_list_intro_is_never_taken_from_a_table():
+    structure = StructuredDocument(title="Doc", blocks=[
+        Block("heading", "1 Intro", level=1),
+        Block("table", rows=[["Name", "Wert"]]),
+        Block("list", items=["Pumpe pruefen", "Filter tauschen"]),
+    ])
+
+    chunks = chunk_structured(structure, chunk_size=11, engine=ENGINE)
+
+    # The header-only row is not repeated as the intro of the split list
+    assert [chunk["content"] for chunk in chunks] == [
+        "Doc - 1 Intro\nName | Wert\n- Pumpe pruefen",
+        "Doc - 1 Intro\n- Filter tauschen",
+    ]
+
+
+def test_intro_longer_than_half_a_chunk_stays_a_paragraph():
+    intro = " ".join(["Einleitung"] * 30)
+    structure = StructuredDocument(blocks=[
+        Block("heading", "Wartung", level=1),
+        Block("paragraph", intro),
+        Block("list", items=["Pumpe pruefen", "Filter tauschen"]),
+    ])
+
+    chunks = chunk_structured(structure, chunk_size=40, engine=ENGINE)
+
+    assert [chunk["content"] for chunk in chunks] == [
+        f"Wartung\n{intro}\n- Pumpe pruefen\n- Filter tauschen",
+    ]
+    assert chunk_structured(structure, chunk_size=20, engine=ENGINE)[-1]["content"] == (
+        "Wartung\n- Pumpe pruefen\n- Filter tauschen"
+    )
+    assert all(chunk["token_count"] <= 20 for chunk in chunk_structured(structure, chunk_size=20, engine=ENGINE))
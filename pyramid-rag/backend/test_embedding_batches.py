@@ -0,0 +1,48 @@
+import numpy as np
+
+from app.services.embedding_batches import encode_in_token_batches, padded_tokens, plan_batches
+
+
+class FakeTokenizer:
+    def __call__(self, texts, max_length=None, truncation=False, **kwargs):
+        lengths = [len(text.split()) + 2 for text in texts]
+        if truncation:
+            lengths = [min(length, max_length) for length in lengths]
+        return {"input_ids": [[0] * length for length in lengths]}
+
+
+class FakeModel:
+    max_seq_length = 8
+    tokenizer = FakeTokenizer()
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size, output_value="sentence_embedding", **kwargs):
+        assert batch_size == len(texts)
+        self.batches.append(list(texts))
+        if output_value is None:
+            return [{"text": text} for text in texts]
+        return np.array([[len(text.split())] for text in texts], dtype=np.float32)
+
+
+def test_batches_are_cut_by_padded_tokens_and_size():
+    lengths = [10, 100, 12, 98, 11, 400]
+    batches = plan_batches(lengths, token_budget=200, max_batch_size=8)
+
+    assert batches == [[5], [1, 3], [2, 4, 0]]
+    assert padded_tokens(lengths, batches) == 400 + 200 + 36
+    assert plan_batches([5] * 10, token_budget=1000, max_batch_size=4) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+
+def test_outputs_come_back_in_input_order():
+    model = FakeModel()
+    texts = ["a", "a b c d e f g h i j", "a b", "a b c"]
+
+    embeddings = encode_in_token_batches(model, texts, token_budget=15, max_batch_size=8)
+
+    assert embeddings[:, 0].tolist() == [1, 10, 2, 3]
+    # Truncated to max_seq_length (8 tokens), the long text still needs a batch of its own
+    assert model.batches[0] == ["a b c d e f g h i j"]
+    features = encode_in_token_batches(model, texts, token_budget=15, output_value=None)
+    assert [feature["text"] for feature in features] == texts
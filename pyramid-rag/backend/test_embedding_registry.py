@@ -0,0 +1,181 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import (
+    Department,
+    Document,
+    DocumentChunk,
+    DocumentChunkVector,
+    EmbeddingModel,
+    EmbeddingModelStatus,
+    FileType,
+    User,
+)
+from app.services import embedding_registry, search_service
+from app.services.embedding_registry import (
+    ActiveModel,
+    BuildProgress,
+    ShadowIncomplete,
+    activate_model,
+    build_shadow_vectors,
+    register_model,
+    store_chunk_vectors,
+)
+
+
+class FakeEncoder:
+    def encode(self, texts, batch_size, normalize_embeddings=True, **kwargs):
+        return np.array([[1.0, 0.0, float(len(text))] for text in texts])
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 3))
+        self.now += seconds
+
+
+def make_factory(chunks=5):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables = [
+        User.__table__, Document.__table__, DocumentChunk.__table__,
+        EmbeddingModel.__table__, DocumentChunkVector.__table__,
+    ]
+    User.metadata.create_all(engine, tables=tables)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    user = User(email="a@example.com", username="a", hashed_password="x", primary_department=Department.SUPPORT)
+    db.add(user)
+    db.flush()
+    document = Document(
+        filename="a.txt", original_filename="a.txt", file_path="/a.txt", file_type=FileType.TEXT,
+        department=Department.SUPPORT, uploaded_by=user.id,
+    )
+    db.add(document)
+    db.flush()
+    db.add_all([DocumentChunk(document_id=document.id, chunk_index=index, content=f"Chunk {index}") for index in range(chunks)])
+    db.commit()
+    return factory, db, document
+
+
+def build(factory, clock, budget):
+    return build_shadow_vectors(
+        factory, budget_seconds=budget, encoder_loader=lambda name: FakeEncoder(),
+        batch_size=2, clock=clock, sleep=clock.sleep,
+    )
+
+
+def test_shadow_build_is_throttled_and_resumes_until_ready():
+    factory, db, _ = make_factory()
+    model = register_model(db, "intfloat/multilingual-e5-large", rate_limit=2.0)
+    clock = FakeClock()
+
+    # Two batches of 2 chunks at 2 chunks/s; the tick ends before a third pause would overrun it
+    assert build(factory, clock, budget=1.5) == {"intfloat/multilingual-e5-large": 4}
+    assert clock.sleeps == [1.0]
+    db.expire_all()
+    assert model.status == EmbeddingModelStatus.BUILDING and model.dimension == 3
+
+    assert build(factory, clock, budget=10) == {"intfloat/multilingual-e5-large": 1}
+    db.expire_all()
+    assert model.status == EmbeddingModelStatus.READY
+    assert db.execute(select(func.count()).select_from(DocumentChunkVector)).scalar_one() == 5
+
+
+def test_switch_is_refused_until_the_shadow_is_complete():
+    factory, db, _ = make_factory(chunks=3)
+    first = register_model(db, "model-a", rate_limit=100.0)
+    clock = FakeClock()
+    build(factory, clock, budget=10)
+
+    second = register_model(db, "model-b", rate_limit=100.0)
+    with pytest.raises(ShadowIncomplete):
+        activate_model(db, second.id)
+
+    activate_model(db, first.id)
+    build(factory, clock, budget=10)
+    db.expire_all()
+    assert activate_model(db, second.id) is second
+    assert (first.status, second.status) == (EmbeddingModelStatus.RETIRED, EmbeddingModelStatus.ACTIVE)
+
+    # Back to the legacy column
+    assert activate_model(db, None) is None
+    assert db.execute(
+        select(func.count()).select_from(EmbeddingModel).where(EmbeddingModel.status == EmbeddingModelStatus.ACTIVE)
+    ).scalar_one() == 0
+
+
+def test_ingestion_writes_vectors_for_a_registered_model_of_the_same_name():
+    _, db, document = make_factory(chunks=2)
+    register_model(db, "model-a")
+    chunk_ids = db.execute(select(DocumentChunk.id)).scalars().all()
+
+    assert store_chunk_vectors(db, "unregistered", document.id, chunk_ids, [[1.0, 0.0]] * 2) == 0
+    assert store_chunk_vectors(db, "model-a", document.id, chunk_ids, [[1.0, 0.0]] * 2) == 2
+
+
+def test_progress_projects_completion_from_the_observed_rate():
+    started = datetime(2026, 10, 18, 12, 0, 0)
+    progress = BuildProgress(
+        id=uuid.uuid4(), name="model-b", status=EmbeddingModelStatus.BUILDING, dimension=1024,
+        embedded=600, total=1000, rate_limit=20.0, build_started_at=started, build_completed_at=None,
+        activated_at=None, last_error=None, now=started + timedelta(seconds=60),
+    ).as_dict()
+
+    assert progress["percent_complete"] == 60.0
+    assert progress["chunks_per_second"] == 10.0
+    assert progress["eta_seconds"] == 40
+    assert progress["projected_completion"] == "2026-10-18T12:01:40"
+
+
+def test_active_model_reads_through_its_partial_index_expression():
+    model_id = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    active = ActiveModel(model_id, "model-b", 1024)
+
+    assert active.vector_expression() == "(v.embedding::vector(1024))"
+    assert active.join_clause().endswith(f"v.model_id = '{model_id}'")
+    assert active.distance_expression() == "(v.embedding::vector(1024)) <=> :query_embedding::vector(1024)"
+    assert embedding_registry.index_name(model_id) == "ix_document_chunk_vectors_hnsw_1234567812345678"
+
+
+def test_vector_search_orders_by_the_indexed_distance(monkeypatch):
+    active = ActiveModel(uuid.uuid4(), "model-b", 1024)
+    statements = []
+
+    class RecordingSession:
+        async def execute(self, stmt, params=None):
+            statements.append(str(stmt))
+            return SimpleNamespace(fetchall=lambda: [])
+
+    async def get_active_model(db):
+        return active
+
+    async def no_filter(*args, **kwargs):
+        return None
+
+    service = search_service.SearchService()
+    monkeypatch.setattr(search_service, "get_active_model", get_active_model)
+    monkeypatch.setattr(service, "_query_embedding", lambda query, model: np.zeros(1024, dtype=np.float32))
+    monkeypatch.setattr(service, "_build_access_controlled_query", no_filter)
+    monkeypatch.setattr(service, "_get_allowed_document_ids", no_filter)
+    service.colbert_encoder = None
+
+    asyncio.run(service.vector_search(RecordingSession(), "Pumpe", SimpleNamespace()))
+
+    sql = " ".join(statements[-1].split())
+    assert f"ORDER BY {active.distance_expression()} LIMIT" in sql
+    assert "similarity DESC" not in sql
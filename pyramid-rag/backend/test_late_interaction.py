@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from app.services import document_processor as processor_module
+from app.services.late_interaction import ColbertEncoder, TokenVectorStore, maxsim_scores, rescore
+from app.services.sparse_encoder import SparseEncoder
+
+
+def unit_rows(rng, rows, dim=8):
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_maxsim_matches_the_per_candidate_definition():
+    rng = np.random.default_rng(0)
+    query = unit_rows(rng, 4)
+    candidates = [unit_rows(rng, 7).astype(np.float16), np.zeros((0, 8), dtype=np.float16), unit_rows(rng, 3)]
+
+    scores = maxsim_scores(query, candidates)
+
+    for tokens, score in zip(candidates, scores):
+        if len(tokens):
+            expected = (query @ tokens.astype(np.float32).T).max(axis=1).mean()
+            assert score == pytest.approx(expected, abs=1e-6)
+    assert scores[1] == -np.inf
+
+
+def test_store_round_trips_float16_chunks_and_replaces_atomically(tmp_path):
+    rng = np.random.default_rng(1)
+    store = TokenVectorStore(tmp_path)
+    chunks = [unit_rows(rng, 5), unit_rows(rng, 0), unit_rows(rng, 2)]
+    with store.writer("ab12") as writer:
+        for vectors in chunks:
+            writer.append(vectors)
+
+    assert store.chunk_vectors("ab12", 0).dtype == np.float16
+    np.testing.assert_allclose(store.chunk_vectors("ab12", 2), chunks[2], atol=1e-3)
+    assert len(store.chunk_vectors("ab12", 1)) == 0
+    assert store.chunk_vectors("ab12", 3) is None
+    assert store.chunk_vectors("missing", 0) is None
+
+    # A failed rewrite leaves the stored document untouched
+    with pytest.raises(RuntimeError):
+        with store.writer("ab12") as writer:
+            writer.append(unit_rows(rng, 9))
+            raise RuntimeError("encoding failed")
+    assert len(store.chunk_vectors("ab12", 0)) == 5
+    assert list(tmp_path.rglob("*.tmp")) == []
+
+    with store.writer("ab12") as writer:
+        writer.append(unit_rows(rng, 9))
+    assert len(store.chunk_vectors("ab12", 0)) == 9
+
+
+def test_rescore_orders_by_maxsim_and_keeps_unindexed_results_last(tmp_path):
+    store = TokenVectorStore(tmp_path)
+    query = np.eye(4, dtype=np.float32)[:2]
+    with store.writer("cafe") as writer:
+        writer.append(np.eye(4)[2:])       # chunk 0: orthogonal to the query
+        writer.append(np.eye(4)[:2])       # chunk 1: exact match
+    results = [
+        {"chunk_id": "a", "file_hash": "cafe", "chunk_index": 0, "similarity_score": 0.9},
+        {"chunk_id": "b", "file_hash": "beef", "chunk_index": 0, "similarity_score": 0.8},
+        {"chunk_id": "c", "file_hash": "cafe", "chunk_index": 1, "similarity_score": 0.7},
+    ]
+
+    ranked = rescore(query, results, store)
+
+    assert [result["chunk_id"] for result in ranked] == ["c", "a", "b"]
+    assert ranked[0]["late_interaction_score"] == pytest.approx(1.0)
+    assert "late_interaction_score" not in ranked[2]
+
+
+class FakeModel:
+    tokenizer = None
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, output_value=None, batch_size=16, show_progress_bar=False):
+        self.calls += 1
+        return [
+            {
+                "input_ids": np.array([0, 5, 6, 2]),
+                "attention_mask": np.array([1, 1, 1, 1]),
+                "token_embeddings": np.arange(8, dtype=np.float32).reshape(4, 2) + len(text),
+                "sentence_embedding": np.array([1.0, 0.0]),
+            }
+            for text in texts
+        ]
+
+
+def test_ingestion_derives_dense_sparse_and_token_vectors_from_one_pass(tmp_path, monkeypatch):
+    model = FakeModel()
+    store = TokenVectorStore(tmp_path)
+    sparse = SparseEncoder(model=model, head=(np.array([1.0, 0.0]), 0.0))
+    colbert = ColbertEncoder(model=model, head=(np.eye(2, dtype=np.float32), np.zeros(2, dtype=np.float32)))
+    monkeypatch.setattr(processor_module, "SPARSE_INDEX_ENABLED", True)
+    monkeypatch.setattr(processor_module, "LATE_INTERACTION_ENABLED", True)
+    monkeypatch.setattr(processor_module, "get_sparse_encoder", lambda: sparse)
+    monkeypatch.setattr(processor_module, "get_colbert_encoder", lambda: colbert)
+    monkeypatch.setattr(processor_module, "get_token_vector_store", lambda: store)
+    processor = processor_module.DocumentProcessor()
+    processor._embedding_model = model
+
+    embeddings, sparse_vectors = processor._encode_for_index(["a", "bb"], "f00d")
+
+    assert model.calls == 1
+    assert embeddings == [[1.0, 0.0], [1.0, 0.0]]
+    assert sparse_vectors[0] == {0: 1.0, 5: 3.0, 6: 5.0, 2: 7.0}
+    # Token vectors skip [CLS] and are normalized
+    assert store.chunk_vectors("f00d", 1).shape == (3, 2)
+    np.testing.assert_allclose(np.linalg.norm(store.chunk_vectors("f00d", 0).astype(np.float32), axis=1), 1.0, atol=1e-3)
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_service as llm_module
+
+
+@pytest.fixture
+def service(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(
+        llm_module,
+        "OllamaEmbeddingService",
+        lambda: SimpleNamespace(count_tokens=lambda text: len(text.split())),
+    )
+    instance = llm_module.LLMService()
+
+    async def fake_search(**kwargs):
+        return {
+            "results": [
+                {
+                    "document_id": "doc-1",
+                    "document_title": "Handbuch",
+                    "filename": "handbuch.pdf",
+                    "content": "Der Kiosk startet in 30 Sekunden.",
+                    "similarity_score": 0.91,
+                }
+            ]
+        }
+
+    instance.search_service = SimpleNamespace(search=fake_search)
+    return instance
+
+
+def _collect(generator):
+    async def _run():
+        return [event async for event in generator]
+
+    return asyncio.run(_run())
+
+
+def test_stream_rag_response_emits_citations_before_tokens(service):
+    async def fake_stream(prompt, context=None, temperature=None, max_tokens=None):
+        assert "Handbuch" in context
+        for token in ["Der ", "Kiosk ", "startet."]:
+            yield token
+
+    service.generate_response_stream = fake_stream
+
+    events = _collect(service.stream_rag_response(db=None, user=None, query="Wie schnell startet der Kiosk?"))
+
+    assert [event["type"] for event in events] == ["citations", "chunk", "chunk", "chunk", "complete"]
+    assert events[0]["retrieved_documents"][0]["document_id"] == "doc-1"
+
+    payload = events[-1]["payload"]
+    assert payload["response"] == "Der Kiosk startet."
+    assert payload["use_rag"] is True
+    assert payload["time_to_first_token"] is not None
+    assert payload["tokens_used"] > 0
+
+
+def test_generate_rag_response_stream_flag_returns_joined_payload(service):
+    async def fake_stream(prompt, context=None, temperature=None, max_tokens=None):
+        yield "Hallo "
+        yield "Welt"
+
+    service.generate_response_stream = fake_stream
+
+    result = asyncio.run(
+        service.generate_rag_response(db=None, user=None, query="Test", use_rag=False, stream=True)
+    )
+
+    assert result["response"] == "Hallo Welt"
+    assert result["retrieved_documents"] == []
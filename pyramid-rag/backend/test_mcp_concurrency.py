@@ -0,0 +1,274 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.services.mcp_gateway import DocumentSearchTool, MCPGateway, ToolContext
+from app.vector_store import VectorStore
+
+DB_LATENCY = 0.2
+EMBED_LATENCY = 0.2
+CONCURRENCY = 8
+STREAMS = 50
+TOKEN_DELAY = 0.02
+
+
+class SlowAsyncSession:
+    """Stand-in for AsyncSession whose queries wait on I/O without blocking the loop."""
+
+    async def execute(self, stmt):
+        await asyncio.sleep(DB_LATENCY)
+        return SimpleNamespace(all=lambda: [], scalars=lambda: SimpleNamespace(all=lambda: []))
+
+
+class SlowEmbeddingService:
+    model_name = "test-model"
+
+    def generate_embedding(self, text):
+        # Simulates CPU-bound model inference
+        time.sleep(EMBED_LATENCY)
+        return [0.0] * 4
+
+
+async def _timed_gather(factory):
+    start = time.perf_counter()
+    await asyncio.gather(*(factory() for _ in range(CONCURRENCY)))
+    return time.perf_counter() - start
+
+
+def test_semantic_search_does_not_serialise_concurrent_requests():
+    store = VectorStore(embeddings_service=SlowEmbeddingService())
+    db = SlowAsyncSession()
+
+    elapsed = asyncio.run(_timed_gather(lambda: store.semantic_search("Pumpe", db=db)))
+
+    # Blocking the loop would cost CONCURRENCY * (EMBED_LATENCY + DB_LATENCY) = 3.2s
+    serial_cost = CONCURRENCY * (EMBED_LATENCY + DB_LATENCY)
+    assert elapsed < serial_cost / 2
+
+
+def test_document_search_tool_overlaps_database_waits():
+    db = SlowAsyncSession()
+
+    async def run_tool():
+        return await DocumentSearchTool().execute(ToolContext(db=db), query="Wartung")
+
+    elapsed = asyncio.run(_timed_gather(run_tool))
+
+    assert elapsed < CONCURRENCY * DB_LATENCY / 2
+
+
+class FakeOllamaClient:
+    model = "fake"
+
+    async def generate_stream(self, query, context="", system_prompt=None, temperature=0.7, stats=None):
+        for token in query.split():
+            await asyncio.sleep(TOKEN_DELAY)
+            yield token + " "
+
+    async def chat_stream(self, messages, temperature=0.7, stats=None):
+        question = messages[-1]["content"].rsplit("Frage: ", 1)[-1]
+        async for token in self.generate_stream(question):
+            yield token
+
+
+class FakeVectorStore:
+    async def hybrid_search(self, query, db, limit=5, user_department=None, **_):
+        await db.execute(None)
+        return [{"document_id": user_department, "document_title": "Handbuch", "chunk_content": query}]
+
+
+class TrackingSession(SlowAsyncSession):
+    """Fails if two statements overlap on one session, as AsyncSession would."""
+
+    def __init__(self):
+        self.busy = False
+
+    async def execute(self, stmt):
+        assert not self.busy, "session used concurrently"
+        self.busy = True
+        try:
+            return await super().execute(stmt)
+        finally:
+            self.busy = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_fifty_concurrent_streams_stay_isolated():
+    ollama, store = FakeOllamaClient(), FakeVectorStore()
+
+    async def one_stream(index):
+        gateway = MCPGateway(TrackingSession(), ollama_client=ollama, vector_store=store)
+        events = [
+            event
+            async for event in gateway.stream_chat(
+                messages=[{"role": "user", "content": f"frage {index} bitte"}],
+                session_id=f"s{index}",
+                user_id=str(index),
+                department=f"dept-{index}",
+            )
+        ]
+        return index, events
+
+    async def run_all():
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(*(one_stream(i) for i in range(STREAMS)))
+        return outcomes, time.perf_counter() - start
+
+    outcomes, elapsed = asyncio.run(run_all())
+
+    for index, events in outcomes:
+        payload = events[-1]["payload"]
+        assert payload["content"] == f"frage {index} bitte "
+        assert payload["citations"][0]["document_id"] == f"dept-{index}"
+
+    # One stream costs DB_LATENCY + 3 * TOKEN_DELAY; serialised would be 50x that
+    single_stream = DB_LATENCY + 3 * TOKEN_DELAY
+    assert elapsed < STREAMS * single_stream / 5
+
+
+def test_tool_calls_in_one_turn_run_in_parallel_on_separate_sessions():
+    gateway = MCPGateway(
+        TrackingSession(),
+        ollama_client=FakeOllamaClient(),
+        vector_store=FakeVectorStore(),
+        session_factory=TrackingSession,
+    )
+    tool_calls = [
+        {"id": f"call-{i}", "function": {"name": "document_search", "arguments": '{"query": "Pumpe"}'}}
+        for i in range(CONCURRENCY)
+    ]
+    tool_calls.append({"id": "bad", "function": {"name": "format_disk", "arguments": {}}})
+
+    async def run():
+        start = time.perf_counter()
+        result = await gateway.process_message(
+            messages=[{"role": "user", "content": "", "tool_calls": tool_calls}],
+            session_id="s",
+            user_id="u",
+            department="Management",
+        )
+        return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(run())
+
+    tool_results = result["metadata"]["tool_results"]
+    assert [entry["tool_call_id"] for entry in tool_results] == [call["id"] for call in tool_calls]
+    assert all(entry["result"]["success"] for entry in tool_results[:-1])
+    assert tool_results[-1]["result"] == {"success": False, "error": "Unknown tool: format_disk"}
+    assert elapsed < CONCURRENCY * DB_LATENCY / 2
+
+
+class InFlight:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def enter(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def leave(self):
+        self.current -= 1
+
+
+class BlockingOllamaClient:
+    """Holds every stream open until ``expected`` streams are in flight together."""
+
+    model = "fake"
+
+    def __init__(self, expected, hold_timeout=2.0):
+        self.expected = expected
+        self.hold_timeout = hold_timeout
+        self.streams = InFlight()
+        self.all_in_flight = None
+
+    async def _hold(self):
+        if self.all_in_flight is None:
+            self.all_in_flight = asyncio.Event()
+        self.streams.enter()
+        try:
+            if self.streams.current >= self.expected:
+                self.all_in_flight.set()
+            try:
+                await asyncio.wait_for(self.all_in_flight.wait(), self.hold_timeout)
+            except asyncio.TimeoutError:
+                pass
+            yield "ok"
+        finally:
+            self.streams.leave()
+
+    async def chat_stream(self, messages, temperature=0.7, stats=None):
+        async for token in self._hold():
+            yield token
+
+    async def generate_stream(self, query, context="", system_prompt=None, temperature=0.7, stats=None):
+        async for token in self._hold():
+            yield token
+
+
+class CountingSession(TrackingSession):
+    """AsyncSession stand-in that records how many queries wait at once."""
+
+    def __init__(self, queries):
+        super().__init__()
+        self.queries = queries
+
+    async def execute(self, stmt):
+        self.queries.enter()
+        try:
+            return await super().execute(stmt)
+        finally:
+            self.queries.leave()
+
+
+class LoopBlockingSession(CountingSession):
+    """The synchronous ``Session.query().all()`` the tools used to call from async code."""
+
+    async def execute(self, stmt):
+        self.queries.enter()
+        try:
+            time.sleep(DB_LATENCY / 20)
+            return SimpleNamespace(all=lambda: [], scalars=lambda: SimpleNamespace(all=lambda: []))
+        finally:
+            self.queries.leave()
+
+
+def _peak_in_flight(session_cls):
+    client, queries = BlockingOllamaClient(expected=STREAMS), InFlight()
+    store = FakeVectorStore()
+
+    async def one_stream(index):
+        gateway = MCPGateway(session_cls(queries), ollama_client=client, vector_store=store)
+        return [
+            event
+            async for event in gateway.stream_chat(
+                messages=[{"role": "user", "content": f"frage {index}"}],
+                session_id=f"peak-{session_cls.__name__}-{index}",
+                user_id=str(index),
+                department="Management",
+            )
+        ]
+
+    async def run_all():
+        return await asyncio.gather(*(one_stream(i) for i in range(STREAMS)))
+
+    outcomes = asyncio.run(run_all())
+    assert all(events[-1]["payload"]["content"] == "ok" for events in outcomes)
+    return queries.peak, client
+
+
+def test_peak_in_flight_streams_before_and_after_async_sessions():
+    before_queries, _ = _peak_in_flight(LoopBlockingSession)
+    after_queries, client = _peak_in_flight(CountingSession)
+
+    # A blocking query holds the loop, so streams queue behind each other's database work
+    assert before_queries == 1
+    assert after_queries == STREAMS
+    # Every stream reached the model at the same time instead of waiting for a slot
+    assert client.streams.peak == STREAMS
+    assert client.all_in_flight.is_set()
@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.services import metrics_collector as collector_module
+from app.services.metrics_collector import MetricsCollector
+
+
+class ScriptedSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.log.append(sql)
+        if "FROM pg_class" in sql:
+            rows = [("documents", 1200), ("document_chunks", 48000), ("users", -1)]
+            return SimpleNamespace(all=lambda: rows)
+        if sql == "SELECT count(*) FROM users":
+            return SimpleNamespace(scalar=lambda: 7)
+        if "created_at >= :week_ago" in sql:
+            return SimpleNamespace(one=lambda: (12, 3))
+        if "version()" in sql:
+            return SimpleNamespace(scalar=lambda: "PostgreSQL 16")
+        return SimpleNamespace(scalar=lambda: 5)
+
+
+def test_refresh_uses_estimates_and_serves_snapshot(monkeypatch):
+    log = []
+    monkeypatch.setattr(
+        collector_module,
+        "_sample_host",
+        lambda: {"cpu_percent": 12.5, "memory_percent": 40.0, "disk_percent": 55.0},
+    )
+    collector = MetricsCollector(session_factory=lambda: ScriptedSession(log), interval=60)
+
+    asyncio.run(collector.ensure_collected())
+    queries_after_first = len(log)
+    asyncio.run(collector.ensure_collected())
+
+    assert len(log) == queries_after_first
+    assert collector.values["pyramid_documents_total"] == 1200
+    assert collector.values["pyramid_chunks_total"] == 48000
+    # users was never analysed, so its exact count is used instead
+    assert collector.values["pyramid_users_total"] == 7
+    assert collector.values["pyramid_documents_last_7d"] == 12
+    assert collector.database["version"] == "PostgreSQL 16"
+    assert "pyramid_system_cpu_percent 12.5" in collector.prometheus_text.splitlines()
+    assert "SELECT count(*) FROM documents" not in log
+
+
+def test_refresh_records_database_errors_without_losing_host_metrics(monkeypatch):
+    class BrokenSession(ScriptedSession):
+        async def execute(self, stmt, params=None):
+            raise RuntimeError("connection refused")
+
+    monkeypatch.setattr(collector_module, "_sample_host", lambda: {"cpu_percent": 1.0})
+    collector = MetricsCollector(session_factory=lambda: BrokenSession([]), interval=60)
+
+    asyncio.run(collector.refresh())
+
+    assert collector.database == {"error": "connection refused"}
+    assert collector.values["pyramid_system_cpu_percent"] == 1.0
+
+
+def test_full_scan_counts_are_cached_between_aggregate_refreshes(monkeypatch):
+    log = []
+    monkeypatch.setattr(collector_module, "_sample_host", lambda: {})
+    collector = MetricsCollector(session_factory=lambda: ScriptedSession(log), interval=30, aggregate_interval=900)
+
+    asyncio.run(collector.refresh())
+    first = [sql for sql in log if sql.startswith("SELECT count(*) FROM") and "pg_stat_activity" not in sql]
+    log.clear()
+    asyncio.run(collector.refresh())
+
+    # The never-analysed fallback and the five filtered counts ran once
+    assert len(first) == 1 + len(collector_module.AGGREGATE_QUERIES)
+    assert not [sql for sql in log if sql.startswith("SELECT count(*) FROM") and "pg_stat_activity" not in sql]
+    assert collector.values["pyramid_users_total"] == 7
+    assert collector.values["pyramid_users_active"] == 5
+
+    collector.aggregate_interval = 0
+    log.clear()
+    asyncio.run(collector.refresh())
+    assert "SELECT count(*) FROM users WHERE is_active = true" in log
+
+
+def test_recent_activity_counts_have_a_leading_index():
+    from app.models import ChatSession, Document
+
+    def leading_columns(model):
+        return {next(iter(index.columns)).name for index in model.__table__.indexes}
+
+    assert "updated_at" in leading_columns(ChatSession)
+    assert "created_at" in leading_columns(Document)
@@ -0,0 +1,113 @@
+import asyncio
+
+import numpy as np
+
+from app.services.model_warmup import DISABLED, FAILED, READY, ModelWarmup
+
+
+def test_warmup_reports_each_model_state():
+    loaded = []
+
+    def broken():
+        raise RuntimeError("CUDA out of memory")
+
+    warmup = ModelWarmup(loaders={"embedding": lambda: loaded.append("embedding"), "reranker": broken}, enabled=True)
+    assert not warmup.ready
+
+    asyncio.run(warmup.run())
+
+    snapshot = warmup.snapshot()
+    assert loaded == ["embedding"]
+    assert snapshot["embedding"]["status"] == READY
+    assert snapshot["reranker"] == {
+        "status": FAILED,
+        "seconds": snapshot["reranker"]["seconds"],
+        "error": "CUDA out of memory",
+        "loaded_at": None,
+    }
+    assert not warmup.ready
+
+
+def test_disabled_warmup_counts_as_ready():
+    warmup = ModelWarmup(loaders={"embedding": lambda: None}, enabled=False)
+
+    assert warmup.ready
+    assert warmup.snapshot()["embedding"]["status"] == DISABLED
+
+
+def test_document_processor_does_not_load_model_on_construction(monkeypatch):
+    from app.services import bge_m3_embedding_service
+    from app.services.document_processor import DocumentProcessor
+
+    calls = []
+    monkeypatch.setattr(bge_m3_embedding_service, "get_embedding_model", lambda: calls.append(1) or "model")
+
+    processor = DocumentProcessor()
+
+    assert calls == []
+    monkeypatch.setattr("app.services.document_processor.HAS_EMBEDDINGS", True)
+    assert processor.embedding_model == "model"
+    assert processor.embedding_model == "model"
+    assert calls == [1]
+
+
+def test_concurrent_first_calls_load_the_embedding_model_once(monkeypatch):
+    import threading
+    import time
+    from types import SimpleNamespace
+
+    from app.services import bge_m3_embedding_service
+
+    loads = []
+
+    def slow_load():
+        loads.append(threading.get_ident())
+        time.sleep(0.05)
+        return SimpleNamespace(get_sentence_embedding_dimension=lambda: 1024)
+
+    monkeypatch.setattr(bge_m3_embedding_service, "_embedding_model", None)
+    monkeypatch.setattr(bge_m3_embedding_service, "_sentence_transformer", object)
+    monkeypatch.setattr(bge_m3_embedding_service, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(bge_m3_embedding_service, "load_onnx_model", slow_load)
+
+    async def warmup_and_first_request():
+        return await asyncio.gather(
+            asyncio.to_thread(bge_m3_embedding_service.get_embedding_model),
+            asyncio.to_thread(bge_m3_embedding_service.get_embedding_model),
+        )
+
+    first, second = asyncio.run(warmup_and_first_request())
+
+    assert first is second
+    assert len(loads) == 1
+
+
+def test_concurrent_first_queries_load_the_search_model_once(monkeypatch):
+    import threading
+    import time
+
+    from app.embeddings_service import EmbeddingsService
+    from app.services.model_warmup import ModelWarmup
+
+    service = EmbeddingsService()
+    loads = []
+
+    class FakeModel:
+        def encode(self, text, **kwargs):
+            return np.zeros(384)
+
+    def slow_load():
+        loads.append(threading.get_ident())
+        time.sleep(0.05)
+        service.model = FakeModel()
+
+    monkeypatch.setattr(service, "_load_model", slow_load)
+
+    async def first_queries():
+        return await asyncio.gather(*(asyncio.to_thread(service.generate_embedding, "Pumpe") for _ in range(4)))
+
+    embeddings = asyncio.run(first_queries())
+
+    assert len(loads) == 1
+    assert all(len(embedding) == 384 for embedding in embeddings)
+    assert "search_embedding" in ModelWarmup(enabled=False).loaders
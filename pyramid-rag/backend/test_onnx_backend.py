@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import bge_m3_embedding_service, onnx_backend
+
+
+def test_thread_count_defaults_to_physical_cores_and_can_be_pinned(monkeypatch):
+    monkeypatch.delenv("EMBEDDING_THREADS", raising=False)
+    assert onnx_backend.embedding_threads() >= 1
+
+    monkeypatch.setenv("EMBEDDING_THREADS", "6")
+    assert onnx_backend.embedding_threads() == 6
+
+
+def test_missing_export_is_reported_before_loading(tmp_path):
+    with pytest.raises(FileNotFoundError, match="export_onnx_model.py export"):
+        onnx_backend.load_onnx_model(tmp_path, onnx_backend.quantized_file_name("avx2"))
+
+
+def test_backend_is_selected_by_environment(monkeypatch):
+    onnx_model = SimpleNamespace(get_sentence_embedding_dimension=lambda: 1024)
+    monkeypatch.setattr(bge_m3_embedding_service, "_embedding_model", None)
+    monkeypatch.setattr(bge_m3_embedding_service, "_sentence_transformer", lambda *args, **kwargs: pytest.fail("torch model loaded"))
+    monkeypatch.setattr(bge_m3_embedding_service, "EMBEDDING_BACKEND", "onnx")
+    monkeypatch.setattr(bge_m3_embedding_service, "load_onnx_model", lambda: onnx_model)
+
+    assert bge_m3_embedding_service.get_embedding_model() is onnx_model
@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import load_only
+
+from app.api.endpoints.documents import LIST_COLUMNS
+from app.models import Document
+from app.services.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_after
+
+
+def compile_pg(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 9, 30, 15, 123456)
+    row_id = uuid.uuid4()
+
+    cursor = encode_cursor(created_at, row_id)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, row_id)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10", encode_cursor(datetime(2026, 1, 1), "x")])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_listing_query_skips_heavy_columns_and_uses_keyset():
+    cursor = encode_cursor(datetime(2026, 10, 18), uuid.uuid4())
+    statement = (
+        select(Document)
+        .options(load_only(*LIST_COLUMNS))
+        .where(keyset_after(Document.created_at, Document.id, cursor))
+        .order_by(Document.created_at.desc(), Document.id.desc())
+        .limit(20)
+    )
+
+    sql = compile_pg(statement)
+
+    assert "documents.content" not in sql
+    assert "documents.meta_data" not in sql
+    assert "(documents.created_at, documents.id) < (" in sql
+    assert "OFFSET" not in sql
+    assert keyset_after(Document.created_at, Document.id, None) is None
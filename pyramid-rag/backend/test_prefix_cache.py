@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+
+from app.services import mcp_gateway
+from app.services.chat_file_index import ChatFileIndex
+from app.services.conversation_store import ConversationStore
+from app.services.mcp_gateway import MCPGateway
+from benchmarks.fake_ollama import create_app
+
+
+class ChatRecordingClient:
+    model = "fake"
+
+    def __init__(self):
+        self.requests = []
+
+    async def chat_stream(self, messages, temperature=0.7, stats=None):
+        self.requests.append(messages)
+        if stats is not None:
+            stats.update({"prefill_seconds": 0.01, "prompt_tokens": 10})
+        yield f"Antwort {len(self.requests)}"
+
+
+class ChangingVectorStore:
+    async def hybrid_search(self, query, **_):
+        return [{"document_id": "kb-1", "document_title": "Handbuch", "chunk_content": f"Treffer zu {query}"}]
+
+
+def run_turns(gateway, questions, uploads):
+    async def consume():
+        events = []
+        for index, question in enumerate(questions):
+            async for event in gateway.stream_chat(
+                messages=[{"role": "user", "content": question}],
+                session_id="s1",
+                user_id="u1",
+                department="Support",
+                context_payload={"uploaded_documents": uploads if index == 0 else []},
+            ):
+                events.append(event)
+        return events
+
+    return asyncio.run(consume())
+
+
+def test_chat_prompt_keeps_a_stable_prefix_between_turns():
+    client = ChatRecordingClient()
+    gateway = MCPGateway(
+        db_session=None, ollama_client=client, vector_store=ChangingVectorStore(), conversation_store=ConversationStore()
+    )
+    uploads = [{"id": "doc-1", "title": "Wartungsbericht", "content": "Pumpe P-100 tauschen"}]
+
+    events = run_turns(gateway, ["frage 1", "frage 2", "frage 3"], uploads)
+
+    first, second, third = client.requests
+    assert first[0]["role"] == "system"
+    assert "[DOC_1] Wartungsbericht" in first[0]["content"]
+    # Everything but the per-turn message is reused verbatim by the next turn
+    assert second[: len(first) - 1] == first[:-1]
+    assert third[: len(second) - 1] == second[:-1]
+    assert second[len(first) - 1:len(first) + 1] == [
+        {"role": "user", "content": "frage 1"},
+        {"role": "assistant", "content": "Antwort 1"},
+    ]
+    assert "Treffer zu frage 3" in third[-1]["content"]
+    assert third[-1]["content"].endswith("Frage: frage 3")
+    assert events[-1]["payload"]["metadata"]["llm_stats"]["prompt_tokens"] == 10
+
+
+def test_pinned_block_does_not_depend_on_which_indexed_upload_matches(monkeypatch):
+    def encode(model_name, text):
+        # "Pumpe" points at the manual, anything else at the price list
+        return [1.0, 0.0] if "Pumpe" in text else [0.0, 1.0]
+
+    index = ChatFileIndex(spill=lambda *args: None, query_encoder=encode)
+    for file_id, title, text, vector in (
+        ("file-a", "Handbuch", "Pumpe P-100 warten", [1.0, 0.0]),
+        ("file-b", "Preise", "P-100 kostet 900 Euro", [0.0, 1.0]),
+    ):
+        asyncio.run(index.add_file("s1", file_id, title, [{"content": text}], [vector], model_name="BAAI/bge-m3"))
+    monkeypatch.setattr(mcp_gateway, "chat_file_index", index)
+    client = ChatRecordingClient()
+    gateway = MCPGateway(
+        db_session=None, ollama_client=client, vector_store=ChangingVectorStore(), conversation_store=ConversationStore()
+    )
+    uploads = [
+        {"id": "file-a", "title": "Handbuch", "content": "Titelseite Handbuch", "scope": "CHAT"},
+        {"id": "notes", "title": "Notiz", "content": "Rueckruf am Montag", "scope": "CHAT"},
+        {"id": "file-b", "title": "Preise", "content": "Titelseite Preise", "scope": "CHAT"},
+    ]
+
+    run_turns(gateway, ["Wie warte ich die Pumpe?", "Was kostet das?"], uploads)
+
+    first, second = client.requests
+    assert second[0] == first[0]
+    assert "[DOC_1] Notiz" in first[0]["content"]
+    assert "Titelseite" not in first[0]["content"]
+    assert "Pumpe P-100 warten" in first[-1]["content"]
+    assert "P-100 kostet 900 Euro" in second[-1]["content"]
+
+
+def test_fake_ollama_only_charges_prefill_after_the_cached_prefix():
+    transport = httpx.ASGITransport(app=create_app(tokens_per_second=1000, prefill_tokens_per_second=1e6, max_tokens=4))
+
+    async def chat(client, messages):
+        response = await client.post("/api/chat", json={"model": "m", "messages": messages, "stream": False})
+        return response.json()
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake") as client:
+            system = {"role": "system", "content": "lang " * 200}
+            first = await chat(client, [system, {"role": "user", "content": "Frage: eins"}])
+            answer = first["message"]
+            second = await chat(client, [system, {"role": "user", "content": "Frage: eins"}, answer, {"role": "user", "content": "Frage: zwei"}])
+            return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first["prompt_eval_count"] > 200
+    assert second["prompt_eval_count"] < 10
+
+
+def test_both_transports_share_the_system_prompt(monkeypatch):
+    from app.services import mcp_gateway
+    from app.services.mcp_gateway import CHAT_SYSTEM_PROMPT, ChatTool, MCPContext, ToolContext
+
+    context = MCPContext(session_id="s1", user_id="u1", department="Support")
+    tool_context = ToolContext(db=None, ollama_client=ChatRecordingClient(), vector_store=ChangingVectorStore())
+
+    async def prepare():
+        return await ChatTool().prepare_chat(tool_context, "frage", context)
+
+    chat = asyncio.run(prepare())
+    monkeypatch.setattr(mcp_gateway, "OLLAMA_TRANSPORT", "generate")
+    generate = asyncio.run(prepare())
+
+    expected = CHAT_SYSTEM_PROMPT.format(department="Support")
+    assert chat.chat_messages[0]["content"] == expected
+    assert generate.chat_messages is None
+    assert generate.system_prompt == expected
@@ -0,0 +1,85 @@
+import asyncio
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.api import deps
+from app.models import Department
+from app.services.principal_cache import PrincipalCache, UserPrincipal
+
+
+def _user(**overrides):
+    values = dict(
+        id=uuid.uuid4(),
+        email="anna@pyramid.local",
+        username="anna",
+        full_name="Anna Admin",
+        primary_department=Department.MANAGEMENT,
+        is_active=True,
+        is_superuser=False,
+        created_at=datetime(2024, 1, 1),
+        last_login=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class CountingSession:
+    def __init__(self, user):
+        self.user = user
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return SimpleNamespace(scalar_one_or_none=lambda: self.user)
+
+
+def test_resolve_principal_hits_database_once(monkeypatch):
+    monkeypatch.setattr(deps, "principal_cache", PrincipalCache(ttl_seconds=60, redis_url=None))
+    user = _user()
+    db = CountingSession(user)
+
+    async def resolve_many():
+        return [await deps.resolve_principal(str(user.id), db) for _ in range(5)]
+
+    principals = asyncio.run(resolve_many())
+
+    assert db.queries == 1
+    assert all(p == UserPrincipal.from_user(user) for p in principals)
+
+
+def test_invalidate_forces_reload_after_deactivation(monkeypatch):
+    cache = PrincipalCache(ttl_seconds=60, redis_url=None)
+    monkeypatch.setattr(deps, "principal_cache", cache)
+    user = _user()
+    db = CountingSession(user)
+
+    async def scenario():
+        first = await deps.resolve_principal(str(user.id), db)
+        user.is_active = False
+        await cache.invalidate(user.id)
+        second = await deps.resolve_principal(str(user.id), db)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first.is_active is True
+    assert second.is_active is False
+    assert db.queries == 2
+
+
+def test_expired_entries_are_dropped():
+    cache = PrincipalCache(ttl_seconds=0, redis_url=None)
+    principal = UserPrincipal.from_user(_user())
+
+    async def scenario():
+        await cache.set(principal)
+        return await cache.get(str(principal.id))
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_principal_json_round_trip():
+    principal = UserPrincipal.from_user(_user(last_login=datetime(2024, 5, 1, 8, 30)))
+
+    assert UserPrincipal.from_json(principal.to_json()) == principal
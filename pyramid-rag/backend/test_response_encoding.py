@@ -0,0 +1,89 @@
+import uuid
+from datetime import datetime
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.models import FileType
+from app.services import response_encoding
+from app.services.response_encoding import CompressionMiddleware, InvalidFields, json_response, parse_fields
+
+CONTEXT_RESPONSE = {
+    "query": "wartung",
+    "total_results": 2,
+    "results": [
+        {"document_id": "d1", "similarity_score": 0.9, "main_chunk": {"chunk_id": "c1", "content": "x"}, "full_context": "long"},
+        {"document_id": "d2", "similarity_score": 0.8, "main_chunk": {"chunk_id": "c2", "content": "y"}, "full_context": "long"},
+    ],
+}
+
+
+def test_fields_include_and_exclude_nested_paths_across_lists():
+    included = parse_fields("total_results, results.document_id,results.main_chunk.chunk_id").apply(CONTEXT_RESPONSE)
+    assert included == {
+        "total_results": 2,
+        "results": [
+            {"document_id": "d1", "main_chunk": {"chunk_id": "c1"}},
+            {"document_id": "d2", "main_chunk": {"chunk_id": "c2"}},
+        ],
+    }
+
+    excluded = parse_fields("-results.full_context,-results.main_chunk.content").apply(CONTEXT_RESPONSE)
+    assert excluded["query"] == "wartung"
+    assert excluded["results"][0] == {"document_id": "d1", "similarity_score": 0.9, "main_chunk": {"chunk_id": "c1"}}
+
+    assert parse_fields("") is None
+    with pytest.raises(InvalidFields):
+        parse_fields("results..content")
+
+
+def test_json_response_serializes_model_types_without_jsonable_encoder():
+    document_id = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    payload = {"id": document_id, "file_type": FileType.PDF, "created_at": datetime(2026, 10, 18, 12), "content": "x" * 10}
+
+    body = orjson.loads(json_response(payload, parse_fields("-content")).body)
+
+    assert body == {"id": str(document_id), "file_type": "pdf", "created_at": "2026-10-18T12:00:00"}
+
+
+def test_accept_encoding_honours_q_values(monkeypatch):
+    monkeypatch.setattr(response_encoding, "HAS_BROTLI", True)
+    assert response_encoding.choose_encoding("gzip, deflate, br") == "br"
+    assert response_encoding.choose_encoding("br;q=0, gzip;q=0.5") == "gzip"
+    assert response_encoding.choose_encoding("identity") is None
+
+    monkeypatch.setattr(response_encoding, "HAS_BROTLI", False)
+    assert response_encoding.choose_encoding("br, *;q=0.1") == "gzip"
+
+
+def test_middleware_compresses_large_bodies_only(monkeypatch):
+    monkeypatch.setattr(response_encoding, "HAS_BROTLI", False)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    def large():
+        return json_response({"content": "Wartung des Terminals. " * 200})
+
+    @app.get("/small")
+    def small():
+        return json_response({"content": "ok"})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"data: 1\n\n" * 200, b"data: 2\n\n"]), media_type="text/event-stream")
+
+    client = TestClient(app)
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < 1024
+    assert response.json()["content"].startswith("Wartung")
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in streamed.headers
+    assert streamed.text.endswith("data: 2\n\n")
@@ -0,0 +1,126 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Department, Document, DocumentChunk, DocumentChunkTerm, FileType, User
+from app.services.search_service import SearchService
+from app.services.sparse_encoder import SparseEncoder, store_sparse_terms
+
+CLS, EOS = 0, 2
+
+
+class FakeModel:
+    """Forward-pass features: hidden state i of a text is [i + 1] * 2."""
+
+    tokenizer = SimpleNamespace(all_special_ids=[CLS, EOS, 1])
+
+    def __init__(self, token_ids):
+        self.token_ids = token_ids
+
+    def encode(self, texts, output_value=None, batch_size=16, show_progress_bar=False):
+        assert output_value is None
+        features = []
+        for text in texts:
+            ids = [CLS] + self.token_ids[text] + [EOS, 1, 1]  # padded to the batch length
+            mask = [1] * (len(ids) - 2) + [0, 0]
+            hidden = np.array([[index + 1.0, index + 1.0] for index in range(len(ids))])
+            features.append({
+                "input_ids": np.array(ids),
+                "attention_mask": np.array(mask),
+                "token_embeddings": hidden,
+                "sentence_embedding": np.array([0.6, 0.8]),
+            })
+        return features
+
+
+def make_encoder(token_ids, min_weight=0.0):
+    # weight(h) = relu(0.5 * h0 + 0.5 * h1 - 2)
+    return SparseEncoder(model=FakeModel(token_ids), head=(np.array([0.5, 0.5]), -2.0), min_weight=min_weight)
+
+
+def test_sparse_vectors_keep_max_weight_per_token_and_drop_special_tokens():
+    encoder = make_encoder({"pumpe pumpe ventil": [7, 9, 7]})
+
+    # Positions 1..3 have hidden values 2, 3, 4 -> weights 0, 1, 2
+    assert encoder.encode(["pumpe pumpe ventil"]) == [{9: 1.0, 7: 2.0}]
+
+
+def test_min_weight_prunes_postings():
+    encoder = make_encoder({"a": [7, 9, 11]}, min_weight=1.5)
+
+    assert encoder.encode(["a"]) == [{11: 2.0}]
+
+
+def test_unavailable_encoder_returns_nothing():
+    encoder = SparseEncoder(model=FakeModel({}))
+    encoder._failed = True
+
+    assert encoder.encode(["a"]) == []
+    assert encoder.encode_query("a") == {}
+
+
+def make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    tables = [User.__table__, Document.__table__, DocumentChunk.__table__, DocumentChunkTerm.__table__]
+    User.metadata.create_all(engine, tables=tables)
+    return sessionmaker(bind=engine)()
+
+
+def test_postings_are_scored_in_sql_by_shared_tokens():
+    db = make_session()
+    user = User(email="a@example.com", username="a", hashed_password="x", primary_department=Department.SUPPORT)
+    db.add(user)
+    db.flush()
+    document = Document(
+        filename="a.txt", original_filename="a.txt", file_path="/a.txt", file_type=FileType.TEXT,
+        title="Handbuch", department=Department.SUPPORT, uploaded_by=user.id,
+    )
+    db.add(document)
+    db.flush()
+    chunks = [DocumentChunk(document_id=document.id, chunk_index=index, content=f"Chunk {index}") for index in range(3)]
+    db.add_all(chunks)
+    db.flush()
+    rows = store_sparse_terms(
+        db, document.id, [chunk.id for chunk in chunks],
+        [{7: 0.5, 9: 0.1}, {7: 0.2, 9: 0.9, 11: 3.0}, {11: 1.0}],
+    )
+    db.commit()
+    assert rows == 6
+
+    service = SearchService()
+    superuser = SimpleNamespace(is_superuser=True)
+    stmt = asyncio.run(service._sparse_statement({7: 1.0, 9: 2.0}, superuser, limit=5))
+    ranked = [(chunk.chunk_index, round(score, 6)) for chunk, _, score in db.execute(stmt).all()]
+
+    # Chunk 2 shares no query token and is not read at all
+    assert ranked == [(1, 2.0), (0, 0.7)]
+
+
+def test_hybrid_search_swaps_the_keyword_leg(monkeypatch):
+    service = SearchService()
+    calls = []
+
+    async def vector_search(*args, **kwargs):
+        return [{"document_id": "d1", "chunk_id": "c1"}]
+
+    async def keyword_search(*args, **kwargs):
+        calls.append("fulltext")
+        return []
+
+    async def sparse_search(*args, **kwargs):
+        calls.append("sparse")
+        return [{"document_id": "d2", "chunk_id": "c2"}]
+
+    monkeypatch.setattr(service, "vector_search", vector_search)
+    monkeypatch.setattr(service, "keyword_search", keyword_search)
+    monkeypatch.setattr(service, "sparse_search", sparse_search)
+
+    results = asyncio.run(service.hybrid_search(None, "Pumpe", SimpleNamespace(), keyword_backend="sparse"))
+
+    assert calls == ["sparse"]
+    assert [result["document_id"] for result in results] == ["d1", "d2"]
+    assert results[1]["keyword_rank"] == 1
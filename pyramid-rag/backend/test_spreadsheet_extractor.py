@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import openpyxl
+
+from app.services.spreadsheet_extractor import extract_spreadsheet
+
+
+def write_workbook(path: Path, rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Artikel"
+    for row in rows:
+        sheet.append(row)
+    workbook.create_sheet("Leer")
+    workbook.save(path)
+
+
+def test_workbook_rows_are_grouped_under_the_header(tmp_path):
+    path = tmp_path / "export.xlsx"
+    rows = [["Artikel", "Bezeichnung", "Preis"], [None, None, None]]
+    rows += [[f"P-{index}", "Pumpe Typ A", 10.0 + index] for index in range(10)]
+    write_workbook(path, rows)
+
+    result = extract_spreadsheet(path, chunk_size_words=20)
+
+    assert result.metadata["extraction_method"] == "openpyxl_read_only"
+    assert result.metadata["rows"] == 10
+    assert result.metadata["sheets"] == 2
+    assert "P-0\tPumpe Typ A\t10" in result.content
+    assert len(result.chunks) > 1
+    for chunk in result.chunks:
+        assert chunk["content"].startswith("[Sheet: Artikel]\nArtikel | Bezeichnung | Preis\n")
+    assert result.chunks[0]["start_row"] == 3
+    assert result.chunks[-1]["end_row"] == 12
+    assert sum(chunk["content"].count("Pumpe") for chunk in result.chunks) == 10
+
+
+def test_csv_uses_the_same_path_with_row_and_column_caps(tmp_path):
+    path = tmp_path / "preise.csv"
+    lines = ["Artikel;Preis;Lager;Intern"] + [f"P-{index};{index},50;Ulm;x" for index in range(5)]
+    path.write_bytes("\n".join(lines).replace("Ulm", "München").encode("cp1252"))
+
+    result = extract_spreadsheet(path, chunk_size_words=100, max_rows=3, max_columns=3)
+
+    assert result.metadata["extraction_method"] == "csv_stream"
+    assert result.metadata["rows"] == 3
+    assert result.metadata["truncated_sheets"] == ["preise"]
+    assert result.chunks == [{
+        "content": "[Sheet: preise]\nArtikel | Preis | Lager\nP-0 | 0,50 | München\nP-1 | 1,50 | München\nP-2 | 2,50 | München",
+        "start_word": 0,
+        "end_word": 22,
+        "word_count": 22,
+        "character_count": len(result.chunks[0]["content"]),
+        "sheet": "preise",
+        "start_row": 2,
+        "end_row": 4,
+    }]
+    assert "P-3" not in result.content
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import httpx
+from prometheus_client import REGISTRY
+
+from app.ollama_client import OllamaClient
+from app.services import telemetry
+
+
+def stage_count(stage, route, mode):
+    value = REGISTRY.get_sample_value(
+        "pyramid_stage_duration_seconds_count",
+        {"stage": stage, "route": route, "mode": mode},
+    )
+    return value or 0.0
+
+
+def test_generation_stats_convert_nanoseconds_to_rates():
+    stats = telemetry.ollama_generation_stats({
+        "load_duration": 250_000_000,
+        "prompt_eval_count": 400,
+        "prompt_eval_duration": 200_000_000,
+        "eval_count": 60,
+        "eval_duration": 3_000_000_000,
+        "total_duration": 3_500_000_000,
+    })
+
+    assert stats["load_seconds"] == 0.25
+    assert stats["prefill_tokens_per_second"] == 2000
+    assert stats["decode_tokens_per_second"] == 20
+    assert stats["total_seconds"] == 3.5
+
+
+def test_generation_stats_tolerate_missing_counters():
+    stats = telemetry.ollama_generation_stats({"done": True})
+
+    assert stats["decode_tokens_per_second"] is None
+    assert stats["prefill_seconds"] is None
+
+
+def test_enclosing_search_mode_overrides_stage_default():
+    token = telemetry.bind_route("/api/v1/search/")
+    try:
+        before = stage_count("ann", "/api/v1/search/", "hybrid")
+        with telemetry.search_mode("hybrid"):
+            with telemetry.stage("ann", mode="vector"):
+                pass
+        with telemetry.stage("ann", mode="vector"):
+            pass
+    finally:
+        telemetry.reset_route(token)
+
+    assert stage_count("ann", "/api/v1/search/", "hybrid") == before + 1
+    assert stage_count("ann", "/api/v1/search/", "vector") >= 1
+    assert telemetry.current_route() == "background"
+
+
+def test_stream_records_time_to_first_token_and_decode_stages():
+    lines = [
+        {"response": "Hallo", "done": False},
+        {"response": " Welt", "done": False},
+        {
+            "response": "",
+            "done": True,
+            "prompt_eval_count": 100,
+            "prompt_eval_duration": 50_000_000,
+            "eval_count": 2,
+            "eval_duration": 100_000_000,
+        },
+    ]
+    body = "\n".join(json.dumps(line) for line in lines)
+
+    client = OllamaClient()
+    client.model = "telemetry-test"
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=body)))
+
+    async def consume():
+        return [chunk async for chunk in client.generate_stream("Frage")]
+
+    decode_before = stage_count("llm_decode", "background", "stream")
+    chunks = asyncio.run(consume())
+
+    assert "".join(chunks) == "Hallo Welt"
+    assert REGISTRY.get_sample_value(
+        "pyramid_llm_time_to_first_token_seconds_count",
+        {"route": "background", "model": "telemetry-test"},
+    ) == 1
+    assert stage_count("llm_decode", "background", "stream") == decode_before + 1
+    assert REGISTRY.get_sample_value(
+        "pyramid_llm_decode_tokens_per_second_sum",
+        {"route": "background", "model": "telemetry-test"},
+    ) == 20
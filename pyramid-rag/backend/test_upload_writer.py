@@ -0,0 +1,40 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from app.services.upload_writer import UploadTooLarge, write_upload
+
+
+class FakeUpload:
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+        self.reads = []
+
+    async def read(self, size=-1):
+        self.reads.append(size)
+        return self.buffer.read(size)
+
+
+def test_upload_is_written_and_hashed_in_one_pass(tmp_path):
+    data = b"Pumpe P-100 " * 10000
+    upload = FakeUpload(data)
+
+    stored = asyncio.run(write_upload(upload, tmp_path / "a.pdf", chunk_bytes=32 * 1024))
+
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert (tmp_path / "a.pdf").read_bytes() == data
+    assert set(upload.reads) == {32 * 1024}
+
+
+def test_oversized_upload_is_aborted_and_removed(tmp_path):
+    upload = FakeUpload(b"x" * 5000)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(write_upload(upload, tmp_path / "big.bin", max_bytes=3000, chunk_bytes=1024))
+
+    assert not (tmp_path / "big.bin").exists()
+    # Reading stops at the first block past the limit
+    assert len(upload.reads) == 3
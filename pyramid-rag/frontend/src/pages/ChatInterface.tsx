@@ -848,9 +848,11 @@ const selectSession = async (sessionId: string, fallbackSession?: ChatSession) =
   if (userMessage) {
     historySource.push(userMessage);
   }
+  // The backend keeps the state of an existing session, so only the new turn is sent
   const conversationHistory: MCPMessage[] = historySource
-    .slice(-CONTEXT_WINDOW_SIZE)
+    .slice(activeSessionId && userMessage ? -1 : -CONTEXT_WINDOW_SIZE)
     .map(msg => ({
+      id: msg.id,
       role: msg.role,
       content: msg.content,
     }));
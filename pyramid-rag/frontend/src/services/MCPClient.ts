@@ -6,6 +6,7 @@
 import type { UploadedDocumentPayload } from '../types';
 
 export interface MCPMessage {
+  id?: string;
   role: 'user' | 'assistant' | 'system' | 'tool';
   content: string;
   tool_calls?: ToolCall[];
@@ -98,6 +99,7 @@ class MCPClient {
 
       const payloadMessages = (messages && messages.length > 0)
         ? messages.map(message => ({
+            id: message.id,
             role: message.role,
             content: message.content,
             tool_calls: message.tool_calls,